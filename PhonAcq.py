@@ -9,6 +9,7 @@ import queue
 from datetime import datetime
 import importlib.util
 import traceback
+import multiprocessing
 
 # ==============================================================================
 # 阶段一：绝对最小化导入，用于瞬时启动画面
@@ -72,17 +73,19 @@ def global_exception_handler(exc_type, exc_value, exc_traceback):
 # 将我们自定义的函数设置为Python的全局异常处理器。
 sys.excepthook = global_exception_handler
 
+def get_base_path_for_splash():
+    """获取用于启动画面的基本路径，兼容打包和源码运行。"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    else:
+        return os.path.abspath(".")
+
 if __name__ == "__main__":
+    # [新增] 音频分析的多进程计算在打包版本中需要此调用，子进程会在这里直接进入工作循环
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False) # <-- [新增] 阻止在最后一个窗口关闭时自动退出
 
-    def get_base_path_for_splash():
-        """获取用于启动画面的基本路径，兼容打包和源码运行。"""
-        if getattr(sys, 'frozen', False):
-            return os.path.dirname(sys.executable)
-        else:
-            return os.path.abspath(".")
-    
     base_path_splash = get_base_path_for_splash()
     splash_pix = None
     splash_dir = os.path.join(base_path_splash, "assets", "splashes")
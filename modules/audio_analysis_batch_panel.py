@@ -5,13 +5,16 @@ MODULE_DESCRIPTION = "为音频分析模块提供批量处理功能，不直接
 import os
 import sys
 import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait as futures_wait, FIRST_COMPLETED
 import pandas as pd
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
                              QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
                              QFileDialog, QMessageBox, QMenu, QProgressDialog, QDialog,
                              QCheckBox, QDialogButtonBox, QFormLayout, QApplication, QRadioButton, QLineEdit, QGroupBox, QComboBox, QShortcut, QSizePolicy, QProgressBar)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QObject, QUrl, QTimer, QItemSelection, QItemSelectionModel, QItemSelectionRange
-from PyQt5.QtGui import QCursor, QIntValidator, QKeySequence, QPixmap
+from PyQt5.QtGui import QCursor, QIntValidator, QKeySequence, QPixmap, QFont
 from PyQt5.QtMultimedia import QMediaContent
 
 # 动态导入核心依赖，如果失败则优雅地处理
@@ -23,6 +26,15 @@ try:
     DEPENDENCIES_MISSING = False
 except ImportError:
     DEPENDENCIES_MISSING = True
+from audio_analysis_engine import (analyze_file, analyze_audio_file, quantize_spectrogram, mode_f0_settings,
+                                   resolve_worker_count)
+from audio_analysis_render import scene_from_results, render_analysis_file, analysis_info_text
+from audio_analysis_export import (available_table_formats, save_analysis_table, TABLE_FORMATS, PYARROW_AVAILABLE,
+                                   MergedTableWriter)
+from audio_analysis_source import open_audio_source, load_audio, build_waveform_envelope, audio_duration_s
+from audio_analysis_cache import (compute_file_hash, pack_formants, unpack_formants, pack_acoustics, unpack_acoustics,
+                                  COARSE_F0_KIND, pack_coarse_f0_range, unpack_coarse_f0_range, BatchResultStore,
+                                  BatchManifest, params_fingerprint)
 # ==============================================================================
 # [新增] 高级图片保存对话框 (AdvancedImageSaveDialog)
 # ==============================================================================
@@ -118,28 +130,56 @@ class AdvancedCsvSaveDialog(QDialog):
         self.separate_files_radio.setChecked(True)
         
         self.merge_file_radio = QRadioButton("将所有结果合并到一个 .csv 文件中")
-        self.merge_file_radio.setToolTip("所有音频的分析数据将合并到一个CSV文件中，并增加一列'source_file'来区分来源。")
+        self.merge_file_radio.setToolTip("所有音频的分析数据将合并到一个CSV文件中，并增加一列'source_file'来区分来源。\n"
+                                         "选择 Parquet 格式时保存为每个音频一个分片的 Parquet 数据集（一个文件夹）。\n"
+                                         "合并时逐个文件写出，不支持 NPZ 格式。")
         
         group_layout.addWidget(self.separate_files_radio)
         group_layout.addWidget(self.merge_file_radio)
         
         layout.addWidget(group)
 
+        # [新增] 文件格式：CSV 之外的二进制格式读写更快、文件更小，且可以拖回本模块重新加载
+        format_layout = QFormLayout()
+        self.format_combo = QComboBox()
+        for ext in available_table_formats():
+            self.format_combo.addItem(f"{TABLE_FORMATS[ext][0]} (*{ext})", ext)
+        tooltip = "CSV 通用性最好；Parquet/Feather/NPZ 为二进制格式，长音频的导出和重新加载快得多。"
+        if not PYARROW_AVAILABLE:
+            tooltip += "\n安装 pyarrow 后可选择 Parquet 和 Feather 格式。"
+        self.format_combo.setToolTip(tooltip)
+        format_layout.addRow("文件格式:", self.format_combo)
+        layout.addLayout(format_layout)
+        # [修复] 合并模式逐个文件追加写出，只提供支持追加的格式，避免把全部结果放进内存再合并
+        self.merge_file_radio.toggled.connect(self._update_format_availability)
+
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
         layout.addWidget(button_box)
 
+    def _update_format_availability(self, merge):
+        """合并模式下禁用不支持追加写出的格式；当前选中的格式被禁用时改选 CSV。"""
+        model = self.format_combo.model()
+        for i in range(self.format_combo.count()):
+            streaming = self.format_combo.itemData(i) in MergedTableWriter.STREAMING_FORMATS
+            item = model.item(i)
+            item.setEnabled(streaming or not merge)
+            item.setToolTip("" if streaming or not merge else "该格式不支持合并导出")
+        if merge and self.format_combo.currentData() not in MergedTableWriter.STREAMING_FORMATS:
+            self.format_combo.setCurrentIndex(self.format_combo.findData('.csv'))
+
     def get_options(self):
         return {
-            "merge": self.merge_file_radio.isChecked()
+            "merge": self.merge_file_radio.isChecked(),
+            "format": self.format_combo.currentData()
         }
 # ==============================================================================
 # [新增] 后台批量加载工作器 (BatchLoadWorker)
 # ==============================================================================
 class BatchLoadWorker(QObject):
     """一个专门用于在后台线程加载单个音频文件的简单工作器。"""
-    # 信号定义：成功时发送包含 y, sr, filepath 的字典，失败时发送错误字符串
+    # 信号定义：成功时发送包含 y, sr, y_overview, filepath 的字典，失败时发送错误字符串
     finished = pyqtSignal(dict)
     error = pyqtSignal(str)
 
@@ -154,8 +194,12 @@ class BatchLoadWorker(QObject):
             if QThread.currentThread().isInterruptionRequested():
                 return  # 如果取消，则静默退出
 
-            y, sr = librosa.load(self.filepath, sr=None, mono=True)
-            self.finished.emit({"y": y, "sr": sr, "filepath": self.filepath})
+            # [v2.5] 按需读取的数据源 + 多级波形包络，长文件也能立即显示
+            source = open_audio_source(self.filepath)
+            y_overview = build_waveform_envelope(source, cancel_check=QThread.currentThread().isInterruptionRequested)
+            if y_overview is None:
+                return
+            self.finished.emit({"y": source, "sr": source.sr, "y_overview": y_overview, "filepath": self.filepath})
         except Exception as e:
             self.error.emit(str(e))
 # ==============================================================================
@@ -166,7 +210,12 @@ class BatchAnalysisWorker(QObject):
     在独立线程中执行耗时的批量音频分析任务。
     设计核心是内存效率：逐个加载、分析并释放每个音频文件，以处理大量数据。
     [v2.1] 版本引入了分块分析机制，以支持平滑的进度条更新。
+    [v2.6] worker_count 大于 1 时改用进程池同时分析多个文件；同时在分析的文件数不超过进程数，
+    它们的音频总时长不超过 max_in_flight_s（至少允许一个文件），以此限制内存占用。
+    进程池模式下没有文件内部的 chunk_progress，进度按完成的文件数推进。
     """
+    DEFAULT_MAX_IN_FLIGHT_S = 30 * 60 # 进程池模式下同时分析的音频总时长上限（秒）
+
     # --- 信号定义 ---
     finished = pyqtSignal(dict, dict)           # 所有任务完成时发送，携带完整的分析结果缓存
     progress = pyqtSignal(int, int, str)  # (当前文件索引, 文件总数, 文件名)，用于更新进度条标签
@@ -175,15 +224,29 @@ class BatchAnalysisWorker(QObject):
     chunk_progress = pyqtSignal(float, float)
     single_file_completed = pyqtSignal(str, bool, str)
 
-    def __init__(self, filepaths, analysis_params):
+    def __init__(self, filepaths, analysis_params, disk_cache=None, worker_count=1, max_in_flight_s=None,
+                 result_store=None, manifest=None):
         """
         构造函数。
         :param filepaths: 要分析的音频文件路径列表。
         :param analysis_params: 一个包含所有分析参数的字典，从主UI获取。
+        :param disk_cache: [新增] 可选的 AnalysisCache 实例；命中时跳过加载和分析。
+        :param worker_count: [新增] 同时分析的文件数（进程数），1 表示在本线程中逐个分析。
+        :param max_in_flight_s: [新增] 进程池模式下同时分析的音频总时长上限（秒）。
+        :param result_store: [新增] 可选的 BatchResultStore；提供时每个文件的结果完成后立即写入其中，
+            finished 信号中的结果字典只记录文件路径（值为 None），内存占用与文件数无关。
+        :param manifest: [新增] 可选的 BatchManifest；每处理完一个文件追加一条检查点记录，
+            全部文件处理完（未被取消）时标记本次运行结束。
         """
         super().__init__()
         self.filepaths = filepaths
         self.params = analysis_params
+        self.disk_cache = disk_cache
+        self.worker_count = max(1, int(worker_count))
+        self.max_in_flight_s = self.DEFAULT_MAX_IN_FLIGHT_S if max_in_flight_s is None else max_in_flight_s
+        self.result_store = result_store
+        self.manifest = manifest
+        self.cancelled = False
         self.analysis_cache = {}  # 用于存储分析结果的字典
         self.failed_files = {} # 改为字典 {filepath: error_string}
 
@@ -192,8 +255,15 @@ class BatchAnalysisWorker(QObject):
         [v2.3 - 取消修复版] 工作器的入口点。
         此版本为 InterruptedError 添加了专门的 except 块，以正确处理用户取消操作。
         """
+        if self.worker_count > 1 and len(self.filepaths) > 1:
+            self._run_parallel()
+            self._finish_manifest()
+            self.finished.emit(self.analysis_cache, self.failed_files)
+            return
+
         total_files = len(self.filepaths)
         for i, filepath in enumerate(self.filepaths):
+            content_hash = None
             try:
                 # --- 1. 检查中断请求 (此部分不变) ---
                 if QThread.currentThread().isInterruptionRequested():
@@ -203,11 +273,22 @@ class BatchAnalysisWorker(QObject):
                 # --- 2. 报告文件级进度 (此部分不变) ---
                 self.progress.emit(i, total_files, os.path.basename(filepath))
 
-                # --- 3. [核心] 单文件处理逻辑 (此部分不变) ---
-                y, sr = librosa.load(filepath, sr=None, mono=True)
-                results_for_file = self._analyze_file_logic(y, sr)
-                self.analysis_cache[filepath] = results_for_file
-                del y, sr, results_for_file
+                # --- 3. [核心] 单文件处理逻辑：优先使用磁盘缓存 ---
+                content_hash = self._content_hash(filepath)
+                results_for_file = self._load_results_from_disk_cache(content_hash)
+                if results_for_file is None:
+                    y, sr = load_audio(filepath)
+                    coarse_f0_range = self._load_coarse_f0_range(content_hash)
+                    results_for_file = self._analyze_file_logic(y, sr, coarse_f0_range)
+                    if coarse_f0_range is None and 'coarse_f0_range' in results_for_file:
+                        self._store_coarse_f0_range(content_hash, results_for_file['coarse_f0_range'])
+                    self._store_results_in_disk_cache(content_hash, results_for_file)
+                    del y, sr
+                else:
+                    duration_s = results_for_file['duration_ms'] / 1000
+                    self.chunk_progress.emit(duration_s, duration_s)
+                self._keep_result(filepath, results_for_file, content_hash)
+                del results_for_file
                 self.single_file_completed.emit(filepath, True, "")
 
             # --- [核心修复] ---
@@ -216,301 +297,185 @@ class BatchAnalysisWorker(QObject):
                 # 当捕获到这个错误时，我们知道是用户主动取消的。
                 # 打印一条信息到控制台（可选），然后直接 break 退出循环。
                 print("Batch analysis was cancelled by the user.")
+                self.cancelled = True
                 break # 干净地跳出 for 循环
             # 2. 捕获所有其他类型的错误
             except Exception as e:
                 import traceback
-                error_str = str(e)
                 traceback.print_exc()
-                print(f"ERROR: Failed to process file '{filepath}': {error_str}")
-                self.failed_files[filepath] = error_str
-                self.single_file_completed.emit(filepath, False, error_str)
+                self._report_failure(filepath, e, content_hash)
                 continue
             # --- [修复结束] ---
         
         # --- 5. 任务最终完成 (此部分不变) ---
         # 无论循环是正常结束还是被 break，都会执行到这里
+        self._finish_manifest()
         self.finished.emit(self.analysis_cache, self.failed_files)
 
-    def _analyze_file_logic(self, y, sr):
+    def _run_parallel(self):
         """
-        [v2.3 - 移植修复版] 封装了对单个已加载音频(y, sr)的所有分析计算。
-        此版本将单文件工作器中经过验证的、更健壮的兼容模式逻辑移植了过来，
-        并保留了普通模式下的优化，同时对两种模式都增加了对极短音频的保护。
+        [新增] 进程池模式：每个文件在子进程中加载并分析（analyze_audio_file），
+        磁盘缓存的查询与写入仍在本线程中进行，命中缓存的文件不会提交到进程池。
+        结果按完成顺序逐个通过 single_file_completed 报告；取消时不再提交新文件，
+        已排队的任务被撤销，正在子进程中运行的文件的结果被丢弃。
         """
-        results_for_file = {}
-        analysis_mode = self.params.get('analysis_mode', 'normal')
-
-        # --- [核心保护] 对极短音频的保护性检查，对两种模式都生效 ---
-        # pyin 算法需要至少约4096个采样点才能稳定工作
-        MIN_SAMPLES_FOR_PYIN = 4096
-        if len(y) < MIN_SAMPLES_FOR_PYIN:
-            raise ValueError(f"音频过短 ({len(y)}采样点)，无法进行可靠的F0分析。至少需要{MIN_SAMPLES_FOR_PYIN}个采样点。")
-        
-        # 步骤 1: F0 & Intensity 分析 (根据模式选择)
-        if self.params.get('analyze_f0_intensity'):
-            if analysis_mode == 'compatibility':
-                # --- [核心移植] 使用与 AudioTaskWorker 完全相同的兼容模式逻辑 ---
-                y_analyzed = librosa.effects.preemphasis(y) if self.params['pre_emphasis'] else y
-                
-                f0_min = self.params.get('f0_min', 75)
-                f0_max = self.params.get('f0_max', 500)
-
-                f0_raw, voiced_flags, _ = librosa.pyin(y_analyzed, fmin=f0_min, fmax=f0_max, sr=sr)
-                intensity = librosa.feature.rms(y=y)[0]
-                
-                # F0后处理
-                f0_postprocessed = np.full_like(f0_raw, np.nan)
-                voiced_ints = voiced_flags.astype(int)
-                if len(voiced_ints) > 0:
-                    starts, ends = np.where(np.diff(voiced_ints) == 1)[0] + 1, np.where(np.diff(voiced_ints) == -1)[0] + 1
-                    if voiced_ints[0] == 1: starts = np.insert(starts, 0, 0)
-                    if voiced_ints[-1] == 1: ends = np.append(ends, len(voiced_ints))
-                    for start_idx, end_idx in zip(starts, ends):
-                        if end_idx - start_idx > 2:
-                            segment = f0_raw[start_idx:end_idx]; segment_series = pd.Series(segment)
-                            interpolated_segment = segment_series.interpolate(method='linear', limit_direction='both', limit=2).to_numpy()
-                            f0_postprocessed[start_idx:end_idx] = interpolated_segment
-                
-                # 准备时间轴并对齐数据
-                times = librosa.times_like(f0_raw, sr=sr)
-                if len(intensity) > len(times): intensity = intensity[:len(times)]
-                elif len(intensity) < len(times): intensity = np.pad(intensity, (0, len(times) - len(intensity)), 'constant', constant_values=0)
-
-                results_for_file['f0_data'] = (times, f0_raw)
-                results_for_file['f0_derived_data'] = (times, f0_postprocessed)
-                results_for_file['intensity_data'] = intensity
-                
-                try:
-                    hop_length = librosa.time_to_samples(times[1] - times[0], sr=sr) if len(times) > 1 else 512
-                except:
-                    hop_length = 512
-                results_for_file['hop_length'] = hop_length
-                
-                # 在兼容模式下，进度条直接跳到当前文件完成
-                self.chunk_progress.emit(len(y)/sr, len(y)/sr)
-
-            else: # --- 普通模式逻辑 (保留F0范围预分析优化) ---
-                y_analyzed = librosa.effects.preemphasis(y) if self.params['pre_emphasis'] else y
-                
-                user_f0_min = self.params.get('f0_min', 75)
-                user_f0_max = self.params.get('f0_max', 500)
-                final_f0_min, final_f0_max = user_f0_min, user_f0_max
-                
-                # 对预分析步骤进行保护
-                try:
-                    y_coarse = librosa.resample(y, orig_sr=sr, target_sr=8000)
-                    if len(y_coarse) > 2048: # 仅当重采样后仍然足够长时才进行预分析
-                        f0_coarse, _, _ = librosa.pyin(
-                            y_coarse, fmin=30, fmax=1200, sr=8000,
-                            frame_length=1024, hop_length=512
-                        )
-                        valid_f0_coarse = f0_coarse[np.isfinite(f0_coarse)]
-                        if len(valid_f0_coarse) > 10:
-                            p5, p95 = np.percentile(valid_f0_coarse, [5, 95])
-                            padding = (p95 - p5) * 0.15
-                            final_f0_min = max(user_f0_min, p5 - padding)
-                            final_f0_max = min(user_f0_max, p95 + padding)
-                except Exception:
-                    pass # 预分析失败是可接受的，将使用用户设定的范围
-
-                narrow_band_window_s = 0.035
-                base_n_fft_for_hop = 1 << (int(sr * narrow_band_window_s) - 1).bit_length()
-                render_overlap_ratio = 1 - (1 / (2**self.params['render_density']))
-                hop_length = int(base_n_fft_for_hop * (1 - render_overlap_ratio)) or 1
-                frame_length = 1 << (int(sr * 0.040) - 1).bit_length()
-
-                # ... (此处是普通模式的分块分析逻辑，无需修改) ...
-                chunk_size_ms = 200
-                chunk_overlap_ms = 10
-                chunk_size_samples = int((chunk_size_ms / 1000) * sr)
-                overlap_samples = int((chunk_overlap_ms / 1000) * sr)
-                step_size_samples = chunk_size_samples - overlap_samples
-                if step_size_samples <= 0: step_size_samples = hop_length
-                all_f0_raw, all_f0_derived, all_intensity, all_times = [], [], [], []
-                current_pos_samples = 0
-                total_duration_s = len(y) / sr
-                while current_pos_samples < len(y):
-                    if QThread.currentThread().isInterruptionRequested():
-                        raise InterruptedError("用户取消了操作")
-                    start_sample = current_pos_samples
-                    end_sample = start_sample + chunk_size_samples
-                    y_chunk, y_chunk_analyzed = y[start_sample:end_sample], y_analyzed[start_sample:end_sample]
-                    if len(y_chunk) == 0: break
-                    f0_raw_chunk, voiced_flags, _ = librosa.pyin(
-                        y_chunk_analyzed, fmin=final_f0_min, fmax=final_f0_max, sr=sr,
-                        frame_length=frame_length, hop_length=hop_length
-                    )
-                    f0_postprocessed_chunk = np.full_like(f0_raw_chunk, np.nan)
-                    if len(f0_raw_chunk) > 0:
-                        voiced_ints = voiced_flags.astype(int)
-                        if len(voiced_ints) > 0:
-                            starts, ends = np.where(np.diff(voiced_ints) == 1)[0] + 1, np.where(np.diff(voiced_ints) == -1)[0] + 1
-                            if voiced_ints[0] == 1: starts = np.insert(starts, 0, 0)
-                            if voiced_ints[-1] == 1: ends = np.append(ends, len(voiced_ints))
-                            for start_idx, end_idx in zip(starts, ends):
-                                if end_idx - start_idx > 2:
-                                    segment = f0_raw_chunk[start_idx:end_idx]; segment_series = pd.Series(segment)
-                                    interpolated_segment = segment_series.interpolate(method='linear', limit_direction='both', limit=2).to_numpy()
-                                    f0_postprocessed_chunk[start_idx:end_idx] = interpolated_segment
-                    intensity_chunk = librosa.feature.rms(y=y_chunk, frame_length=frame_length, hop_length=hop_length)[0]
-                    num_frames_in_step = round(step_size_samples / hop_length)
-                    times_in_chunk = librosa.times_like(f0_raw_chunk, sr=sr, hop_length=hop_length)
-                    global_times = times_in_chunk + (start_sample / sr)
-                    all_times.append(global_times[:num_frames_in_step])
-                    all_f0_raw.append(f0_raw_chunk[:num_frames_in_step])
-                    all_f0_derived.append(f0_postprocessed_chunk[:num_frames_in_step])
-                    all_intensity.append(intensity_chunk[:num_frames_in_step])
-                    last_time_in_chunk = global_times[-1] if len(global_times) > 0 else (end_sample / sr)
-                    self.chunk_progress.emit(last_time_in_chunk, total_duration_s)
-                    current_pos_samples += step_size_samples
-                results_for_file['f0_data'] = (np.concatenate(all_times), np.concatenate(all_f0_raw))
-                results_for_file['f0_derived_data'] = (np.concatenate(all_times), np.concatenate(all_f0_derived))
-                results_for_file['intensity_data'] = np.concatenate(all_intensity)
-                results_for_file['hop_length'] = hop_length
-
-        # 步骤 2. 语谱图和共振峰分析 (此部分逻辑无需修改，保持原样)
-        y_analyzed_spec = librosa.effects.preemphasis(y) if self.params['pre_emphasis'] else y
-        
-        narrow_band_window_s = 0.035
-        base_n_fft_for_hop = 1 << (int(sr * narrow_band_window_s) - 1).bit_length()
-        
-        render_hop_length = results_for_file.get('hop_length')
-        if render_hop_length is None:
-            render_overlap_ratio = 1 - (1 / (2**self.params['render_density']))
-            render_hop_length = int(base_n_fft_for_hop * (1 - render_overlap_ratio)) or 1
-            results_for_file['hop_length'] = render_hop_length
-        
-        spectrogram_window_s = 0.005 if self.params['is_wide_band'] else 0.035
-        n_fft_spectrogram = 1 << (int(sr * spectrogram_window_s) - 1).bit_length()
-        D = librosa.stft(y_analyzed_spec, hop_length=render_hop_length, n_fft=n_fft_spectrogram)
-        S_db = librosa.amplitude_to_db(np.abs(D), ref=np.max)
-        results_for_file['S_db'] = S_db
-
-        if self.params.get('analyze_formants'):
-            overlap_ratio_formant = 1 - (1 / (2**self.params['formant_density']))
-            hop_length_formant = int(base_n_fft_for_hop * (1 - overlap_ratio_formant)) or 1
-            formant_points = self._analyze_formants_helper(y, sr, hop_length_formant)
-            results_for_file['formants_data'] = formant_points
-            
-        results_for_file['sr'] = sr
-        results_for_file['duration_ms'] = (len(y) / sr) * 1000
-
-        return results_for_file
-
-    def _analyze_formants_helper(self, y_data, sr, hop_length, start_offset=0, pre_emphasis=None):
-        """
-        改进版（用于 BatchAnalysisWorker）：窗口化 + 去均值 + LPC 阶数约束 +
-        计算极点频率与带宽，并在每个 formant band 中选择带宽最小的候选。
-        :param pre_emphasis: 若传入 None，则从 self.params 中读取 (默认启用或禁用由 ui 决定)。
-        :return: list of (sample_center, [F1, F2, ...])
-        """
-        # 决定是否做预加重（优先使用显式参数，否则从 worker 的 params 读）
-        if pre_emphasis is None:
-            pre_emphasis = bool(self.params.get('pre_emphasis', True))
-
-        # 预加重（如果启用）
-        y_proc = librosa.effects.preemphasis(y_data) if pre_emphasis else y_data
-
-        # 帧设置：25 ms 常用值（Praat 常用窗长 20-25ms）
-        frame_length = int(sr * 0.025)
-        if frame_length < 16:
-            frame_length = max(16, len(y_proc))
-
-        # LPC 阶数：基于采样率的启发式值，但做上下界约束，且不能超过 frame_length-2
-        order = int(2 + sr // 1000)
-        order = max(6, min(order, max(6, frame_length - 2)))
-
-        formant_points = []
-
-        # 能量判定，过滤静音帧
-        rms = librosa.feature.rms(y=y_data, frame_length=frame_length, hop_length=hop_length)[0]
-        energy_threshold = np.max(rms) * 0.05 if np.max(rms) > 0 else 0
-        frame_index = 0
-
-        nyq = sr / 2.0
-        # formant bands（上限受 Nyquist 限制）
-        formant_ranges = [
-            (250, min(800, nyq)),
-            (800, min(2200, nyq)),
-            (2200, min(3000, nyq)),
-            (3000, min(4000, nyq)),
-        ]
-
-        for i in range(0, len(y_proc) - frame_length, hop_length):
-            # 能量阈值过滤
-            if frame_index < len(rms) and rms[frame_index] < energy_threshold:
-                frame_index += 1
-                continue
-
-            y_frame = y_proc[i: i + frame_length]
-            if len(y_frame) < frame_length:
-                frame_index += 1
-                continue
-
-            # 去均值 + 窗函数
-            y_frame = y_frame - np.mean(y_frame)
-            win = np.hamming(len(y_frame))
-            y_frame = y_frame * win
-
-            # 跳过低能量或数值异常帧
-            if np.max(np.abs(y_frame)) < 1e-6 or not np.isfinite(y_frame).all():
-                frame_index += 1
-                continue
-
-            try:
-                if len(y_frame) <= order:
-                    frame_index += 1
-                    continue
-
-                a = librosa.lpc(y_frame, order=order)
-                if not np.isfinite(a).all():
-                    frame_index += 1
-                    continue
-
-                roots_all = np.roots(a)
-                # 只保留上半平面的极点并剔除幅度异常的极点
-                roots = [r for r in roots_all if np.imag(r) >= 0 and 0.001 < np.abs(r) < 0.9999]
+        thread = QThread.currentThread()
+        total_files = len(self.filepaths)
+        queue = deque(enumerate(self.filepaths))
+        durations = {}
+        pending = {} # future -> (文件路径, 内容哈希, 是否需要缓存粗略 F0 估计, 音频时长)
+        # 与分析进程池相同，统一使用 spawn 方式启动子进程
+        pool = ProcessPoolExecutor(max_workers=min(self.worker_count, total_files),
+                                   mp_context=multiprocessing.get_context('spawn'))
+        try:
+            while queue or pending:
+                if thread.isInterruptionRequested():
+                    print("Batch analysis was cancelled by the user.")
+                    self.cancelled = True
+                    break
 
-                candidates = []
-                for r in roots:
-                    ang = np.angle(r)
-                    freq = ang * (sr / (2 * np.pi))
-                    if freq <= 0 or freq >= nyq:
+                # 1. 在进程数和音频总时长的限制内提交新文件
+                in_flight_s = sum(info[3] for info in pending.values())
+                while queue and len(pending) < self.worker_count:
+                    index, filepath = queue[0]
+                    if filepath not in durations:
+                        durations[filepath] = audio_duration_s(filepath)
+                    if pending and in_flight_s + durations[filepath] > self.max_in_flight_s:
+                        break
+                    queue.popleft()
+                    self.progress.emit(index, total_files, os.path.basename(filepath))
+                    content_hash = None
+                    try:
+                        content_hash = self._content_hash(filepath)
+                        results_for_file = self._load_results_from_disk_cache(content_hash)
+                        if results_for_file is not None:
+                            self._keep_result(filepath, results_for_file, content_hash)
+                            self.single_file_completed.emit(filepath, True, "")
+                            continue
+                        coarse_f0_range = self._load_coarse_f0_range(content_hash)
+                        future = pool.submit(analyze_audio_file, filepath, self.params, coarse_f0_range)
+                    except Exception as e:
+                        self._report_failure(filepath, e, content_hash)
                         continue
-                    # 带宽映射：bw = - (sr / pi) * ln(|r|)
-                    bw = - (sr / np.pi) * np.log(np.abs(r))
-                    # 丢弃过宽或负值带宽（噪声）
-                    if bw <= 0 or bw > 1000:
-                        continue
-                    candidates.append((freq, bw))
+                    pending[future] = (filepath, content_hash, coarse_f0_range is None, durations.pop(filepath))
+                    in_flight_s += pending[future][3]
 
-                # 以频率排序，便于在bands中选择
-                candidates.sort(key=lambda x: x[0])
+                if not pending:
+                    continue
 
-                found_formants = []
-                # 对每个预设 band，选择带宽最小的候选（更尖锐、可靠）
-                for f_min, f_max in formant_ranges:
-                    band_cands = [(f, bw) for (f, bw) in candidates if f_min <= f <= f_max]
-                    if not band_cands:
+                # 2. 短暂等待，以便及时响应取消请求
+                done, _ = futures_wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filepath, content_hash, store_coarse_f0_range, _ = pending.pop(future)
+                    try:
+                        results_for_file = future.result()
+                        if store_coarse_f0_range and 'coarse_f0_range' in results_for_file:
+                            self._store_coarse_f0_range(content_hash, results_for_file['coarse_f0_range'])
+                        self._store_results_in_disk_cache(content_hash, results_for_file)
+                    except Exception as e:
+                        self._report_failure(filepath, e, content_hash)
                         continue
-                    best = min(band_cands, key=lambda x: x[1])
-                    found_formants.append(best[0])
-
-                if found_formants:
-                    sample_center = start_offset + i + frame_length // 2
-                    formant_points.append((sample_center, found_formants))
-
-            except Exception:
-                # 数值问题就忽略该帧
-                frame_index += 1
-                continue
+                    self._keep_result(filepath, results_for_file, content_hash)
+                    del results_for_file
+                    self.single_file_completed.emit(filepath, True, "")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _content_hash(self, filepath):
+        """磁盘缓存和检查点清单都需要文件内容哈希；两者都没有时不计算。"""
+        if self.disk_cache is None and self.manifest is None:
+            return None
+        return compute_file_hash(filepath)
+
+    def _keep_result(self, filepath, results_for_file, content_hash=None):
+        """[新增] 保存单个文件的结果：有结果存储时立即写入磁盘，analysis_cache 中只记下文件路径。"""
+        result_location = None
+        if self.result_store is not None:
+            self.result_store[filepath] = results_for_file
+            result_location = self.result_store.entry_location(filepath)
+            results_for_file = None
+        self.analysis_cache[filepath] = results_for_file
+        if self.manifest is not None:
+            self.manifest.record(filepath, content_hash, 'done', result=result_location)
+
+    def _report_failure(self, filepath, error, content_hash=None):
+        """[新增] 记录并报告单个文件的失败。"""
+        error_str = str(error) or type(error).__name__
+        print(f"ERROR: Failed to process file '{filepath}': {error_str}")
+        self.failed_files[filepath] = error_str
+        if self.manifest is not None:
+            self.manifest.record(filepath, content_hash, 'failed', error=error_str)
+        self.single_file_completed.emit(filepath, False, error_str)
+
+    def _finish_manifest(self):
+        """[新增] 没有被取消时，在清单中标记本次运行已完成。"""
+        if self.manifest is not None and not self.cancelled:
+            self.manifest.finish_run()
+
+    def _load_results_from_disk_cache(self, content_hash):
+        """[新增] 从磁盘缓存读取单个文件的完整批量分析结果，未命中时返回 None。"""
+        if self.disk_cache is None or not content_hash:
+            return None
+        entry = self.disk_cache.get(content_hash, 'batch', self.params)
+        if entry is None:
+            return None
+        results_for_file = {'S_db': entry['S_db'], 'hop_length': int(entry['hop_length']),
+                            'sr': int(entry['sr']), 'duration_ms': float(entry['duration_ms'])}
+        f0_data, f0_derived_data, intensity_data = unpack_acoustics(entry)
+        if f0_data is not None:
+            results_for_file['f0_data'] = f0_data
+            results_for_file['f0_derived_data'] = f0_derived_data
+            results_for_file['intensity_data'] = intensity_data
+        formants_data = unpack_formants(entry)
+        if formants_data is not None:
+            results_for_file['formants_data'] = formants_data
+        return results_for_file
 
-            frame_index += 1
+    def _load_coarse_f0_range(self, content_hash):
+        """[新增] 读取该文件缓存的粗略 F0 估计（与 F0 范围、精细度等参数无关），未命中时返回 None。"""
+        if self.disk_cache is None or not content_hash:
+            return None
+        entry = self.disk_cache.get(content_hash, COARSE_F0_KIND, {'method': self._coarse_f0_method()})
+        return unpack_coarse_f0_range(entry) if entry is not None else None
 
-        return formant_points
+    def _store_coarse_f0_range(self, content_hash, coarse_range):
+        if self.disk_cache is None or not content_hash:
+            return
+        self.disk_cache.put(content_hash, COARSE_F0_KIND, {'method': self._coarse_f0_method()},
+                            pack_coarse_f0_range(coarse_range))
 
+    def _coarse_f0_method(self):
+        """实际使用的粗略 F0 估计方法（快速模式固定为自相关）。"""
+        return mode_f0_settings(self.params.get('analysis_mode', 'normal'),
+                                coarse_f0_method=self.params.get('coarse_f0_method', 'pyin'))[2]
 
+    def _store_results_in_disk_cache(self, content_hash, results_for_file):
+        """[新增] 将单个文件的批量分析结果写入磁盘缓存。"""
+        if self.disk_cache is None or not content_hash:
+            return
+        arrays = {
+            'S_db': quantize_spectrogram(results_for_file['S_db']),
+            'hop_length': results_for_file['hop_length'],
+            'sr': results_for_file['sr'],
+            'duration_ms': results_for_file['duration_ms'],
+        }
+        if 'f0_data' in results_for_file:
+            arrays.update(pack_acoustics(results_for_file['f0_data'], results_for_file.get('f0_derived_data'),
+                                         results_for_file.get('intensity_data')))
+        if 'formants_data' in results_for_file:
+            arrays.update(pack_formants(results_for_file['formants_data']))
+        self.disk_cache.put(content_hash, 'batch', self.params, arrays)
+
+    def _analyze_file_logic(self, y, sr, coarse_f0_range=None):
+        """
+        [v2.3 - 移植修复版] 封装了对单个已加载音频(y, sr)的所有分析计算。
+        [v2.5] 计算流程已移至 audio_analysis_engine.analyze_file，与单文件工作器共用同一套函数；
+        这里只负责把进度和取消请求接到 Qt 线程上。取消时抛出 InterruptedError。
+        """
+        return analyze_file(y, sr, self.params,
+                            progress_callback=self.chunk_progress.emit,
+                            cancel_check=QThread.currentThread().isInterruptionRequested,
+                            coarse_f0_range=coarse_f0_range)
 
 # ==============================================================================
 # 批量保存选项对话框 (BatchSaveDialog)
@@ -521,7 +486,7 @@ class BatchSaveDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("批量保存选项")
         layout = QFormLayout(self)
-        self.save_csv_check = QCheckBox("保存分析数据为 .csv 文件")
+        self.save_csv_check = QCheckBox("保存分析数据表格 (CSV/Parquet/Feather/NPZ)")
         self.save_csv_check.setChecked(True)
         self.save_image_check = QCheckBox("保存视图为 .png 图片")
         self.save_image_check.setChecked(True)
@@ -558,7 +523,8 @@ class AudioAnalysisBatchPanel(QWidget):
 
         # --- 数据与状态管理 ---
         self.file_list = []  # 存储 (filepath, status) 元组的列表
-        self.analysis_cache = {} # 格式: {filepath: {analysis_data_dict}}
+        # 格式: {filepath: {analysis_data_dict}}；[v2.6] 结果保存在会话目录中，内存里只保留最近查看的几个文件
+        self.analysis_cache = BatchResultStore(os.path.join(main_page.parent_window.BASE_PATH, "cache", "audio_analysis_batch"))
         self.current_audio_data = None # 当前选中文件的 (y, sr) 数据，用于播放
         self.batch_thread = None
         self.batch_worker = None
@@ -571,6 +537,7 @@ class AudioAnalysisBatchPanel(QWidget):
         # [新增] 状态变量，用于计算平滑的进度
         self.current_file_index = 0
         self.total_files = 0
+        self.completed_file_count = 0
         # [新增] 创建一个用于延迟加载的QTimer
         self.selection_timer = QTimer(self)
         self.selection_timer.setSingleShot(True) # 确保它只触发一次
@@ -580,6 +547,7 @@ class AudioAnalysisBatchPanel(QWidget):
         self.setAcceptDrops(True)
         self.file_table.setFocusPolicy(Qt.StrongFocus)
         self._connect_signals()
+        self._update_resume_button()
 
     def _init_ui(self):
         """
@@ -658,13 +626,20 @@ class AudioAnalysisBatchPanel(QWidget):
         self.run_all_btn = QPushButton(" 全部分析")
         self.run_all_btn.setIcon(self.icon_manager.get_icon("analyze"))
         self.run_all_btn.setEnabled(False)
-        self.run_all_btn.setToolTip("对列表中所有“待处理”的文件执行完整的声学分析。")
+        self.run_all_btn.setToolTip("对列表中新增、已更改或分析参数不同的文件执行完整的声学分析。\n结果已是最新的文件会被跳过。")
         self.run_all_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         self.save_all_btn = QPushButton(" 保存全部结果...")
         self.save_all_btn.setIcon(self.icon_manager.get_icon("save_all"))
         self.save_all_btn.setEnabled(False)
         self.save_all_btn.setToolTip("将所有已分析文件的结果批量保存为图片或CSV。")
         self.save_all_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        # [新增] 继续上次被取消或中断的批量分析
+        self.resume_btn = QPushButton(" 继续未完成的分析")
+        self.resume_btn.setIcon(self.icon_manager.get_icon("analyze"))
+        self.resume_btn.setToolTip("上次的批量分析被取消或意外中断。\n继续分析剩余的文件，已用相同参数完成且内容未改变的文件会被跳过。")
+        self.resume_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.resume_btn.hide()
+        bottom_actions_layout.addWidget(self.resume_btn)
         bottom_actions_layout.addWidget(self.run_all_btn)
         bottom_actions_layout.addWidget(self.save_all_btn)
 
@@ -716,6 +691,7 @@ class AudioAnalysisBatchPanel(QWidget):
         # --- [新增结束] ---
         
         self.run_all_btn.clicked.connect(self.run_all_analysis)
+        self.resume_btn.clicked.connect(self.resume_batch_analysis)
         self.save_all_btn.clicked.connect(self.save_all_results)
         self.cancel_btn.clicked.connect(self.cancel_task)
         # [新增] 添加回车键快捷方式
@@ -852,7 +828,7 @@ class AudioAnalysisBatchPanel(QWidget):
         """
         [新增] 当后台音频加载完成后，填充剩余的UI部分。
         """
-        y, sr, filepath = result['y'], result['sr'], result['filepath']
+        y, sr, filepath, y_overview = result['y'], result['sr'], result['filepath'], result['y_overview']
 
         # --- 安全检查 ---
         # 检查加载完成的音频是否仍然是当前选中的项，防止用户快速切换导致错乱
@@ -864,8 +840,7 @@ class AudioAnalysisBatchPanel(QWidget):
         # 3. 填充波形图和播放器
         self.main_page.audio_data = y
         self.main_page.sr = sr
-        # 为了简化，我们直接用完整数据作为概览数据
-        self.main_page.waveform_widget.set_audio_data(y, sr, y)
+        self.main_page.waveform_widget.set_audio_data(y, sr, y_overview)
         self.main_page.player.setMedia(QMediaContent(QUrl.fromLocalFile(filepath)))
         self.main_page.play_pause_btn.setEnabled(True)
         self.current_audio_data = (y, sr)
@@ -900,7 +875,7 @@ class AudioAnalysisBatchPanel(QWidget):
                 return
 
             # 调用同步方法更新UI
-            self._display_file_sync(result['y'], result['sr'], result['filepath'])
+            self._display_file_sync(result['y'], result['sr'], result['filepath'], result['y_overview'])
             self.load_thread.quit()
 
         def on_load_error(err_msg):
@@ -928,7 +903,7 @@ class AudioAnalysisBatchPanel(QWidget):
 
         self.load_thread.start()
 
-    def _display_file_sync(self, y, sr, filepath):
+    def _display_file_sync(self, y, sr, filepath, y_overview=None):
         """
         [v2.3 - 核心UI更新逻辑]
         使用已加载的音频数据(y, sr)来同步更新中心视图。
@@ -944,8 +919,8 @@ class AudioAnalysisBatchPanel(QWidget):
             self.main_page.audio_data = y
             self.main_page.sr = sr
             self.main_page.current_filepath = filepath
-            # 概览波形图，为简化直接使用完整数据
-            self.main_page.waveform_widget.set_audio_data(y, sr, y)
+            # 概览波形图：优先使用加载线程生成的多级包络，未提供时由控件自行构建
+            self.main_page.waveform_widget.set_audio_data(y, sr, y_overview)
             # 准备播放器
             self.main_page.player.setMedia(QMediaContent(QUrl.fromLocalFile(filepath)))
             self.main_page.play_pause_btn.setEnabled(True)
@@ -1052,15 +1027,14 @@ class AudioAnalysisBatchPanel(QWidget):
 
         self.file_table.blockSignals(False)
 
-    def _start_batch_analysis(self, filepaths_to_process, dialog_title, override_params=None):
+    def _start_batch_analysis(self, filepaths_to_process, dialog_title, override_params=None, resume_run=None):
         """
         [已重构] 一个通用的辅助方法，用于启动批量分析任务。
         现在它接受一个 override_params 字典来覆盖默认的UI设置。
+        [新增] 每次运行都会在结果存储的会话目录中写入检查点清单；
+        resume_run 为 BatchManifest.unfinished_run() 的返回值时，继续该运行而不是开始新的运行。
         """
-        self.is_batch_task_running = True
-        self.run_all_btn.setEnabled(False)
-        self.import_btn.setEnabled(False)
-        
+        # [修复] 先检查能否启动，再锁定界面，避免提前返回后按钮一直不可用
         if self.batch_thread and self.batch_thread.isRunning():
             QMessageBox.warning(self, "操作繁忙", "另一个批量分析任务正在进行中，请稍后再试。")
             return
@@ -1069,35 +1043,38 @@ class AudioAnalysisBatchPanel(QWidget):
             QMessageBox.information(self, "无需分析", "没有需要分析的文件。")
             return
 
-        # 1. 从UI获取默认分析参数
+        self.is_batch_task_running = True
+        self.run_all_btn.setEnabled(False)
+        self.import_btn.setEnabled(False)
+
         module_states = self.main_page.parent_window.config.get("module_states", {}).get("audio_analysis", {})
-        analysis_mode = module_states.get("analysis_mode", "normal")
-        params = {
-            'analyze_f0_intensity': True, 'analyze_formants': True,
-            'pre_emphasis': self.main_page.pre_emphasis_checkbox.isChecked(),
-            'f0_min': self.main_page.f0_range_slider.lowerValue(),
-            'f0_max': self.main_page.f0_range_slider.upperValue(),
-            'render_density': self.main_page.render_density_slider.value(),
-            'formant_density': self.main_page.formant_density_slider.value(),
-            'is_wide_band': self.main_page.spectrogram_type_checkbox.isChecked(),
-            'analysis_mode': analysis_mode,
-        }
-        
-        # [核心修改] 如果提供了覆盖参数，则更新参数字典
-        if override_params and isinstance(override_params, dict):
-            params.update(override_params)
+        params = self._batch_params(override_params)
 
         # --- 后续的启动逻辑保持不变 ---
         self.file_list_for_run = filepaths_to_process
         self.total_files = len(self.file_list_for_run)
         self.current_file_index = 0
+        self.completed_file_count = 0
 
         self.progress_bar.setRange(0, self.total_files * 100)
         self.progress_bar.setValue(0)
         self.progress_label.setText(dialog_title)
         self.progress_container.show()
 
-        self.batch_worker = BatchAnalysisWorker(self.file_list_for_run, params)
+        manifest = self.analysis_cache.manifest()
+        if resume_run is not None:
+            manifest.resume_run(resume_run)
+        else:
+            manifest.start_run(self.file_list_for_run, params)
+        self.resume_btn.hide()
+
+        # [v2.6] 多个文件可以在进程池中同时分析（设置中的“同时分析的文件数”，0 表示全部核心）
+        self.batch_worker = BatchAnalysisWorker(
+            self.file_list_for_run, params, disk_cache=self.main_page.disk_cache,
+            worker_count=resolve_worker_count(module_states.get("batch_workers", 0)),
+            max_in_flight_s=module_states.get("batch_max_in_flight_minutes",
+                                              BatchAnalysisWorker.DEFAULT_MAX_IN_FLIGHT_S // 60) * 60,
+            result_store=self.analysis_cache, manifest=manifest)
         self.batch_thread = QThread()
         self.batch_worker.moveToThread(self.batch_thread)
 
@@ -1106,17 +1083,115 @@ class AudioAnalysisBatchPanel(QWidget):
         self.batch_worker.single_file_completed.connect(self._on_single_file_completed)
         self.batch_worker.finished.connect(self._on_batch_finished)
         self.batch_worker.error.connect(self._on_batch_error)
-        
+
         self.batch_thread.started.connect(self.batch_worker.run)
         self.batch_thread.finished.connect(self._cleanup_batch_thread)
         self.batch_thread.start()
 
+    def _batch_params(self, override_params=None):
+        """[新增] 从界面和设置读取批量分析参数；override_params 中的项覆盖默认值。"""
+        module_states = self.main_page.parent_window.config.get("module_states", {}).get("audio_analysis", {})
+        analysis_mode = module_states.get("analysis_mode", "normal")
+        params = {
+            'analyze_f0_intensity': True, 'analyze_formants': True,
+            'pre_emphasis': self.main_page.pre_emphasis_checkbox.isChecked(),
+            'f0_min': self.main_page.f0_range_slider.lowerValue(),
+            'f0_max': self.main_page.f0_range_slider.upperValue(),
+            'render_density': self.main_page.render_density_slider.value(),
+            'formant_density': self.main_page.formant_density_slider.value(),
+            'is_wide_band': self.main_page.spectrogram_type_checkbox.isChecked(),
+            'analysis_mode': analysis_mode,
+            'coarse_f0_method': module_states.get("coarse_f0_method", "pyin"),
+        }
+        
+        # [核心修改] 如果提供了覆盖参数，则更新参数字典
+        if override_params and isinstance(override_params, dict):
+            params.update(override_params)
+        return params
 
     def run_all_analysis(self):
-        """启动对所有待处理文件的批量分析。"""
-        files_to_run = [fp for fp, status in self.file_list if status != "已分析"]
-        # [修改] 调用更新后的函数，不传递覆盖参数
-        self._start_batch_analysis(files_to_run, "正在准备批量分析...")
+        """
+        启动对所有待处理文件的批量分析。
+        [新增] 增量分析：结果已在存储中、清单记录的参数指纹与当前参数相同、且文件未被修改（大小与修改时间，
+        必要时比较内容哈希）的文件直接使用已有结果，只有新增、已更改或参数不同的文件会重新排队。
+        """
+        if self.is_batch_task_running:
+            return
+        fingerprint = params_fingerprint(self._batch_params())
+        records = self.analysis_cache.manifest().latest_file_records() if self.analysis_cache.session_dir else {}
+
+        files_to_run = []
+        for i, (fp, status) in enumerate(self.file_list):
+            if self._is_result_current(fp, status, fingerprint, records.get(fp)):
+                continue
+            files_to_run.append(fp)
+            if status == "已分析": # 参数或文件已改变，旧结果不再有效
+                self.file_list[i] = (fp, "待处理")
+                self._update_table_row_status(i, "待处理")
+
+        num_current = len(self.file_list) - len(files_to_run)
+        if not files_to_run:
+            QMessageBox.information(self, "无需分析", f"全部 {num_current} 个文件的分析结果都是最新的。")
+            return
+        title = "正在准备批量分析..." if not num_current else \
+            f"正在准备批量分析（{num_current} 个文件的结果已是最新，将被跳过）..."
+        self._start_batch_analysis(files_to_run, title)
+
+    def _is_result_current(self, filepath, status, fingerprint, record):
+        """
+        [新增] 判断文件已有的分析结果是否仍然有效。
+        [修复] 没有清单记录的结果无法确认参数和文件是否改变，视为过期并重新分析。
+        """
+        if status != "已分析" or filepath not in self.analysis_cache or record is None:
+            return False
+        return (record.get('status') == 'done' and record.get('fingerprint') == fingerprint
+                and BatchManifest.file_unchanged(record))
+
+    def _update_resume_button(self):
+        """[新增] 存在最后一次运行未完成的会话（本次或之前被中断的程序）时显示“继续”按钮。"""
+        self.resume_btn.setVisible(not self.is_batch_task_running and bool(self.analysis_cache.unfinished_sessions()))
+
+    def resume_batch_analysis(self):
+        """
+        [新增] 继续最近一次未完成的批量分析。
+        之前会话的结果并入当前的结果存储；清单中已用同样参数完成、且文件内容未变的文件直接显示为“已分析”，
+        只有剩余的文件（包括失败的文件）会以原来的参数重新排队。
+        """
+        if self.is_batch_task_running:
+            return
+        sessions = self.analysis_cache.unfinished_sessions()
+        if not sessions:
+            self._update_resume_button()
+            return
+        self.analysis_cache.adopt_session(sessions[0])
+        manifest = self.analysis_cache.manifest()
+        run = manifest.unfinished_run()
+        if run is None:
+            self._update_resume_button()
+            return
+
+        existing = [fp for fp in run['files'] if os.path.exists(fp)]
+        done = {fp for fp in existing
+                if fp in run['done'] and fp in self.analysis_cache and BatchManifest.file_unchanged(run['done'][fp])}
+        remaining = [fp for fp in existing if fp not in done]
+
+        statuses = dict(self.file_list)
+        for fp in existing:
+            statuses[fp] = "已分析" if fp in done else "待处理"
+        self.file_list = list(statuses.items())
+        self._update_table()
+        self.run_all_btn.setEnabled(bool(self.file_list))
+        if done:
+            self.save_all_btn.setEnabled(True)
+
+        if not remaining:
+            manifest.resume_run(run)
+            manifest.finish_run()
+            self._update_resume_button()
+            QMessageBox.information(self, "无需分析", f"上次批量分析的 {len(done)} 个文件均已完成。")
+            return
+        self._start_batch_analysis(remaining, f"正在继续批量分析（已完成 {len(done)}/{len(run['files'])}）...",
+                                   override_params=run['params'], resume_run=run)
 
     def _run_analysis_on_selected(self, filepaths):
         """对所有选中的文件启动一个独立的后台分析任务。"""
@@ -1150,6 +1225,7 @@ class AudioAnalysisBatchPanel(QWidget):
         # 恢复UI按钮的可用状态
         self.run_all_btn.setEnabled(True)
         self.import_btn.setEnabled(True)
+        self._update_resume_button()
 
         # 安排后台对象的安全删除
         if self.batch_worker:
@@ -1204,7 +1280,8 @@ class AudioAnalysisBatchPanel(QWidget):
         self.progress_label.setText(f"正在分析: {truncated_filename} ({current + 1}/{total})")
         # --- [修改结束] ---
         
-        base_progress = current * 100
+        # [v2.6] 进度以已完成的文件数为基础（并行分析时开始分析的文件可能多于已完成的文件）
+        base_progress = self.completed_file_count * 100
         self.progress_bar.setValue(int(base_progress))
         
         # 找到即将被分析的文件在UI表格中的行，并更新其状态
@@ -1222,6 +1299,9 @@ class AudioAnalysisBatchPanel(QWidget):
     # [新增] 新的槽函数，用于实时更新单个文件的完成状态
     def _on_single_file_completed(self, filepath, success, error_message):
         """当后台报告单个文件处理完成时，立即更新该行的UI。"""
+        if self.batch_worker is not None and self.sender() is self.batch_worker:
+            self.completed_file_count += 1
+            self.progress_bar.setValue(self.completed_file_count * 100)
         # 遍历表格，找到对应文件的那一行
         for i in range(len(self.file_list)):
             fp, _ = self.file_list[i]
@@ -1276,7 +1356,7 @@ class AudioAnalysisBatchPanel(QWidget):
 
         chunk_percent = (chunk_time_s / total_duration_s) * 100 if total_duration_s > 0 else 100
         
-        base_progress = self.current_file_index * 100
+        base_progress = self.completed_file_count * 100
         detail_progress = min(99.9, chunk_percent)
         
         total_progress = base_progress + detail_progress
@@ -1349,20 +1429,17 @@ class AudioAnalysisBatchPanel(QWidget):
         progress_dialog.show()
 
         # 2. 获取分析参数
-        params = {
-            'analyze_f0_intensity': True, 'analyze_formants': True,
-            'pre_emphasis': self.main_page.pre_emphasis_checkbox.isChecked(),
-            'f0_min': self.main_page.f0_range_slider.lowerValue(),
-            'f0_max': self.main_page.f0_range_slider.upperValue(),
-            'render_density': self.main_page.render_density_slider.value(),
-            'formant_density': self.main_page.formant_density_slider.value(),
-            'is_wide_band': self.main_page.spectrogram_type_checkbox.isChecked(),
-        }
+        # [修复] 与批量分析使用同一组参数（包括分析模式和粗略F0方法），并在清单中记录参数指纹与文件状态，
+        # 之后的增量分析才能判断这个结果是否仍然有效
+        params = self._batch_params()
+        manifest = self.analysis_cache.manifest()
+        manifest.start_single(params)
 
         # 3. 创建 QThread 和 Worker
         self.single_analysis_thread = QThread()
         # 即使是单个文件，Worker也需要一个列表
-        self.single_analysis_worker = BatchAnalysisWorker([filepath], params)
+        self.single_analysis_worker = BatchAnalysisWorker([filepath], params, disk_cache=self.main_page.disk_cache,
+                                                          result_store=self.analysis_cache, manifest=manifest)
         self.single_analysis_worker.moveToThread(self.single_analysis_thread)
 
         # 4. 定义完成和错误处理的内部函数
@@ -1422,8 +1499,9 @@ class AudioAnalysisBatchPanel(QWidget):
         """
         [v2.3 - 渲染修复版]
         批量保存所有已分析的结果。
-        此版本在调用主模块的渲染函数时，会传递当前文件的完整上下文（包括路径和时长），
-        从而彻底修复了在批量保存图片时因状态不同步导致的 'TypeError'。
+        [v2.6] 图片不再借用主页面的语谱图控件逐个渲染（也不再为此重新加载音频），
+        而是由 audio_analysis_render 在线程池中直接根据分析结果离屏渲染并保存，
+        GUI 线程只负责提交任务和更新进度，所有 CPU 核心同时工作。
         """
         # 1. 弹出主选择对话框，让用户决定要保存什么
         main_dialog = BatchSaveDialog(self)
@@ -1466,26 +1544,62 @@ class AudioAnalysisBatchPanel(QWidget):
             return # 用户点击了取消或关闭，静默返回
 
         # 5. 执行保存操作
+        merged_writer = None
         try:
             # --- CSV 合并模式的准备 ---
-            all_dfs_to_merge = []
+            # [新增] 合并模式下每个文件的表格生成后立即追加到合并输出中（Parquet 为每个文件一个分片的数据集），
+            # 内存中只保留当前文件的数据；中途取消时已写出的部分同样是有效的表格
+            if save_csv:
+                table_ext = csv_options.get('format', '.csv')
             if save_csv and csv_options.get('merge', False):
-                merged_filename = f"merged_analysis_{int(time.time())}.csv"
-                merged_filepath = os.path.join(save_dir, merged_filename)
+                merged_filename = f"merged_analysis_{int(time.time())}{table_ext}"
+                merged_writer = MergedTableWriter(os.path.join(save_dir, merged_filename))
 
             # --- 循环处理每个分析结果 ---
-            num_files = len(self.analysis_cache)
+            # 按来源文件名的顺序处理，合并输出因此无需在最后整体排序
+            filepaths = sorted(self.analysis_cache,
+                               key=lambda fp: os.path.splitext(os.path.basename(fp))[0] if isinstance(fp, str) else '')
+            num_files = len(filepaths)
             progress = QProgressDialog("正在批量保存结果...", "取消", 0, num_files, self)
             progress.setWindowModality(Qt.WindowModal)
             progress.show()
 
-            for i, (filepath, results) in enumerate(self.analysis_cache.items()):
+            # --- 图片渲染的准备：样式取自主页面的语谱图控件，渲染在线程池中进行 ---
+            if save_image:
+                spectrogram_widget = self.main_page.spectrogram_widget
+                image_options = dict(image_options, resolution=image_options['resolution']
+                                     or (spectrogram_widget.width(), spectrogram_widget.height()))
+                image_style = spectrogram_widget.render_style(axis_font=QFont().toString())
+                f0_display_range = 'auto' if spectrogram_widget._f0_axis_is_auto \
+                    else (spectrogram_widget._manual_f0_min, spectrogram_widget._manual_f0_max)
+                render_workers = resolve_worker_count(0)
+                render_pool = ThreadPoolExecutor(max_workers=render_workers)
+            pending_renders, render_jobs, rendered_count, failed_images = set(), {}, 0, []
+
+            def collect_renders(block):
+                """收集已完成的渲染任务；block=True 时最多等待一小段时间，期间保持界面响应。"""
+                nonlocal pending_renders, rendered_count
+                if not pending_renders: return
+                done, pending_renders = futures_wait(pending_renders, timeout=0.05 if block else 0,
+                                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    rendered_count += 1
+                    img_path = render_jobs.pop(future)
+                    try:
+                        if not future.result():
+                            failed_images.append(img_path)
+                    except Exception as e:
+                        print(f"渲染图片 {img_path} 时出错: {e}")
+                        failed_images.append(img_path)
+
+            for i, filepath in enumerate(filepaths):
                 # 在循环内部对每个文件路径进行有效性检查
                 if not (isinstance(filepath, str) and filepath):
                     print(f"警告: 在分析缓存中发现无效的文件路径，跳过此条目。")
                     continue
+                results = self.analysis_cache[filepath]
 
-                progress.setValue(i)
+                progress.setValue(rendered_count if save_image else i)
                 base_name = os.path.splitext(os.path.basename(filepath))[0]
                 progress.setLabelText(f"正在保存: {base_name}...")
                 QApplication.processEvents()
@@ -1497,52 +1611,45 @@ class AudioAnalysisBatchPanel(QWidget):
                 if save_csv:
                     df = self.main_page.convert_analysis_to_dataframe(results)
                     if df is not None:
-                        if csv_options.get('merge', False):
-                            df['source_file'] = base_name
-                            all_dfs_to_merge.append(df)
+                        if merged_writer is not None:
+                            merged_writer.append(df, base_name)
                         else: # 单独保存模式
-                            csv_path = os.path.join(save_dir, f"{base_name}_analysis.csv")
-                            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+                            csv_path = os.path.join(save_dir, f"{base_name}_analysis{table_ext}")
+                            save_analysis_table(df, csv_path)
                 
-                # --- 保存图片逻辑 ---
+                # --- 保存图片逻辑：提交到线程池，排队的任务数限制为线程数的两倍 ---
                 if save_image:
-                    # a. 加载音频数据以准备渲染环境
-                    temp_y, temp_sr = librosa.load(filepath, sr=None, mono=True)
-                    
-                    # b. [核心修复] 在渲染前，将当前文件的完整上下文同步到主页面。
-                    #    这确保了 render_high_quality_image 函数能获取到正确的文件名、时长等信息。
-                    self.main_page.audio_data = temp_y
-                    self.main_page.sr = temp_sr
-                    self.main_page.current_filepath = filepath
-                    self.main_page.known_duration = (len(temp_y) / temp_sr) * 1000
-
-                    # c. 将分析结果应用到主页面的UI控件上
-                    self.main_page.spectrogram_widget.set_data(results['S_db'], temp_sr, results['hop_length'])
-                    self.main_page.spectrogram_widget.set_analysis_data(
-                        f0_data=results.get('f0_data'),
-                        f0_derived_data=results.get('f0_derived_data'),
-                        intensity_data=results.get('intensity_data'),
-                        formants_data=results.get('formants_data')
-                    )
-                    
-                    # d. 给予UI足够的时间来处理和渲染更新
-                    QApplication.processEvents()
-                    time.sleep(0.05)
-                    
-                    # e. [核心修复] 调用渲染函数时，将当前循环的 `filepath` 作为新参数传递进去。
-                    pixmap = self.main_page.render_high_quality_image(image_options, source_filepath=filepath)
-                    
-                    # f. 保存图片并释放内存
+                    if 'S_db' not in results:
+                        print(f"警告: {base_name} 没有语谱图数据，跳过图片。")
+                        continue
+                    scene = scene_from_results(results, spectrogram_widget.max_display_freq, f0_display_range)
+                    info_text = analysis_info_text(filepath, results['duration_ms'], results['sr'])
                     img_path = os.path.join(save_dir, f"{base_name}_view.png")
-                    pixmap.save(img_path)
-                    del temp_y
+                    future = render_pool.submit(render_analysis_file, scene, image_style, image_options, info_text, img_path)
+                    render_jobs[future] = img_path
+                    pending_renders.add(future)
+                    collect_renders(block=False)
+                    while len(pending_renders) >= render_workers * 2 and not progress.wasCanceled():
+                        collect_renders(block=True)
+                        progress.setValue(rendered_count)
+                        QApplication.processEvents()
+
+            # --- 等待剩余的图片渲染完成；取消时丢弃尚未开始的任务 ---
+            if save_image:
+                while pending_renders and not progress.wasCanceled():
+                    progress.setLabelText(f"正在渲染图片... ({rendered_count}/{rendered_count + len(pending_renders)})")
+                    collect_renders(block=True)
+                    progress.setValue(rendered_count)
+                    QApplication.processEvents()
+                render_pool.shutdown(wait=True, cancel_futures=True)
+                if failed_images:
+                    print(f"警告: {len(failed_images)} 张图片保存失败: {failed_images[:5]}")
             
-            # --- CSV 合并模式的最终写入 ---
-            if save_csv and csv_options.get('merge', False) and all_dfs_to_merge:
-                progress.setLabelText("正在合并CSV文件...")
-                final_df = pd.concat(all_dfs_to_merge, ignore_index=True)
-                final_df.sort_values(by=['source_file', 'timestamp'], inplace=True)
-                final_df.to_csv(merged_filepath, index=False, encoding='utf-8-sig')
+            # --- CSV 合并模式的收尾（Feather/NPZ 不支持追加，在这里一次性写出） ---
+            if merged_writer is not None:
+                progress.setLabelText("正在写入合并文件...")
+                writer, merged_writer = merged_writer, None
+                writer.close()
             
             progress.setValue(num_files)
             if not progress.wasCanceled():
@@ -1554,6 +1661,11 @@ class AudioAnalysisBatchPanel(QWidget):
             import traceback
             traceback.print_exc()
             QMessageBox.critical(self, "保存失败", f"批量保存时出错: {e}")
+        finally:
+            # 出错时同样保留已经写出的合并结果
+            if merged_writer is not None:
+                try: merged_writer.close()
+                except Exception as e: print(f"写入合并文件时出错: {e}")
 
     def _open_context_menu(self, position):
         """
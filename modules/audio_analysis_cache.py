@@ -0,0 +1,682 @@
+# --- 模块元数据 ---
+MODULE_NAME = "音频分析结果缓存"
+MODULE_DESCRIPTION = "为音频分析模块提供按音频内容寻址的磁盘缓存（F0、强度、共振峰、语谱图），不直接作为独立标签页。"
+# ---
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import weakref
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+try:
+    import numpy as np
+    DEPENDENCIES_MISSING = False
+except ImportError as e:
+    print(f"CRITICAL: audio_analysis_cache.py - Missing dependencies: {e}")
+    DEPENDENCIES_MISSING = True
+    MISSING_ERROR_MESSAGE = str(e)
+
+
+# 缓存格式版本：分析算法或存储结构发生不兼容变化时递增，旧条目会自然失效并被 LRU 淘汰
+CACHE_FORMAT_VERSION = 2
+DEFAULT_CACHE_SIZE_MB = 2048
+EVICTION_TARGET_FRACTION = 0.9 # 超过上限时淘汰到上限的 90%，留出余量，避免缓存写满后每次写入都重新扫描
+
+# 进程内的文件哈希备忘录：(绝对路径, 大小, 修改时间) -> 内容哈希，避免同一文件被重复读取
+_file_hash_memo = {}
+_file_hash_lock = threading.Lock()
+
+
+def compute_file_hash(filepath, block_size=1 << 20):
+    """
+    计算音频文件内容的 SHA-1 哈希（流式读取，不会一次性载入整个文件）。
+    文件未被修改时直接返回进程内记住的结果。
+    """
+    stat = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    with _file_hash_lock:
+        cached = _file_hash_memo.get(memo_key)
+    if cached is not None:
+        return cached
+
+    hasher = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            hasher.update(block)
+    content_hash = hasher.hexdigest()
+
+    with _file_hash_lock:
+        _file_hash_memo[memo_key] = content_hash
+    return content_hash
+
+
+def params_fingerprint(params):
+    """分析参数字典的指纹（按键名排序后的 SHA-1），用于判断两次分析是否使用了相同的参数。"""
+    payload = json.dumps([CACHE_FORMAT_VERSION, params], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """
+    按“音频内容哈希 + 结果类型 + 全部分析参数”寻址的磁盘缓存。
+    每个条目是一个 .npz 文件；总大小超过上限时按最近使用时间（LRU）淘汰最旧的条目。
+    命中时会刷新条目的修改时间，以此记录“最近使用”。
+    缓存总大小在第一次写入时扫描一次目录得到，之后随写入累加；只有超过上限时才重新扫描目录，
+    并淘汰到上限的 EVICTION_TARGET_FRACTION，因此连续写入 N 个条目不需要 N 次完整扫描。
+    该类与界面无关，可同时被主页面和批量分析线程使用。
+    """
+    def __init__(self, cache_dir, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._total_bytes = None  # 估计的缓存总大小；None 表示需要重新扫描
+
+    def set_max_size_mb(self, max_size_mb):
+        self.max_size_bytes = int(max_size_mb) * 1024 * 1024
+        self._enforce_size_limit()
+
+    def make_key(self, content_hash, kind, params):
+        """由内容哈希、结果类型和参数字典生成条目键。参数按键名排序后参与哈希。"""
+        payload = json.dumps([CACHE_FORMAT_VERSION, content_hash, kind, params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, content_hash, kind, params):
+        """
+        读取缓存条目。未命中或条目损坏时返回 None。
+        返回的字典中，0 维数组会被还原为 Python 标量。
+        """
+        if not content_hash:
+            return None
+        path = self._entry_path(self.make_key(content_hash, kind, params))
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                entry = {name: (data[name].item() if data[name].ndim == 0 else data[name]) for name in data.files}
+            os.utime(path, None)  # 刷新最近使用时间
+            return entry
+        except Exception as e:
+            print(f"读取分析缓存失败，已忽略该条目: {e}")
+            try: os.remove(path)
+            except OSError: pass
+            with self._lock:
+                self._total_bytes = None
+            return None
+
+    def put(self, content_hash, kind, params, arrays):
+        """
+        写入缓存条目。arrays 为 {名称: ndarray 或标量}，值为 None 的项会被跳过。
+        先写入临时文件再原子替换，避免并发读取到写了一半的条目。
+        """
+        if not content_hash:
+            return
+        arrays = {name: np.asarray(value) for name, value in arrays.items() if value is not None}
+        path = self._entry_path(self.make_key(content_hash, kind, params))
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            new_size = os.path.getsize(tmp_path)
+            try: old_size = os.path.getsize(path)
+            except OSError: old_size = 0
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"写入分析缓存失败: {e}")
+            try: os.remove(tmp_path)
+            except OSError: pass
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += new_size - old_size
+            over_limit = self._total_bytes is None or self._total_bytes > self.max_size_bytes
+        if over_limit:
+            self._enforce_size_limit()
+
+    def _enforce_size_limit(self):
+        """重新扫描缓存目录；总大小超过上限时，从最久未使用的条目开始删除，直到低于上限的 EVICTION_TARGET_FRACTION。"""
+        with self._lock:
+            try:
+                entries = []
+                for name in os.listdir(self.cache_dir):
+                    if not name.endswith('.npz'): continue
+                    path = os.path.join(self.cache_dir, name)
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+            except OSError:
+                self._total_bytes = None
+                return
+            total = sum(size for _, size, _ in entries)
+            target = self.max_size_bytes * EVICTION_TARGET_FRACTION if total > self.max_size_bytes else total
+            for _, size, path in sorted(entries):
+                if total <= target: break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._total_bytes = total
+
+    def total_size_bytes(self):
+        try:
+            total = sum(os.path.getsize(os.path.join(self.cache_dir, n)) for n in os.listdir(self.cache_dir) if n.endswith('.npz'))
+        except OSError:
+            return 0
+        with self._lock:
+            self._total_bytes = total
+        return total
+
+    def clear(self):
+        """删除全部缓存条目。"""
+        with self._lock:
+            try: names = os.listdir(self.cache_dir)
+            except OSError: return
+            for name in names:
+                if name.endswith('.npz') or name.endswith('.tmp'):
+                    try: os.remove(os.path.join(self.cache_dir, name))
+                    except OSError: pass
+            self._total_bytes = None
+
+
+# --- 结果打包/解包辅助函数 ---
+# 缓存条目只保存普通数组；共振峰这种“每帧长度不等的列表”需要先转换为定长数组。
+
+def pack_formants(formant_points, prefix='formants'):
+    """将 [(sample_center, [F1, F2, ...]), ...] 打包为中心点数组和以 NaN 补齐的频率矩阵。"""
+    if not formant_points:
+        return {f'{prefix}_centers': np.zeros(0, dtype=np.int64), f'{prefix}_values': np.zeros((0, 4))}
+    width = max(len(freqs) for _, freqs in formant_points)
+    values = np.full((len(formant_points), width), np.nan)
+    for row, (_, freqs) in enumerate(formant_points):
+        values[row, :len(freqs)] = freqs
+    centers = np.array([center for center, _ in formant_points], dtype=np.int64)
+    return {f'{prefix}_centers': centers, f'{prefix}_values': values}
+
+
+def unpack_formants(entry, prefix='formants'):
+    """pack_formants 的逆操作。条目中没有共振峰数据时返回 None。"""
+    if f'{prefix}_centers' not in entry:
+        return None
+    centers, values = entry[f'{prefix}_centers'], entry[f'{prefix}_values']
+    return [(int(center), row[np.isfinite(row)].tolist()) for center, row in zip(centers, values)]
+
+
+def pack_acoustics(f0_data, f0_derived_data, intensity_data):
+    """打包 F0 (times, values)、派生 F0 与强度曲线。"""
+    arrays = {'intensity': intensity_data}
+    if f0_data is not None:
+        arrays['f0_times'], arrays['f0_values'] = f0_data
+    if f0_derived_data is not None:
+        arrays['f0_derived_times'], arrays['f0_derived_values'] = f0_derived_data
+    return arrays
+
+
+def unpack_acoustics(entry):
+    """pack_acoustics 的逆操作，返回 (f0_data, f0_derived_data, intensity_data)。"""
+    f0_data = (entry['f0_times'], entry['f0_values']) if 'f0_times' in entry else None
+    f0_derived_data = (entry['f0_derived_times'], entry['f0_derived_values']) if 'f0_derived_times' in entry else None
+    return f0_data, f0_derived_data, entry.get('intensity')
+
+
+COARSE_F0_KIND = 'coarse_f0' # 粗略 F0 估计的缓存条目类型，参数只包含估计方法
+
+
+def pack_coarse_f0_range(coarse_range):
+    """打包粗略 F0 估计 (p5, p95)；没有有效估计时为 (nan, nan)，同样值得缓存。"""
+    return {'percentiles': np.asarray(coarse_range, dtype=float)}
+
+
+def unpack_coarse_f0_range(entry):
+    """pack_coarse_f0_range 的逆操作。"""
+    p5, p95 = entry['percentiles']
+    return (float(p5), float(p95))
+
+
+# --- 批量分析结果存储（溢出到磁盘） ---
+
+class BatchResultStore(MutableMapping):
+    """
+    批量分析结果的存储：{音频文件路径: 批量结果字典}，用法与普通字典相同。
+    每个文件的结果在写入时立即保存到会话目录下的独立子目录（每个数组一个 .npy，标量写入 meta.json），
+    内存中只保留最近访问的 memory_items 个文件；其余文件在读取时再从磁盘加载，
+    其中语谱图以只读内存映射打开，F0/强度/共振峰这类较小的数据读入内存。
+    因此批量分析能处理的文件数取决于磁盘空间而不是内存。
+    会话目录在第一次写入时创建，在 close() 或对象被回收（包括程序退出）时删除；
+    超过 STALE_SESSION_DAYS 天未修改的旧会话目录（例如程序崩溃后遗留的）会在创建新会话时清理，
+    但仍有未完成运行、可以继续的会话除外。
+    [修复] 已读出的语谱图仍映射着条目目录中的文件，因此条目从不原地替换：重写结果时写入新的条目目录，
+    旧目录删除失败（Windows 上文件仍被映射）时打印警告并在之后重试；无法删除的会话目录写入
+    CLOSED_MARKER 标记，下次创建会话时不论新旧都会清理。
+    写入（分析线程）与读取（界面线程）可以同时进行。
+    [新增] 会话目录中的 BatchManifest 记录了批量分析的进度；最后一次运行未完成的会话在程序退出时保留，
+    之后可以通过 adopt_session() 并入新的会话继续分析。
+    """
+    DEFAULT_MEMORY_ITEMS = 8
+    STALE_SESSION_DAYS = 7
+    SESSION_PREFIX = 'session_'
+    META_FILE = 'meta.json'
+    MEMORY_MAPPED_ARRAYS = ('S_db',)
+    CLOSED_MARKER = 'closed'
+    TMP_SUFFIX = '.tmp'
+
+    def __init__(self, root_dir, memory_items=DEFAULT_MEMORY_ITEMS):
+        self.root_dir = root_dir
+        self.memory_items = max(0, int(memory_items))
+        self.session_dir = None
+        self._entries = {}  # 文件路径 -> 条目目录（按写入顺序）
+        self._memory = OrderedDict()  # 最近访问的结果（LRU）
+        self._lock = threading.RLock()
+        self._finalizer = None
+        self._pending_removals = []  # 删除失败、稍后重试的旧条目目录
+
+    # --- 字典接口 ---
+
+    def __contains__(self, filepath):
+        with self._lock:
+            return filepath in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __getitem__(self, filepath):
+        with self._lock:
+            if filepath in self._memory:
+                self._memory.move_to_end(filepath)
+                return self._memory[filepath]
+            entry_dir = self._entries[filepath]
+        results = self._read_entry(entry_dir)
+        with self._lock:
+            if filepath in self._entries:
+                self._remember(filepath, results)
+        return results
+
+    def __setitem__(self, filepath, results):
+        with self._lock:
+            entry_dir = self._new_entry_dir(filepath)
+        self._write_entry(entry_dir, filepath, results)
+        with self._lock:
+            old_dir = self._entries.get(filepath)
+            self._entries[filepath] = entry_dir
+            self._remember(filepath, results)
+        if old_dir and old_dir != entry_dir:
+            # [修复] 旧条目可能仍被界面持有的内存映射引用，只在新条目就位后删除
+            self._discard_dir(old_dir)
+
+    def __delitem__(self, filepath):
+        with self._lock:
+            entry_dir = self._entries.pop(filepath)
+            self._memory.pop(filepath, None)
+        self._discard_dir(entry_dir)
+
+    def update(self, other=(), **kwargs):
+        """
+        与 dict.update 相同；值为 None 的项表示结果已由分析线程直接写入本存储，会被跳过。
+        """
+        items = other.items() if hasattr(other, 'items') else other
+        for filepath, results in list(items) + list(kwargs.items()):
+            if results is not None:
+                self[filepath] = results
+
+    def close(self):
+        """删除会话目录和内存中的全部结果。"""
+        with self._lock:
+            self._entries.clear()
+            self._memory.clear()
+            session_dir, self.session_dir = self.session_dir, None
+            if self._finalizer is not None:
+                self._finalizer.detach()
+                self._finalizer = None
+        with self._lock:
+            self._pending_removals.clear()
+        if session_dir:
+            _remove_session_dir(session_dir)
+
+    # --- 内部实现 ---
+
+    def _new_entry_dir(self, filepath):
+        """文件结果的新条目目录：首次写入使用 entry_name()，重写时加序号，不覆盖仍可能被映射的旧目录。"""
+        base = os.path.join(self._ensure_session_dir(), self.entry_name(filepath))
+        entry_dir, version = base, 0
+        while entry_dir == self._entries.get(filepath) or os.path.exists(entry_dir):
+            version += 1
+            entry_dir = f"{base}_{version}"
+        return entry_dir
+
+    def _discard_dir(self, path):
+        """删除不再使用的条目目录（连同之前删除失败的目录）；失败时打印警告并留待下次重试。"""
+        with self._lock:
+            paths, self._pending_removals = self._pending_removals + [path], []
+        failed = []
+        for path in paths:
+            try:
+                shutil.rmtree(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"删除旧的分析结果失败，稍后重试: {e}")
+                failed.append(path)
+        with self._lock:
+            self._pending_removals.extend(failed)
+
+    def _remember(self, filepath, results):
+        if self.memory_items <= 0:
+            return
+        self._memory[filepath] = results
+        self._memory.move_to_end(filepath)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _ensure_session_dir(self):
+        if self.session_dir is None:
+            os.makedirs(self.root_dir, exist_ok=True)
+            self._remove_stale_sessions()
+            self.session_dir = os.path.join(
+                self.root_dir, f"{self.SESSION_PREFIX}{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{id(self):x}")
+            os.makedirs(self.session_dir, exist_ok=True)
+            self._finalizer = weakref.finalize(self, _release_session_dir, self.session_dir)
+        return self.session_dir
+
+    @staticmethod
+    def entry_name(filepath):
+        """文件结果在会话目录中的子目录名（由绝对路径决定，在不同会话之间保持不变）。"""
+        return hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+
+    def entry_location(self, filepath):
+        """文件当前结果条目的子目录名（重写过的条目带序号）。"""
+        with self._lock:
+            return os.path.basename(self._entries[filepath])
+
+    def manifest(self):
+        """当前会话的检查点清单（必要时创建会话目录）。"""
+        with self._lock:
+            return BatchManifest(os.path.join(self._ensure_session_dir(), BatchManifest.FILE_NAME))
+
+    def unfinished_sessions(self):
+        """最后一次运行尚未完成的会话目录（包括当前会话），按修改时间从新到旧排列。"""
+        try:
+            names = [name for name in os.listdir(self.root_dir) if name.startswith(self.SESSION_PREFIX)]
+        except OSError:
+            return []
+        sessions = []
+        for name in names:
+            path = os.path.join(self.root_dir, name)
+            manifest_path = os.path.join(path, BatchManifest.FILE_NAME)
+            if _has_unfinished_run(path):
+                sessions.append((os.path.getmtime(manifest_path), path))
+        return [path for _, path in sorted(sessions, reverse=True)]
+
+    def adopt_session(self, session_dir):
+        """
+        把另一个会话目录中的结果和清单并入当前会话（同名条目以当前会话为准），然后删除该目录。
+        返回并入的文件数。
+        """
+        with self._lock:
+            own_dir = self._ensure_session_dir()
+            if os.path.abspath(session_dir) == os.path.abspath(own_dir):
+                return 0
+            adopted = 0
+            for name in os.listdir(session_dir):
+                if name.endswith(self.TMP_SUFFIX):
+                    continue  # 崩溃时未写完的临时目录
+                entry_dir = os.path.join(session_dir, name)
+                meta_path = os.path.join(entry_dir, self.META_FILE)
+                if not os.path.isfile(meta_path):
+                    continue
+                try:
+                    with open(meta_path, encoding='utf-8') as f:
+                        filepath = json.load(f)['filepath']
+                except (OSError, ValueError, KeyError):
+                    continue
+                if filepath in self._entries:
+                    continue
+                target = self._new_entry_dir(filepath)
+                os.replace(entry_dir, target)
+                self._entries[filepath] = target
+                adopted += 1
+            old_manifest = os.path.join(session_dir, BatchManifest.FILE_NAME)
+            if os.path.isfile(old_manifest):
+                with open(old_manifest, encoding='utf-8') as f:
+                    lines = [line for line in f if line.endswith('\n')]
+                self.manifest().append_lines(lines)
+        _remove_session_dir(session_dir)
+        return adopted
+
+    def _remove_stale_sessions(self):
+        cutoff = time.time() - self.STALE_SESSION_DAYS * 86400
+        try:
+            names = os.listdir(self.root_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.root_dir, name)
+            if not name.startswith(self.SESSION_PREFIX):
+                continue
+            try:
+                if os.path.exists(os.path.join(path, self.CLOSED_MARKER)):
+                    shutil.rmtree(path)
+                elif os.path.getmtime(path) < cutoff and not _has_unfinished_run(path):
+                    # [修复] 仍可继续的未完成运行不因过期被删除
+                    shutil.rmtree(path)
+            except OSError as e:
+                print(f"清理旧的批量分析会话失败: {e}")
+
+    def _write_entry(self, entry_dir, filepath, results):
+        """先写入临时目录再整体替换，读取方不会看到写了一半的条目。"""
+        arrays = {'S_db': results['S_db']}
+        if 'f0_data' in results:
+            arrays.update(pack_acoustics(results['f0_data'], results.get('f0_derived_data'),
+                                         results.get('intensity_data')))
+        if 'formants_data' in results:
+            arrays.update(pack_formants(results['formants_data']))
+        coarse_f0_range = results.get('coarse_f0_range')
+        meta = {
+            'filepath': filepath,
+            'hop_length': int(results['hop_length']),
+            'sr': int(results['sr']),
+            'duration_ms': float(results['duration_ms']),
+            'coarse_f0_range': None if coarse_f0_range is None else [float(v) for v in coarse_f0_range],
+        }
+
+        tmp_dir = f"{entry_dir}.{threading.get_ident()}{self.TMP_SUFFIX}"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        for name, value in arrays.items():
+            if value is not None:
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(value), allow_pickle=False)
+        with open(os.path.join(tmp_dir, self.META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_dir, entry_dir)  # entry_dir 总是新目录，不会替换仍被映射的文件
+
+    def _read_entry(self, entry_dir):
+        with open(os.path.join(entry_dir, self.META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {}
+        for name in os.listdir(entry_dir):
+            if name.endswith('.npy'):
+                key = name[:-len('.npy')]
+                arrays[key] = np.load(os.path.join(entry_dir, name), allow_pickle=False,
+                                      mmap_mode='r' if key in self.MEMORY_MAPPED_ARRAYS else None)
+
+        results = {'S_db': arrays['S_db'], 'hop_length': meta['hop_length'], 'sr': meta['sr'],
+                   'duration_ms': meta['duration_ms']}
+        f0_data, f0_derived_data, intensity_data = unpack_acoustics(arrays)
+        if f0_data is not None:
+            results['f0_data'] = f0_data
+            results['f0_derived_data'] = f0_derived_data
+            results['intensity_data'] = intensity_data
+        formants_data = unpack_formants(arrays)
+        if formants_data is not None:
+            results['formants_data'] = formants_data
+        if meta.get('coarse_f0_range') is not None:
+            results['coarse_f0_range'] = tuple(meta['coarse_f0_range'])
+        return results
+
+
+def _release_session_dir(session_dir):
+    """会话结束时删除会话目录；最后一次运行未完成（可继续）的会话保留。"""
+    if not _has_unfinished_run(session_dir):
+        _remove_session_dir(session_dir)
+
+
+def _has_unfinished_run(session_dir):
+    """会话目录的清单中最后一次运行是否未完成（可继续）。"""
+    manifest_path = os.path.join(session_dir, BatchManifest.FILE_NAME)
+    return os.path.isfile(manifest_path) and BatchManifest(manifest_path).unfinished_run() is not None
+
+
+def _remove_session_dir(session_dir):
+    """
+    删除会话目录。部分文件仍被映射而无法删除时打印警告，并写入 CLOSED_MARKER，
+    下次创建会话时由 _remove_stale_sessions() 清理。
+    """
+    try:
+        shutil.rmtree(session_dir)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"删除批量分析会话目录失败，将在下次启动时清理: {e}")
+        try:
+            with open(os.path.join(session_dir, BatchResultStore.CLOSED_MARKER), 'w', encoding='utf-8'):
+                pass
+        except OSError:
+            pass
+
+
+class BatchManifest:
+    """
+    批量分析的检查点清单（JSON Lines，只追加）。
+    每次运行先写一行 'run' 记录（参数、参数指纹和全部文件），每处理完一个文件追加一行 'file' 记录
+    （文件、内容哈希、大小与修改时间、参数指纹、状态、结果在会话目录中的位置），正常结束时追加 'end' 记录。
+    每行写入后立即 flush 并 fsync，程序崩溃或断电时最多丢失正在写的那一行；读取时忽略不完整的行。
+    """
+    FILE_NAME = 'manifest.jsonl'
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def start_run(self, filepaths, params):
+        """开始一次新的运行并返回其编号。"""
+        self.run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{id(self):x}"
+        self._fingerprint = params_fingerprint(params)
+        self._append({'type': 'run', 'run_id': self.run_id, 'time': time.time(), 'params': params,
+                      'fingerprint': self._fingerprint, 'files': list(filepaths)})
+        return self.run_id
+
+    def record(self, filepath, content_hash, status, error=None, result=None):
+        """记录单个文件的处理结果；status 为 'done' 或 'failed'，result 为结果条目的子目录名。"""
+        try:
+            stat = os.stat(filepath)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size, mtime_ns = None, None
+        self._append({'type': 'file', 'run_id': self.run_id, 'filepath': filepath, 'content_hash': content_hash,
+                      'size': size, 'mtime_ns': mtime_ns, 'fingerprint': self._fingerprint,
+                      'status': status, 'error': error, 'result': result})
+
+    def start_single(self, params):
+        """
+        [新增] 在任何运行之外记录文件（单文件分析）：记录带有参数指纹，但不属于任何运行，
+        因此不会影响 unfinished_run() 判断哪一次运行可以继续。
+        """
+        self.run_id = None
+        self._fingerprint = params_fingerprint(params)
+
+    def finish_run(self):
+        """标记当前运行已完整结束（被取消或崩溃的运行没有这一行）。"""
+        if self.run_id is None:
+            return  # start_single() 之后没有需要结束的运行
+        self._append({'type': 'end', 'run_id': self.run_id, 'time': time.time()})
+
+    def append_lines(self, lines):
+        """原样追加其他清单中的完整行（并入旧会话时使用）。"""
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _append(self, record):
+        self.append_lines([json.dumps(record, ensure_ascii=False) + '\n'])
+
+    def records(self):
+        """读取全部完整的记录。"""
+        records = []
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return records
+
+    def latest_file_records(self):
+        """每个文件最后一条 'file' 记录（不论参数指纹和所属运行）：{文件路径: 记录}。"""
+        latest = {}
+        for record in self.records():
+            if record.get('type') == 'file':
+                latest[record['filepath']] = record
+        return latest
+
+    def unfinished_run(self):
+        """
+        最后一次运行没有 'end' 记录时，返回 {'run_id', 'params', 'fingerprint', 'files', 'done', 'failed'}，
+        否则返回 None。'done'/'failed' 为 {文件路径: 最后一条记录}，只统计使用相同参数指纹的记录
+        （包括更早的、同样参数的运行），因此中断多次后继续时，之前每一次完成的文件都会被跳过。
+        """
+        records = self.records()
+        runs = [record for record in records if record.get('type') == 'run']
+        if not runs:
+            return None
+        run = runs[-1]
+        if any(record.get('type') == 'end' and record.get('run_id') == run['run_id'] for record in records):
+            return None
+        latest = {}
+        for record in records:
+            if record.get('type') == 'file' and record.get('fingerprint') == run['fingerprint']:
+                latest[record['filepath']] = record
+        return {
+            'run_id': run['run_id'], 'params': run['params'], 'fingerprint': run['fingerprint'], 'files': run['files'],
+            'done': {fp: record for fp, record in latest.items() if record['status'] == 'done'},
+            'failed': {fp: record for fp, record in latest.items() if record['status'] != 'done'},
+        }
+
+    @staticmethod
+    def file_unchanged(record):
+        """
+        记录中的文件是否仍与记录时相同：大小和修改时间都没变时直接认为相同，
+        否则重新计算内容哈希比较（文件被复制或 touch 过但内容未变时同样可以跳过）。
+        """
+        try:
+            stat = os.stat(record['filepath'])
+        except OSError:
+            return False
+        if stat.st_size == record.get('size') and stat.st_mtime_ns == record.get('mtime_ns'):
+            return True
+        return bool(record.get('content_hash')) and compute_file_hash(record['filepath']) == record['content_hash']
+
+    def resume_run(self, run):
+        """继续 unfinished_run() 返回的运行：之后的记录与结束标记都归入该运行。"""
+        self.run_id = run['run_id']
+        self._fingerprint = run['fingerprint']
@@ -0,0 +1,381 @@
+# --- 模块元数据 ---
+MODULE_NAME = "音频批量分析（命令行）"
+MODULE_DESCRIPTION = "无需图形界面的批量音频分析入口：多进程分析文件夹或文件列表，逐个写出 CSV/NPZ/PNG/带标注的视图图片并输出吞吐统计，不直接作为独立标签页。"
+# ---
+#
+# 用法示例（在服务器等无显示环境中运行）：
+#   python modules/audio_analysis_cli.py recordings/ -o results/ --workers 8 --formats csv,npz,png
+#   python modules/audio_analysis_cli.py recordings/ -o results/ --formats view   # 与界面“批量保存图片”相同的视图图片
+# 分析参数与批量分析面板 (BatchAnalysisWorker.params) 完全相同，详见 --help。
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait as futures_wait, FIRST_COMPLETED
+
+try:
+    import numpy as np
+    from scipy.signal import lfilter
+    DEPENDENCIES_MISSING = False
+except ImportError as e:
+    print(f"CRITICAL: audio_analysis_cli.py - Missing dependencies: {e}")
+    DEPENDENCIES_MISSING = True
+    MISSING_ERROR_MESSAGE = str(e)
+
+from audio_analysis_engine import (analyze_file, resolve_worker_count,
+                                   benchmark_coarse_f0_estimators, COARSE_F0_METHODS,
+                                   benchmark_f0_backends, analysis_hop_length, F0_BACKENDS)
+from audio_analysis_source import load_audio
+from audio_analysis_export import analysis_results_to_dataframe
+from audio_analysis_cache import pack_acoustics, pack_formants
+
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.m4a') # 与批量分析面板的导入过滤器一致
+OUTPUT_FORMATS = ('csv', 'npz', 'png', 'view')
+DEFAULT_OUTPUT_FORMATS = ('csv', 'npz', 'png')
+# 'view' 格式的导出选项，与界面导出对话框的 Full HD 预设相同
+VIEW_IMAGE_OPTIONS = {'resolution': (1920, 1080), 'info_label': True, 'add_time_axis': True}
+
+
+def collect_audio_inputs(inputs, recursive=False):
+    """
+    把命令行给出的文件和文件夹展开为去重后的 {音频文件绝对路径: 输出名} 字典（保持给出的顺序）。
+    输出名是结果文件名的前缀（不含扩展名）：文件夹中的文件保留其相对于该文件夹的子目录，
+    例如 recordings/a/001.wav -> a/001，因此递归查找时不同子文件夹中的同名文件不会互相覆盖；
+    直接给出的文件使用其文件名。
+    """
+    found_inputs = {}
+    for path in inputs:
+        if os.path.isdir(path):
+            if recursive:
+                found = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+            else:
+                found = [os.path.join(path, name) for name in os.listdir(path)]
+            for p in sorted(p for p in found if p.lower().endswith(AUDIO_EXTENSIONS)):
+                found_inputs.setdefault(os.path.abspath(p), os.path.splitext(os.path.relpath(p, path))[0])
+        elif os.path.isfile(path):
+            found_inputs.setdefault(os.path.abspath(path), os.path.splitext(os.path.basename(path))[0])
+        else:
+            print(f"警告: 找不到 '{path}'，已跳过。", file=sys.stderr)
+    return found_inputs
+
+
+def collect_audio_files(inputs, recursive=False):
+    """把命令行给出的文件和文件夹展开为去重后的音频文件列表（保持给出的顺序）。"""
+    return list(collect_audio_inputs(inputs, recursive))
+
+
+def find_output_collisions(output_names):
+    """返回会写到同一组输出文件的输入 {输出名: [文件, ...]}（不区分大小写，兼容 Windows/macOS 文件系统）。"""
+    groups = {}
+    for filepath, name in output_names.items():
+        groups.setdefault(os.path.normcase(name).lower(), []).append(filepath)
+    return {output_names[files[0]]: files for files in groups.values() if len(files) > 1}
+
+
+def save_spectrogram_png(S_quantized, path, min_color=(255, 255, 255), max_color=(0, 0, 0)):
+    """
+    将量化后的 uint8 语谱图按最小/最大颜色线性插值着色并保存为 PNG（低频在下，一帧一像素）。
+    只使用 QImage，不需要 QApplication 或显示环境。
+    """
+    from PyQt5.QtGui import QColor
+    from audio_analysis_render import spectrogram_image, spectrogram_color_table
+    image = spectrogram_image(S_quantized, spectrogram_color_table(QColor(*min_color).rgba(), QColor(*max_color).rgba()))
+    if not image.save(path, 'PNG'):
+        raise IOError(f"无法写入图片: {path}")
+
+
+def save_view_image(results, filepath, path, options=VIEW_IMAGE_OPTIONS):
+    """
+    用界面共用的离屏渲染器生成整个文件的视图图片（语谱图、F0、共振峰、时间轴和信息标签），
+    样式为语谱图控件的默认样式。子进程中会自动创建 offscreen 的 QGuiApplication。
+    """
+    from audio_analysis_render import render_analysis_file, scene_from_results, analysis_info_text, DEFAULT_RENDER_STYLE
+    info_text = analysis_info_text(filepath, results['duration_ms'], results['sr'])
+    if not render_analysis_file(scene_from_results(results), DEFAULT_RENDER_STYLE, options, info_text, path):
+        raise IOError(f"无法写入图片: {path}")
+
+
+def analyze_and_save(filepath, params, output_dir, formats, output_name=None):
+    """
+    在子进程中分析单个文件并立即写出结果，只把简短的统计信息返回给主进程，
+    因此主进程的内存占用与文件数量无关。
+    output_name 为结果文件名的前缀（可以包含子目录，见 collect_audio_inputs），默认为音频文件名。
+    返回 {'filepath', 'ok', 'error', 'duration_s', 'elapsed_s', 'outputs'}。
+    """
+    t0 = time.perf_counter()
+    stats = {'filepath': filepath, 'ok': False, 'error': '', 'duration_s': 0.0, 'elapsed_s': 0.0, 'outputs': []}
+    try:
+        y, sr = load_audio(filepath)
+        results = analyze_file(y, sr, params)
+        stats['duration_s'] = len(y) / sr
+        del y
+
+        base_path = os.path.join(output_dir, output_name or os.path.splitext(os.path.basename(filepath))[0])
+        os.makedirs(os.path.dirname(base_path), exist_ok=True)
+        if 'csv' in formats:
+            df = analysis_results_to_dataframe(results, sr)
+            if df is not None:
+                csv_path = f"{base_path}_analysis.csv"
+                df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+                stats['outputs'].append(csv_path)
+        if 'npz' in formats:
+            # 与磁盘缓存中 'batch' 条目的布局相同
+            arrays = {name: results[name] for name in ('S_db', 'hop_length', 'sr', 'duration_ms')}
+            if 'f0_data' in results:
+                arrays.update(pack_acoustics(results['f0_data'], results.get('f0_derived_data'), results.get('intensity_data')))
+            if 'formants_data' in results:
+                arrays.update(pack_formants(results['formants_data']))
+            npz_path = f"{base_path}_analysis.npz"
+            np.savez_compressed(npz_path, **{name: np.asarray(value) for name, value in arrays.items() if value is not None})
+            stats['outputs'].append(npz_path)
+        if 'png' in formats:
+            png_path = f"{base_path}_spectrogram.png"
+            save_spectrogram_png(results['S_db'], png_path)
+            stats['outputs'].append(png_path)
+        if 'view' in formats:
+            view_path = f"{base_path}_view.png"
+            save_view_image(results, filepath, view_path)
+            stats['outputs'].append(view_path)
+        stats['ok'] = True
+    except Exception as e:
+        stats['error'] = str(e) or type(e).__name__
+    stats['elapsed_s'] = time.perf_counter() - t0
+    return stats
+
+
+def run_batch(filepaths, params, output_dir, formats=DEFAULT_OUTPUT_FORMATS, worker_count=0, report=print,
+              output_names=None):
+    """
+    分析 filepaths 中的全部文件，并把结果写入 output_dir。
+    output_names 为 {文件: 输出名}（见 collect_audio_inputs），未给出的文件使用其文件名。
+    worker_count 为 0 时按 CPU 核数自动选择；为 1 时在当前进程中顺序执行。
+    同时提交的任务数被限制为进程数的数倍，完成一个文件就报告一个文件。
+    返回全部文件的统计信息列表（按完成顺序）。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_names = output_names or {}
+    worker_count = min(resolve_worker_count(worker_count), max(1, len(filepaths)))
+    all_stats = []
+
+    def finish(stats):
+        all_stats.append(stats)
+        name = output_names.get(stats['filepath']) or os.path.basename(stats['filepath'])
+        if stats['ok']:
+            report(f"[{len(all_stats)}/{len(filepaths)}] {name}: {stats['duration_s']:.1f} s 音频，用时 {stats['elapsed_s']:.2f} s")
+        else:
+            report(f"[{len(all_stats)}/{len(filepaths)}] {name}: 失败 - {stats['error']}")
+
+    if worker_count <= 1:
+        for filepath in filepaths:
+            finish(analyze_and_save(filepath, params, output_dir, formats, output_names.get(filepath)))
+        return all_stats
+
+    # 与分析进程池相同，统一使用 spawn 方式启动子进程
+    with ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = set()
+        queue = deque(filepaths)
+        while queue or pending:
+            while queue and len(pending) < worker_count * 2:
+                filepath = queue.popleft()
+                pending.add(pool.submit(analyze_and_save, filepath, params, output_dir, formats,
+                                        output_names.get(filepath)))
+            done, pending = futures_wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(future.result())
+    return all_stats
+
+
+def format_summary(all_stats, wall_time_s):
+    """生成吞吐统计的文本摘要。"""
+    succeeded = [s for s in all_stats if s['ok']]
+    audio_s = sum(s['duration_s'] for s in succeeded)
+    lines = [
+        f"完成: {len(succeeded)}/{len(all_stats)} 个文件成功，总用时 {wall_time_s:.2f} s",
+        f"吞吐: {len(all_stats) / wall_time_s if wall_time_s > 0 else 0:.2f} 文件/秒，"
+        f"{audio_s / 60:.1f} 分钟音频，{audio_s / wall_time_s if wall_time_s > 0 else 0:.1f} 倍实时",
+    ]
+    failed = [s for s in all_stats if not s['ok']]
+    if failed:
+        lines.append("失败的文件:")
+        lines.extend(f"  {s['filepath']}: {s['error']}" for s in failed)
+    return "\n".join(lines)
+
+
+def run_coarse_f0_benchmark(filepaths, report=print):
+    """
+    对每个文件比较各粗略 F0 估计方法给出的 (p5, p95) 范围和用时，
+    最后报告相对 pYIN 的平均偏差与加速比。
+    """
+    reference, others = COARSE_F0_METHODS[0], COARSE_F0_METHODS[1:]
+    rows = []
+    for filepath in filepaths:
+        try:
+            y, sr = load_audio(filepath)
+        except Exception as e:
+            report(f"{os.path.basename(filepath)}: 读取失败 - {str(e) or type(e).__name__}")
+            continue
+        bench = benchmark_coarse_f0_estimators(y, sr)
+        rows.append(bench)
+        report(f"{os.path.basename(filepath)}: " + "，".join(
+            f"{method} ({r['range'][0]:.0f}-{r['range'][1]:.0f} Hz, {r['seconds'] * 1000:.0f} ms)" for method, r in bench.items()))
+    for method in others:
+        pairs = [(b[reference], b[method]) for b in rows
+                 if np.all(np.isfinite(b[reference]['range'])) and np.all(np.isfinite(b[method]['range']))]
+        if not pairs:
+            continue
+        deviation = np.array([np.abs(np.subtract(o['range'], r['range'])) for r, o in pairs])
+        speedup = sum(r['seconds'] for r, _ in pairs) / max(sum(o['seconds'] for _, o in pairs), 1e-9)
+        report(f"{method} 相对 {reference}: {len(pairs)} 个文件，p5 平均偏差 {deviation[:, 0].mean():.1f} Hz，"
+               f"p95 平均偏差 {deviation[:, 1].mean():.1f} Hz，快 {speedup:.0f} 倍")
+    return rows
+
+
+# 合成测试语音：(名称, F0 轮廓关键点 Hz)，覆盖男声、女声、童声和大跨度语调
+SYNTHETIC_VOICES = (
+    ('男声 90-140 Hz', (90, 120, 140, 100, 110)),
+    ('女声 180-300 Hz', (180, 260, 300, 220, 200)),
+    ('童声 250-450 Hz', (250, 400, 450, 300)),
+    ('大跨度 80-350 Hz', (80, 350, 120, 300, 90)),
+)
+
+
+def synthesize_voice(f0_points, sr=16000, duration_s=10.0, seed=0):
+    """
+    合成带已知 F0 的测试语音：谐波声源经过三个共振峰滤波，每 1.25 s 约有 0.3 s 静音，叠加少量白噪声。
+    返回 (y, sr, 逐采样点的真值 F0)，静音段的真值为 NaN。
+    """
+    t = np.arange(int(sr * duration_s)) / sr
+    f0 = np.interp(t, np.linspace(0, duration_s, len(f0_points)), f0_points)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(np.sin(k * phase) / k for k in range(1, 25))
+    for formant, bandwidth in ((700, 80), (1200, 90), (2600, 120)):
+        r = np.exp(-np.pi * bandwidth / sr)
+        y = lfilter([1 - r], [1, -2 * r * np.cos(2 * np.pi * formant / sr), r * r], y)
+    voiced = np.sin(2 * np.pi * 0.8 * t) > -0.3
+    rng = np.random.default_rng(seed)
+    y = y * voiced / np.abs(y).max() * 0.5 + 0.005 * rng.standard_normal(len(t))
+    return y.astype(np.float32), sr, np.where(voiced, f0, np.nan)
+
+
+def run_f0_backend_benchmark(filepaths, f0_min, f0_max, report=print):
+    """
+    比较各 F0 后端的速度与准确度：合成语音以真值为参考，录音文件以 pYIN 的结果为参考。
+    最后报告各后端相对 pYIN 的总加速比。
+    """
+    rows = []
+
+    def report_row(name, bench, reference_name):
+        rows.append(bench)
+        report(f"{name}（参考: {reference_name}）: " + "；".join(
+            f"{backend} {r['seconds'] * 1000:.0f} ms, 清浊一致 {r['voicing_agreement']:.1%}, "
+            f"粗差 {r['gross_error']:.1%}, 中位偏差 {r['median_cents']:.1f} 音分" for backend, r in bench.items()))
+
+    for name, f0_points in SYNTHETIC_VOICES:
+        y, sr, true_f0 = synthesize_voice(f0_points)
+        hop_length = analysis_hop_length(sr, 4)
+        # 真值取每帧中心（与 center=True 的帧划分一致）
+        frame_centers = np.minimum(np.arange(1 + len(y) // hop_length) * hop_length, len(y) - 1)
+        report_row(f"合成 {name}", benchmark_f0_backends(y, sr, f0_min, f0_max, hop_length, true_f0[frame_centers]), "真值")
+
+    for filepath in filepaths:
+        try:
+            y, sr = load_audio(filepath)
+        except Exception as e:
+            report(f"{os.path.basename(filepath)}: 读取失败 - {str(e) or type(e).__name__}")
+            continue
+        report_row(os.path.basename(filepath), benchmark_f0_backends(y, sr, f0_min, f0_max), "pyin")
+
+    pyin_seconds = sum(r['pyin']['seconds'] for r in rows)
+    for backend in F0_BACKENDS:
+        if backend != 'pyin' and rows:
+            report(f"{backend} 相对 pyin: 共 {len(rows)} 段音频，快 {pyin_seconds / max(sum(r[backend]['seconds'] for r in rows), 1e-9):.0f} 倍")
+    return rows
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="批量分析音频文件（F0、强度、语谱图、共振峰），无需图形界面。")
+    parser.add_argument('inputs', nargs='*', help="音频文件或包含音频文件的文件夹")
+    parser.add_argument('-o', '--output-dir', help="结果输出目录（分析时必需）")
+    parser.add_argument('-r', '--recursive', action='store_true', help="递归查找子文件夹中的音频文件")
+    parser.add_argument('-j', '--workers', type=int, default=0, help="并行进程数，0 表示按 CPU 核数自动选择（默认 0）")
+    parser.add_argument('--formats', default='csv,npz,png', help="输出格式，逗号分隔：csv、npz、png（一帧一像素的语谱图）、view（带标注的视图图片）（默认 csv,npz,png）")
+    parser.add_argument('--mode', choices=['normal', 'fast', 'compatibility'], default='normal',
+                        help="F0 分析模式：normal（pYIN 分块）、fast（向量化 YIN）或 compatibility（默认 normal）")
+    parser.add_argument('--f0-min', type=float, default=75, help="F0 搜索下限 Hz（默认 75）")
+    parser.add_argument('--f0-max', type=float, default=500, help="F0 搜索上限 Hz（默认 500）")
+    parser.add_argument('--render-density', type=int, default=4, choices=range(1, 7), help="语谱图/F0 精细度 1-6（默认 4）")
+    parser.add_argument('--formant-density', type=int, default=5, choices=range(1, 7), help="共振峰精细度 1-6（默认 5）")
+    parser.add_argument('--wide-band', action='store_true', help="使用宽带语谱图")
+    parser.add_argument('--pre-emphasis', action='store_true', help="分析前进行预加重")
+    parser.add_argument('--no-f0', action='store_true', help="跳过 F0 与强度分析")
+    parser.add_argument('--no-formants', action='store_true', help="跳过共振峰分析")
+    parser.add_argument('--coarse-f0', choices=COARSE_F0_METHODS, default='pyin',
+                        help="普通模式下粗略估计 F0 范围的方法：pyin（精确）或 autocorr（快速）（默认 pyin）")
+    parser.add_argument('--benchmark-f0-range', action='store_true',
+                        help="不做分析，只比较各粗略 F0 估计方法给出的范围与用时")
+    parser.add_argument('--benchmark-f0-backends', action='store_true',
+                        help="不做分析，在内置合成语音和给出的文件上比较各 F0 后端的速度与准确度")
+    return parser
+
+
+def main(argv=None):
+    if DEPENDENCIES_MISSING:
+        print(f"缺少依赖，无法运行: {MISSING_ERROR_MESSAGE}", file=sys.stderr)
+        return 2
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.benchmark_f0_backends:
+        run_f0_backend_benchmark(collect_audio_files(args.inputs, args.recursive), args.f0_min, args.f0_max)
+        return 0
+    if not args.inputs:
+        parser.error("需要给出音频文件或文件夹")
+    if not args.output_dir and not args.benchmark_f0_range:
+        parser.error("需要用 -o/--output-dir 指定结果输出目录")
+
+    formats = tuple(f.strip().lower() for f in args.formats.split(',') if f.strip())
+    unknown = [f for f in formats if f not in OUTPUT_FORMATS]
+    if unknown:
+        print(f"未知的输出格式: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    # 与批量分析面板传给 BatchAnalysisWorker 的参数字典相同
+    params = {
+        'analyze_f0_intensity': not args.no_f0, 'analyze_formants': not args.no_formants,
+        'pre_emphasis': args.pre_emphasis,
+        'f0_min': args.f0_min, 'f0_max': args.f0_max,
+        'render_density': args.render_density, 'formant_density': args.formant_density,
+        'is_wide_band': args.wide_band, 'analysis_mode': args.mode,
+        'coarse_f0_method': args.coarse_f0,
+    }
+
+    output_names = collect_audio_inputs(args.inputs, args.recursive)
+    filepaths = list(output_names)
+    if not filepaths:
+        print("没有找到可分析的音频文件。", file=sys.stderr)
+        return 1
+
+    if args.benchmark_f0_range:
+        run_coarse_f0_benchmark(filepaths)
+        return 0
+
+    # 不同的输入会写到同一组输出文件时（例如两个文件夹中都有 001.wav，或同名的 .wav 与 .mp3），拒绝运行
+    collisions = find_output_collisions(output_names)
+    if collisions:
+        print("以下文件的输出文件名相同，结果会互相覆盖，请分别处理或重命名：", file=sys.stderr)
+        for name, files in collisions.items():
+            print(f"  {name}: {', '.join(files)}", file=sys.stderr)
+        return 2
+
+    print(f"共 {len(filepaths)} 个文件，使用 {min(resolve_worker_count(args.workers), len(filepaths))} 个进程，输出到 {args.output_dir}")
+    t0 = time.perf_counter()
+    all_stats = run_batch(filepaths, params, args.output_dir, formats, args.workers, output_names=output_names)
+    print(format_summary(all_stats, time.perf_counter() - t0))
+    return 0 if all(s['ok'] for s in all_stats) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
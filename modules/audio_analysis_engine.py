@@ -0,0 +1,1127 @@
+# --- 模块元数据 ---
+MODULE_NAME = "音频分析计算引擎"
+MODULE_DESCRIPTION = "为音频分析模块提供与界面无关的计算函数（如分块F0提取、共振峰分析），可在子进程中安全调用，不直接作为独立标签页。"
+# ---
+
+import os
+import math
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# 本模块刻意不导入任何 PyQt 组件：
+# 进程池的子进程会通过 pickle 按“模块名.函数名”找到这里的顶层函数，
+# 保持它轻量且与界面无关，子进程才能快速、安全地启动。
+try:
+    import numpy as np
+    import librosa
+    import pandas as pd
+    DEPENDENCIES_MISSING = False
+except ImportError as e:
+    print(f"CRITICAL: audio_analysis_engine.py - Missing dependencies: {e}")
+    DEPENDENCIES_MISSING = True
+    MISSING_ERROR_MESSAGE = str(e)
+
+from audio_analysis_source import load_audio
+
+
+# --- F0 后处理 ---
+
+def interpolate_voiced_segments(f0_raw, voiced_flags):
+    """
+    对 pYIN 输出的 F0 做浊音段内插值：只在长度大于 2 帧的连续浊音段内，
+    线性填补最多 2 帧的空洞，清音段保持为 NaN。
+    """
+    if len(f0_raw) == 0:
+        return f0_raw
+
+    f0_postprocessed = np.full_like(f0_raw, np.nan)
+    voiced_ints = voiced_flags.astype(int)
+    if len(voiced_ints) > 0:
+        starts, ends = np.where(np.diff(voiced_ints) == 1)[0] + 1, np.where(np.diff(voiced_ints) == -1)[0] + 1
+        if voiced_ints[0] == 1: starts = np.insert(starts, 0, 0)
+        if voiced_ints[-1] == 1: ends = np.append(ends, len(voiced_ints))
+        for start_idx, end_idx in zip(starts, ends):
+            if end_idx - start_idx > 2:
+                segment = f0_raw[start_idx:end_idx]; segment_series = pd.Series(segment)
+                interpolated_segment = segment_series.interpolate(method='linear', limit_direction='both', limit=2).to_numpy()
+                f0_postprocessed[start_idx:end_idx] = interpolated_segment
+    return f0_postprocessed
+
+
+# --- 逐块追加的数据缓冲区 ---
+
+class GrowableArray:
+    """
+    按容量倍增方式扩展的一维数组，用于逐块追加分析结果（每次追加的均摊开销与已有数据量无关）。
+    同时维护已追加数据中有限值的个数与最小/最大值，调用方无需每次追加后重新扫描全部数据。
+    """
+    MIN_CAPACITY = 1024
+
+    def __init__(self, initial=None):
+        initial = np.zeros(0) if initial is None else np.asarray(initial)
+        self._buffer = np.empty(len(initial), dtype=initial.dtype)
+        self._size = 0
+        self._view = None
+        self.finite_count, self.finite_min, self.finite_max = 0, np.inf, -np.inf
+        self.append(initial)
+
+    def __len__(self):
+        return self._size
+
+    def append(self, chunk):
+        chunk = np.asarray(chunk)
+        new_size = self._size + len(chunk)
+        if new_size > len(self._buffer):
+            capacity = max(len(self._buffer), self.MIN_CAPACITY)
+            while capacity < new_size:
+                capacity *= 2
+            dtype = chunk.dtype if self._size == 0 else np.result_type(self._buffer.dtype, chunk.dtype)
+            grown = np.empty(capacity, dtype=dtype)
+            grown[:self._size] = self._buffer[:self._size]
+            self._buffer = grown
+        self._buffer[self._size:new_size] = chunk
+        self._size = new_size
+        self._view = None
+
+        finite = chunk[np.isfinite(chunk)] if chunk.dtype.kind == 'f' else chunk
+        if len(finite):
+            self.finite_count += len(finite)
+            self.finite_min = min(self.finite_min, finite.min())
+            self.finite_max = max(self.finite_max, finite.max())
+
+    def view(self):
+        """返回已追加全部数据的视图。两次追加之间多次调用返回同一个对象，可用 `is` 判断数据是否变化。"""
+        if self._view is None:
+            self._view = self._buffer[:self._size]
+        return self._view
+
+
+# --- F0 后端 ---
+# 每个后端都是 backend(y, sr, fmin, fmax, frame_length, hop_length) -> (f0, voiced_flags)，
+# 帧的划分与 librosa.pyin 相同（center=True，两端补零，共 1 + len(y) // hop_length 帧），清音帧的 F0 为 NaN。
+# 后端按名称登记在 F0_BACKENDS 中，分块参数里只传名称，因此同样可以提交给进程池。
+
+PYIN_MAX_TRANSITION_RATE = 35.92 # librosa.pyin 的默认值（八度/秒）
+
+
+def pitch_pyin(y, sr, fmin, fmax, frame_length, hop_length):
+    """
+    librosa.pyin：概率 YIN + HMM 平滑，最稳健，也最慢。
+    帧移较大时，HMM 一帧内允许的最大跳变可能超过 [fmin, fmax] 的音高格数（librosa 会报错），
+    此时把 fmax 放宽到刚好容纳这一跳变。
+    """
+    max_semitones_per_frame = round(PYIN_MAX_TRANSITION_RATE * 12 * hop_length / sr)
+    fmax = max(fmax, fmin * 2 ** ((max_semitones_per_frame + 0.1) / 12))
+    f0, voiced_flags, _ = librosa.pyin(
+        y, fmin=fmin, fmax=fmax, sr=sr,
+        frame_length=frame_length, hop_length=hop_length
+    )
+    return f0, voiced_flags
+
+
+YIN_FRAMES_PER_BLOCK = 2048 # 每批同时计算的帧数，只为限制长音频时帧矩阵的内存占用
+
+
+def pitch_yin_fast(y, sr, fmin, fmax, frame_length, hop_length, threshold=0.15, voicing_threshold=0.35, silence_db=-45.0):
+    """
+    向量化的 YIN：所有帧的差分函数通过一次批量 FFT 求得（不逐帧循环），
+    取累积均值归一化差分 (CMND) 第一个低于 threshold 的谷底（没有则取最低点）作为周期，并做抛物线插值。
+    CMND 谷底高于 voicing_threshold 或帧能量低于最响帧 silence_db 的帧判为清音。
+    与 pYIN 相比没有 HMM 平滑，偶尔会有倍频/半频跳点，适合快速浏览。
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n_frames = 1 + len(y) // hop_length
+    f0 = np.full(n_frames, np.nan)
+    voiced_flags = np.zeros(n_frames, dtype=bool)
+    if len(y) == 0:
+        return f0, voiced_flags
+
+    min_lag = max(1, int(np.floor(sr / fmax)))
+    max_lag = min(int(np.ceil(sr / fmin)), frame_length // 2)
+    if max_lag <= min_lag + 1:
+        return f0, voiced_flags
+    window = frame_length - max_lag # 差分函数的积分窗长
+    n_fft = 1 << (frame_length + window - 1).bit_length()
+
+    padded = np.pad(y, frame_length // 2)
+    frames_all = librosa.util.frame(padded, frame_length=frame_length, hop_length=hop_length, axis=0)[:n_frames]
+    energy_all = np.einsum('ij,ij->i', frames_all[:, :window], frames_all[:, :window])
+    loud_all = energy_all > max(energy_all.max(), 1e-20) * 10 ** (silence_db / 10)
+
+    lags = np.arange(max_lag + 1)
+    for block_start in range(0, n_frames, YIN_FRAMES_PER_BLOCK):
+        block = slice(block_start, min(block_start + YIN_FRAMES_PER_BLOCK, n_frames))
+        frames = frames_all[block]
+
+        # d(τ) = Σ_j (x_j - x_{j+τ})²  =  E(0) + E(τ) - 2 r(τ)，j ∈ [0, window)
+        spectrum = np.fft.rfft(frames, n=n_fft, axis=1)
+        head_spectrum = np.fft.rfft(frames[:, :window], n=n_fft, axis=1)
+        r = np.fft.irfft(spectrum * np.conj(head_spectrum), n=n_fft, axis=1)[:, :max_lag + 1]
+        power = np.concatenate([np.zeros((len(frames), 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+        energy = power[:, lags + window] - power[:, lags]
+        diff = np.maximum(energy[:, :1] + energy - 2 * r, 0.0)
+
+        # 累积均值归一化差分：d'(τ) = d(τ) · τ / Σ_{k≤τ} d(k)
+        cumulative = np.cumsum(diff[:, 1:], axis=1)
+        cmnd = np.ones_like(diff)
+        cmnd[:, 1:] = diff[:, 1:] * lags[1:] / np.maximum(cumulative, 1e-20)
+
+        search = cmnd[:, min_lag:max_lag]
+        is_trough = np.zeros_like(search, dtype=bool)
+        is_trough[:, 1:-1] = (search[:, 1:-1] <= search[:, :-2]) & (search[:, 1:-1] <= search[:, 2:])
+        below = is_trough & (search < threshold)
+        has_below = below.any(axis=1)
+        local_lag = np.where(has_below, below.argmax(axis=1), search.argmin(axis=1))
+        lag = local_lag + min_lag
+
+        rows = np.arange(len(frames))
+        trough = cmnd[rows, lag]
+        left = cmnd[rows, np.maximum(lag - 1, 0)]
+        right = cmnd[rows, np.minimum(lag + 1, max_lag)]
+        denominator = left - 2 * trough + right
+        offset = np.where(np.abs(denominator) > 1e-12, 0.5 * (left - right) / np.where(denominator == 0, 1, denominator), 0.0)
+        refined_lag = lag + np.clip(offset, -0.5, 0.5)
+
+        voiced = loud_all[block] & (trough < voicing_threshold)
+        f0[block] = np.where(voiced, sr / refined_lag, np.nan)
+        voiced_flags[block] = voiced
+    return f0, voiced_flags
+
+
+F0_BACKENDS = {'pyin': pitch_pyin, 'yin': pitch_yin_fast}
+
+
+def benchmark_f0_backends(y, sr, f0_min, f0_max, hop_length=None, reference_f0=None, backends=tuple(F0_BACKENDS)):
+    """
+    对同一段音频运行各 F0 后端，返回 {后端: {'seconds', 'voicing_agreement', 'gross_error', 'median_cents'}}。
+    reference_f0 为逐帧的参考 F0（清音帧为 NaN，如合成信号的真值）；未给出时以 pYIN 的结果为参考。
+    - voicing_agreement：清浊判断与参考一致的帧比例；
+    - gross_error：双方都判为浊音的帧中，与参考相差超过 20% 的比例（倍频/半频等粗差）；
+    - median_cents：双方都判为浊音的帧中，与参考之差的中位数（音分）。
+    """
+    if hop_length is None:
+        hop_length = analysis_hop_length(sr, 4)
+    frame_length = pyin_frame_length(sr)
+    outputs = {}
+    for backend in backends:
+        t0 = time.perf_counter()
+        f0, _ = F0_BACKENDS[backend](y, sr, f0_min, f0_max, frame_length, hop_length)
+        outputs[backend] = (f0, time.perf_counter() - t0)
+    if reference_f0 is None:
+        reference_f0 = outputs['pyin'][0] if 'pyin' in outputs else pitch_pyin(y, sr, f0_min, f0_max, frame_length, hop_length)[0]
+    reference_f0 = np.asarray(reference_f0, dtype=np.float64)
+
+    results = {}
+    for backend, (f0, seconds) in outputs.items():
+        n = min(len(f0), len(reference_f0))
+        f0, reference = f0[:n], reference_f0[:n]
+        voiced, reference_voiced = np.isfinite(f0), np.isfinite(reference)
+        both = voiced & reference_voiced
+        ratio = f0[both] / reference[both]
+        results[backend] = {
+            'seconds': seconds,
+            'voicing_agreement': float(np.mean(voiced == reference_voiced)) if n else float('nan'),
+            'gross_error': float(np.mean(np.abs(ratio - 1) > 0.2)) if len(ratio) else float('nan'),
+            'median_cents': float(np.median(np.abs(1200 * np.log2(ratio)))) if len(ratio) else float('nan'),
+        }
+    return results
+
+
+# 分析模式 -> F0 后端；兼容模式整段运行 pyin，不经过分块流程
+ANALYSIS_MODE_BACKENDS = {'normal': 'pyin', 'fast': 'yin'}
+FAST_MODE_CHUNK_MS = 5000 # 快速模式每块的计算量很小，用更大的块减少逐块开销
+
+
+def mode_f0_settings(analysis_mode, chunk_size_ms=200, coarse_f0_method='pyin'):
+    """
+    返回分析模式实际使用的 (F0 后端, 分块时长 ms, 粗略 F0 估计方法)。
+    快速模式固定使用 YIN 后端、大块和自相关粗估，否则粗估本身会比整段 YIN 还慢。
+    """
+    if analysis_mode == 'fast':
+        return ANALYSIS_MODE_BACKENDS['fast'], max(chunk_size_ms, FAST_MODE_CHUNK_MS), 'autocorr'
+    return ANALYSIS_MODE_BACKENDS['normal'], chunk_size_ms, coarse_f0_method
+
+
+# --- 分块 F0 / 强度分析 ---
+
+def analyze_pyin_chunk(y_chunk, y_chunk_analyzed, sr, start_sample, f0_min, f0_max,
+                       frame_length, hop_length, num_frames_in_step, backend='pyin'):
+    """
+    分析单个音频块的 F0 与强度，返回可直接用于 chunk_finished 信号的结果字典。
+    该函数是模块顶层函数，既可在当前线程中直接调用，也可以提交给进程池。
+    F0 由 F0_BACKENDS 中名为 backend 的后端计算（默认 pYIN）。
+
+    Args:
+        y_chunk (np.ndarray): 原始音频块（用于计算强度）。
+        y_chunk_analyzed (np.ndarray): 可能经过预加重的音频块（用于 pYIN）。
+        sr (int): 采样率。
+        start_sample (int): 该块在整段音频中的起始采样点。
+        f0_min, f0_max (float): pYIN 的搜索范围。
+        frame_length, hop_length (int): pYIN/RMS 的帧长与帧移。
+        num_frames_in_step (int): 只保留块头部这么多帧，去掉与下一块重叠的部分。
+        backend (str): F0 后端名称，见 F0_BACKENDS。
+    """
+    f0_raw, voiced_flags = F0_BACKENDS[backend](y_chunk_analyzed, sr, f0_min, f0_max, frame_length, hop_length)
+    f0_postprocessed = interpolate_voiced_segments(f0_raw, voiced_flags)
+
+    intensity = librosa.feature.rms(y=y_chunk, frame_length=frame_length, hop_length=hop_length)[0]
+
+    times_in_chunk = librosa.times_like(f0_raw, sr=sr, hop_length=hop_length)
+    global_times = times_in_chunk + (start_sample / sr)
+
+    return {
+        'f0_raw': (global_times[:num_frames_in_step], f0_raw[:num_frames_in_step]),
+        'f0_derived': (global_times[:num_frames_in_step], f0_postprocessed[:num_frames_in_step]),
+        'intensity': intensity[:num_frames_in_step],
+    }
+
+
+MIN_SAMPLES_FOR_PYIN = 4096 # pyin 算法需要至少约 4096 个采样点才能稳定工作
+PYIN_DEFAULT_HOP_LENGTH = 512 # librosa.pyin 默认帧长 2048 对应的帧移，兼容模式整段分析使用
+COMPAT_PYIN_FRAME_LENGTH = 2048 # librosa.pyin 的默认帧长
+
+
+def check_pyin_length(n_samples):
+    """对极短音频的保护性检查：采样点不足时抛出 ValueError。"""
+    if n_samples < MIN_SAMPLES_FOR_PYIN:
+        raise ValueError(f"音频过短 ({n_samples}采样点)，无法进行可靠的F0分析。至少需要{MIN_SAMPLES_FOR_PYIN}个采样点。")
+
+
+def analysis_hop_length(sr, density):
+    """
+    由窄带窗长（35 ms）和精细度（重叠率 1 - 1/2^density）决定的帧移。
+    语谱图、F0/强度分析和共振峰分析都使用这一公式，只是精细度来自不同的设置项。
+    """
+    base_n_fft_for_hop = 1 << (int(sr * 0.035) - 1).bit_length()
+    overlap_ratio = 1 - (1 / (2**density))
+    return int(base_n_fft_for_hop * (1 - overlap_ratio)) or 1
+
+
+COARSE_F0_SR = 8000
+COARSE_F0_FMIN, COARSE_F0_FMAX = 30, 1200
+COARSE_F0_FRAME_LENGTH, COARSE_F0_HOP_LENGTH = 1024, 512
+COARSE_F0_METHODS = ('pyin', 'autocorr') # 粗略 F0 估计方法：pYIN（精确）、自相关（快速）
+
+
+def _coarse_f0_pyin(y_coarse):
+    """8 kHz 下用大帧移运行 pYIN，返回各帧 F0（清音帧为 NaN）。"""
+    f0_coarse, _, _ = librosa.pyin(
+        y_coarse, fmin=COARSE_F0_FMIN, fmax=COARSE_F0_FMAX, sr=COARSE_F0_SR,
+        frame_length=COARSE_F0_FRAME_LENGTH, hop_length=COARSE_F0_HOP_LENGTH
+    )
+    return f0_coarse
+
+
+def _coarse_f0_autocorr(y_coarse, voicing_threshold=0.5, silence_db=-35.0):
+    """
+    8 kHz 下的快速自相关 F0 估计：只保留能量足够（不低于最响帧 silence_db）且
+    归一化自相关峰值超过 voicing_threshold 的帧。所有帧的自相关通过一次批量 FFT 计算。
+    峰值只在自相关第一次变为负值之后搜索，以避开零延迟附近的主瓣（防止高八度错误）。
+    """
+    if len(y_coarse) < COARSE_F0_FRAME_LENGTH:
+        return np.zeros(0)
+    frames = librosa.util.frame(y_coarse, frame_length=COARSE_F0_FRAME_LENGTH, hop_length=COARSE_F0_HOP_LENGTH, axis=0)
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    energy = np.einsum('ij,ij->i', frames, frames)
+    loud = energy > energy.max() * 10 ** (silence_db / 10) if energy.size else energy > 0
+    frames = frames[loud]
+    if len(frames) == 0:
+        return np.zeros(0)
+
+    min_lag = int(COARSE_F0_SR / COARSE_F0_FMAX)
+    max_lag = int(np.ceil(COARSE_F0_SR / COARSE_F0_FMIN))
+    n_fft = 1 << (2 * COARSE_F0_FRAME_LENGTH - 1).bit_length()
+    spectrum = np.fft.rfft(frames, n=n_fft, axis=1)
+    acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_fft, axis=1)[:, :max_lag + 2]
+    acf /= np.maximum(acf[:, :1], 1e-12)
+    acf *= COARSE_F0_FRAME_LENGTH / (COARSE_F0_FRAME_LENGTH - np.arange(acf.shape[1])) # 无偏估计，补偿长延迟的重叠减少
+
+    lags = np.arange(acf.shape[1])
+    negative = acf < 0
+    first_negative = np.where(negative.any(axis=1), negative.argmax(axis=1), acf.shape[1])
+    searchable = (lags >= max(min_lag, 1)) & (lags <= max_lag)
+    candidates = np.where(searchable[None, :] & (lags[None, :] > first_negative[:, None]), acf, -np.inf)
+    # 取不低于最高峰 85% 的第一个局部峰值：周期的整数倍处也有几乎同样高的峰，取最短的延迟以避免低八度错误
+    inner = candidates[:, 1:-1]
+    best = inner.max(axis=1, keepdims=True)
+    local_peak = (inner >= candidates[:, :-2]) & (inner >= candidates[:, 2:]) & np.isfinite(inner)
+    peak = (local_peak & (inner >= best * 0.85)).argmax(axis=1) + 1
+    rows = np.arange(len(acf))
+    peak_value = acf[rows, peak]
+    voiced = np.isfinite(candidates[rows, peak]) & (peak_value > voicing_threshold)
+
+    # 抛物线插值得到亚采样点精度的延迟
+    left, right = acf[rows, peak - 1], acf[rows, peak + 1]
+    denominator = left - 2 * peak_value + right
+    offset = np.where(np.abs(denominator) > 1e-12, 0.5 * (left - right) / np.where(denominator == 0, 1, denominator), 0.0)
+    lag = peak + np.clip(offset, -0.5, 0.5)
+    return COARSE_F0_SR / lag[voiced]
+
+
+def estimate_coarse_f0_range(y, sr, method='pyin'):
+    """
+    粗略估计整段音频的 F0 分布，返回有效 F0 的 (5% 分位数, 95% 分位数)。
+    结果只取决于音频内容和估计方法（与用户的 F0 范围、预加重、精细度无关），
+    因此同一文件可以缓存并反复使用。音频过短、有效帧太少或估计失败时返回 (nan, nan)。
+    """
+    try:
+        y_coarse = librosa.resample(np.asarray(y), orig_sr=sr, target_sr=COARSE_F0_SR)
+        if len(y_coarse) <= 2048: # 仅当重采样后仍然足够长时才进行预分析
+            return (np.nan, np.nan)
+        f0_coarse = _coarse_f0_autocorr(y_coarse) if method == 'autocorr' else _coarse_f0_pyin(y_coarse)
+        valid_f0_coarse = f0_coarse[np.isfinite(f0_coarse)]
+        if len(valid_f0_coarse) > 10:
+            p5, p95 = np.percentile(valid_f0_coarse, [5, 95])
+            return (float(p5), float(p95))
+    except Exception:
+        pass # 预分析失败是可接受的，将使用用户设定的范围
+    return (np.nan, np.nan)
+
+
+def narrow_f0_search_range(f0_min, f0_max, coarse_range):
+    """
+    用粗略 F0 分布 (p5, p95)（两侧各留 15% 余量）与用户设定的范围取交集，以缩小正式分析的搜索范围。
+    没有有效的粗略估计，或交集为空（退化为一点）时返回用户范围。
+    """
+    p5, p95 = coarse_range
+    if not (np.isfinite(p5) and np.isfinite(p95)):
+        return f0_min, f0_max
+    padding = (p95 - p5) * 0.15
+    final_f0_min, final_f0_max = max(f0_min, p5 - padding), min(f0_max, p95 + padding)
+    if final_f0_min < final_f0_max:
+        return final_f0_min, final_f0_max
+    return f0_min, f0_max
+
+
+def estimate_f0_search_range(y, sr, f0_min, f0_max, method='pyin'):
+    """粗略估计 F0 分布并与用户范围取交集，见 estimate_coarse_f0_range 与 narrow_f0_search_range。"""
+    return narrow_f0_search_range(f0_min, f0_max, estimate_coarse_f0_range(y, sr, method))
+
+
+def benchmark_coarse_f0_estimators(y, sr, methods=COARSE_F0_METHODS):
+    """
+    对同一段音频运行各粗略 F0 估计方法，返回 {方法: {'range': (p5, p95), 'seconds': 用时}}，
+    用于比较快速估计方法与 pYIN 给出的范围是否一致。
+    """
+    results = {}
+    for method in methods:
+        t0 = time.perf_counter()
+        coarse_range = estimate_coarse_f0_range(y, sr, method)
+        results[method] = {'range': coarse_range, 'seconds': time.perf_counter() - t0}
+    return results
+
+
+def pyin_frame_length(sr):
+    """F0 分析的帧长：不小于 40 ms 的 2 的幂。"""
+    return 1 << (int(sr * 0.040) - 1).bit_length()
+
+
+def plan_pyin_chunks(n_samples, sr, hop_length, chunk_size_ms=200, chunk_overlap_ms=10):
+    """
+    规划普通模式的分块分析，返回 (各块起点, 块长采样点数, pYIN 帧长, 每块保留的帧数)。
+    相邻块重叠 chunk_overlap_ms；每块只保留起点到下一块起点之间的帧（向上取整），
+    拼接后的帧序列既不重复也不遗漏。
+    """
+    chunk_size_samples = int((chunk_size_ms / 1000) * sr)
+    overlap_samples = int((chunk_overlap_ms / 1000) * sr)
+    step_size_samples = chunk_size_samples - overlap_samples
+    if step_size_samples <= 0:
+        step_size_samples = hop_length
+    frame_length = pyin_frame_length(sr)
+    num_frames_in_step = math.ceil(step_size_samples / hop_length)
+    return range(0, n_samples, step_size_samples), chunk_size_samples, frame_length, num_frames_in_step
+
+
+def pyin_chunk_args(y, sr, start, chunk_size_samples, f0_min, f0_max, frame_length, hop_length,
+                    num_frames_in_step, pre_emphasis, backend='pyin'):
+    """
+    为 analyze_pyin_chunk 准备从 start 开始的一块的参数（可直接提交给进程池）。
+    y 可以是 ndarray 或 AudioSource；预加重按块计算，结果与整段预加重后再切片一致。
+    """
+    return (y[start:start + chunk_size_samples],
+            read_samples(y, start, start + chunk_size_samples, pre_emphasis),
+            sr, start, f0_min, f0_max, frame_length, hop_length, num_frames_in_step, backend)
+
+
+def merge_chunk_results(chunk_results):
+    """把按时间顺序排列的 analyze_pyin_chunk 结果拼接为一份完整的 F0/强度结果。"""
+    if not chunk_results:
+        empty = np.zeros(0)
+        return {'f0_raw': (empty, empty), 'f0_derived': (empty, empty), 'intensity': empty}
+    times = np.concatenate([chunk['f0_raw'][0] for chunk in chunk_results])
+    return {
+        'f0_raw': (times, np.concatenate([chunk['f0_raw'][1] for chunk in chunk_results])),
+        'f0_derived': (times, np.concatenate([chunk['f0_derived'][1] for chunk in chunk_results])),
+        'intensity': np.concatenate([chunk['intensity'] for chunk in chunk_results]),
+    }
+
+
+def analyze_pyin_full(y, sr, f0_min, f0_max, pre_emphasis):
+    """
+    兼容模式：对整段音频一次性运行 pYIN（librosa 默认帧长/帧移）与 RMS 强度，
+    返回与 merge_chunk_results 相同格式的结果字典。
+    """
+    y = np.asarray(y)
+    y_analyzed = preemphasize(y) if pre_emphasis else y
+
+    f0_raw, voiced_flags = pitch_pyin(y_analyzed, sr, f0_min, f0_max, COMPAT_PYIN_FRAME_LENGTH, PYIN_DEFAULT_HOP_LENGTH)
+    intensity = librosa.feature.rms(y=y)[0]
+
+    f0_postprocessed = interpolate_voiced_segments(f0_raw, voiced_flags)
+
+    # 准备时间轴并对齐数据
+    times = librosa.times_like(f0_raw, sr=sr)
+    if len(intensity) > len(times):
+        intensity = intensity[:len(times)]
+    elif len(intensity) < len(times):
+        intensity = np.pad(intensity, (0, len(times) - len(intensity)), 'constant', constant_values=0)
+
+    return {
+        'f0_raw': (times, f0_raw),
+        'f0_derived': (times, f0_postprocessed),
+        'intensity': intensity,
+    }
+
+
+SELECTION_GUARD_MS = 100 # 重新分析选区时两侧额外分析的长度，pYIN 的平滑与浊音段插值在边缘处不稳定
+
+
+def reanalyze_acoustics_segment(y, sr, frame_times, f0_min, f0_max, hop_length, frame_length,
+                                pre_emphasis=False, backend='pyin', guard_ms=SELECTION_GUARD_MS):
+    """
+    只重新计算已有 F0/强度结果中的一段帧（例如用户选区内、用新的 F0 范围修正倍频错误）。
+    在 frame_times 覆盖的范围两侧各加 guard_ms 与半帧的保护区后连续分析，
+    再取与 frame_times 最近的帧，返回与 frame_times 等长、可以直接替换原数组对应位置的
+    {'f0_raw': 数组, 'f0_derived': 数组, 'intensity': 数组}；帧时间保持不变，其他部分无需重绘。
+    F0 范围直接使用给定值，不再与整段音频的粗略估计取交集。
+    """
+    frame_times = np.asarray(frame_times, dtype=float)
+    frame_positions = frame_times * sr
+    guard = int(guard_ms / 1000 * sr) + frame_length // 2
+    guard = max(guard, (MIN_SAMPLES_FOR_PYIN - int(frame_positions[-1] - frame_positions[0])) // 2)
+    # 分析起点与第一帧相差帧移的整数倍，选区开头的帧与原帧严格对齐
+    first = int(round(frame_positions[0]))
+    segment_start = first - min(-(-guard // hop_length), first // hop_length) * hop_length
+    segment_end = min(len(y), int(round(frame_positions[-1])) + guard + 1)
+
+    y_segment = read_samples(y, segment_start, segment_end)
+    y_analyzed = read_samples(y, segment_start, segment_end, pre_emphasis)
+    f0_raw, voiced_flags = F0_BACKENDS[backend](y_analyzed, sr, f0_min, f0_max, frame_length, hop_length)
+    f0_postprocessed = interpolate_voiced_segments(f0_raw, voiced_flags)
+    intensity = librosa.feature.rms(y=y_segment, frame_length=frame_length, hop_length=hop_length)[0]
+
+    n_frames = min(len(f0_raw), len(intensity))
+    indices = np.clip(np.rint((frame_positions - segment_start) / hop_length).astype(int), 0, n_frames - 1)
+    return {
+        'f0_raw': f0_raw[indices],
+        'f0_derived': f0_postprocessed[indices],
+        'intensity': intensity[indices],
+    }
+
+
+# --- 进程池管理 ---
+
+_process_pool = None
+_process_pool_size = 0
+
+
+def resolve_worker_count(requested):
+    """将设置中的进程数（0 表示自动）解析为实际进程数。"""
+    cpu_count = os.cpu_count() or 1
+    if not requested or requested <= 0:
+        return cpu_count
+    return max(1, min(int(requested), cpu_count))
+
+
+def get_process_pool(max_workers):
+    """
+    获取（必要时创建）共享的分析进程池。
+    进程池在多次分析之间复用，避免每次都付出子进程启动和导入 librosa 的开销；
+    请求的进程数变化或进程池已损坏时才会重建。
+    统一使用 spawn 方式启动子进程，避免在带有 Qt 线程的进程中 fork 导致死锁。
+    """
+    global _process_pool, _process_pool_size
+    if _process_pool is not None and (_process_pool_size != max_workers or getattr(_process_pool, '_broken', False)):
+        shutdown_process_pool()
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        _process_pool_size = max_workers
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """关闭共享进程池，并取消所有尚未开始的任务。"""
+    global _process_pool, _process_pool_size
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+        _process_pool_size = 0
+
+
+# --- 共振峰（LPC）分析 ---
+
+# 每批同时求解的帧数。一批内的所有帧一次性完成 LPC 与求根，
+# 分批只是为了限制长音频时帧矩阵的内存占用。
+FORMANT_FRAMES_PER_BLOCK = 2048
+
+
+def _formant_bands(sr):
+    """预定义的 F1-F4 搜索频带，上限受 Nyquist 频率限制。"""
+    nyq = sr / 2.0
+    return [
+        (250, min(800, nyq)),
+        (800, min(2200, nyq)),
+        (2200, min(3000, nyq)),
+        (3000, min(4000, nyq)),
+    ]
+
+
+def formant_frame_length(sr):
+    """共振峰分析的帧长（25 ms）。"""
+    return int(sr * 0.025)
+
+
+def analyze_formants_lpc(y_data, sr, hop_length, start_offset=0, pre_emphasis=False, worker_count=1,
+                         energy_reference=None):
+    """
+    向量化的共振峰分析（窗口化、LPC 阶数保护、按带宽筛选候选）。
+    整段信号一次性分帧，每批帧共同求解 LPC 系数（Burg 法），
+    再通过批量伴随矩阵特征值得到全部极点，以数组运算求出频率与带宽，
+    结果与逐帧循环的实现一致。
+
+    Args:
+        y_data (np.ndarray): 原始音频（能量判定使用未预加重的信号）。
+        sr (int): 采样率。
+        hop_length (int): 帧移。
+        start_offset (int): 结果中采样点位置的偏移量（用于只分析视图片段时）。
+        pre_emphasis (bool): 是否在 LPC 之前做预加重。
+        worker_count (int): 大于 1 时，各批帧会分发到共享进程池并行求解。
+        energy_reference (float, optional): 能量判定的参考 RMS（低于它 5% 的帧被跳过）；
+            默认取 y_data 自身的最大 RMS。只分析片段时传入整段音频的值，结果才与片段的划分无关。
+
+    Returns:
+        list of (sample_center, [F1, F2, ...])
+    """
+    y_proc = preemphasize(y_data) if pre_emphasis else y_data
+
+    # 帧与阶数设置
+    frame_length = formant_frame_length(sr)  # 25 ms
+    if frame_length < 16:
+        frame_length = max(16, len(y_proc))
+    order = int(2 + sr // 1000)
+    order = max(6, min(order, max(6, frame_length - 2)))
+
+    # 与逐帧实现相同的帧起点：range(0, len - frame_length, hop)
+    frame_starts = np.arange(0, len(y_proc) - frame_length, hop_length)
+    if len(frame_starts) == 0 or frame_length <= order:
+        return []
+
+    # 能量判断：第 k 帧使用 rms[k]（超出 rms 长度的帧不做能量过滤）
+    rms = librosa.feature.rms(y=y_data, frame_length=frame_length, hop_length=hop_length)[0]
+    if energy_reference is None:
+        energy_reference = np.max(rms)
+    energy_threshold = energy_reference * 0.05 if energy_reference > 0 else 0
+    keep = np.ones(len(frame_starts), dtype=bool)
+    n_checked = min(len(rms), len(frame_starts))
+    keep[:n_checked] = rms[:n_checked] >= energy_threshold
+    kept_starts = frame_starts[keep]
+
+    # 每批只传递该批帧覆盖的那一段信号，便于提交到子进程
+    blocks = []
+    for block_start in range(0, len(kept_starts), FORMANT_FRAMES_PER_BLOCK):
+        starts = kept_starts[block_start:block_start + FORMANT_FRAMES_PER_BLOCK]
+        segment_start = int(starts[0])
+        blocks.append((y_proc[segment_start:int(starts[-1]) + frame_length], starts - segment_start,
+                       segment_start + start_offset, frame_length, order, sr))
+
+    if worker_count > 1 and len(blocks) > 1:
+        pool = get_process_pool(worker_count)
+        block_results = pool.map(solve_formant_block, *zip(*blocks))
+    else:
+        block_results = (solve_formant_block(*block) for block in blocks)
+
+    formant_points = []
+    for points in block_results:
+        formant_points.extend(points)
+    return formant_points
+
+
+def formant_energy_reference(y, sr, hop_length, frames_per_block=8192):
+    """
+    整段音频在共振峰分析帧上的最大 RMS（与 analyze_formants_lpc 对整段信号的能量参考相同），
+    分块计算，不需要一次性读出整段信号。
+    """
+    frame_length = formant_frame_length(sr)
+    half = frame_length // 2
+    n_frames = 1 + len(y) // hop_length
+    peak = 0.0
+    # librosa.feature.rms 的帧以 k * hop_length 为中心，两端补零
+    for first in range(0, n_frames, frames_per_block):
+        last = min(first + frames_per_block, n_frames)
+        lo, hi = first * hop_length - half, (last - 1) * hop_length - half + frame_length
+        segment = np.zeros(hi - lo, dtype=np.float32)
+        src_lo, src_hi = max(lo, 0), min(hi, len(y))
+        if src_hi > src_lo:
+            segment[src_lo - lo:src_hi - lo] = y[src_lo:src_hi]
+        frames = np.lib.stride_tricks.sliding_window_view(segment, frame_length)[::hop_length]
+        peak = max(peak, float(np.sqrt(np.max(np.einsum('ij,ij->i', frames, frames) / frame_length))))
+    return peak
+
+
+def analyze_formants_range(y, sr, hop_length, start, end, pre_emphasis=False, energy_reference=None, worker_count=1):
+    """
+    分析起点落在 [start, end) 内的共振峰帧。帧起点取全局网格（hop_length 的整数倍），
+    每侧额外读取一帧以上的上下文，使预加重和能量判定与整段分析时相同；
+    只要 energy_reference 相同（见 formant_energy_reference），结果与区间怎样划分无关，可以任意拼接。
+    """
+    frame_length = formant_frame_length(sr)
+    context = -(-(frame_length + hop_length) // hop_length) * hop_length
+    segment_start = max(0, start - start % hop_length - context)
+    segment_end = min(len(y), end + context)
+    points = analyze_formants_lpc(y[segment_start:segment_end], sr, hop_length, segment_start, pre_emphasis,
+                                  worker_count=worker_count, energy_reference=energy_reference)
+    half = frame_length // 2
+    return [point for point in points if start <= point[0] - half < end]
+
+
+class FormantIntervalCache:
+    """
+    记录一组参数（帧移、预加重）下已分析过的采样点区间和对应的共振峰点，
+    用于平移/缩放时只分析尚未覆盖的部分。区间按帧移对齐，points 始终按采样点位置排序。
+    """
+
+    def __init__(self, sr, hop_length):
+        self.hop_length = hop_length
+        self._half_frame = formant_frame_length(sr) // 2 # 点的位置是帧中心，区间按帧起点划分
+        self.intervals = [] # 已覆盖的区间 [(start, end)]，按起点排序，互不重叠也不相邻
+        self.points = []    # [(sample_center, [F1, F2, ...])]
+        self._positions = np.empty(0, dtype=np.int64) # points 中各点的帧起点，便于二分查找
+
+    def align(self, start, end):
+        """把区间向外扩展到帧移的整数倍。"""
+        hop = self.hop_length
+        return start - start % hop, -(-end // hop) * hop
+
+    def missing(self, start, end, piece_samples=None):
+        """
+        返回 [start, end) 中尚未分析的子区间（已对齐），
+        给出 piece_samples 时把较长的子区间再切成不超过该长度的小段，便于逐段显示和中途取消。
+        """
+        start, end = self.align(max(0, start), end)
+        gaps, cursor = [], start
+        for a, b in self.intervals:
+            if b <= cursor:
+                continue
+            if a >= end:
+                break
+            if a > cursor:
+                gaps.append((cursor, a))
+            cursor = max(cursor, b)
+        if cursor < end:
+            gaps.append((cursor, end))
+        if not piece_samples:
+            return gaps
+        piece = max(self.hop_length, piece_samples - piece_samples % self.hop_length)
+        return [(a, min(a + piece, b)) for a, b in gaps for a in range(a, b, piece)]
+
+    def covers(self, start, end):
+        return not self.missing(start, end)
+
+    def add(self, start, end, points):
+        """记录 analyze_formants_range(start, end) 的结果；与已覆盖区间重叠的部分被忽略。"""
+        for a, b in self.missing(start, end):
+            new = [p for p in points if a <= self._frame_start(p) < b]
+            if new:
+                index = int(np.searchsorted(self._positions, a))
+                self.points[index:index] = new
+                self._positions = np.insert(self._positions, index, [self._frame_start(p) for p in new])
+            self._add_interval(a, b)
+
+    def points_in(self, start, end):
+        """帧起点位于 [start, end) 内的点。"""
+        lo, hi = np.searchsorted(self._positions, [start, end])
+        return self.points[lo:hi]
+
+    def _frame_start(self, point):
+        return point[0] - self._half_frame
+
+    def _add_interval(self, a, b):
+        merged = []
+        for x, y in self.intervals:
+            if y < a or x > b:
+                merged.append((x, y))
+            else:
+                a, b = min(a, x), max(b, y)
+        merged.append((a, b))
+        self.intervals = sorted(merged)
+
+
+def solve_formant_block(y_segment, local_starts, segment_offset, frame_length, order, sr):
+    """
+    一次性求解一批帧的共振峰。
+
+    Args:
+        y_segment (np.ndarray): 覆盖这批帧的（可能已预加重的）信号片段。
+        local_starts (np.ndarray): 各帧在片段内的起点。
+        segment_offset (int): 片段起点对应的全局采样点（已含 start_offset）。
+    """
+    frames = np.lib.stride_tricks.sliding_window_view(y_segment, frame_length)[local_starts]
+
+    # 去均值 + 窗函数（非常关键）
+    frames = (frames - frames.mean(axis=1, keepdims=True)) * np.hamming(frame_length)
+
+    # 跳过低能量/无效帧
+    valid = np.isfinite(frames).all(axis=1)
+    valid[valid] = np.max(np.abs(frames[valid]), axis=1) >= 1e-6
+    if not valid.any():
+        return []
+    frames, local_starts = frames[valid], local_starts[valid]
+
+    try:
+        a = librosa.lpc(frames, order=order, axis=-1)
+    except Exception:
+        # 批量求解出现数值问题时退回逐帧求解，只跳过出问题的帧
+        a = np.full((len(frames), order + 1), np.nan)
+        for k in range(len(frames)):
+            try:
+                a[k] = librosa.lpc(frames[k], order=order)
+            except Exception:
+                pass
+    finite = np.isfinite(a).all(axis=1)
+    if not finite.any():
+        return []
+    a, local_starts = a[finite], local_starts[finite]
+
+    # 批量求根：首一多项式伴随矩阵的特征值（与 np.roots 的做法相同）
+    companion = np.zeros((len(a), order, order), dtype=np.float64)
+    companion[:, 0, :] = -a[:, 1:] / a[:, :1]
+    companion[:, np.arange(1, order), np.arange(order - 1)] = 1.0
+    roots = np.linalg.eigvals(companion)
+
+    # 只保留上半平面根并且在合理幅度范围内，再换算为频率与带宽
+    nyq = sr / 2.0
+    magnitudes = np.abs(roots)
+    freqs = np.angle(roots) * (sr / (2 * np.pi))
+    with np.errstate(divide='ignore'):
+        bandwidths = -(sr / np.pi) * np.log(magnitudes)
+    usable = ((roots.imag >= 0) & (magnitudes > 0.001) & (magnitudes < 0.9999)
+              & (freqs > 0) & (freqs < nyq) & (bandwidths > 0) & (bandwidths <= 1000))
+
+    # 对每个 formant band，选择带宽最小的候选（更尖锐更可靠）
+    band_found, band_freqs = [], []
+    for f_min, f_max in _formant_bands(sr):
+        in_band = usable & (freqs >= f_min) & (freqs <= f_max)
+        best = np.argmin(np.where(in_band, bandwidths, np.inf), axis=1)
+        band_found.append(in_band.any(axis=1))
+        band_freqs.append(np.take_along_axis(freqs, best[:, None], axis=1)[:, 0])
+    band_found = np.stack(band_found, axis=1)
+    band_freqs = np.stack(band_freqs, axis=1)
+
+    points = []
+    centers = segment_offset + local_starts + frame_length // 2
+    for center, found, values in zip(centers.tolist(), band_found, band_freqs):
+        if found.any():
+            points.append((center, values[found].tolist()))
+    return points
+
+
+# --- 语谱图（分块/多分辨率） ---
+
+SPECTROGRAM_TOP_DB = 80.0 # 与 librosa.amplitude_to_db 的默认动态范围一致
+
+
+def spectrogram_params(sr, render_density, is_wide_band):
+    """
+    根据采样率、渲染精细度和宽/窄带设置，返回语谱图的 (hop_length, n_fft)。
+    帧移由窄带窗长（35 ms）和重叠率决定，与 F0 分析使用的帧移保持一致。
+    """
+    render_hop_length = analysis_hop_length(sr, render_density)
+
+    spectrogram_window_s = 0.005 if is_wide_band else 0.035
+    n_fft = 1 << (int(sr * spectrogram_window_s) - 1).bit_length()
+    return render_hop_length, n_fft
+
+
+def quantize_spectrogram(S_db):
+    """
+    将 dB 语谱图按自身的最小/最大值归一化并量化为 uint8（0 对应最小值，255 对应最大值），
+    显示时只需通过 256 色调色板映射，内存占用仅为 float32 的四分之一。
+    已经量化过的 uint8 输入原样返回。
+    """
+    if S_db.dtype == np.uint8:
+        return S_db
+    S_min, S_max = float(S_db.min()), float(S_db.max())
+    S_norm = (S_db - S_min) * (1.0 / (S_max - S_min + 1e-6)) # 加1e-6防止除以零
+    return (np.clip(S_norm, 0.0, 1.0) * 255).astype(np.uint8)
+
+
+PRE_EMPHASIS_COEF = 0.97 # 与 librosa.effects.preemphasis 的默认系数一致
+PRE_EMPHASIS_BLOCK = 1 << 16 # 原地预加重时每块的采样点数，临时数组只有这么大
+SPECTROGRAM_BLOCK_FRAMES = 512 # 整段语谱图每次做 STFT 的帧数，复数 STFT 矩阵只在这么大的块内存在
+SPECTROGRAM_AMIN = 1e-5 # 与 librosa.amplitude_to_db 的默认 amin 一致
+
+
+def _preemphasize_in_place(x, previous, at_file_start, y_next=None):
+    """
+    原地计算 x[n] -= 0.97 * x[n-1]，x[-1] 取 previous（片段之前的真实采样点）。
+    从尾部按块向前处理：处理 [lo, hi) 时 x[lo - 1] 尚未被修改，因此只需要一块大小的 float32 临时数组。
+    at_file_start 为 True 时首个采样点按 librosa.effects.preemphasis 的默认滤波器初始状态
+    (2*y[0] - y[1]) 计算，y_next 为文件的第二个采样点。
+    """
+    if len(x) == 0:
+        return x
+    if at_file_start:
+        first = x[0] + (2 * x[0] - y_next)
+    else:
+        first = x[0] - PRE_EMPHASIS_COEF * previous
+    for hi in range(len(x), 1, -PRE_EMPHASIS_BLOCK):
+        lo = max(hi - PRE_EMPHASIS_BLOCK, 1)
+        x[lo:hi] -= PRE_EMPHASIS_COEF * x[lo - 1:hi - 1]
+    x[0] = first
+    return x
+
+
+def _centered_segment(y, start_sample, end_sample, pad, pre_emphasis):
+    """
+    取出 [start_sample - pad, end_sample + pad) 范围的 float32 信号，越界部分补零
+    （等价于 librosa.stft(center=True) 的常数填充）。
+    预加重在这份拷贝上原地进行，使用片段之前的真实采样点作为初始状态，保证相邻分块的结果可以无缝拼接。
+    """
+    lo, hi = start_sample - pad, end_sample + pad
+    src_lo, src_hi = max(lo, 0), min(hi, len(y))
+    segment = np.zeros(hi - lo, dtype=np.float32)
+    if src_hi > src_lo:
+        body = segment[src_lo - lo:src_hi - lo]
+        body[:] = y[src_lo:src_hi]
+        if pre_emphasis and src_lo > 0:
+            _preemphasize_in_place(body, y[src_lo - 1], False)
+        elif pre_emphasis:
+            # 文件开头与 librosa.effects.preemphasis 的默认滤波器初始状态 (2*y[0] - y[1]) 保持一致
+            _preemphasize_in_place(body, 0.0, True, body[1] if len(body) > 1 else y[min(1, len(y) - 1)])
+    return segment
+
+
+def read_samples(y, start_sample, end_sample, pre_emphasis=False):
+    """
+    取出 y[start_sample:end_sample]（float32），y 可以是 ndarray 或按需读取的 AudioSource。
+    开启预加重时，结果与先对整段信号做 librosa.effects.preemphasis 再切片一致，
+    因此分块分析时无需为整段音频生成一份预加重副本。
+    """
+    end_sample = min(end_sample, len(y))
+    if end_sample <= start_sample:
+        return np.zeros(0, dtype=np.float32)
+    return _centered_segment(y, start_sample, end_sample, 0, pre_emphasis)
+
+
+def preemphasize(y):
+    """
+    对整段信号做预加重，返回新的 float32 数组（与 librosa.effects.preemphasis 的结果一致）。
+    直接在这份拷贝上原地计算，不会再产生整段大小的临时数组。
+    """
+    return read_samples(y, 0, len(y), pre_emphasis=True)
+
+
+def _stft_power_db(y, hop_length, n_fft, start_frame, n_frames, pre_emphasis, out):
+    """
+    计算第 [start_frame, start_frame + n_frames) 帧的未参考功率谱 10*log10(max(amin², |D|²))，
+    原地写入 float32 数组 out（形状 (频率 bin, n_frames)，可以是更大矩阵的切片），返回这些帧的最大幅度。
+    幅度直接由复数 STFT 写入 out，之后的平方与取对数都在 out 上原地完成，不再分配同样大小的临时数组。
+    """
+    start_sample = start_frame * hop_length
+    end_sample = (start_frame + n_frames - 1) * hop_length
+    segment = _centered_segment(y, start_sample, end_sample, n_fft // 2, pre_emphasis)
+    if len(segment) < n_fft:
+        segment = np.pad(segment, (0, n_fft - len(segment)))
+    D = librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, center=False)
+    np.abs(D[:, :n_frames], out=out)
+    del D, segment
+    peak = out.max() if out.size else np.float32(0.0)
+    np.square(out, out=out)
+    np.maximum(out, SPECTROGRAM_AMIN ** 2, out=out)
+    np.log10(out, out=out)
+    out *= 10.0
+    return peak
+
+
+def _reference_db(ref_amplitude):
+    """参考幅度对应的 dB 偏移，计算方式与 librosa.amplitude_to_db 相同（保留 ref_amplitude 的精度）。"""
+    return 10.0 * np.log10(np.maximum(SPECTROGRAM_AMIN ** 2, ref_amplitude ** 2))
+
+
+def compute_spectrogram_tile(y, hop_length, n_fft, start_frame, n_frames, pre_emphasis, ref_amplitude):
+    """
+    计算第 [start_frame, start_frame + n_frames) 帧（帧移 hop_length）的语谱图分块。
+    只读取该分块需要的那一段信号，结果以全局参考幅度换算为 dB，
+    再归一化并量化为 uint8（0 对应 -80 dB，255 对应参考幅度），形状为 (频率 bin, 帧)。
+    """
+    S_db = np.empty((1 + n_fft // 2, n_frames), dtype=np.float32)
+    _stft_power_db(y, hop_length, n_fft, start_frame, n_frames, pre_emphasis, S_db)
+    S_db -= _reference_db(ref_amplitude)
+    S_db += SPECTROGRAM_TOP_DB
+    S_db /= SPECTROGRAM_TOP_DB
+    np.clip(S_db, 0.0, 1.0, out=S_db)
+    S_db *= 255
+    return S_db.astype(np.uint8)
+
+
+def estimate_spectrogram_reference(y, n_fft, hop_length, pre_emphasis, block_frames=2048, cancel_check=None):
+    """
+    估计整段音频语谱图的最大幅度，作为所有分块共用的 dB 参考值（对应 ref=np.max）。
+    分段计算，内存占用与音频长度无关；可传入较大的帧移以加快估计。
+    cancel_check 为可选的无参函数，返回 True 时提前结束。
+    """
+    ref = 0.0
+    block_samples = block_frames * hop_length
+    for start in range(0, len(y), block_samples):
+        if cancel_check is not None and cancel_check():
+            break
+        segment = _centered_segment(y, start, min(start + block_samples, len(y)), n_fft // 2, pre_emphasis)
+        if len(segment) < n_fft:
+            segment = np.pad(segment, (0, n_fft - len(segment)))
+        D = librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, center=False)
+        ref = max(ref, float(np.max(np.abs(D))) if D.size else 0.0)
+    return ref or 1.0
+
+
+def compute_spectrogram(y, sr, hop_length, n_fft, pre_emphasis, block_frames=SPECTROGRAM_BLOCK_FRAMES):
+    """
+    计算整段音频的语谱图（ref=np.max，top_db=80），返回量化后的 uint8 矩阵，形状为 (频率 bin, 帧)。
+    结果与 quantize_spectrogram(librosa.amplitude_to_db(np.abs(librosa.stft(y)), ref=np.max)) 相同，
+    但按 block_frames 帧分块做 STFT：完整的复数 STFT 矩阵从不出现，dB 换算在一份 float32 矩阵上原地完成，
+    预加重也只作用于每块读取的片段。y 可以是 ndarray 或按需读取的 AudioSource。
+    """
+    n_frames = 1 + len(y) // hop_length
+    S_db = np.empty((1 + n_fft // 2, n_frames), dtype=np.float32)
+    blocks = [S_db[:, first:first + block_frames] for first in range(0, n_frames, block_frames)]
+    peak = np.float32(0.0)
+    for first, block in zip(range(0, n_frames, block_frames), blocks):
+        peak = max(peak, _stft_power_db(y, hop_length, n_fft, first, block.shape[1], pre_emphasis, block))
+
+    # 与 power_to_db 相同：先减去参考值，再把低于最大值 top_db 的部分截平
+    ref_db = _reference_db(peak)
+    for block in blocks:
+        block -= ref_db
+    floor_db = S_db.max() - SPECTROGRAM_TOP_DB
+    for block in blocks:
+        np.maximum(block, floor_db, out=block)
+
+    # 与 quantize_spectrogram 相同的归一化，逐块原地计算后写入 uint8 结果
+    S_min, S_max = float(S_db.min()), float(S_db.max())
+    scale = 1.0 / (S_max - S_min + 1e-6)
+    S_quantized = np.empty(S_db.shape, dtype=np.uint8)
+    for first, block in zip(range(0, n_frames, block_frames), blocks):
+        block -= S_min
+        block *= scale
+        np.clip(block, 0.0, 1.0, out=block)
+        block *= 255
+        S_quantized[:, first:first + block.shape[1]] = block
+    return S_quantized
+
+
+# --- 完整分析流程（单文件与批量共用，可在脚本和子进程中直接调用） ---
+
+def analyze_acoustics(y, sr, f0_min, f0_max, pre_emphasis, analysis_mode='normal', hop_length=None,
+                      render_density=4, chunk_size_ms=200, chunk_overlap_ms=10,
+                      coarse_f0_range=None, coarse_f0_method='pyin',
+                      progress_callback=None, cancel_check=None):
+    """
+    对整段音频做 F0 与强度分析，返回 {'f0_raw', 'f0_derived', 'intensity', 'hop_length'}。
+
+    - 兼容模式：整段运行 pYIN，hop_length 为 librosa 默认值。
+    - 普通模式：先粗略估计 F0 范围，再按块顺序分析并拼接；hop_length 未指定时由 render_density 决定。
+      传入之前得到的 coarse_f0_range 可跳过粗略估计；实际使用的估计结果以 'coarse_f0_range' 返回，便于缓存。
+    - 快速模式：流程同普通模式，但 F0 由向量化 YIN 计算（见 mode_f0_settings）。
+
+    progress_callback(已分析到的秒数, 总秒数) 在每块完成后调用；
+    cancel_check 返回 True 时抛出 InterruptedError。
+    """
+    check_pyin_length(len(y))
+    total_duration_s = len(y) / sr
+
+    if analysis_mode == 'compatibility':
+        results = analyze_pyin_full(y, sr, f0_min, f0_max, pre_emphasis)
+        results['hop_length'] = PYIN_DEFAULT_HOP_LENGTH
+        if progress_callback is not None:
+            progress_callback(total_duration_s, total_duration_s)
+        return results
+
+    backend, chunk_size_ms, coarse_f0_method = mode_f0_settings(analysis_mode, chunk_size_ms, coarse_f0_method)
+    if coarse_f0_range is None:
+        coarse_f0_range = estimate_coarse_f0_range(y, sr, coarse_f0_method)
+    final_f0_min, final_f0_max = narrow_f0_search_range(f0_min, f0_max, coarse_f0_range)
+    if hop_length is None:
+        hop_length = analysis_hop_length(sr, render_density)
+    chunk_starts, chunk_size_samples, frame_length, num_frames_in_step = plan_pyin_chunks(
+        len(y), sr, hop_length, chunk_size_ms, chunk_overlap_ms)
+
+    chunk_results = []
+    for start in chunk_starts:
+        if cancel_check is not None and cancel_check():
+            raise InterruptedError("用户取消了操作")
+        chunk = analyze_pyin_chunk(*pyin_chunk_args(y, sr, start, chunk_size_samples, final_f0_min, final_f0_max,
+                                                    frame_length, hop_length, num_frames_in_step, pre_emphasis,
+                                                    backend))
+        chunk_results.append(chunk)
+        if progress_callback is not None:
+            chunk_times = chunk['f0_raw'][0]
+            progress_callback(float(chunk_times[-1]) if len(chunk_times) else min(start + chunk_size_samples, len(y)) / sr,
+                              total_duration_s)
+
+    results = merge_chunk_results(chunk_results)
+    results['hop_length'] = hop_length
+    results['coarse_f0_range'] = coarse_f0_range
+    return results
+
+
+def analyze_file(y, sr, params, progress_callback=None, cancel_check=None, coarse_f0_range=None):
+    """
+    按批量分析的参数字典对一段已加载的音频做完整分析（F0/强度、语谱图、共振峰），
+    返回批量结果字典：'f0_data'、'f0_derived_data'、'intensity_data'（可选）、
+    'formants_data'（可选）、'S_db'（uint8）、'hop_length'、'sr'、'duration_ms'。
+
+    params 使用的键：analyze_f0_intensity、analyze_formants、pre_emphasis、f0_min、f0_max、
+    render_density、formant_density、is_wide_band、analysis_mode、coarse_f0_method。
+    coarse_f0_range 为之前缓存的粗略 F0 估计；普通/快速模式下实际使用的估计以 'coarse_f0_range' 一并返回。
+    """
+    check_pyin_length(len(y))
+    pre_emphasis = bool(params.get('pre_emphasis', False))
+    results_for_file = {}
+
+    # 步骤 1: F0 & Intensity 分析 (根据模式选择)
+    if params.get('analyze_f0_intensity'):
+        acoustics = analyze_acoustics(
+            y, sr, params.get('f0_min', 75), params.get('f0_max', 500), pre_emphasis,
+            analysis_mode=params.get('analysis_mode', 'normal'), render_density=params.get('render_density', 4),
+            coarse_f0_range=coarse_f0_range, coarse_f0_method=params.get('coarse_f0_method', 'pyin'),
+            progress_callback=progress_callback, cancel_check=cancel_check)
+        results_for_file['f0_data'] = acoustics['f0_raw']
+        results_for_file['f0_derived_data'] = acoustics['f0_derived']
+        results_for_file['intensity_data'] = acoustics['intensity']
+        results_for_file['hop_length'] = acoustics['hop_length']
+        if 'coarse_f0_range' in acoustics:
+            results_for_file['coarse_f0_range'] = acoustics['coarse_f0_range']
+
+    # 步骤 2. 语谱图和共振峰分析；语谱图与 F0 分析使用同一帧移
+    render_hop_length, n_fft_spectrogram = spectrogram_params(sr, params.get('render_density', 4),
+                                                              params.get('is_wide_band', False))
+    render_hop_length = results_for_file.setdefault('hop_length', render_hop_length)
+    results_for_file['S_db'] = compute_spectrogram(y, sr, render_hop_length, n_fft_spectrogram, pre_emphasis)
+
+    if params.get('analyze_formants'):
+        hop_length_formant = analysis_hop_length(sr, params.get('formant_density', 5))
+        results_for_file['formants_data'] = analyze_formants_lpc(y, sr, hop_length_formant, 0, pre_emphasis)
+
+    results_for_file['sr'] = sr
+    results_for_file['duration_ms'] = (len(y) / sr) * 1000
+    return results_for_file
+
+
+def analyze_audio_file(filepath, params, coarse_f0_range=None):
+    """
+    加载并分析单个音频文件，返回 analyze_file 的结果字典。
+    批量分析的进程池以文件为单位提交这个函数：音频只在子进程中加载，
+    主进程只收到分析结果（量化后的语谱图和 F0/共振峰数组）。
+    """
+    y, sr = load_audio(filepath)
+    return analyze_file(y, sr, params, coarse_f0_range=coarse_f0_range)
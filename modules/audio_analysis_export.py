@@ -0,0 +1,412 @@
+# --- START OF FILE modules/audio_analysis_export.py ---
+# --- 模块元数据 ---
+MODULE_NAME = "音频分析数据导出"
+MODULE_DESCRIPTION = "将 F0、强度和共振峰分析结果按列直接由 NumPy 数组组装成表格，并读写 CSV/Parquet/Feather/NPZ 文件，不直接作为独立标签页。"
+# ---
+#
+# 表格布局与旧版逐行构造字典后 groupby('timestamp').first() 的结果完全相同：
+#   timestamp, f0_hz, intensity, f1_hz, f2_hz, ...
+# 每个不同的时间戳一行（升序），同一时间戳的多条记录合并为一行、每列取第一个非空值，数值保留 4 位小数。
+# Parquet/Feather 需要可选依赖 pyarrow；CSV 与 NPZ 始终可用。
+
+import os
+import re
+import csv
+import itertools
+
+try:
+    import numpy as np
+    import pandas as pd
+    DEPENDENCIES_MISSING = False
+except ImportError as e:
+    print(f"CRITICAL: audio_analysis_export.py - Missing dependencies: {e}")
+    DEPENDENCIES_MISSING = True
+    MISSING_ERROR_MESSAGE = str(e)
+
+# pyarrow 为可选依赖：缺失时只能导出/读取 CSV 和 NPZ
+try:
+    import pyarrow as pa
+    import pyarrow.feather as pa_feather
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pa_parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# 扩展名 -> (显示名称, 是否需要 pyarrow)
+TABLE_FORMATS = {
+    '.csv': ("CSV", False),
+    '.parquet': ("Parquet", True),
+    '.feather': ("Feather", True),
+    '.npz': ("NPZ", False),
+}
+TABLE_DECIMALS = 4
+FORMANT_COLUMN_PATTERN = re.compile(r'^f([1-9]\d*)_hz$') # f1_hz, f2_hz, ...（不包括 f0_hz）
+
+
+def available_table_formats():
+    """当前环境可以读写的表格格式扩展名列表（CSV 在最前）。"""
+    return [ext for ext, (_, needs_pyarrow) in TABLE_FORMATS.items() if PYARROW_AVAILABLE or not needs_pyarrow]
+
+
+def table_file_filter():
+    """QFileDialog 使用的文件类型过滤器字符串，只包含可用的格式。"""
+    return ";;".join(f"{TABLE_FORMATS[ext][0]} 文件 (*{ext})" for ext in available_table_formats())
+
+
+def table_format_of(path):
+    """返回路径对应的表格格式扩展名；不支持的扩展名返回 None。"""
+    ext = os.path.splitext(path)[1].lower()
+    return ext if ext in TABLE_FORMATS else None
+
+
+def merge_timestamped_columns(sources):
+    """
+    按时间戳合并若干组数据列。sources 为 [(时间数组, {列名: 数值数组}), ...]，
+    结果与把每条记录写成一个字典、再 DataFrame.groupby('timestamp').first() 相同：
+    时间戳去重并升序排列，同一时间戳的多条记录中每列取第一个（按 sources 顺序）非 NaN 的值。
+    返回 {列名: 数组}，'timestamp' 在最前，其余列按首次出现的顺序排列。
+    """
+    sources = [(np.asarray(times, dtype=np.float64), columns) for times, columns in sources if len(times)]
+    if not sources:
+        return None
+    all_times = np.concatenate([times for times, _ in sources])
+    # 稳定排序保持同一时间戳下记录的原始先后顺序，这正是 first() 的语义
+    order = np.argsort(all_times, kind='stable')
+    timestamps, group_of_sorted = np.unique(all_times[order], return_inverse=True)
+    position_in_sorted = np.empty_like(order)
+    position_in_sorted[order] = np.arange(len(order))
+
+    names = list(dict.fromkeys(name for _, columns in sources for name in columns))
+    merged = {'timestamp': timestamps}
+    offsets = np.cumsum([0] + [len(times) for times, _ in sources])
+    for name in names:
+        rows, values = [], []
+        for (times, columns), offset in zip(sources, offsets):
+            if name in columns:
+                column = np.asarray(columns[name], dtype=np.float64)
+                rows.append(position_in_sorted[offset:offset + len(times)])
+                values.append(column)
+        rows, values = np.concatenate(rows), np.concatenate(values)
+        valid = ~np.isnan(values)
+        rows, values = rows[valid], values[valid]
+        # 对有效记录按其在排序后序列中的位置排序，每组取第一条
+        first = np.argsort(rows, kind='stable')
+        rows, values = rows[first], values[first]
+        groups, first_in_group = np.unique(group_of_sorted[rows], return_index=True)
+        column = np.full(len(timestamps), np.nan)
+        column[groups] = values[first_in_group]
+        merged[name] = column
+    return merged
+
+
+def formant_matrix(formants_data):
+    """
+    将 [(采样点位置, [F1, F2, ...]), ...] 转换为 (位置数组, N×K 矩阵)，
+    K 为最多的共振峰个数，不足的位置填 NaN。
+    """
+    positions = np.fromiter((item[0] for item in formants_data), dtype=np.float64, count=len(formants_data))
+    lengths = np.fromiter((len(item[1]) for item in formants_data), dtype=np.intp, count=len(formants_data))
+    width = int(lengths.max()) if len(lengths) else 0
+    matrix = np.full((len(formants_data), width), np.nan)
+    if width:
+        flat = np.fromiter(itertools.chain.from_iterable(item[1] for item in formants_data), dtype=np.float64,
+                           count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(formants_data)), lengths)
+        cols = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        matrix[rows, cols] = flat
+    return positions, matrix
+
+
+def analysis_columns(f0_data=None, intensity_data=None, formants_data=None, sr=None,
+                     intensity_times=None, time_range=None):
+    """
+    由分析数据直接组装表格列 {列名: 数组}（布局见模块说明），没有任何数据时返回 None。
+
+    Args:
+        f0_data (tuple): (times, f0_values)。
+        intensity_data (np.ndarray): 强度数组。intensity_times 为 None 时与 F0 按下标配对
+            （批量结果的布局，取两者较短的长度）；否则使用 intensity_times 作为各帧时间。
+        formants_data (list): [(采样点位置, [F1, F2, ...]), ...]，时间戳为位置 / sr。
+        time_range (tuple): (起始秒, 结束秒)，只保留 start <= t < end 的记录。
+    """
+    sources = []
+    if f0_data is not None and intensity_data is not None and intensity_times is None:
+        times, f0_values = f0_data
+        min_len = min(len(times), len(f0_values), len(intensity_data))
+        sources.append((times[:min_len], {'f0_hz': f0_values[:min_len], 'intensity': intensity_data[:min_len]}))
+    else:
+        if f0_data is not None:
+            sources.append((f0_data[0], {'f0_hz': f0_data[1]}))
+        if intensity_data is not None and intensity_times is not None:
+            min_len = min(len(intensity_times), len(intensity_data))
+            sources.append((intensity_times[:min_len], {'intensity': intensity_data[:min_len]}))
+    if formants_data and sr:
+        positions, matrix = formant_matrix(formants_data)
+        sources.append((positions / sr, {f'f{i + 1}_hz': matrix[:, i] for i in range(matrix.shape[1])}))
+
+    if time_range is not None:
+        start_s, end_s = time_range
+        clipped = []
+        for times, columns in sources:
+            times = np.asarray(times, dtype=np.float64)
+            keep = (times >= start_s) & (times < end_s)
+            clipped.append((times[keep], {name: np.asarray(values)[keep] for name, values in columns.items()}))
+        sources = clipped
+
+    columns = merge_timestamped_columns(sources)
+    if columns is None:
+        return None
+    return {name: np.round(values, TABLE_DECIMALS) for name, values in columns.items()}
+
+
+def analysis_results_to_dataframe(analysis_results, sr):
+    """
+    将批量格式的分析结果字典转换为可保存的 DataFrame（timestamp、f0_hz、intensity、f1_hz...）。
+    共振峰的时间戳由采样点位置除以 sr 得到；没有任何数据时返回 None。
+    """
+    if not analysis_results:
+        return None
+    has_f0_intensity = 'f0_data' in analysis_results and 'intensity_data' in analysis_results
+    columns = analysis_columns(
+        f0_data=analysis_results.get('f0_data') if has_f0_intensity else None,
+        intensity_data=analysis_results.get('intensity_data') if has_f0_intensity else None,
+        formants_data=analysis_results.get('formants_data'), sr=sr)
+    return pd.DataFrame(columns) if columns is not None else None
+
+
+def _require_pyarrow(ext):
+    if not PYARROW_AVAILABLE:
+        raise ImportError(f"读写 {TABLE_FORMATS[ext][0]} 文件需要安装可选依赖 pyarrow。")
+
+
+def save_analysis_table(table, path):
+    """
+    按扩展名把表格（DataFrame 或 {列名: 数组}）写入 CSV/Parquet/Feather/NPZ。
+    Feather 不压缩，读取时可以直接内存映射；NPZ 同样不压缩以加快读写。
+    """
+    ext = table_format_of(path)
+    if ext is None:
+        raise ValueError(f"不支持的文件格式: {path}")
+    if ext == '.npz':
+        columns = table if isinstance(table, dict) else {name: table[name].to_numpy() for name in table.columns}
+        # 文本列（例如合并导出的 source_file）保存为定长 Unicode 数组，读取时无需 pickle
+        columns = {name: values.astype(str) if values.dtype == object else values for name, values in columns.items()}
+        with open(path, 'wb') as f: # 直接写入文件对象，避免 numpy 自动追加扩展名
+            np.savez(f, **columns)
+        return
+    df = table if isinstance(table, pd.DataFrame) else pd.DataFrame(table)
+    if ext == '.csv':
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+        return
+    _require_pyarrow(ext)
+    arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+    if ext == '.parquet':
+        pa_parquet.write_table(arrow_table, path)
+    else:
+        pa_feather.write_feather(arrow_table, path, compression='uncompressed')
+
+
+def load_analysis_table(path):
+    """
+    读取 save_analysis_table 写出的表格并返回 DataFrame。
+    Parquet/Feather 以内存映射方式打开；NPZ 逐列读取，不经过文本解析。
+    Parquet 路径也可以是 MergedTableWriter 写出的数据集目录。
+    """
+    ext = table_format_of(path)
+    if ext is None:
+        raise ValueError(f"不支持的文件格式: {path}")
+    if ext == '.csv':
+        return pd.read_csv(path)
+    if ext == '.npz':
+        with np.load(path, allow_pickle=False) as data:
+            return pd.DataFrame({name: data[name] for name in data.files})
+    _require_pyarrow(ext)
+    if ext == '.parquet':
+        return pa_parquet.read_table(path, memory_map=True).to_pandas()
+    return pa_feather.read_table(path, memory_map=True).to_pandas()
+
+
+class MergedTableWriter:
+    """
+    合并导出：把各个音频文件的分析表格依次追加到同一个输出中，每行带有来源文件名（source_file 列）。
+    调用方按来源文件名的顺序逐个 append 已按时间戳排序的表格，输出与旧版 concat 后
+    sort_values(['source_file', 'timestamp']) 的结果相同，但内存中始终只有一个文件的数据：
+      - CSV：每个文件的行立即追加到文件末尾；
+      - Parquet：写成 Parquet 数据集目录，每个文件一个分片（part-N.parquet，source_file 为分片中的字符串列），
+        pyarrow/pandas 等可以直接把整个目录作为一个表读取；
+        [修复] 不使用 source_file=<名称> 形式的 Hive 分区目录，否则读取时分区值会被推断类型（'001' 变成 1）；
+      - [修复] Feather：通过 Arrow IPC 文件写入器（Feather V2 即 Arrow IPC 文件格式）每个文件写一个记录批，
+        文件在 close() 写入结尾后才完整；
+      - NPZ 无法追加，不支持合并导出（STREAMING_FORMATS 之外的格式会引发 ValueError）。
+    CSV/Parquet 的每次追加都是完整的写入，导出中途取消时已写出的部分同样是有效的表格（Feather 需要调用 close()）。
+    source_file 总是最后一列（字符串）；后面的文件出现新的列（例如更多的共振峰）时，新列插在 source_file 之前，
+    已写出的部分逐个文件（Feather 为逐个记录批）补上空列。
+    """
+    SOURCE_COLUMN = 'source_file'
+    STREAMING_FORMATS = ('.csv', '.parquet', '.feather')
+
+    def __init__(self, path):
+        self.ext = table_format_of(path)
+        if self.ext is None:
+            raise ValueError(f"不支持的文件格式: {path}")
+        if self.ext not in self.STREAMING_FORMATS:
+            raise ValueError(f"{TABLE_FORMATS[self.ext][0]} 格式不支持合并导出: {path}")
+        if self.ext != '.csv':
+            _require_pyarrow(self.ext)
+        self.path = path
+        self.columns = []  # 已写出的数据列（不含 source_file），按首次出现的顺序
+        self._parts = []  # Parquet 数据集中已写出的分片文件
+        self._ipc_writer = None  # Feather 的 Arrow IPC 文件写入器
+        self._ipc_schema = None
+        self._ipc_path = path  # Feather 当前正在写入的文件（补列后为临时文件，close() 时替换为 path）
+        self.rows_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, table, source_file):
+        """追加一个来源文件的表格（DataFrame 或 {列名: 数组}），行应已按时间戳排序。"""
+        df = table if isinstance(table, pd.DataFrame) else pd.DataFrame(table)
+        df = df.drop(columns=[self.SOURCE_COLUMN], errors='ignore')
+        if df.empty:
+            return
+        new_columns = [name for name in df.columns if name not in self.columns]
+        if new_columns and self.columns:
+            self._pad_written_output(new_columns)
+        self.columns.extend(new_columns)
+        df = df.reindex(columns=self.columns)
+        if self.ext == '.csv':
+            self._append_csv(df.assign(**{self.SOURCE_COLUMN: source_file}))
+        elif self.ext == '.parquet':
+            self._append_parquet_part(self._to_arrow(df, source_file))
+        else:
+            self._append_ipc_batch(self._to_arrow(df, source_file))
+        self.rows_written += len(df)
+
+    def close(self):
+        """完成写出；Feather 这时写入文件结尾。可以重复调用。"""
+        if self._ipc_writer is not None:
+            writer, self._ipc_writer = self._ipc_writer, None
+            writer.close()
+            if self._ipc_path != self.path:
+                os.replace(self._ipc_path, self.path)
+                self._ipc_path = self.path
+
+    # --- 内部实现 ---
+
+    def _append_csv(self, df):
+        if not self.rows_written:
+            df.to_csv(self.path, index=False, encoding='utf-8-sig')
+        else:
+            df.to_csv(self.path, mode='a', index=False, header=False, encoding='utf-8')
+
+    def _to_arrow(self, df, source_file):
+        """数据列加上字符串类型的 source_file 列，转换为不带 pandas 元数据的 Arrow 表。"""
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+        return arrow_table.append_column(
+            self.SOURCE_COLUMN, pa.array([str(source_file)] * len(arrow_table), type=pa.string()))
+
+    def _append_parquet_part(self, arrow_table):
+        os.makedirs(self.path, exist_ok=True)
+        # 分片按名称排序后即为追加顺序，读取整个目录时行序与 CSV 相同
+        part_path = os.path.join(self.path, f"part-{len(self._parts):05d}.parquet")
+        self._write_parquet_part(arrow_table, part_path)
+        self._parts.append(part_path)
+
+    def _append_ipc_batch(self, arrow_table):
+        if self._ipc_writer is None:
+            self._ipc_schema = arrow_table.schema
+            self._ipc_writer = pa_ipc.new_file(self._ipc_path, self._ipc_schema)
+        self._ipc_writer.write_table(arrow_table.cast(self._ipc_schema))
+
+    @staticmethod
+    def _write_parquet_part(arrow_table, part_path):
+        tmp_path = f"{part_path}.tmp"
+        pa_parquet.write_table(arrow_table, tmp_path)
+        os.replace(tmp_path, part_path)
+
+    @staticmethod
+    def _padded(arrow_data, new_columns):
+        """在最后的 source_file 列之前插入空的新列（Arrow 表或记录批）。"""
+        for name in new_columns:
+            arrow_data = arrow_data.add_column(arrow_data.num_columns - 1, name,
+                                               pa.nulls(arrow_data.num_rows, pa.float64()))
+        return arrow_data
+
+    def _pad_written_output(self, new_columns):
+        """已写出的部分补上新出现的列（空值）。每次只处理一个文件，先写临时文件再替换。"""
+        if self.ext == '.parquet':
+            for part_path in self._parts:
+                self._write_parquet_part(self._padded(pa_parquet.read_table(part_path), new_columns), part_path)
+            return
+        if self.ext == '.feather':
+            self._pad_ipc_file(new_columns)
+            return
+        if not self.rows_written:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(self.path, encoding='utf-8-sig', newline='') as src, \
+                open(tmp_path, 'w', encoding='utf-8-sig', newline='') as dst:
+            # 与 DataFrame.to_csv 相同的换行符与引号规则
+            reader, writer = csv.reader(src), csv.writer(dst, lineterminator=os.linesep)
+            head = next(reader)
+            writer.writerow(head[:-1] + new_columns + head[-1:])
+            padding = [''] * len(new_columns)
+            for row in reader:
+                writer.writerow(row[:-1] + padding + row[-1:])
+        os.replace(tmp_path, self.path)
+
+    def _pad_ipc_file(self, new_columns):
+        """
+        IPC 文件写入后不能修改结构：结束当前文件，以内存映射逐个读出记录批、补列后写入另一个文件，
+        之后继续向新文件追加（close() 时再替换为目标路径）。
+        """
+        if self._ipc_writer is None:
+            return
+        self._ipc_writer.close()
+        old_path = self._ipc_path
+        self._ipc_path = f"{self.path}.{len(self.columns)}.tmp"  # 每次补列时列数都不同，不会与 old_path 重名
+        with pa.memory_map(old_path) as source:
+            reader = pa_ipc.open_file(source)
+            self._ipc_schema = self._padded(reader.schema.empty_table(), new_columns).schema
+            self._ipc_writer = pa_ipc.new_file(self._ipc_path, self._ipc_schema)
+            for i in range(reader.num_record_batches):
+                self._ipc_writer.write_batch(self._padded(reader.get_batch(i), new_columns))
+        os.remove(old_path)
+
+
+def analysis_data_from_table(df, sr):
+    """
+    load_analysis_table 的逆过程：从表格中取出 (f0_data, intensity_data, formants_data)，
+    缺少的部分为 None（共振峰为空列表）。共振峰的采样点位置为 int(timestamp * sr)。
+    """
+    f0_data, intensity_data, formants_data = None, None, []
+    timestamps = df['timestamp'].to_numpy(dtype=np.float64)
+
+    if 'f0_hz' in df.columns:
+        f0_values = df['f0_hz'].to_numpy(dtype=np.float64)
+        keep = ~np.isnan(f0_values) & ~np.isnan(timestamps)
+        f0_data = (timestamps[keep], f0_values[keep])
+
+    if 'intensity' in df.columns:
+        intensity = df['intensity'].to_numpy(dtype=np.float64)
+        # 强度是没有时间戳的纯数组，其时间由 hop_length 决定；这里假设表格中的时间戳与 hop_length 匹配
+        intensity_data = intensity[~np.isnan(intensity) & ~np.isnan(timestamps)]
+
+    formant_cols = sorted((col for col in df.columns if FORMANT_COLUMN_PATTERN.match(col)),
+                          key=lambda col: int(FORMANT_COLUMN_PATTERN.match(col).group(1)))
+    if formant_cols:
+        matrix = df[formant_cols].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(matrix)
+        rows = np.flatnonzero(valid.any(axis=1))
+        positions = (timestamps[rows] * sr).astype(np.int64).tolist()
+        values = matrix[rows].tolist()
+        row_valid = valid[rows].tolist()
+        formants_data = [(pos, [v for v, ok in zip(vals, oks) if ok])
+                         for pos, vals, oks in zip(positions, values, row_valid)]
+    return f0_data, intensity_data, formants_data
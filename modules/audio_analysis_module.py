@@ -7,18 +7,41 @@ MODULE_DESCRIPTION = "对单个音频文件进行声学分析，包括波形、
 import os
 import re
 import sys
-from datetime import timedelta
 import math # 新增导入，用于数学计算，如对数和向上取整
+import threading
+import itertools
+from collections import deque, OrderedDict
+from functools import partial
+from concurrent.futures import wait as futures_wait
 from modules.custom_widgets_module import RangeSlider, AnimatedSlider
-from audio_analysis_batch_panel import AudioAnalysisBatchPanel
+from audio_analysis_batch_panel import AudioAnalysisBatchPanel, BatchAnalysisWorker
+from audio_analysis_cache import (AnalysisCache, DEFAULT_CACHE_SIZE_MB, compute_file_hash, pack_formants,
+                                  unpack_formants, pack_acoustics, unpack_acoustics, COARSE_F0_KIND,
+                                  pack_coarse_f0_range, unpack_coarse_f0_range)
+from audio_analysis_engine import (analyze_pyin_chunk, get_process_pool, resolve_worker_count,
+                                   spectrogram_params, compute_spectrogram_tile,
+                                   estimate_spectrogram_reference, quantize_spectrogram, GrowableArray,
+                                   check_pyin_length, analysis_hop_length, estimate_coarse_f0_range, narrow_f0_search_range,
+                                   plan_pyin_chunks, pyin_chunk_args, analyze_pyin_full, compute_spectrogram,
+                                   mode_f0_settings, formant_energy_reference,
+                                   analyze_formants_range, FormantIntervalCache, reanalyze_acoustics_segment,
+                                   formant_frame_length, pyin_frame_length, COMPAT_PYIN_FRAME_LENGTH)
+from audio_analysis_source import open_audio_source, build_waveform_envelope, WaveformEnvelope
+from audio_analysis_scheduler import (AnalysisTaskScheduler, PRIORITY_LOAD, PRIORITY_VIEW, PRIORITY_SPECTROGRAM,
+                                      PRIORITY_ACOUSTICS, PRIORITY_BACKGROUND)
+from audio_analysis_export import (analysis_results_to_dataframe, analysis_columns, analysis_data_from_table,
+                                   save_analysis_table, load_analysis_table, table_file_filter, table_format_of)
+from audio_analysis_render import (paint_spectrogram_layer, render_analysis_image, spectrogram_color_table,
+                                   spectrogram_image, auto_f0_display_range, plot_rect_for, polygon_from_array,
+                                   format_duration, analysis_info_text, DEFAULT_F0_DISPLAY_RANGE, TIME_AXIS_HEIGHT)
 # PyQt5 GUI 库的核心组件导入
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
                              QMessageBox, QGroupBox, QFormLayout, QSizePolicy, QSlider,
                              QScrollBar, QProgressDialog, QFileDialog, QCheckBox, QLineEdit,QListWidget,
-                             QMenu, QAction, QDialog, QDialogButtonBox, QComboBox, QShortcut,QScrollArea, QFrame, QTabWidget, QStackedWidget, QRadioButton) # 新增导入 QMenu, QAction, QDialog, QDialogButtonBox, QComboBox, QShortcut
-from PyQt5.QtCore import Qt, QUrl, QPointF, QThread, pyqtSignal, QObject, pyqtProperty, QRect, QPoint, QTimer
+                             QMenu, QAction, QDialog, QDialogButtonBox, QComboBox, QShortcut,QScrollArea, QFrame, QTabWidget, QStackedWidget, QRadioButton, QSpinBox) # 新增导入 QMenu, QAction, QDialog, QDialogButtonBox, QComboBox, QShortcut
+from PyQt5.QtCore import Qt, QUrl, QPointF, QThread, pyqtSignal, QObject, pyqtProperty, QRect, QRectF, QPoint, QTimer, QEvent
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
-from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QPalette, QImage, QIntValidator, QPixmap, QRegion, QFont, QCursor, QKeySequence
+from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QPalette, QImage, QIntValidator, QPixmap, QRegion, QFont, QCursor, QKeySequence, QPolygonF
 from modules.custom_widgets_module import ColorButton, RangeSlider
 
 # 模块级别依赖检查
@@ -34,6 +57,7 @@ except ImportError as e:
     DEPENDENCIES_MISSING = True
     MISSING_ERROR_MESSAGE = str(e)
 
+
 # --- 后台工作器 ---
 # AudioTaskWorker 类：在独立的线程中执行耗时的音频处理任务，以保持UI响应。
 class AudioTaskWorker(QObject):
@@ -48,7 +72,7 @@ class AudioTaskWorker(QObject):
         Args:
             task_type (str): 要执行的任务类型 ('load', 'analyze', 'analyze_formants_view')。
             filepath (str, optional): 音频文件路径，用于 'load' 任务。
-            audio_data (np.ndarray, optional): 音频数据数组，用于 'analyze' 和 'analyze_formants_view' 任务。
+            audio_data (np.ndarray | AudioSource, optional): 音频数据（数组或按需读取的数据源），用于 'analyze' 和 'analyze_formants_view' 任务。
             sr (int, optional): 采样率，与 audio_data 配套。
             **kwargs: 其他任务特定的参数。
         """
@@ -73,176 +97,125 @@ class AudioTaskWorker(QObject):
                 self._run_spectrogram_task() # 调用新的语谱图分析方法
             elif self.task_type == 'analyze_formants_view':
                 self._run_formant_view_task()
+            elif self.task_type == 'reanalyze_selection':
+                self._run_reanalyze_selection_task()
         except Exception as e:
             self.error.emit(str(e))
 
     def _run_load_task(self):
         """
         执行音频加载任务。
-        使用 librosa.load 读取音频文件，并生成一个用于波形概览的下采样版本。
-        """
-        # 使用 librosa 加载音频，sr=None 表示使用原始采样率，mono=True 转换为单声道
-        y, sr = librosa.load(self.filepath, sr=None, mono=True)
+        [v2.5] 不再一次性解码整个文件：PCM WAV 通过内存映射按需读取，其他格式按需 seek 解码，
+        波形的多级包络在一次流式遍历中生成。发出的 'y_full' 是一个 AudioSource，
+        可以像数组一样取 len() 和切片，需要完整信号的分析任务会自行读出；'y_overview' 是 WaveformEnvelope。
+        """
+        source = open_audio_source(self.filepath)
+        cancel_check = QThread.currentThread().isInterruptionRequested
+        y_overview = build_waveform_envelope(source, cancel_check=cancel_check) # 多级最小/最大值包络
+        if y_overview is None:
+            self.finished.emit({}) # 用户已取消；仍发出 finished，让任务线程正常结束
+            return
 
-        # 生成用于概览视图的下采样数据
-        overview_points = 4096 # 概览视图的目标点数
-        if len(y) > overview_points:
-            # 如果音频很长，则进行分块平均以创建概览波形
-            chunk_size = len(y) // overview_points
-            y_overview = np.array([np.mean(y[i:i+chunk_size]) for i in range(0, len(y), chunk_size)])
-        else:
-            # 如果音频较短，直接使用完整数据作为概览
-            y_overview = y
-        
         # 任务完成后，发出 finished 信号，携带加载的音频数据和采样率
-        self.finished.emit({ 'y_full': y, 'sr': sr, 'y_overview': y_overview })
+        self.finished.emit({ 'y_full': source, 'sr': source.sr, 'y_overview': y_overview })
 
     def _run_acoustics_task(self):
         """
         [v2.3 - 修复版] 增加了对极短音频的保护。
+        [v2.5] 计算流程与批量分析共用 audio_analysis_engine 中的函数。
         """
         try:
-            # --- [新增] 对极短音频的保护性检查 ---
-            MIN_SAMPLES_FOR_PYIN = 4096
-            if len(self.y) < MIN_SAMPLES_FOR_PYIN:
-                raise ValueError(f"音频过短 ({len(self.y)}采样点)，无法进行可靠的F0分析。至少需要{MIN_SAMPLES_FOR_PYIN}个采样点。")
-            # --- [新增结束] ---
+            check_pyin_length(len(self.y)) # 对极短音频的保护性检查
 
             mode = self.kwargs.get('analysis_mode', 'normal')
+            pre_emphasis = self.kwargs.get('pre_emphasis', False)
+            user_f0_min = self.kwargs.get('f0_min', librosa.note_to_hz('C2'))
+            user_f0_max = self.kwargs.get('f0_max', librosa.note_to_hz('C7'))
 
             if mode == 'compatibility':
-                # --- 兼容模式逻辑 ---
-                pre_emphasis = self.kwargs.get('pre_emphasis', False)
-                f0_min = self.kwargs.get('f0_min', librosa.note_to_hz('C2'))
-                f0_max = self.kwargs.get('f0_max', librosa.note_to_hz('C7'))
-                y_analyzed = librosa.effects.preemphasis(self.y) if pre_emphasis else self.y
-
-                f0_raw, voiced_flags, voiced_probs = librosa.pyin(
-                    y_analyzed, fmin=f0_min, fmax=f0_max, sr=self.sr
+                # --- 兼容模式逻辑：整段分析，需要读出完整信号 ---
+                self.finished.emit(analyze_pyin_full(self.y, self.sr, user_f0_min, user_f0_max, pre_emphasis))
+
+            else: # --- 普通/快速模式逻辑：两者只有 F0 后端、块大小和粗估方法不同 ---
+                backend, chunk_size_ms, coarse_f0_method = mode_f0_settings(
+                    mode, self.kwargs.get('chunk_size_ms', 200), self.kwargs.get('coarse_f0_method', 'pyin'))
+                # [新增] 粗略 F0 估计只取决于音频内容，页面会缓存上次的结果并通过 coarse_f0_range 传入
+                coarse_f0_range = self.kwargs.get('coarse_f0_range')
+                if coarse_f0_range is None:
+                    coarse_f0_range = estimate_coarse_f0_range(self.y, self.sr, coarse_f0_method)
+                final_f0_min, final_f0_max = narrow_f0_search_range(user_f0_min, user_f0_max, coarse_f0_range)
+
+                hop_length = self.kwargs.get('forced_hop_length')
+                if hop_length is None:
+                    hop_length = analysis_hop_length(self.sr, self.kwargs.get('render_density', 4))
+
+                chunk_starts, chunk_size_samples, frame_length, num_frames_in_step = plan_pyin_chunks(
+                    len(self.y), self.sr, hop_length, chunk_size_ms, self.kwargs.get('chunk_overlap_ms', 10))
+
+                # 所有块的起始位置；各块相互独立，可以顺序计算，也可以分发到进程池
+                # [v2.5] 每块按需读取并单独预加重，不再为整段音频生成预加重副本
+                chunk_args = lambda start: pyin_chunk_args(
+                    self.y, self.sr, start, chunk_size_samples, final_f0_min, final_f0_max,
+                    frame_length, hop_length, num_frames_in_step, pre_emphasis, backend
                 )
-                intensity = librosa.feature.rms(y=self.y)[0]
-                
-                f0_postprocessed = np.full_like(f0_raw, np.nan)
-                voiced_ints = voiced_flags.astype(int)
-                if len(voiced_ints) > 0:
-                    starts, ends = np.where(np.diff(voiced_ints) == 1)[0] + 1, np.where(np.diff(voiced_ints) == -1)[0] + 1
-                    if voiced_ints[0] == 1: starts = np.insert(starts, 0, 0)
-                    if voiced_ints[-1] == 1: ends = np.append(ends, len(voiced_ints))
-                    for start_idx, end_idx in zip(starts, ends):
-                        if end_idx - start_idx > 2:
-                            segment = f0_raw[start_idx:end_idx]; segment_series = pd.Series(segment)
-                            interpolated_segment = segment_series.interpolate(method='linear', limit_direction='both', limit=2).to_numpy()
-                            f0_postprocessed[start_idx:end_idx] = interpolated_segment
-
-                times = librosa.times_like(f0_raw, sr=self.sr)
-                if len(intensity) > len(times):
-                    intensity = intensity[:len(times)]
-                elif len(intensity) < len(times):
-                    intensity = np.pad(intensity, (0, len(times) - len(intensity)), 'constant', constant_values=0)
-
-                self.finished.emit({
-                    'f0_raw': (times, f0_raw),
-                    'f0_derived': (times, f0_postprocessed),
-                    'intensity': intensity,
-                })
-
-            else: # --- 普通模式逻辑 ---
-                pre_emphasis = self.kwargs.get('pre_emphasis', False)
-                user_f0_min = self.kwargs.get('f0_min', librosa.note_to_hz('C2'))
-                user_f0_max = self.kwargs.get('f0_max', librosa.note_to_hz('C7'))
-                forced_hop_length = self.kwargs.get('forced_hop_length')
-                chunk_size_ms = self.kwargs.get('chunk_size_ms', 200)
-                chunk_overlap_ms = self.kwargs.get('chunk_overlap_ms', 10)
-                
-                y_analyzed = librosa.effects.preemphasis(self.y) if pre_emphasis else self.y
-
-                final_f0_min, final_f0_max = user_f0_min, user_f0_max
-                try:
-                    y_coarse = librosa.resample(self.y, orig_sr=self.sr, target_sr=8000)
-                    f0_coarse, _, _ = librosa.pyin(
-                        y_coarse, fmin=30, fmax=1200, sr=8000,
-                        frame_length=1024, hop_length=512
-                    )
-                    valid_f0_coarse = f0_coarse[np.isfinite(f0_coarse)]
-
-                    if len(valid_f0_coarse) > 10:
-                        p5, p95 = np.percentile(valid_f0_coarse, [5, 95])
-                        padding = (p95 - p5) * 0.15
-                        final_f0_min = max(user_f0_min, p5 - padding)
-                        final_f0_max = min(user_f0_max, p95 + padding)
-                except Exception:
-                    pass
-
-                if forced_hop_length is not None:
-                    hop_length = forced_hop_length
+
+                # [新增] 多进程模式：worker_count > 1 时把各块分发到进程池
+                worker_count = self.kwargs.get('worker_count', 1)
+                if worker_count > 1 and len(chunk_starts) > 1:
+                    completed = self._run_chunks_in_process_pool(chunk_starts, chunk_args, worker_count)
                 else:
-                    render_density = self.kwargs.get('render_density', 4)
-                    narrow_band_window_s = 0.035
-                    base_n_fft_for_hop = 1 << (int(self.sr * narrow_band_window_s) - 1).bit_length()
-                    render_overlap_ratio = 1 - (1 / (2**render_density))
-                    hop_length = int(base_n_fft_for_hop * (1 - render_overlap_ratio)) or 1
-                
-                chunk_size_samples = int((chunk_size_ms / 1000) * self.sr)
-                overlap_samples = int((chunk_overlap_ms / 1000) * self.sr)
-                step_size_samples = chunk_size_samples - overlap_samples
-                if step_size_samples <= 0:
-                    step_size_samples = hop_length
-                
-                frame_length = 1 << (int(self.sr * 0.040) - 1).bit_length()
-                
-                current_pos_samples = 0
-                while current_pos_samples < len(self.y):
-                    if QThread.currentThread().isInterruptionRequested():
-                        self.finished.emit({})
-                        return
-
-                    start_sample = current_pos_samples
-                    end_sample = start_sample + chunk_size_samples
-                    y_chunk, y_chunk_analyzed = self.y[start_sample:end_sample], y_analyzed[start_sample:end_sample]
-
-                    if len(y_chunk) == 0: break
-
-                    f0_raw, voiced_flags, _ = librosa.pyin(
-                        y_chunk_analyzed, fmin=final_f0_min, fmax=final_f0_max, sr=self.sr,
-                        frame_length=frame_length, hop_length=hop_length
-                    )
-                    
-                    if len(f0_raw) > 0:
-                        f0_postprocessed = np.full_like(f0_raw, np.nan)
-                        voiced_ints = voiced_flags.astype(int)
-                        if len(voiced_ints) > 0:
-                            starts, ends = np.where(np.diff(voiced_ints) == 1)[0] + 1, np.where(np.diff(voiced_ints) == -1)[0] + 1
-                            if voiced_ints[0] == 1: starts = np.insert(starts, 0, 0)
-                            if voiced_ints[-1] == 1: ends = np.append(ends, len(voiced_ints))
-                            for start_idx, end_idx in zip(starts, ends):
-                                if end_idx - start_idx > 2:
-                                    segment = f0_raw[start_idx:end_idx]; segment_series = pd.Series(segment)
-                                    interpolated_segment = segment_series.interpolate(method='linear', limit_direction='both', limit=2).to_numpy()
-                                    f0_postprocessed[start_idx:end_idx] = interpolated_segment
-                    else:
-                        f0_postprocessed = f0_raw
-                    
-                    intensity = librosa.feature.rms(y=y_chunk, frame_length=frame_length, hop_length=hop_length)[0]
-                    
-                    num_frames_in_step = math.ceil(step_size_samples / hop_length)
-                    times_in_chunk = librosa.times_like(f0_raw, sr=self.sr, hop_length=hop_length)
-                    global_times = times_in_chunk + (start_sample / self.sr)
-                    
-                    self.chunk_finished.emit({
-                        'f0_raw': (global_times[:num_frames_in_step], f0_raw[:num_frames_in_step]),
-                        'f0_derived': (global_times[:num_frames_in_step], f0_postprocessed[:num_frames_in_step]),
-                        'intensity': intensity[:num_frames_in_step],
-                    })
-                    
-                    current_pos_samples += step_size_samples
-
-                self.finished.emit({'hop_length': hop_length})
+                    completed = self._run_chunks_sequentially(chunk_starts, chunk_args)
+                if not completed:
+                    self.finished.emit({})
+                    return
+
+                self.finished.emit({'hop_length': hop_length, 'coarse_f0_range': coarse_f0_range,
+                                    'coarse_f0_method': coarse_f0_method})
         
         except Exception as e:
             import traceback
             traceback.print_exc()
             self.error.emit(f"{e}")
 
+    def _run_chunks_sequentially(self, chunk_starts, chunk_args):
+        """在当前线程中逐块分析。返回 False 表示被用户中断。"""
+        for start in chunk_starts:
+            if QThread.currentThread().isInterruptionRequested():
+                return False
+            self.chunk_finished.emit(analyze_pyin_chunk(*chunk_args(start)))
+        return True
+
+    def _run_chunks_in_process_pool(self, chunk_starts, chunk_args, worker_count):
+        """
+        [新增] 将各块分发到进程池并行分析，仍按时间顺序逐块发出 chunk_finished。
+        同时在途的块数被限制为进程数的数倍，避免长音频一次性复制全部数据到子进程。
+        返回 False 表示被用户中断。
+        """
+        pool = get_process_pool(worker_count)
+        max_in_flight = worker_count * 4
+        pending = deque()
+        starts_iter = iter(chunk_starts)
+
+        def fill_queue():
+            for start in starts_iter:
+                pending.append(pool.submit(analyze_pyin_chunk, *chunk_args(start)))
+                if len(pending) >= max_in_flight:
+                    break
+
+        fill_queue()
+        while pending:
+            future = pending[0]
+            # 以短超时轮询队首结果，以便及时响应进度对话框的“取消”
+            while not future.done():
+                if QThread.currentThread().isInterruptionRequested():
+                    for f in pending: f.cancel()
+                    return False
+                futures_wait([future], timeout=0.1)
+            pending.popleft()
+            self.chunk_finished.emit(future.result())
+            fill_queue()
+        return True
+
     def _run_spectrogram_task(self):
         """
         执行语谱图分析任务。
@@ -252,151 +225,77 @@ class AudioTaskWorker(QObject):
         render_density = self.kwargs.get('render_density', 4)
         pre_emphasis = self.kwargs.get('pre_emphasis', False)
         
-        y_analyzed = librosa.effects.preemphasis(self.y) if pre_emphasis else self.y
-        
-        narrow_band_window_s = 0.035
-        base_n_fft_for_hop = 1 << (int(self.sr * narrow_band_window_s) - 1).bit_length()
-        render_overlap_ratio = 1 - (1 / (2**render_density))
-        render_hop_length = int(base_n_fft_for_hop * (1 - render_overlap_ratio)) or 1
-
-        spectrogram_window_s = 0.005 if is_wide_band else narrow_band_window_s
-        n_fft_spectrogram = 1 << (int(self.sr * spectrogram_window_s) - 1).bit_length()
-        
-        D = librosa.stft(y_analyzed, hop_length=render_hop_length, n_fft=n_fft_spectrogram)
-        S_db = librosa.amplitude_to_db(np.abs(D), ref=np.max)
+        render_hop_length, n_fft_spectrogram = spectrogram_params(self.sr, render_density, is_wide_band)
+        # 单张完整语谱图只用于较短的音频；按块计算 STFT，不会一次性生成完整的复数矩阵
+        S_quantized = compute_spectrogram(self.y, self.sr, render_hop_length, n_fft_spectrogram, pre_emphasis)
 
-        # [核心修改] 任务完成后，只发送语谱图结果
+        # [核心修改] 任务完成后，只发送语谱图结果；语谱图已量化为 uint8，界面直接用调色板着色
         self.finished.emit({
-            'S_db': S_db,
+            'S_db': S_quantized,
             'hop_length': render_hop_length
         })
 
     def _run_formant_view_task(self):
         """
         执行仅分析可见区域共振峰的任务。
+        [v2.6] 只分析页面给出的、尚未分析过的子区间 (ranges)，每完成一段就通过 chunk_finished 发出；
+        帧位于全局网格上、能量参考取整段音频，各段可以直接拼入页面的区间缓存，
+        已发出的段即使任务随后被取消也不会浪费。
         """
         # 获取要分析的音频片段的起始和结束采样点
         start_sample, end_sample = self.kwargs.get('start_sample', 0), self.kwargs.get('end_sample', len(self.y))
         # 获取跳跃长度和是否预加重
         hop_length = self.kwargs.get('hop_length', 128)
         pre_emphasis = self.kwargs.get('pre_emphasis', False)
-        
-        # 提取当前视图内的音频数据
-        y_view_orig = self.y[start_sample:end_sample]
-        
-        # 直接调用辅助函数进行共振峰分析
-        formant_points = self._analyze_formants_helper(y_view_orig, self.sr, hop_length, start_sample, pre_emphasis)
-
-        # 任务完成后，发出 finished 信号，携带共振峰数据
-        self.finished.emit({'formants_view': formant_points})
-
-    def _analyze_formants_helper(self, y_data, sr, hop_length, start_offset, pre_emphasis):
-        """
-        改进版的共振峰分析（窗口化、LPC 阶数保护、按带宽筛选候选）。
-        Returns: list of (sample_center, [F1, F2, ...])
-        """
-        # 预加重（如果需要）
-        y_proc = librosa.effects.preemphasis(y_data) if pre_emphasis else y_data
-
-        # 帧与阶数设置
-        frame_length = int(sr * 0.025)  # 25 ms
-        if frame_length < 16:
-            frame_length = max(16, len(y_proc))
-        # 推荐的初始阶数（保持你原先思路），但进行上下界约束
-        order = int(2 + sr // 1000)
-        # 阶数不得超过 (frame_length - 2) 且至少为 6
-        order = max(6, min(order, max(6, frame_length - 2)))
-
-        formant_points = []
-
-        # 能量判断
-        rms = librosa.feature.rms(y=y_data, frame_length=frame_length, hop_length=hop_length)[0]
-        energy_threshold = np.max(rms) * 0.05 if np.max(rms) > 0 else 0
-        frame_index = 0
-
-        # 预定义 formant band，并确保不超过 Nyquist
-        nyq = sr / 2.0
-        formant_ranges = [
-            (250, min(800, nyq)),
-            (800, min(2200, nyq)),
-            (2200, min(3000, nyq)),
-            (3000, min(4000, nyq))
-        ]
+        worker_count = self.kwargs.get('worker_count', 1)
+        ranges = self.kwargs.get('ranges') or [(start_sample, end_sample)]
 
-        for i in range(0, len(y_proc) - frame_length, hop_length):
-            if frame_index < len(rms) and rms[frame_index] < energy_threshold:
-                frame_index += 1
-                continue
+        energy_reference = self.kwargs.get('energy_reference')
+        if energy_reference is None:
+            energy_reference = formant_energy_reference(self.y, self.sr, hop_length)
+        params = {'hop_length': hop_length, 'pre_emphasis': pre_emphasis, 'energy_reference': energy_reference}
 
-            y_frame = y_proc[i: i + frame_length]
-            if len(y_frame) < frame_length:
-                frame_index += 1
-                continue
-
-            # 去均值 + 窗函数（非常关键）
-            y_frame = y_frame - np.mean(y_frame)
-            win = np.hamming(len(y_frame))
-            y_frame = y_frame * win
-
-            # 跳过低能量/无效帧
-            if np.max(np.abs(y_frame)) < 1e-6 or not np.isfinite(y_frame).all():
-                frame_index += 1
-                continue
+        for range_start, range_end in ranges:
+            if QThread.currentThread().isInterruptionRequested():
+                self.finished.emit({})
+                return
+            formant_points = analyze_formants_range(self.y, self.sr, hop_length, range_start, range_end, pre_emphasis,
+                                                    energy_reference, worker_count=worker_count)
+            self.chunk_finished.emit(dict(params, formant_range=(range_start, range_end), formants=formant_points))
+
+        # 任务完成后，发出 finished 信号；共振峰数据已逐段发出
+        self.finished.emit(dict(params, formant_range=(start_sample, end_sample)))
+
+    def _run_reanalyze_selection_task(self):
+        """
+        [新增] 只重新分析选区：F0/强度按已有结果中选区内的帧 (frame_times) 重新计算，
+        共振峰按当前参数重新计算选区范围；结果由页面拼接回现有数据。
+        """
+        results = {}
+        frame_times = self.kwargs.get('frame_times')
+        if frame_times is not None and len(frame_times) > 0:
+            results.update(reanalyze_acoustics_segment(
+                self.y, self.sr, frame_times, self.kwargs['f0_min'], self.kwargs['f0_max'],
+                self.kwargs['hop_length'], self.kwargs['frame_length'], self.kwargs.get('pre_emphasis', False),
+                self.kwargs.get('backend', 'pyin')))
+            results.update(start_index=self.kwargs['start_index'], frame_times=frame_times)
+
+        formant_hop_length = self.kwargs.get('formant_hop_length')
+        if formant_hop_length is not None:
+            if QThread.currentThread().isInterruptionRequested():
+                self.finished.emit({})
+                return
+            start_sample, end_sample = self.kwargs['start_sample'], self.kwargs['end_sample']
+            energy_reference = self.kwargs.get('energy_reference')
+            if energy_reference is None:
+                energy_reference = formant_energy_reference(self.y, self.sr, formant_hop_length)
+            formant_points = analyze_formants_range(self.y, self.sr, formant_hop_length, start_sample, end_sample,
+                                                    self.kwargs.get('pre_emphasis', False), energy_reference)
+            results.update(formants=formant_points, formant_range=(start_sample, end_sample),
+                           formant_hop_length=formant_hop_length, energy_reference=energy_reference,
+                           pre_emphasis=self.kwargs.get('pre_emphasis', False))
 
-            try:
-                # LPC：如遇数值问题，跳过
-                if len(y_frame) <= order:
-                    frame_index += 1
-                    continue
-
-                a = librosa.lpc(y_frame, order=order)
-                if not np.isfinite(a).all():
-                    frame_index += 1
-                    continue
-
-                roots_all = np.roots(a)
-
-                # 只保留上半平面根（imag >= 0）并且在合理幅度范围内 (避免 0 或 >1 的极端值)
-                roots = [r for r in roots_all if np.imag(r) >= 0 and 0.001 < np.abs(r) < 0.9999]
-
-                candidates = []
-                for r in roots:
-                    ang = np.angle(r)
-                    freq = ang * (sr / (2 * np.pi))
-                    if freq <= 0 or freq >= nyq:
-                        continue
-                    # 带宽（Hz）：常用离散极点到带宽的映射
-                    bw = - (sr / np.pi) * np.log(np.abs(r))
-                    # 忽掉非常大的带宽（噪声 / 非共振峰）
-                    if bw <= 0 or bw > 1000:  # 1000Hz 上限可调，默认保守
-                        continue
-                    candidates.append((freq, bw))
-
-                # 按频率排序（便于在各个 band 中选择）
-                candidates.sort(key=lambda x: x[0])
-
-                found_formants = []
-                # 对每个 formant band，选择带宽最小的 candidate（更尖锐更可靠）
-                for f_min, f_max in formant_ranges:
-                    band_cands = [(f, bw) for (f, bw) in candidates if f_min <= f <= f_max]
-                    if not band_cands:
-                        continue
-                    # 根据带宽选择最“尖锐”的峰
-                    best = min(band_cands, key=lambda x: x[1])
-                    found_formants.append(best[0])
-
-                if found_formants:
-                    sample_center = start_offset + i + frame_length // 2
-                    formant_points.append((sample_center, found_formants))
-
-            except Exception:
-                # 出现数值问题就跳过该帧
-                frame_index += 1
-                continue
-
-            frame_index += 1
-
-        return formant_points
+        self.finished.emit(results)
 
 
 # ExportDialog 类：用于设置图片导出选项的对话框
@@ -608,6 +507,204 @@ class TimeAxisWidget(QWidget):
             painter.setPen(self.line_color) # 换回线条颜色
 
 
+# --- [新增] 长音频语谱图的分块金字塔 ---
+class SpectrogramTileWorker(QObject):
+    """在后台线程中按需计算语谱图分块。每次只处理一个请求，由 SpectrogramTilePyramid 调度。"""
+    reference_ready = pyqtSignal(float)
+    tile_ready = pyqtSignal(object, object) # (分块键, uint8 数组)
+
+    def __init__(self, y, hop_length, n_fft, pre_emphasis):
+        super().__init__()
+        self.y, self.hop_length, self.n_fft, self.pre_emphasis = y, hop_length, n_fft, pre_emphasis
+
+    def compute_reference(self):
+        # 以 50% 重叠的帧移估计全局参考幅度，覆盖每一个采样点，但计算量远小于完整语谱图
+        ref_hop = max(self.hop_length, self.n_fft // 2)
+        cancel_check = QThread.currentThread().isInterruptionRequested
+        ref = estimate_spectrogram_reference(self.y, self.n_fft, ref_hop, self.pre_emphasis, cancel_check=cancel_check)
+        if not cancel_check(): # 金字塔已关闭时不再发出结果
+            self.reference_ready.emit(ref)
+
+    def compute_tile(self, key, ref_amplitude, n_frames):
+        if QThread.currentThread().isInterruptionRequested():
+            return
+        level, index = key
+        hop = self.hop_length << level
+        data = compute_spectrogram_tile(self.y, hop, self.n_fft, index * SpectrogramTilePyramid.TILE_FRAMES,
+                                        n_frames, self.pre_emphasis, ref_amplitude)
+        if not QThread.currentThread().isInterruptionRequested():
+            self.tile_ready.emit(key, data)
+
+
+class SpectrogramTilePyramid(QObject):
+    """
+    长音频语谱图的多分辨率分块金字塔。
+    第 L 层的帧移为基础帧移的 2^L 倍；每个分块固定包含 TILE_FRAMES 帧。
+    分块只在视图需要时才在后台线程中计算（当前视图内的分块优先，离视图中心越近越先），
+    计算结果以量化后的 uint8 形式保存在有容量上限的 LRU 缓存中，
+    因此整个文件从不需要以一张完整图像的形式驻留内存。
+    """
+    TILE_FRAMES = 512
+    DEFAULT_CACHE_BYTES = 192 * 1024 * 1024
+
+    tiles_updated = pyqtSignal()
+    _reference_requested = pyqtSignal()
+    _tile_requested = pyqtSignal(object, float, int)
+
+    def __init__(self, y, sr, hop_length, n_fft, pre_emphasis, max_cache_bytes=DEFAULT_CACHE_BYTES):
+        super().__init__()
+        self.y, self.sr, self.hop_length, self.n_fft, self.pre_emphasis = y, sr, hop_length, n_fft, pre_emphasis
+        self.n_bins = 1 + n_fft // 2
+        self.max_cache_bytes = max_cache_bytes
+        self.ref_amplitude = None
+        self._tiles = OrderedDict() # key -> (uint8 数组, QImage)
+        self._cache_bytes = 0
+        self._pending = []          # 等待计算的分块键，按优先级排列
+        self._in_flight = None      # 正在后台计算的分块键
+        self._color_table = [QColor(Qt.white).rgba()] * 256
+
+        self.max_level = 0
+        while self._frames_at_level(self.max_level) > self.TILE_FRAMES:
+            self.max_level += 1
+
+        self._thread = QThread()
+        self._worker = SpectrogramTileWorker(y, hop_length, n_fft, pre_emphasis)
+        self._worker.moveToThread(self._thread)
+        self._reference_requested.connect(self._worker.compute_reference)
+        self._tile_requested.connect(self._worker.compute_tile)
+        self._worker.reference_ready.connect(self._on_reference_ready)
+        self._worker.tile_ready.connect(self._on_tile_ready)
+        self._thread.start()
+        self._reference_requested.emit()
+
+    def _frames_at_level(self, level):
+        """与 librosa.stft(center=True) 相同的帧数。"""
+        return 1 + len(self.y) // (self.hop_length << level)
+
+    def _tile_frame_count(self, level, index):
+        return max(0, min(self.TILE_FRAMES, self._frames_at_level(level) - index * self.TILE_FRAMES))
+
+    def tile_sample_span(self, level):
+        return self.TILE_FRAMES * (self.hop_length << level)
+
+    def choose_level(self, view_width_samples, pixel_width):
+        """选择使每个像素约对应 1~2 帧的层级，避免为看不见的细节计算分块。"""
+        frames_per_pixel = view_width_samples / self.hop_length / max(1, pixel_width)
+        level = int(math.floor(math.log2(frames_per_pixel))) if frames_per_pixel > 1 else 0
+        return max(0, min(level, self.max_level))
+
+    def set_color_table(self, color_table):
+        """更新调色板；已缓存的分块只需替换颜色表，无需重新计算。"""
+        self._color_table = color_table
+        for _, image in self._tiles.values():
+            image.setColorTable(color_table)
+
+    def tiles_for_view(self, start_sample, end_sample, pixel_width, synchronous=False):
+        """
+        返回绘制当前视图所需的分块列表 [(样本起点, 样本终点, QImage 或 None, 源矩形), ...]，
+        并把缺失的分块加入后台计算队列（视图中心附近优先，并预取左右各一个分块）。
+        synchronous=True 时（例如离屏导出）直接在当前线程中补齐缺失的分块。
+        """
+        level = self.choose_level(end_sample - start_sample, pixel_width)
+        span = self.tile_sample_span(level)
+        n_tiles = -(-self._frames_at_level(level) // self.TILE_FRAMES)
+        first = max(0, int(start_sample) // span)
+        last = min(n_tiles - 1, max(first, (int(end_sample) - 1) // span))
+
+        if synchronous and self.ref_amplitude is None:
+            self.ref_amplitude = estimate_spectrogram_reference(
+                self.y, self.n_fft, max(self.hop_length, self.n_fft // 2), self.pre_emphasis)
+
+        visible, missing = [], []
+        for index in range(first, last + 1):
+            key = (level, index)
+            entry = self._tiles.get(key)
+            if entry is None and synchronous:
+                n_frames = self._tile_frame_count(level, index)
+                self._store_tile(key, compute_spectrogram_tile(self.y, self.hop_length << level, self.n_fft,
+                                                               index * self.TILE_FRAMES, n_frames,
+                                                               self.pre_emphasis, self.ref_amplitude))
+                entry = self._tiles.get(key)
+            if entry is not None:
+                self._tiles.move_to_end(key)
+            else:
+                missing.append(key)
+            frames = self._tile_frame_count(level, index)
+            tile_start = index * span
+            image, source_rect = (entry[1], QRectF(0, 0, frames, self.n_bins)) if entry is not None \
+                else self._fallback_image(level, index, frames)
+            visible.append((tile_start, tile_start + frames * (self.hop_length << level), image, source_rect))
+
+        if not synchronous:
+            center = (first + last) / 2
+            missing.sort(key=lambda k: abs(k[1] - center))
+            for index in (first - 1, last + 1): # 预取相邻分块，使平移时更流畅
+                if 0 <= index < n_tiles and (level, index) not in self._tiles:
+                    missing.append((level, index))
+            self._pending = missing
+            self._dispatch_next()
+        return visible
+
+    def _fallback_image(self, level, index, frames):
+        """
+        缺失分块的临时替代：寻找已缓存的更粗层级分块，并裁剪出对应的区域。
+        返回 (QImage, 源矩形)，没有可用替代时返回 (None, None)。
+        """
+        for coarser in range(level + 1, self.max_level + 1):
+            shift = coarser - level
+            entry = self._tiles.get((coarser, index >> shift))
+            if entry is not None:
+                x = (index - ((index >> shift) << shift)) * self.TILE_FRAMES / (1 << shift)
+                return entry[1], QRectF(x, 0, frames / (1 << shift), self.n_bins)
+        return None, None
+
+    def _dispatch_next(self):
+        if self._in_flight is not None or self.ref_amplitude is None:
+            return
+        while self._pending:
+            key = self._pending.pop(0)
+            if key not in self._tiles:
+                self._in_flight = key
+                self._tile_requested.emit(key, self.ref_amplitude, self._tile_frame_count(*key))
+                return
+
+    def _on_reference_ready(self, ref):
+        if self.ref_amplitude is None:
+            self.ref_amplitude = ref
+        self._dispatch_next()
+        self.tiles_updated.emit()
+
+    def _on_tile_ready(self, key, data):
+        self._in_flight = None
+        self._store_tile(key, data)
+        self._dispatch_next()
+        self.tiles_updated.emit()
+
+    def _store_tile(self, key, data):
+        # 低频在下：上下翻转后按 4 字节对齐宽度保存，以便直接作为 Indexed8 图像的缓冲区
+        padded_width = (self.TILE_FRAMES + 3) // 4 * 4
+        buffer = np.zeros((data.shape[0], padded_width), dtype=np.uint8)
+        buffer[:, :data.shape[1]] = data[::-1]
+        image = QImage(buffer.data, padded_width, buffer.shape[0], padded_width, QImage.Format_Indexed8)
+        image.setColorTable(self._color_table)
+        if key in self._tiles:
+            self._cache_bytes -= self._tiles.pop(key)[0].nbytes
+        self._tiles[key] = (buffer, image)
+        self._cache_bytes += buffer.nbytes
+        while self._cache_bytes > self.max_cache_bytes and len(self._tiles) > 1:
+            _, (old_buffer, _) = self._tiles.popitem(last=False)
+            self._cache_bytes -= old_buffer.nbytes
+
+    def shutdown(self):
+        """停止后台线程并释放所有分块。"""
+        self._pending = []
+        self._thread.requestInterruption()
+        self._thread.quit()
+        self._thread.wait()
+        self._tiles.clear()
+        self._cache_bytes = 0
+
+
 # SpectrogramWidget 类：核心细节视图，显示语谱图和叠加的声学特征
 class SpectrogramWidget(QWidget):
     # 定义信号，用于与主页面通信
@@ -617,6 +714,7 @@ class SpectrogramWidget(QWidget):
     exportAnalysisToCsvRequested = pyqtSignal()    # 请求导出分析数据为CSV时发送
     exportSelectionAsWavRequested = pyqtSignal()   # 请求导出选区音频为WAV时发送
     spectrumSliceRequested = pyqtSignal(int)       # 请求显示频谱切片时发送，携带采样点位置
+    reanalyzeSelectionRequested = pyqtSignal()     # [新增] 请求只重新分析选区时发送
 
     def __init__(self, parent, icon_manager):
         """
@@ -644,6 +742,8 @@ class SpectrogramWidget(QWidget):
 
         # --- 其他所有旧属性保持不变 ---
         self.spectrogram_image = None # 存储语谱图的QImage
+        self.tile_pyramid = None # [新增] 长音频使用的分块金字塔 (SpectrogramTilePyramid)，与 spectrogram_image 二选一
+        self._synchronous_tiles = False # [新增] 离屏导出时同步补齐缺失分块
         self._view_start_sample, self._view_end_sample = 0, 1 # 当前视图窗口的采样点范围
         self.sr, self.hop_length = 1, 256 # 采样率和语谱图跳跃长度
         self._playback_pos_sample = -1 # 播放光标位置 (采样点)
@@ -653,6 +753,12 @@ class SpectrogramWidget(QWidget):
         self._intensity_data = None  # 强度数据 (numpy array)
         self._formants_data = []     # 共振峰数据 [(sample_pos, [F1, F2, F3...]), ...]
         self._f0_derived_data = None # 派生F0数据 (times, f0_interpolated_values)
+        self._append_buffers = {}    # [新增] 实时分析时逐块追加数据所用的 GrowableArray，键为数据名
+        # [新增] 叠加层几何缓存：{名称: (数据对象, 参数, QPolygonF 或 QPointF 列表)}，
+        # 只有数据对象被替换或视图/尺寸/显示范围变化时才重建，播放光标刷新时直接复用
+        self._overlay_cache = {}
+        # [新增] 分层渲染：背景层缓存及其有效标志（见 update() 与 paintEvent）
+        self._background_cache, self._background_key, self._background_valid = None, None, False
 
         # 叠加层可见性控制标志
         self._show_f0, self._show_f0_points, self._show_f0_derived = False, True, True
@@ -707,12 +813,12 @@ class SpectrogramWidget(QWidget):
     @pyqtProperty(QColor)
     def spectrogramMinColor(self): return self._spectrogramMinColor
     @spectrogramMinColor.setter
-    def spectrogramMinColor(self, color): self._spectrogramMinColor = color; self.update()
+    def spectrogramMinColor(self, color): self._spectrogramMinColor = color; self._refresh_spectrogram_colors(); self.update()
     
     @pyqtProperty(QColor)
     def spectrogramMaxColor(self): return self._spectrogramMaxColor
     @spectrogramMaxColor.setter
-    def spectrogramMaxColor(self, color): self._spectrogramMaxColor = color; self.update()
+    def spectrogramMaxColor(self, color): self._spectrogramMaxColor = color; self._refresh_spectrogram_colors(); self.update()
     
     @pyqtProperty(QColor)
     def intensityColor(self): return self._intensityColor
@@ -830,25 +936,12 @@ class SpectrogramWidget(QWidget):
         """
         if self._f0_data:
             times, f0_values = self._f0_data
-            valid_f0 = f0_values[np.isfinite(f0_values)]
-            
-            if len(valid_f0) > 1:
-                actual_min, actual_max = np.min(valid_f0), np.max(valid_f0)
-                data_range = actual_max - actual_min
-                padding = max(10, data_range * 0.1)
-                padded_min = actual_min - padding
-                padded_max = actual_max + padding
-                current_range = padded_max - padded_min
-                if current_range < 100:
-                    center = (padded_max + padded_min) / 2
-                    padded_min = center - 50
-                    padded_max = center + 50
-                
-                self._f0_display_min = max(0, padded_min)
-                self._f0_display_max = padded_max
+            display_range = auto_f0_display_range(f0_values)
+            if display_range is not None:
+                self._f0_display_min, self._f0_display_max = display_range
                 self._f0_axis_enabled = True
             else: 
-                self._f0_display_min, self._f0_display_max = 75, 400
+                self._f0_display_min, self._f0_display_max = DEFAULT_F0_DISPLAY_RANGE
                 self._f0_axis_enabled = False
         else:
             self._f0_data = None
@@ -865,7 +958,7 @@ class SpectrogramWidget(QWidget):
         else:
             self._selection_start_sample = None
             self._selection_end_sample = None
-        self.update() # 触发重绘以更新选区显示
+        self._update_top_layer() # 触发重绘以更新选区显示
 
     def update_formants_data(self, formants_data, clear_previous=True):
         """
@@ -896,9 +989,7 @@ class SpectrogramWidget(QWidget):
         Returns:
             QRect: 绘图区域的矩形。
         """
-        padding_left, padding_right = 45, 45
-        padding_top, padding_bottom = 10, 10
-        return self.rect().adjusted(padding_left, padding_top, -padding_right, -padding_bottom)
+        return plot_rect_for(self.rect())
 
     def _pixel_to_sample(self, x_pixel):
         """
@@ -940,176 +1031,119 @@ class SpectrogramWidget(QWidget):
         x_ratio = sample_offset / view_width_samples # 计算采样点在视图内的比例
         return int(plot_rect.left() + x_ratio * plot_rect.width()) # 返回实际像素X坐标
 
-    def paintEvent(self, event):
+    def update(self, *args):
         """
-        [v2.0 - Optimized] 绘制语谱图及其所有叠加层。
-        此版本使用 numpy.searchsorted 对所有叠加层数据进行高效裁剪，
-        仅绘制当前视图内的部分，极大地提升了缩放和平移的性能。
+        [v2.5] 分层渲染：除播放光标、选区和悬浮信息之外，任何重绘请求都意味着背景层
+        （语谱图、网格、坐标轴和分析叠加层）的内容可能已经变化，因此先使背景缓存失效。
+        只涉及顶层的重绘请使用 _update_top_layer()。
         """
+        self._background_valid = False
+        super().update(*args)
+
+    def _update_top_layer(self, rect=None):
+        """只重绘顶层（光标、选区、悬浮信息），直接复用缓存的背景层。"""
+        if rect is None:
+            QWidget.update(self)
+        else:
+            QWidget.update(self, rect)
+
+    def changeEvent(self, event):
+        if event.type() in (QEvent.StyleChange, QEvent.PaletteChange, QEvent.FontChange):
+            self._background_valid = False
+        super().changeEvent(event)
+
+    def paintEvent(self, event):
+        """
+        [v2.5 - 分层渲染] 背景层（语谱图、网格、坐标轴和全部分析叠加层）被渲染到一张缓存的
+        QPixmap 中，只有视图、数据或样式变化时才重新生成；每次重绘只需贴图，
+        再在其上绘制播放光标、选区和悬浮信息。播放时光标移动只会重绘光标附近的窄条区域。
+        """
+        dpr = self.devicePixelRatioF()
+        background_key = (self.width(), self.height(), dpr, self._view_start_sample, self._view_end_sample,
+                          self.sr, self.hop_length, self.max_display_freq)
+        if not self._background_valid or self._background_key != background_key:
+            background = QPixmap(max(1, math.ceil(self.width() * dpr)), max(1, math.ceil(self.height() * dpr)))
+            background.setDevicePixelRatio(dpr)
+            background_painter = QPainter(background)
+            self._paint_background(background_painter)
+            background_painter.end()
+            self._background_cache, self._background_key = background, background_key
+            self._background_valid = True
+
         painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._background_cache)
         painter.setRenderHint(QPainter.Antialiasing)
-        painter.fillRect(self.rect(), self._backgroundColor)
+        self._paint_top_layer(painter)
 
-        plot_rect = self._get_plot_rect()
-        
-        if not plot_rect.isValid(): return
+    def _paint_background(self, painter):
+        """
+        [v2.0 - Optimized] 绘制语谱图及其所有叠加层。
+        [v2.6] 绘制逻辑移至 audio_analysis_render.paint_spectrogram_layer，与离屏导出共用同一份代码，
+        控件只负责提供 scene/style 以及跨次绘制复用的几何缓存。
+        """
+        scene = self.render_scene(self._get_plot_rect().width(), synchronous_tiles=self._synchronous_tiles)
+        paint_spectrogram_layer(painter, self.rect(), scene, self.render_style(), self._overlay_cache, self.devicePixelRatioF())
+
+    def render_scene(self, plot_width, synchronous_tiles=False):
+        """
+        [新增] 当前视图与分析数据的渲染输入 (scene)，见 audio_analysis_render。
+        使用分块金字塔时在这里取出宽度为 plot_width 的绘图区所需的分块；
+        synchronous_tiles=True 时（离屏导出）同步补齐缺失的分块。
+        """
+        tiles = None
+        if self.tile_pyramid is not None and self._view_end_sample > self._view_start_sample:
+            tiles = self.tile_pyramid.tiles_for_view(self._view_start_sample, self._view_end_sample,
+                                                     plot_width, synchronous=synchronous_tiles)
+        return {
+            'sr': self.sr, 'hop_length': self.hop_length, 'max_display_freq': self.max_display_freq,
+            'view': (self._view_start_sample, self._view_end_sample),
+            'spectrogram': self.spectrogram_image, 'spectrogram_tiles': tiles,
+            'f0_data': self._f0_data, 'f0_derived_data': self._f0_derived_data,
+            'intensity_data': self._intensity_data, 'formants_data': self._formants_data,
+            'f0_display_range': (self._f0_display_min, self._f0_display_max) if self._f0_axis_enabled else None,
+        }
 
-        w, h = plot_rect.width(), plot_rect.height()
+    def render_style(self, axis_font=None):
+        """
+        [新增] 当前外观的渲染输入 (style)：颜色均转换为 QColor.rgba() 整数，
+        axis_font 为 None 时使用控件自身的字体。
+        """
+        rgba = lambda color: QColor(color).rgba()
+        return {
+            'background': rgba(self._backgroundColor),
+            'spectrogram_min_color': rgba(self._spectrogramMinColor), 'spectrogram_max_color': rgba(self._spectrogramMaxColor),
+            'axis_color': rgba(self._f0AxisColor), 'intensity_color': rgba(self._intensityColor),
+            'f0_color': rgba(self._f0Color), 'f0_derived_color': rgba(self._f0DerivedColor),
+            'f1_color': rgba(self._f1Color), 'f2_color': rgba(self._f2Color), 'formant_color': rgba(self._formantColor),
+            'point_outline_color': rgba(self._f0_point_outline_color), 'point_outline_width': self._point_outline_width,
+            'f0_point_outline': self._f0_point_has_outline, 'f1_point_outline': self._f1_point_has_outline,
+            'f2_point_outline': self._f2_point_has_outline, 'formant_point_outline': self._formant_point_has_outline,
+            'text_color': rgba(self.palette().color(QPalette.Text)),
+            'axis_font': self.font() if axis_font is None else axis_font,
+            'show_f0': self._show_f0, 'show_f0_points': self._show_f0_points, 'show_f0_derived': self._show_f0_derived,
+            'show_intensity': self._show_intensity, 'smooth_intensity': self._smooth_intensity,
+            'show_formants': self._show_formants, 'highlight_f1': self._highlight_f1,
+            'highlight_f2': self._highlight_f2, 'show_other_formants': self._show_other_formants,
+        }
+
+    def _cursor_x(self):
+        """播放光标的像素X坐标；光标不在当前视图内时返回 None。"""
         view_width_samples = self._view_end_sample - self._view_start_sample
-        if view_width_samples <= 0: return
+        if view_width_samples <= 0 or not (self._view_start_sample <= self._playback_pos_sample < self._view_end_sample):
+            return None
+        plot_rect = self._get_plot_rect()
+        return int(plot_rect.left() + (self._playback_pos_sample - self._view_start_sample) * plot_rect.width() / view_width_samples)
 
-        # --- 绘制语谱图背景 ---
-        if self.spectrogram_image:
-            start_frame = self._view_start_sample // self.hop_length
-            end_frame = self._view_end_sample // self.hop_length
-            view_width_frames = end_frame - start_frame
-            if view_width_frames > 0:
-                source_rect = QRect(start_frame, 0, view_width_frames, self.spectrogram_image.height())
-                painter.drawImage(plot_rect, self.spectrogram_image, source_rect)
-
-        # --- 绘制坐标轴和网格线 (此部分无需优化) ---
-        painter.setPen(QPen(self._f0AxisColor, 1, Qt.DotLine))
-        font = self.font()
-        font.setPointSize(8)
-        painter.setFont(font)
-        
-        for freq in range(0, int(self.max_display_freq) + 1, 1000):
-            if freq == 0 and self.max_display_freq > 0: continue
-            y = plot_rect.bottom() - (freq / self.max_display_freq * h)
-            painter.drawLine(plot_rect.left(), int(y), plot_rect.right(), int(y))
-            painter.drawText(QPointF(plot_rect.left() - 35, int(y) + 4), f"{freq}")
-        
-        if self._f0_axis_enabled:
-            f0_display_range = self._f0_display_max - self._f0_display_min
-            if f0_display_range > 0:
-                step = 50 if f0_display_range > 200 else 25 if f0_display_range > 100 else 10
-                metrics = painter.fontMetrics()
-                text_height = metrics.height()
-                for freq in range(int(self._f0_display_min // step * step), int(self._f0_display_max) + 1, step):
-                    if freq < self._f0_display_min: continue
-                    y = plot_rect.bottom() - ((freq - self._f0_display_min) / f0_display_range * h)
-                    painter.drawLine(plot_rect.left(), int(y), plot_rect.right(), int(y))
-                    painter.drawText(
-                        QRect(plot_rect.right() + 5, int(y) - text_height // 2, 
-                              plot_rect.right() - plot_rect.left() - 10, text_height),
-                        Qt.AlignLeft | Qt.AlignVCenter, f"{freq}"
-                    )
-
-        # --- [OPTIMIZED] 强度曲线 ---
-        if self._show_intensity and self._intensity_data is not None:
-            painter.setPen(QPen(self._intensityColor, 2))
-            data_to_plot = self._intensity_data
-            if self._smooth_intensity:
-                data_to_plot = pd.Series(data_to_plot).rolling(window=5, center=True, min_periods=1).mean().to_numpy()
-            
-            max_intensity = np.max(data_to_plot) if len(data_to_plot) > 0 else 1.0
-            if max_intensity == 0: max_intensity = 1.0
-
-            # 1. 创建采样点位置数组
-            sample_positions = np.arange(len(data_to_plot)) * self.hop_length
-            # 2. 使用二分查找快速定位视图范围内的起始和结束索引
-            start_idx = np.searchsorted(sample_positions, self._view_start_sample, side='left')
-            end_idx = np.searchsorted(sample_positions, self._view_end_sample, side='right')
-
-            intensity_points = []
-            # 3. 只遍历视图内的切片，而不是全部数据
-            for i in range(start_idx, end_idx):
-                sample_pos = sample_positions[i]
-                val = data_to_plot[i]
-                x = plot_rect.left() + (sample_pos - self._view_start_sample) * w / view_width_samples
-                y = plot_rect.bottom() - (val / max_intensity * h * 0.3) 
-                intensity_points.append(QPointF(x, y))
-                
-            if len(intensity_points) > 1:
-                painter.drawPolyline(*intensity_points)
-
-        # --- [OPTIMIZED] 基频曲线 (F0) ---
-        if self._show_f0 and self._f0_axis_enabled and f0_display_range > 0:
-            if self._show_f0_derived and self._f0_derived_data:
-                painter.setPen(QPen(self._f0DerivedColor, 1.5, Qt.DashLine))
-                derived_times, derived_f0 = self._f0_derived_data
-                
-                # 优化：快速找到可视区域的数据
-                sample_positions = derived_times * self.sr
-                start_idx = np.searchsorted(sample_positions, self._view_start_sample, side='left')
-                end_idx = np.searchsorted(sample_positions, self._view_end_sample, side='right')
-                
-                derived_points = []
-                # 只遍历切片
-                for i in range(start_idx, end_idx):
-                    if np.isfinite(derived_f0[i]):
-                        sample_pos = sample_positions[i]
-                        x = plot_rect.left() + (sample_pos - self._view_start_sample) * w / view_width_samples
-                        y = plot_rect.bottom() - ((derived_f0[i] - self._f0_display_min) / f0_display_range * h)
-                        derived_points.append(QPointF(x, y))
-
-                if len(derived_points) > 1:
-                    painter.drawPolyline(*derived_points)
-
-            if self._show_f0_points and self._f0_data:
-                raw_times, raw_f0 = self._f0_data
-                
-                # 优化：快速找到可视区域的数据
-                sample_positions = raw_times * self.sr
-                start_idx = np.searchsorted(sample_positions, self._view_start_sample, side='left')
-                end_idx = np.searchsorted(sample_positions, self._view_end_sample, side='right')
-                
-                # 只遍历切片
-                for i in range(start_idx, end_idx):
-                    if np.isfinite(raw_f0[i]):
-                        sample_pos = sample_positions[i]
-                        x = plot_rect.left() + (sample_pos - self._view_start_sample) * w / view_width_samples
-                        y = plot_rect.bottom() - ((raw_f0[i] - self._f0_display_min) / f0_display_range * h)
-                        
-                        if self._f0_point_has_outline:
-                            painter.setPen(QPen(self._f0_point_outline_color, self._point_outline_width))
-                            painter.setBrush(self._f0Color)
-                            painter.drawEllipse(QPointF(x, y), 2.5, 2.5)
-                        else:
-                            painter.setPen(Qt.NoPen)
-                            painter.setBrush(self._f0Color)
-                            painter.drawEllipse(QPointF(x, y), 2.5, 2.5)
-        
-        # --- [OPTIMIZED] 共振峰点 ---
-        if self._show_formants and self._formants_data:
-            max_freq_y_axis = self.max_display_freq
-            
-            # 优化：提取所有采样点位置并快速查找可视区域
-            sample_positions = np.array([item[0] for item in self._formants_data])
-            start_idx = np.searchsorted(sample_positions, self._view_start_sample, side='left')
-            end_idx = np.searchsorted(sample_positions, self._view_end_sample, side='right')
-
-            # 只遍历切片
-            for i in range(start_idx, end_idx):
-                sample_pos, formants = self._formants_data[i]
-                x = plot_rect.left() + (sample_pos - self._view_start_sample) * w / view_width_samples
-                for i, f in enumerate(formants):
-                    brush, has_outline, outline_color, should_draw = None, False, None, False
-                    
-                    if i == 0 and self._highlight_f1:
-                        brush, has_outline, outline_color, should_draw = self._f1Color, self._f1_point_has_outline, self._f1_point_outline_color, True
-                    elif i == 1 and self._highlight_f2:
-                        brush, has_outline, outline_color, should_draw = self._f2Color, self._f2_point_has_outline, self._f2_point_outline_color, True
-                    elif i > 1 and self._show_other_formants:
-                        brush, has_outline, outline_color, should_draw = self._formantColor, self._formant_point_has_outline, self._formant_point_outline_color, True
-                    
-                    if should_draw:
-                        y = plot_rect.bottom() - (f / max_freq_y_axis * h)
-                        if plot_rect.top() <= y <= plot_rect.bottom():
-                            if has_outline:
-                                painter.setPen(QPen(self._f0_point_outline_color, self._point_outline_width))
-                                painter.setBrush(brush)
-                                painter.drawEllipse(QPointF(x, y), 2.5, 2.5)
-                            else:
-                                painter.setPen(Qt.NoPen)
-                                painter.setBrush(brush)
-                                painter.drawEllipse(QPointF(x, y), 2.5, 2.5)
-
-        # --- 播放光标、选区、悬浮信息 (这些部分本身很快，无需优化) ---
-        if self._view_start_sample <= self._playback_pos_sample < self._view_end_sample:
-            pos_x = plot_rect.left() + (self._playback_pos_sample - self._view_start_sample) * w / view_width_samples
+    def _cursor_rect(self, cursor_x):
+        """覆盖播放光标（2 像素宽、抗锯齿）的重绘区域。"""
+        return QRect(cursor_x - 3, 0, 7, self.height())
+
+    def _paint_top_layer(self, painter):
+        """绘制顶层：播放光标、选区和悬浮信息 (这些部分本身很快，每次重绘都直接绘制)。"""
+        cursor_x = self._cursor_x()
+        if cursor_x is not None:
             painter.setPen(QPen(self._cursorColor, 2))
-            painter.drawLine(int(pos_x), 0, int(pos_x), self.height())
+            painter.drawLine(cursor_x, 0, cursor_x, self.height())
 
         start_x_pixel, end_x_pixel = 0, 0
         if self._is_selecting:
@@ -1182,7 +1216,7 @@ class SpectrogramWidget(QWidget):
         """
         处理鼠标按下事件，开始选区拖动。
         """
-        if self.spectrogram_image is None:
+        if not self.has_spectrogram():
             return # 如果没有加载语谱图，则不处理
 
         # 如果鼠标点击在左右两侧的轴上（绘图区外），则清除选区
@@ -1193,7 +1227,7 @@ class SpectrogramWidget(QWidget):
                     self._selection_start_sample = None
                     self._selection_end_sample = None
                     self.selectionChanged.emit(None) # 通知上层选区已清除
-                    self.update()
+                    self._update_top_layer()
                 return
 
         if event.button() == Qt.LeftButton:
@@ -1207,7 +1241,7 @@ class SpectrogramWidget(QWidget):
                 self._selection_start_sample = None
                 self._selection_end_sample = None
                 self.selectionChanged.emit(None) # 通知上层选区已清除
-            self.update() # 触发重绘以显示新的选区状态
+            self._update_top_layer() # 触发重绘以显示新的选区状态
         
         super().mousePressEvent(event) # 调用父类的事件处理
 
@@ -1219,10 +1253,10 @@ class SpectrogramWidget(QWidget):
         # 1. 如果用户正在拖动选择区域，则优先更新选区并重绘
         if self._is_selecting:
             self._selection_end_x = event.pos().x()
-            self.update()
+            self._update_top_layer()
         
         # 2. 安全检查：如果没有任何音频数据，则不执行任何操作
-        if self.spectrogram_image is None:
+        if not self.has_spectrogram():
             super().mouseMoveEvent(event)
             return
 
@@ -1241,7 +1275,7 @@ class SpectrogramWidget(QWidget):
             if self._cursor_info_text:
                 # 如果有，则清空它并触发一次重绘以移除信息框
                 self._cursor_info_text = ""
-                self.update()
+                self._update_top_layer()
             
             # 调用父类的方法并立即退出，不再进行后续的耗时计算
             super().mouseMoveEvent(event)
@@ -1306,7 +1340,7 @@ class SpectrogramWidget(QWidget):
                     self._info_box_position = 'top_left'
 
         # 9. 触发重绘以显示更新后的信息
-        self.update()
+        self._update_top_layer()
         super().mouseMoveEvent(event)
 
 
@@ -1337,7 +1371,7 @@ class SpectrogramWidget(QWidget):
                 # 发射信号，通知控制器选区已确定
                 self.selectionChanged.emit((self._selection_start_sample, self._selection_end_sample))
             
-            self.update() # 触发重绘以显示最终选区
+            self._update_top_layer() # 触发重绘以显示最终选区
         super().mouseReleaseEvent(event) # 调用父类的事件处理
     
     def create_context_menu(self):
@@ -1385,6 +1419,13 @@ class SpectrogramWidget(QWidget):
             zoom_to_selection_action.triggered.connect(lambda: self.zoomToSelectionRequested.emit(self._selection_start_sample, self._selection_end_sample))
             menu.addAction(zoom_to_selection_action)
 
+            # [新增] 只重新分析选区（例如调整 F0 范围后修正一小段的倍频错误）
+            reanalyze_action = QAction(self.icon_manager.get_icon("analyze"), "仅重新分析选区", self)
+            reanalyze_action.setEnabled(has_analysis)
+            reanalyze_action.setToolTip("用当前参数重新计算选区内的 F0、强度和共振峰，其余部分保持不变。")
+            reanalyze_action.triggered.connect(self.reanalyzeSelectionRequested.emit)
+            menu.addAction(reanalyze_action)
+
         menu.addSeparator()
 
         # 3. 复制信息
@@ -1565,35 +1606,54 @@ class SpectrogramWidget(QWidget):
         if not menu.isEmpty(): # 如果菜单不为空，则显示
             menu.exec_(self.mapToGlobal(event.pos())) # 在鼠标位置显示菜单
 
+    # --- [新增] 分块语谱图 ---
+    def has_spectrogram(self):
+        """是否已有可显示的语谱图（完整图像或分块金字塔）。"""
+        return self.spectrogram_image is not None or self.tile_pyramid is not None
+
+    def set_tile_pyramid(self, pyramid):
+        """使用分块金字塔显示语谱图，替代一次性生成的完整图像。"""
+        self._release_tile_pyramid()
+        self.spectrogram_image = None
+        self.tile_pyramid = pyramid
+        self.sr, self.hop_length = pyramid.sr, pyramid.hop_length
+        self._refresh_spectrogram_colors()
+        pyramid.tiles_updated.connect(self.update)
+        # 控件被销毁（例如标签页刷新）时必须先停止后台线程
+        self.destroyed.connect(pyramid.shutdown)
+        self.update()
+
+    def _release_tile_pyramid(self):
+        if self.tile_pyramid is not None:
+            self.tile_pyramid.tiles_updated.disconnect(self.update)
+            self.destroyed.disconnect(self.tile_pyramid.shutdown)
+            self.tile_pyramid.shutdown()
+            self.tile_pyramid = None
+
+    def _spectrogram_color_table(self):
+        """由最小/最大颜色线性插值得到的 256 色调色板。"""
+        return spectrogram_color_table(QColor(self._spectrogramMinColor).rgba(), QColor(self._spectrogramMaxColor).rgba())
+
+    def _refresh_spectrogram_colors(self):
+        """主题颜色变化时只替换调色板，量化后的语谱图数据无需重新计算。"""
+        if getattr(self, 'spectrogram_image', None) is not None:
+            self.spectrogram_image.setColorTable(self._spectrogram_color_table())
+        if getattr(self, 'tile_pyramid', None) is not None:
+            self.tile_pyramid.set_color_table(self._spectrogram_color_table())
+
     # --- 其他方法 ---
     def set_data(self, S_db, sr, hop_length):
         """
         设置语谱图图像数据。
         Args:
-            S_db (np.ndarray): 语谱图的分贝矩阵。
+            S_db (np.ndarray): 语谱图的分贝矩阵，或 quantize_spectrogram 量化后的 uint8 矩阵。
             sr (int): 采样率。
             hop_length (int): 语谱图的跳跃长度。
         """
+        self._release_tile_pyramid()
         self.sr, self.hop_length = sr, hop_length
-        # 将分贝值归一化到0-1范围，以便映射到颜色
-        S_norm = (S_db - S_db.min()) / (S_db.max() - S_db.min() + 1e-6) # 归一化到0-1，加1e-6防止除以零
-        h, w = S_norm.shape # 获取语谱图的高度（频率bin数）和宽度（帧数）
-        rgba_data = np.zeros((h, w, 4), dtype=np.uint8) # 创建RGBA图像数据数组
-        
-        # 根据min/max颜色进行插值
-        min_color_obj, max_color_obj = QColor(self._spectrogramMinColor), QColor(self._spectrogramMaxColor)
-        min_c, max_c = np.array(min_color_obj.getRgb()), np.array(max_color_obj.getRgb())
-        
-        # 对每个像素进行颜色插值
-        interpolated_colors = min_c + (max_c - min_c) * (S_norm[..., np.newaxis])
-        rgba_data[..., :3] = interpolated_colors[..., :3].astype(np.uint8) # 复制RGB通道
-        rgba_data[..., 3] = 255 # 设置Alpha通道为255（完全不透明）
-        
-        # 垂直翻转数据，因为QImage的0,0点在左上角，而语谱图的0频率在底部
-        image_data = np.flipud(rgba_data)
-        
-        # 创建QImage
-        self.spectrogram_image = QImage(image_data.tobytes(), w, h, QImage.Format_RGBA8888).copy()
+        # [v2.5] 数据量化为 uint8 后保存为 Indexed8 图像，颜色由 256 色调色板决定，换主题时只需替换调色板
+        self.spectrogram_image = spectrogram_image(S_db, self._spectrogram_color_table())
         self.update() # 触发重绘
 
     def set_waveform_sibling(self, widget):
@@ -1620,7 +1680,7 @@ class SpectrogramWidget(QWidget):
         if self._cursor_info_text:
             self._cursor_info_text = ""
             self._info_box_position = 'top_left' # 重置信息框位置
-            self.update() # 触发重绘
+            self._update_top_layer() # 触发重绘
         super().leaveEvent(event)
 
     def set_analysis_data(self, f0_data=None, f0_derived_data=None, intensity_data=None, formants_data=None, clear_previous_formants=True):
@@ -1685,40 +1745,29 @@ class SpectrogramWidget(QWidget):
         将新分析出的数据块追加到现有数据中，并触发重绘。
         这用于实现实时呈现效果。
         """
+        # [核心修改] 数据追加到容量倍增的缓冲区中，避免每个数据块都重新拼接全部历史数据
         # --- 追加 F0 数据 ---
         if f0_chunk:
-            new_times, new_f0 = f0_chunk
-            if self._f0_data is None:
-                self._f0_data = (new_times, new_f0)
-            else:
-                old_times, old_f0 = self._f0_data
-                self._f0_data = (np.concatenate([old_times, new_times]), 
-                                 np.concatenate([old_f0, new_f0]))
+            old_times, old_f0 = self._f0_data if self._f0_data is not None else (None, None)
+            self._f0_data = (self._append_to_buffer('f0_times', old_times, f0_chunk[0]),
+                             self._append_to_buffer('f0_values', old_f0, f0_chunk[1]))
 
         # --- 追加派生 F0 数据 ---
         if f0_derived_chunk:
-            new_times, new_f0_derived = f0_derived_chunk
-            if self._f0_derived_data is None:
-                self._f0_derived_data = (new_times, new_f0_derived)
-            else:
-                old_times, old_f0_derived = self._f0_derived_data
-                self._f0_derived_data = (np.concatenate([old_times, new_times]), 
-                                         np.concatenate([old_f0_derived, new_f0_derived]))
+            old_times, old_f0_derived = self._f0_derived_data if self._f0_derived_data is not None else (None, None)
+            self._f0_derived_data = (self._append_to_buffer('f0_derived_times', old_times, f0_derived_chunk[0]),
+                                     self._append_to_buffer('f0_derived_values', old_f0_derived, f0_derived_chunk[1]))
 
         # --- 追加强度数据 ---
         if intensity_chunk is not None:
-            if self._intensity_data is None:
-                self._intensity_data = intensity_chunk
-            else:
-                self._intensity_data = np.concatenate([self._intensity_data, intensity_chunk])
+            self._intensity_data = self._append_to_buffer('intensity', self._intensity_data, intensity_chunk)
         
-        # 实时更新F0轴的范围
-        if self._f0_data:
-            _, all_f0_values = self._f0_data
-            valid_f0 = all_f0_values[np.isfinite(all_f0_values)]
-            if len(valid_f0) > 1:
+        # 实时更新F0轴的范围（缓冲区维护了有效值的最小/最大值，无需重新扫描全部F0数据）
+        f0_buffer = self._append_buffers.get('f0_values')
+        if self._f0_data and f0_buffer is not None and f0_buffer.view() is self._f0_data[1]:
+            if f0_buffer.finite_count > 1:
                 # 使用与 set_analysis_data 中相同的逻辑来更新轴范围
-                actual_min, actual_max = np.min(valid_f0), np.max(valid_f0)
+                actual_min, actual_max = f0_buffer.finite_min, f0_buffer.finite_max
                 data_range = actual_max - actual_min
                 padding = max(10, data_range * 0.1)
                 padded_min = actual_min - padding
@@ -1735,6 +1784,39 @@ class SpectrogramWidget(QWidget):
         # 触发重绘以在UI上显示新追加的数据
         self.update()
 
+    def splice_analysis_data(self, start_index, f0_values=None, f0_derived_values=None, intensity_values=None):
+        """
+        [新增] 用重新分析的一段数据替换从第 start_index 帧开始的 F0/强度数值，帧时间保持不变。
+        数组被替换为新的副本（而非原地修改），叠加层缓存据此只重建这几条曲线，语谱图背景不受影响。
+        """
+        def spliced(current, values):
+            current = np.array(current, dtype=np.result_type(current, values))
+            current[start_index:start_index + len(values)] = values
+            return current
+
+        if f0_values is not None and self._f0_data is not None:
+            self._f0_data = (self._f0_data[0], spliced(self._f0_data[1], f0_values))
+            if self._f0_axis_is_auto:
+                self._calculate_and_apply_auto_f0_range()
+        if f0_derived_values is not None and self._f0_derived_data is not None:
+            self._f0_derived_data = (self._f0_derived_data[0], spliced(self._f0_derived_data[1], f0_derived_values))
+        if intensity_values is not None and self._intensity_data is not None:
+            self._intensity_data = spliced(self._intensity_data, intensity_values)
+        self.update()
+
+    def _append_to_buffer(self, name, current, chunk):
+        """
+        把数据块追加到名为 name 的缓冲区，返回追加后全部数据的视图。
+        current 不是该缓冲区上次返回的视图时（首次追加，或数据已被 set_analysis_data/clear 替换），
+        以 current 为初始内容新建缓冲区。
+        """
+        buffer = self._append_buffers.get(name)
+        if buffer is None or current is None or buffer.view() is not current:
+            buffer = GrowableArray(current)
+            self._append_buffers[name] = buffer
+        buffer.append(chunk)
+        return buffer.view()
+
     def update_playback_position(self, position_ms):
         """
         更新播放光标位置。
@@ -1742,8 +1824,14 @@ class SpectrogramWidget(QWidget):
             position_ms (int): 当前播放位置（毫秒）。
         """
         if self.sr > 1:
+            old_x = self._cursor_x()
             self._playback_pos_sample = int(position_ms / 1000 * self.sr) # 毫秒转换为采样点
-            self.update() # 触发重绘
+            new_x = self._cursor_x()
+            # [v2.5] 只重绘光标移动前后所在的窄条区域，背景层直接复用缓存
+            if old_x != new_x:
+                for x in (old_x, new_x):
+                    if x is not None:
+                        self._update_top_layer(self._cursor_rect(x))
 
     def set_view_window(self, start_sample, end_sample):
         """
@@ -1768,10 +1856,13 @@ class SpectrogramWidget(QWidget):
         
         # 清除数据
         self.spectrogram_image = None
+        self._release_tile_pyramid()
         self._f0_data = None
         self._intensity_data = None
         self._formants_data = []
         self._f0_derived_data = None # 确保派生F0也清除
+        self._append_buffers = {}
+        self._overlay_cache.clear()
         
         self._playback_pos_sample = -1 # 重置播放光标
         self._cursor_info_text = ""    # 清除悬浮信息
@@ -1826,7 +1917,7 @@ class WaveformWidget(QWidget):
         self.setMinimumHeight(80) # 设置最小高度
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred) # 宽度可扩展，高度优先
         
-        self._y_full, self._y_overview, self._sr = None, None, 1 # 完整音频数据，概览数据，采样率
+        self._y_full, self._envelope, self._sr = None, None, 1 # 完整音频数据，多级最小/最大值包络，采样率
         self._view_start_sample, self._view_end_sample = 0, 1 # 当前视图窗口的采样点范围
         
         # 默认颜色，会根据调色板更新
@@ -1841,17 +1932,19 @@ class WaveformWidget(QWidget):
         self._selection_end_sample = None   # 最终确定的结束采样点
         self._selectionColor = QColor(135, 206, 250, 60) # 与语谱图使用相同颜色
 
-    def set_audio_data(self, y_full, sr, y_overview):
+    def set_audio_data(self, y_full, sr, envelope=None):
         """
         设置音频数据。
         Args:
-            y_full (np.ndarray): 完整音频数据。
+            y_full (np.ndarray | AudioSource): 完整音频数据。
             sr (int): 采样率。
-            y_overview (np.ndarray): 概览音频数据。
+            envelope (WaveformEnvelope, optional): 加载线程预先构建的多级包络；未提供时在此处构建。
         """
         self.clear() # 先清除旧数据
         if y_full is not None and sr is not None:
-            self._y_full, self._sr, self._y_overview = y_full, sr, y_overview
+            if not isinstance(envelope, WaveformEnvelope):
+                envelope = build_waveform_envelope(y_full)
+            self._y_full, self._sr, self._envelope = y_full, sr, envelope
             self._view_start_sample, self._view_end_sample = 0, len(self._y_full) # 初始视图为整个音频
         self.update() # 触发重绘
         self.view_changed.emit(self._view_start_sample, self._view_end_sample) # 发送视图改变信号
@@ -1906,7 +1999,7 @@ class WaveformWidget(QWidget):
         """
         清除音频数据和视图状态。
         """
-        self._y_full, self._y_overview = None, None
+        self._y_full, self._envelope = None, None
         self.update()
         self.view_changed.emit(0, 1) # 发送视图改变信号，表示视图已重置
 
@@ -2007,6 +2100,7 @@ class WaveformWidget(QWidget):
         - 当放大到细节可见时，绘制平滑的波形曲线。
         - 当缩小时，为每个水平像素计算并绘制一条代表振幅范围的垂直线，
           极大地提高了处理大量数据时的渲染性能和流畅度。
+        [v2.5] 每列的最小/最大值改为从加载时构建的多级包络中向量化获取，并一次性批量绘制。
         """
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
@@ -2021,46 +2115,33 @@ class WaveformWidget(QWidget):
         view_width_samples = self._view_end_sample - self._view_start_sample
         w, h, half_h = self.width(), self.height(), self.height() / 2
         
-        # 根据视图宽度选择使用概览数据或完整数据
-        y_to_draw = self._y_overview if view_width_samples > w * 4 else self._y_full
-        
-        start_idx = int(self._view_start_sample / len(self._y_full) * len(y_to_draw))
-        end_idx = int(self._view_end_sample / len(self._y_full) * len(y_to_draw))
-        
-        view_y = y_to_draw[start_idx:end_idx]
-        if len(view_y) == 0: return
-
+        if view_width_samples <= 0 or w <= 0: return
         painter.setPen(QPen(self._waveformColor, 1))
-        # 使用视图内的最大绝对值进行归一化，防止缩放时波形幅度跳变
-        max_val = np.max(np.abs(view_y)) or 1.0
 
-        # --- 2. [核心优化] 根据数据密度选择渲染模式 ---
+        # --- 2. [v2.5] 根据数据密度选择渲染模式 ---
         # 如果视图内的采样点数远大于水平像素数，则使用降采样模式
-        if len(view_y) > w * 2:
-            # 2a. 降采样渲染模式 (适用于缩小的视图)
-            step = len(view_y) / w  # 每个像素平均代表多少个采样点
-            
-            for i in range(w): # 遍历每个水平像素
-                # 找到该像素对应的采样点切片
-                start_slice = int(i * step)
-                end_slice = int((i + 1) * step)
-                if start_slice >= end_slice: continue
-                
-                chunk = view_y[start_slice:end_slice]
-                
-                # 计算切片内的最小值和最大值
-                min_val_in_chunk = np.min(chunk)
-                max_val_in_chunk = np.max(chunk)
-                
-                # 将振幅的min/max值转换为y坐标，并绘制一条垂直线
-                y1 = half_h - (min_val_in_chunk / max_val * half_h * 0.95)
-                y2 = half_h - (max_val_in_chunk / max_val * half_h * 0.95)
-                painter.drawLine(i, int(y1), i, int(y2))
+        if view_width_samples > w * 2:
+            # 2a. 降采样渲染模式：从多级包络中取出每个像素列的最小/最大值（向量化），
+            #     再用一次 drawLines 调用画出所有垂直线，开销与文件长度和缩放级别无关
+            col_min, col_max = self._envelope.column_extrema(self._y_full, self._view_start_sample,
+                                                             self._view_end_sample, w)
+            # 使用视图内的最大绝对值进行归一化，防止缩放时波形幅度跳变
+            max_val = max(-float(col_min.min()), float(col_max.max())) or 1.0
+            scale = half_h * 0.95 / max_val
+            lines = np.empty((w, 2, 2))
+            lines[:, :, 0] = np.arange(w)[:, None]
+            lines[:, 0, 1] = np.floor(half_h - col_min * scale)
+            lines[:, 1, 1] = np.floor(half_h - col_max * scale)
+            painter.drawLines(polygon_from_array(lines.reshape(-1, 2)))
         else:
             # 2b. 详细折线图渲染模式 (适用于放大的视图)
-            points = [QPointF(i * w / len(view_y), half_h - (val / max_val * half_h * 0.95)) for i, val in enumerate(view_y)]
-            if points:
-                painter.drawPolyline(*points)
+            view_y = self._y_full[self._view_start_sample:self._view_end_sample]
+            if len(view_y) == 0: return
+            max_val = float(np.max(np.abs(view_y))) or 1.0
+            points = np.empty((len(view_y), 2))
+            points[:, 0] = np.arange(len(view_y)) * (w / len(view_y))
+            points[:, 1] = half_h - view_y / max_val * half_h * 0.95
+            painter.drawPolyline(polygon_from_array(points))
 
         # --- 3. 绘制选区高亮 (此部分逻辑不变，始终在顶层绘制) ---
         selection_to_draw = None
@@ -2110,6 +2191,8 @@ class AudioAnalysisPage(QWidget):
             1: "最低", 2: "很低", 3: "较低", 4: "标准", 5: "较高",
             6: "精细", 7: "很高", 8: "极高", 9: "最高"
         }
+    # [新增] 完整语谱图超过此像素数（帧数 x 频率bin数）时改用分块金字塔显示
+    TILED_SPECTROGRAM_MIN_PIXELS = 16_000_000
     # 定义需要重新分析的提示文本
     REQUIRES_ANALYSIS_HINT = '<b><font color="#e57373">注意：更改此项需要重新运行分析才能生效。</font></b>'
 
@@ -2132,6 +2215,7 @@ class AudioAnalysisPage(QWidget):
         
         # --- 新增 ---
         self.current_selection = None # 当前选区 (start_sample, end_sample) 或 None
+        self._deferred_selection_reanalysis = None # [新增] 等待 F0 分析完成后再执行的选区重新分析：(选区, 音频, F0 任务)
         self.is_playing_selection = False # 标记是否正在播放选区
         self.is_player_ready = False # 标志，用于检查播放器是否已预热
         self._pending_csv_path = None # 用于在加载音频后应用CSV数据
@@ -2140,8 +2224,20 @@ class AudioAnalysisPage(QWidget):
         self.player.setNotifyInterval(20) # 设置播放进度更新间隔为10毫秒
         self.known_duration = 0 # 已知音频时长
         
-        self.task_thread, self.worker = None, None # 后台任务线程和工作器
-        self.is_task_running = False # 标记是否有任务正在运行
+        # [v2.6] 后台任务调度器：不同类型的任务可以并发执行，同类型的新任务取代旧任务
+        self.task_scheduler = AnalysisTaskScheduler(parent=self)
+
+        # [新增] 按音频内容寻址的磁盘缓存
+        self.current_content_hash = None
+        self._coarse_f0_ranges = {} # [新增] (文件路径, 估计方法) -> 粗略 F0 估计 (p5, p95)，重新分析同一文件时复用
+        self.disk_cache = self._create_disk_cache()
+
+        # [v2.6] 共振峰的区间缓存：(帧移, 预加重) -> FormantIntervalCache；平移/缩放时只分析尚未覆盖的部分
+        self._formant_caches = {}
+        self._formant_energy_references = {} # 帧移 -> 整段音频的能量参考
+        self._view_formants_timer = QTimer(self) # 视图停止变化后再分析，拖动滚动条时不会频繁提交任务
+        self._view_formants_timer.setSingleShot(True)
+        self._view_formants_timer.setInterval(self.VIEW_FORMANTS_DELAY_MS)
 
         self._init_ui() # 初始化UI
         self._connect_signals() # 连接信号和槽
@@ -2242,6 +2338,15 @@ class AudioAnalysisPage(QWidget):
         actions_layout.addWidget(self.analyze_spectrogram_button)
         actions_layout.addWidget(self.analyze_acoustics_button)
         actions_layout.addWidget(self.analyze_formants_button)
+        # [新增] 只重新分析选区：调整 F0 范围或预加重后修正一小段，不必重新分析整个文件
+        self.reanalyze_selection_button = QPushButton(" 仅重新分析选区")
+        self.reanalyze_selection_button.setToolTip(
+            "用当前的 F0 范围、预加重等参数，只重新计算选区内（两侧留有少量保护区）的\n"
+            "F0、强度和共振峰，并拼接回现有结果，其余部分保持不变。\n"
+            "适合修正一小段的倍频/半频错误。"
+        )
+        self.reanalyze_selection_button.setEnabled(False)
+        actions_layout.addWidget(self.reanalyze_selection_button)
         self.analysis_actions_group.setEnabled(False)
 
         # 将所有控件按顺序添加到“单个文件”面板的布局中
@@ -2618,20 +2723,22 @@ class AudioAnalysisPage(QWidget):
             intensity_chunk=chunk_result.get('intensity')
         )
         # 更新进度条
-        if self.progress_dialog and self.progress_dialog.isVisible():
+        task = self.task_scheduler.active_task('analyze_acoustics')
+        progress_dialog = task.context.get('progress_dialog') if task is not None else None
+        if progress_dialog and progress_dialog.isVisible():
             # 计算当前进度百分比
             f0_times = chunk_result.get('f0_raw')[0] if chunk_result.get('f0_raw') else []
             if len(f0_times) > 0 and self.known_duration > 0:
                 current_progress_ms = f0_times[-1] * 1000
                 progress_percent = (current_progress_ms / self.known_duration) * 100
-                self.progress_dialog.setValue(int(progress_percent))
+                progress_dialog.setValue(int(progress_percent))
     # [新增]
     def is_busy(self):
         """
         检查此模块（包括其所有子面板）是否有正在运行的、不可中断的任务。
         :return: (str or None) 如果正忙，返回一个描述任务的字符串；否则返回 None。
         """
-        if self.is_task_running:
+        if self.task_scheduler.has_active_tasks():
             return "单个音频文件的分析任务"
         if hasattr(self, 'batch_analysis_panel') and self.batch_analysis_panel.is_busy():
             return "批量音频文件的分析任务"
@@ -2642,8 +2749,8 @@ class AudioAnalysisPage(QWidget):
         """
         向此模块所有可能正在运行的后台任务发送取消请求。
         """
-        if self.is_task_running and self.task_thread and self.task_thread.isRunning():
-            self.task_thread.requestInterruption()
+        if self.task_scheduler.has_active_tasks():
+            self.task_scheduler.cancel_all()
             print("Single file analysis task cancellation requested.")
         
         if hasattr(self, 'batch_analysis_panel'):
@@ -2654,13 +2761,10 @@ class AudioAnalysisPage(QWidget):
         """
         [已修复] 当所有声学分析块都处理完毕后调用。
         """
-        if self.progress_dialog:
-            self.progress_dialog.close()
-        
         # [关键修复逻辑]
         # 只有当这是第一次分析（即还没有语谱图背景时），
         # 我们才将这次分析的hop_length设置为“黄金标准”。
-        if self.spectrogram_widget.spectrogram_image is None:
+        if not self.spectrogram_widget.has_spectrogram():
             if 'hop_length' in final_result:
                 self.spectrogram_widget.hop_length = final_result['hop_length']
 
@@ -2685,11 +2789,17 @@ class AudioAnalysisPage(QWidget):
         # [关键修复] 添加缺失的滑块信号连接
         self.render_density_slider.valueChanged.connect(self._update_render_density_label)
         self.formant_density_slider.valueChanged.connect(self._update_formant_density_label)
+        self.formant_density_slider.valueChanged.connect(self._schedule_view_formants)
+        self.pre_emphasis_checkbox.stateChanged.connect(self._schedule_view_formants)
+        self.show_formants_toggle.stateChanged.connect(self._schedule_view_formants)
 
         # --- 分析动作 ---
         self.analyze_acoustics_button.clicked.connect(self.run_acoustics_analysis)
         self.analyze_spectrogram_button.clicked.connect(self.run_spectrogram_analysis)
         self.analyze_formants_button.clicked.connect(self.run_formant_analysis)
+        self.reanalyze_selection_button.clicked.connect(self.reanalyze_selection)
+        self.spectrogram_widget.reanalyzeSelectionRequested.connect(self.reanalyze_selection)
+        self._view_formants_timer.timeout.connect(self._request_view_formants)
 
         # --- 选区同步与快捷键 ---
         self.spectrogram_widget.selectionChanged.connect(self.waveform_widget.set_selection)
@@ -2768,6 +2878,10 @@ class AudioAnalysisPage(QWidget):
         self.known_duration = 0
         self.current_selection = None
         self.is_playing_selection = False
+        self.current_content_hash = None # [新增] 新文件的内容哈希需要重新获取，避免命中上一个文件的缓存
+        self._formant_caches.clear()
+        self._formant_energy_references.clear()
+        self._view_formants_timer.stop()
         self.time_axis_widget.hide()
 
     def _select_all(self):
@@ -2897,6 +3011,7 @@ class AudioAnalysisPage(QWidget):
             selection (tuple or None): (start_sample, end_sample) 元组或 None。
         """
         self.current_selection = selection # 更新当前选区状态
+        self.reanalyze_selection_button.setEnabled(selection is not None)
         if self.is_playing_selection and selection is None:
             # 如果正在播放选区时选区被清除了，则停止播放
             self.player.stop()
@@ -2942,6 +3057,7 @@ class AudioAnalysisPage(QWidget):
         
         # 同步语谱图视图
         self.spectrogram_widget.set_view_window(start_sample, end_sample)
+        self._schedule_view_formants()
         
         # 控制和更新时间轴的显示
         # 如果视图宽度和总宽度几乎一样（允许1个采样点的误差），则认为是全览，隐藏时间轴
@@ -3088,9 +3204,11 @@ class AudioAnalysisPage(QWidget):
         """
         [修改后] 音频加载任务完成时的槽函数。
         """
-        if self.progress_dialog: self.progress_dialog.close()
-        
+        if not result: # 加载被取消
+            return
+
         self.audio_data, self.sr, self.overview_data = result['y_full'], result['sr'], result['y_overview']
+        self._compute_content_hash_async(self.current_filepath)
         info = sf.info(self.current_filepath)
         self.filename_label.setText(os.path.basename(self.current_filepath))
         # --- [核心修改] 不再在这里设置 known_duration 和启用播放控件 ---
@@ -3129,7 +3247,9 @@ class AudioAnalysisPage(QWidget):
             QMessageBox.warning(self, "无音频", "请先加载音频文件。")
             return
         
-        if self.spectrogram_widget.spectrogram_image is None:
+        # [v2.6] 语谱图仍在计算时也可以开始：帧移取自该语谱图任务，两者并发执行
+        spectrogram_task = self.task_scheduler.active_task('analyze_spectrogram')
+        if not self.spectrogram_widget.has_spectrogram() and spectrogram_task is None:
              QMessageBox.warning(self, "需要语谱图", "请先运行“分析语谱图”。")
              return
 
@@ -3149,8 +3269,12 @@ class AudioAnalysisPage(QWidget):
         module_states = self.parent_window.config.get("module_states", {}).get("audio_analysis", {})
         analysis_mode = module_states.get("analysis_mode", "normal") # 默认为普通模式
         # --- [新增结束] ---
+        # [新增] 多进程并行设置，仅对普通模式的分块分析生效
+        worker_count = self._get_parallel_worker_count()
 
-        forced_hop_length = self.spectrogram_widget.hop_length
+        forced_hop_length = spectrogram_task.context['hop_length'] if spectrogram_task is not None else self.spectrogram_widget.hop_length
+        # 快速模式固定使用自相关粗估，缓存也按实际使用的方法查找
+        _, _, coarse_f0_method = mode_f0_settings(analysis_mode, coarse_f0_method=module_states.get("coarse_f0_method", "pyin"))
 
         self.run_task('analyze_acoustics', 
                       audio_data=self.audio_data,
@@ -3162,6 +3286,9 @@ class AudioAnalysisPage(QWidget):
                       chunk_size_ms=self.chunk_size_slider.value(),
                       chunk_overlap_ms=self.chunk_overlap_slider.value(),
                       analysis_mode=analysis_mode, # <-- [新增] 传递模式参数
+                      coarse_f0_method=coarse_f0_method,
+                      coarse_f0_range=self._get_coarse_f0_range(coarse_f0_method),
+                      worker_count=worker_count,
                       progress_text=f"正在分析 F0 和强度 ({analysis_mode} 模式)...")
 
     # [新增] 用于语谱图分析的新方法
@@ -3176,18 +3303,42 @@ class AudioAnalysisPage(QWidget):
 
         # [关键修复逻辑]
         # 因为要生成新的背景，所以必须清除所有旧的、可能不匹配的叠加数据。
+        # [v2.6] 仍在运行的叠加层分析会产生与新背景不匹配的数据，一并取消
+        self.task_scheduler.cancel_group('analyze_acoustics')
+        self.task_scheduler.cancel_group('analyze_formants_view')
+        self.task_scheduler.cancel_group('formants_view')
+        self.task_scheduler.cancel_group('formants_prefetch')
+        self.task_scheduler.cancel_group('reanalyze_selection')
         self.spectrogram_widget.set_analysis_data(
             f0_data=None, f0_derived_data=None, intensity_data=None, 
             formants_data=None, clear_previous_formants=True
         )
 
-        self.run_task('analyze_spectrogram',
-                      audio_data=self.audio_data,
-                      sr=self.sr,
-                      is_wide_band=self.spectrogram_type_checkbox.isChecked(),
-                      render_density=self.render_density_slider.value(),
-                      pre_emphasis=self.pre_emphasis_checkbox.isChecked(),
-                      progress_text="正在分析语谱图背景...")
+        # [新增] 长音频：改用按需计算的分块金字塔，避免一次性生成巨大的语谱图图像
+        is_wide_band = self.spectrogram_type_checkbox.isChecked()
+        hop_length, n_fft = spectrogram_params(self.sr, self.render_density_slider.value(), is_wide_band)
+        full_image_pixels = (1 + len(self.audio_data) // hop_length) * (1 + n_fft // 2)
+        if full_image_pixels > self.TILED_SPECTROGRAM_MIN_PIXELS:
+            pyramid = SpectrogramTilePyramid(self.audio_data, self.sr, hop_length, n_fft,
+                                             self.pre_emphasis_checkbox.isChecked())
+            self.spectrogram_widget.set_tile_pyramid(pyramid)
+            self.analyze_acoustics_button.setEnabled(True)
+            self.analyze_acoustics_button.setToolTip("快速运行基频（F0）和强度分析。\n结果将叠加在当前语谱图上。")
+            self._schedule_view_formants()
+            return
+
+        task = self.run_task('analyze_spectrogram',
+                             audio_data=self.audio_data,
+                             sr=self.sr,
+                             is_wide_band=self.spectrogram_type_checkbox.isChecked(),
+                             render_density=self.render_density_slider.value(),
+                             pre_emphasis=self.pre_emphasis_checkbox.isChecked(),
+                             progress_text="正在分析语谱图背景...")
+        if task is not None:
+            # [v2.6] 帧移已知，F0 分析不必等语谱图完成
+            task.context['hop_length'] = hop_length
+            self.analyze_acoustics_button.setEnabled(True)
+            self.analyze_acoustics_button.setToolTip("快速运行基频（F0）和强度分析。\n结果将叠加在当前语谱图上。")
 
     def run_formant_analysis(self):
         """
@@ -3219,30 +3370,246 @@ class AudioAnalysisPage(QWidget):
             QMessageBox.information(self, "范围无效", "分析范围无效，操作已取消。")
             return
 
-        # 计算跳跃长度 (hop_length) 的逻辑保持不变
-        narrow_band_window_s = 0.035
-        base_n_fft_for_hop = 1 << (int(self.sr * narrow_band_window_s) - 1).bit_length()
-        overlap_ratio = 1 - (1 / (2**self.formant_density_slider.value()))
-        hop_length = int(base_n_fft_for_hop * (1 - overlap_ratio)) or 1
+        # 计算跳跃长度 (hop_length)，与批量分析使用同一公式
+        hop_length, pre_emphasis = self._formant_params()
+        cache = self._formant_cache(hop_length, pre_emphasis)
+        ranges = cache.missing(start_sample, end_sample, self._formant_piece_samples())
+        if not ranges:
+            # [v2.6] 整个范围都已分析过（例如自动分析过的可见区域），直接显示
+            self.on_formant_view_finished({'hop_length': hop_length, 'pre_emphasis': pre_emphasis,
+                                           'formant_range': (start_sample, end_sample)})
+            return
 
-        # 启动后台任务，传入我们动态确定的范围和进度文本
+        # 启动后台任务，传入我们动态确定的范围和进度文本；只分析尚未覆盖的子区间
         self.run_task('analyze_formants_view',
                       audio_data=self.audio_data,
                       sr=self.sr,
                       start_sample=start_sample,
                       end_sample=end_sample,
                       hop_length=hop_length,
-                      pre_emphasis=self.pre_emphasis_checkbox.isChecked(),
+                      pre_emphasis=pre_emphasis,
+                      ranges=ranges,
+                      energy_reference=self._formant_energy_references.get(hop_length),
+                      worker_count=self._get_parallel_worker_count(),
                       progress_text=progress_text)
 
+    # --- [v2.6] 共振峰的区间缓存与可见区域自动分析 ---
+    VIEW_FORMANTS_DELAY_MS = 120      # 视图停止变化这么久之后才分析
+    FORMANT_PIECE_SECONDS = 2.0       # 任务按这个长度分段分析并逐段显示
+    DEFAULT_AUTO_VIEW_FORMANTS_MAX_S = 10
+
+    def _formant_params(self):
+        """当前设置下的共振峰 (帧移, 预加重)。"""
+        return analysis_hop_length(self.sr, self.formant_density_slider.value()), self.pre_emphasis_checkbox.isChecked()
+
+    def _formant_cache(self, hop_length, pre_emphasis):
+        key = (hop_length, bool(pre_emphasis))
+        if key not in self._formant_caches:
+            self._formant_caches[key] = FormantIntervalCache(self.sr, hop_length)
+        return self._formant_caches[key]
+
+    def _formant_piece_samples(self):
+        return int(self.FORMANT_PIECE_SECONDS * self.sr)
+
+    def on_formant_range_finished(self, chunk):
+        """共振峰任务每分析完一段就并入区间缓存；若仍是当前参数，立即刷新显示。"""
+        if self.audio_data is None:
+            return
+        self._formant_energy_references.setdefault(chunk['hop_length'], chunk['energy_reference'])
+        self._formant_cache(chunk['hop_length'], chunk['pre_emphasis']).add(*chunk['formant_range'], chunk['formants'])
+        if (chunk['hop_length'], chunk['pre_emphasis']) == self._formant_params():
+            self._show_cached_formants()
+
+    def _show_cached_formants(self):
+        """显示当前参数下区间缓存中的全部共振峰点。"""
+        cache = self._formant_caches.get(self._formant_params())
+        self.spectrogram_widget.update_formants_data(list(cache.points) if cache else [], clear_previous=True)
+
+    def _auto_view_formants_enabled(self):
+        module_states = self.parent_window.config.get("module_states", {}).get("audio_analysis", {})
+        return module_states.get("auto_view_formants", True)
+
+    def _schedule_view_formants(self, *args):
+        """视图、共振峰参数或显示开关变化时，稍后自动分析可见区域的共振峰。"""
+        if (self.audio_data is not None and self.spectrogram_widget.has_spectrogram()
+                and self.show_formants_toggle.isChecked() and self._auto_view_formants_enabled()):
+            self._view_formants_timer.start()
+
+    def _current_view_range(self):
+        return self.waveform_widget._view_start_sample, self.waveform_widget._view_end_sample
+
+    def _request_view_formants(self):
+        """
+        分析可见区域中尚未分析的部分（较高优先级，取代上一次视图的请求），完成后在后台预取两侧相邻的区域。
+        视图超过设置的最大时长（默认 10 秒）时不自动分析，长录音请使用“分析共振峰”按钮。
+        """
+        if self.audio_data is None or not self.show_formants_toggle.isChecked():
+            return
+        start, end = self._current_view_range()
+        module_states = self.parent_window.config.get("module_states", {}).get("audio_analysis", {})
+        max_samples = module_states.get("auto_view_formants_max_s", self.DEFAULT_AUTO_VIEW_FORMANTS_MAX_S) * self.sr
+        if end - start > max_samples:
+            return
+
+        hop_length, pre_emphasis = self._formant_params()
+        self._show_cached_formants()
+        ranges = self._formant_cache(hop_length, pre_emphasis).missing(start, end, self._formant_piece_samples())
+        if not ranges:
+            self._prefetch_view_formants()
+            return
+        self.task_scheduler.cancel_group('formants_prefetch') # 可见区域优先
+        task = self._run_formant_ranges_task(ranges, 'formants_view', PRIORITY_VIEW)
+        task.done.connect(self._prefetch_view_formants)
+
+    def _prefetch_view_formants(self):
+        """在后台分析可见区域左右各一个视图宽度内尚未分析的部分，近处优先，左右交替。"""
+        if self.audio_data is None or not self.show_formants_toggle.isChecked():
+            return
+        start, end = self._current_view_range()
+        width = end - start
+        cache = self._formant_cache(*self._formant_params())
+        piece = self._formant_piece_samples()
+        left = cache.missing(max(0, start - width), start, piece)[::-1]
+        right = cache.missing(end, min(len(self.audio_data), end + width), piece)
+        ranges = [r for pair in itertools.zip_longest(left, right) for r in pair if r is not None]
+        if ranges:
+            self._run_formant_ranges_task(ranges, 'formants_prefetch', PRIORITY_BACKGROUND)
+
+    def _run_formant_ranges_task(self, ranges, group, priority):
+        hop_length, pre_emphasis = self._formant_params()
+        return self.run_task('analyze_formants_view', group=group, priority=priority,
+                             audio_data=self.audio_data,
+                             sr=self.sr,
+                             start_sample=ranges[0][0],
+                             end_sample=ranges[-1][1],
+                             hop_length=hop_length,
+                             pre_emphasis=pre_emphasis,
+                             ranges=ranges,
+                             energy_reference=self._formant_energy_references.get(hop_length),
+                             worker_count=self._get_parallel_worker_count())
+
+    def reanalyze_selection(self):
+        """
+        [新增] 只重新分析当前选区。
+        - F0/强度：按已有结果中落在选区内的帧，用当前的 F0 范围、预加重和分析模式重新计算（两侧留有保护区）；
+        - 共振峰：已显示共振峰或打开了“显示共振峰”时，按当前参数重新计算选区范围。
+        结果在 on_selection_reanalysis_finished 中拼接回现有数据，不重新分析整个文件。
+        [修复] F0 与强度分析仍在进行时不再弹出对话框，而是在它结束后自动重新分析这个选区。
+        """
+        if self.audio_data is None or not self.current_selection:
+            return
+        self._reanalyze_range(self.current_selection)
+
+    def _reanalyze_range(self, selection):
+        """[新增] reanalyze_selection 的实现：selection 为 (start_sample, end_sample)。"""
+        acoustics_task = self.task_scheduler.active_task('analyze_acoustics')
+        if acoustics_task is not None:
+            # 选区内的帧取自 F0 结果，必须等完整分析结束；同一时间只保留最后一次请求
+            self._deferred_selection_reanalysis = (selection, self.audio_data, acoustics_task)
+            acoustics_task.done.connect(partial(self._on_deferred_acoustics_done, acoustics_task))
+            self.parent_window.statusBar().showMessage("F0 与强度分析完成后将自动重新分析选区。", 5000)
+            return
+
+        f0_min, f0_max = self.f0_range_slider.lowerValue(), self.f0_range_slider.upperValue()
+        if f0_min >= f0_max:
+            QMessageBox.warning(self, "参数错误", "F0范围的最小值必须小于最大值。")
+            return
+
+        start_sample, end_sample = selection
+        widget = self.spectrogram_widget
+        kwargs = {}
+        if widget._f0_data is not None and len(widget._f0_data[0]) > 1:
+            times = widget._f0_data[0]
+            start_index, end_index = np.searchsorted(times, [start_sample / self.sr, end_sample / self.sr])
+            if end_index > start_index:
+                module_states = self.parent_window.config.get("module_states", {}).get("audio_analysis", {})
+                analysis_mode = module_states.get("analysis_mode", "normal")
+                if analysis_mode == 'compatibility':
+                    backend, frame_length = 'pyin', COMPAT_PYIN_FRAME_LENGTH
+                else:
+                    backend, _, _ = mode_f0_settings(analysis_mode)
+                    frame_length = pyin_frame_length(self.sr)
+                # 帧移取自已有结果本身，重新分析的帧与原有帧一一对应
+                hop_length = max(1, int(round(np.median(np.diff(times)) * self.sr)))
+                kwargs.update(frame_times=np.array(times[start_index:end_index]), start_index=int(start_index),
+                              f0_min=f0_min, f0_max=f0_max, hop_length=hop_length, frame_length=frame_length,
+                              backend=backend)
+
+        if widget._formants_data or self.show_formants_toggle.isChecked():
+            formant_hop_length, _ = self._formant_params()
+            kwargs.update(formant_hop_length=formant_hop_length,
+                          energy_reference=self._formant_energy_references.get(formant_hop_length))
+
+        if not kwargs:
+            QMessageBox.information(self, "没有可更新的结果", "请先运行 F0 分析，或打开“显示共振峰”。")
+            return
+
+        self.run_task('reanalyze_selection',
+                      audio_data=self.audio_data,
+                      sr=self.sr,
+                      start_sample=start_sample,
+                      end_sample=end_sample,
+                      pre_emphasis=self.pre_emphasis_checkbox.isChecked(),
+                      progress_text="正在重新分析选区...",
+                      **kwargs)
+
+    def _on_deferred_acoustics_done(self, acoustics_task):
+        """
+        [新增] 推迟的选区重新分析所等待的 F0 任务结束。
+        已加载其他文件、或 F0 分析被取消且没有新的分析取代它时放弃这次请求；
+        被新的 F0 分析取代时，_reanalyze_range 会继续等待新任务。
+        """
+        pending = self._deferred_selection_reanalysis
+        if pending is None or pending[2] is not acoustics_task:
+            return
+        self._deferred_selection_reanalysis = None
+        selection, audio_data, _ = pending
+        if audio_data is not self.audio_data:
+            return
+        if acoustics_task.is_cancelled() and self.task_scheduler.active_task('analyze_acoustics') is None:
+            self.parent_window.statusBar().showMessage("F0 与强度分析已取消，未重新分析选区。", 5000)
+            return
+        self._reanalyze_range(selection)
+
+    def on_selection_reanalysis_finished(self, results):
+        """[新增] 把选区的重新分析结果拼接回现有的 F0/强度数组和共振峰点，只重绘这些叠加层。"""
+        if not results:
+            return
+        widget = self.spectrogram_widget
+        if 'f0_raw' in results and widget._f0_data is not None:
+            start_index, frame_times = results['start_index'], results['frame_times']
+            # 期间 F0 结果被替换（例如重新运行了完整分析）时，这段数据已无处可放
+            if np.array_equal(widget._f0_data[0][start_index:start_index + len(frame_times)], frame_times):
+                widget.splice_analysis_data(start_index, results['f0_raw'], results['f0_derived'], results['intensity'])
+
+        if 'formants' in results:
+            hop_length = results['formant_hop_length']
+            self._formant_energy_references.setdefault(hop_length, results['energy_reference'])
+            cache = self._formant_cache(hop_length, results['pre_emphasis'])
+            start, end = cache.align(*results['formant_range'])
+            cache.add(start, end, results['formants'])
+
+            # 只替换选区内的点：选区外仍显示原有结果（可能来自不同的预加重/精细度设置）
+            half_frame = formant_frame_length(self.sr) // 2
+            kept = [point for point in widget._formants_data if not start <= point[0] - half_frame < end]
+            spliced = sorted(kept + list(cache.points_in(start, end)), key=lambda point: point[0])
+            widget.update_formants_data(spliced, clear_previous=True)
+
+    def _get_parallel_worker_count(self):
+        """[新增] 根据设置返回多进程分析使用的进程数，未启用并行时返回 1。"""
+        module_states = self.parent_window.config.get("module_states", {}).get("audio_analysis", {})
+        if not module_states.get("parallel_f0_enabled", False):
+            return 1
+        return resolve_worker_count(module_states.get("parallel_f0_workers", 0))
+
     # [新增] 处理声学分析结果的回调
     def on_acoustics_finished(self, results):
         """
         [v2.1 - 修复版] 声学分析任务完成时的槽函数。
         此版本能正确处理普通模式（分块）和兼容模式（一次性）的结果。
         """
-        if self.progress_dialog:
-            self.progress_dialog.close()
+        if results.get('coarse_f0_range') is not None:
+            self._remember_coarse_f0_range(results.get('coarse_f0_method', 'pyin'), results['coarse_f0_range'])
 
         # 检查 results 字典是否包含 'f0_raw' 键。
         # 这是区分两种模式的关键：
@@ -3261,7 +3628,7 @@ class AudioAnalysisPage(QWidget):
             # 这是普通模式的完成信号。
             # 所有数据都已通过 on_acoustics_chunk_finished 逐步更新到UI上。
             # 此处我们无需再做数据处理，只需确保 hop_length 被正确设置（如果需要）。
-            if self.spectrogram_widget.spectrogram_image is None:
+            if not self.spectrogram_widget.has_spectrogram():
                  if 'hop_length' in results:
                     self.spectrogram_widget.hop_length = results['hop_length']
 
@@ -3282,8 +3649,6 @@ class AudioAnalysisPage(QWidget):
         """
         语谱图分析任务完成时的槽函数。
         """
-        if self.progress_dialog: self.progress_dialog.close()
-
         # 检查后台任务是否真的返回了语谱图数据
         if 'S_db' in results and 'hop_length' in results:
             hop_length = results.get('hop_length', 256)
@@ -3292,6 +3657,7 @@ class AudioAnalysisPage(QWidget):
             # [核心修改] 启用F0分析按钮并更新提示
             self.analyze_acoustics_button.setEnabled(True)
             self.analyze_acoustics_button.setToolTip("快速运行基频（F0）和强度分析。\n结果将叠加在当前语谱图上。")
+            self._schedule_view_formants()
         else:
             # 如果后台任务因某些原因（如被取消）未返回有效数据，则不启用按钮
             pass
@@ -3299,23 +3665,23 @@ class AudioAnalysisPage(QWidget):
     def on_formant_view_finished(self, results):
         """
         [已修复] 当仅分析视图内共振峰的任务完成时调用。
+        [v2.6] 各段结果已由 on_formant_range_finished 并入区间缓存（命中磁盘缓存时在此并入），
+        这里显示缓存中的全部点，并报告所分析范围内的点数。
         """
-        if self.progress_dialog:
-            self.progress_dialog.close()
-    
-        formant_data = results.get('formants_view', [])
-    
-        # [关键修复] 调用新的、专门的方法来只更新共振峰数据，
-        # 这样就不会再清除已经存在的F0和强度数据了。
-        self.spectrogram_widget.update_formants_data(
-            formants_data=formant_data, 
-            clear_previous=True  # 替换旧的共振峰数据，而不是追加
-        )
-    
+        if not results:
+            return
+        start_sample, end_sample = results['formant_range']
+        cache = self._formant_cache(results['hop_length'], results['pre_emphasis'])
+        if 'formants_view' in results:
+            cache.add(*cache.align(start_sample, end_sample), results['formants_view'])
+
+        # [关键修复] 只更新共振峰数据，不清除已经存在的F0和强度数据
+        self._show_cached_formants()
+        found_count = len(cache.points_in(*cache.align(start_sample, end_sample)))
         QMessageBox.information(
             self, 
             "分析完成", 
-            f"已在可见区域找到并显示了 {len(formant_data)} 个有效音框的共振峰。"
+            f"已在分析范围内找到并显示了 {found_count} 个有效音框的共振峰。"
         )
 
     def on_scrollbar_moved(self, value):
@@ -3334,6 +3700,7 @@ class AudioAnalysisPage(QWidget):
         # 更新波形和语谱图的视图窗口
         self.waveform_widget.set_view_window(start_sample, end_sample)
         self.spectrogram_widget.set_view_window(start_sample, end_sample)
+        self._schedule_view_formants()
 
         # 同步更新时间轴
         self.time_axis_widget.update_view(start_sample, end_sample, self.sr)
@@ -3351,57 +3718,208 @@ class AudioAnalysisPage(QWidget):
             # 可以在这里也更新一下时间标签，以防万一
             self.time_label.setText(f"{self.format_time(self.player.position())} / {self.format_time(self.known_duration)}")
 
-    def run_task(self, task_type, progress_text="正在处理...", **kwargs):
+    # [v2.6] 各类任务的调度优先级：用户正在看的共振峰最先，其次语谱图背景，F0/强度分析最后
+    TASK_PRIORITIES = {
+        'load': PRIORITY_LOAD,
+        'analyze_formants_view': PRIORITY_VIEW,
+        'reanalyze_selection': PRIORITY_VIEW,
+        'analyze_spectrogram': PRIORITY_SPECTROGRAM,
+        'analyze_acoustics': PRIORITY_ACOUSTICS,
+    }
+
+    def run_task(self, task_type, progress_text="正在处理...", group=None, priority=None, **kwargs):
         """
         [v2.2 - 修复版] 启动一个后台任务。
         此版本修复了单文件F0分析的信号连接问题。
-        """
-        if self.is_task_running:
-            QMessageBox.warning(self, "操作繁忙", "请等待当前分析任务完成后再试。")
-            return
-        
-        self.is_task_running = True
-        
-        min_val, max_val = (0, 0) # 默认是滚动条
-        # 只有在普通模式下，F0分析才有分块进度
-        if task_type == 'analyze_acoustics' and kwargs.get('analysis_mode', 'normal') == 'normal':
-             min_val, max_val = (0, 100)
+        [v2.6] 任务交给 task_scheduler 调度：不同类型的任务可以并发执行，不再因“操作繁忙”而拒绝；
+        同组（默认即同类型）的新任务会取消仍在排队或运行的旧任务，加载新文件会取消所有任务。
+        给出 group 时作为静默的后台任务提交：不显示进度对话框、不读写磁盘缓存、出错时只记录日志，
+        完成信号由调用方自行连接（共振峰任务的分段结果仍会并入区间缓存）。
+        返回调度器中的任务（可用于单独取消）；命中磁盘缓存时直接应用结果并返回 None。
+        """
+        interactive = group is None
+        # [新增] 磁盘缓存：命中时直接应用结果，不再启动后台任务
+        cache_params = self._get_task_cache_params(task_type, kwargs) if interactive else None
+        if cache_params is not None:
+            cached_results = self._load_task_results_from_cache(task_type, cache_params)
+            if cached_results is not None:
+                self.task_scheduler.cancel_group(task_type) # 缓存的结果同样取代仍在运行的旧任务
+                self._apply_task_results(task_type, cached_results)
+                return None
 
-        self.progress_dialog = QProgressDialog(progress_text, "取消", min_val, max_val, self.parent_window)
-        self.progress_dialog.setWindowModality(Qt.NonModal)
-        self.progress_dialog.setValue(0)
-        self.progress_dialog.show()
-        
-        self.task_thread = QThread()
-        self.worker = AudioTaskWorker(task_type, **kwargs)
-        self.worker.moveToThread(self.task_thread)
+        if task_type == 'load':
+            self.task_scheduler.cancel_all() # 旧文件的分析结果都已过时
+
+        worker = AudioTaskWorker(task_type, **kwargs)
+        task = self.task_scheduler.submit(
+            worker, self.TASK_PRIORITIES.get(task_type, PRIORITY_BACKGROUND) if priority is None else priority,
+            group=task_type if interactive else group)
+        # 缓存条目写入提交时的文件，避免任务完成前切换了文件
+        task.context.update(task_type=task_type, cache_params=cache_params, content_hash=self.current_content_hash)
+
+        if interactive:
+            min_val, max_val = (0, 0) # 默认是滚动条
+            # 只有分块分析（普通/快速模式）的F0分析才有分块进度
+            if task_type == 'analyze_acoustics' and kwargs.get('analysis_mode', 'normal') != 'compatibility':
+                min_val, max_val = (0, 100)
+            progress_dialog = QProgressDialog(progress_text, "取消", min_val, max_val, self.parent_window)
+            progress_dialog.setWindowModality(Qt.NonModal)
+            progress_dialog.setValue(0)
+            progress_dialog.canceled.connect(task.cancel) # 只取消这一个任务
+            progress_dialog.show()
+            task.context['progress_dialog'] = progress_dialog
+
+        if task_type == 'analyze_formants_view':
+            task.chunk_finished.connect(self.on_formant_range_finished)
+        if not interactive:
+            task.error.connect(lambda message: print(f"Background analysis task failed: {message}"))
+            task.done.connect(partial(self.on_task_done, task))
+            return task
 
-        self.worker.finished.connect(self.task_thread.quit)
-        self.worker.error.connect(self.task_thread.quit)
-        self.task_thread.finished.connect(self.on_thread_finished)
-        
         if task_type == 'load':
-            self.worker.finished.connect(self.on_load_finished)
+            task.finished.connect(self.on_load_finished)
         elif task_type == 'analyze_acoustics':
             # --- [核心修复] ---
-            # 普通模式下，连接分块进度信号
-            if kwargs.get('analysis_mode', 'normal') == 'normal':
-                self.worker.chunk_finished.connect(self.on_acoustics_chunk_finished)
-            # 两种模式的最终完成信号都连接到这个统一的处理器
-            self.worker.finished.connect(self.on_acoustics_finished)
+            # 普通/快速模式下，连接分块进度信号
+            if kwargs.get('analysis_mode', 'normal') != 'compatibility':
+                task.chunk_finished.connect(self.on_acoustics_chunk_finished)
+            # 所有模式的最终完成信号都连接到这个统一的处理器
+            task.finished.connect(self.on_acoustics_finished)
             # --- [修复结束] ---
         elif task_type == 'analyze_spectrogram':
-            self.worker.finished.connect(self.on_spectrogram_finished)
+            task.finished.connect(self.on_spectrogram_finished)
         elif task_type == 'analyze_formants_view':
-            self.worker.finished.connect(self.on_formant_view_finished)
-        
-        self.worker.error.connect(self.on_task_error)
-        self.task_thread.started.connect(self.worker.run)
-        
-        if self.progress_dialog:
-            self.progress_dialog.canceled.connect(self.task_thread.requestInterruption)
-        
-        self.task_thread.start()
+            task.finished.connect(self.on_formant_view_finished)
+        elif task_type == 'reanalyze_selection':
+            task.finished.connect(self.on_selection_reanalysis_finished)
+
+        if cache_params is not None:
+            task.finished.connect(partial(self._store_task_results_in_cache, task))
+        task.error.connect(self.on_task_error)
+        task.done.connect(partial(self.on_task_done, task))
+        return task
+
+    # --- [新增] 磁盘缓存相关方法 ---
+    CACHEABLE_TASKS = ('analyze_spectrogram', 'analyze_acoustics', 'analyze_formants_view')
+
+    def _create_disk_cache(self):
+        """根据设置创建磁盘缓存；用户关闭缓存时返回 None。"""
+        module_states = self.parent_window.config.get("module_states", {}).get("audio_analysis", {})
+        if not module_states.get("analysis_cache_enabled", True):
+            return None
+        cache_dir = os.path.join(self.parent_window.BASE_PATH, "cache", "audio_analysis")
+        return AnalysisCache(cache_dir, module_states.get("analysis_cache_size_mb", DEFAULT_CACHE_SIZE_MB))
+
+    def _get_task_cache_params(self, task_type, kwargs):
+        """
+        返回用于缓存寻址的参数字典（即任务的全部分析参数）。
+        不可缓存的任务、缓存关闭或当前文件没有内容哈希时返回 None。
+        """
+        if self.disk_cache is None or not self.current_content_hash or task_type not in self.CACHEABLE_TASKS:
+            return None
+        # 音频数据本身由内容哈希代表；进程数只影响速度，已知的粗略 F0 估计只是省去重复计算，都不影响结果；
+        # 共振峰任务实际分析的子区间 (ranges) 取决于内存中已有的结果，能量参考由音频决定，同样不参与寻址
+        return {k: v for k, v in kwargs.items()
+                if k not in ('audio_data', 'sr', 'worker_count', 'coarse_f0_range', 'ranges', 'energy_reference')}
+
+    def _load_task_results_from_cache(self, task_type, cache_params):
+        """读取缓存条目，并还原为与对应后台任务 finished 信号相同格式的结果字典。"""
+        entry = self.disk_cache.get(self.current_content_hash, task_type, cache_params)
+        if entry is None:
+            return None
+        if task_type == 'analyze_spectrogram':
+            return {'S_db': entry['S_db'], 'hop_length': int(entry['hop_length'])}
+        if task_type == 'analyze_acoustics':
+            f0_data, f0_derived_data, intensity_data = unpack_acoustics(entry)
+            return {'f0_raw': f0_data, 'f0_derived': f0_derived_data, 'intensity': intensity_data}
+        if task_type == 'analyze_formants_view':
+            return {'formants_view': unpack_formants(entry) or [], 'hop_length': cache_params['hop_length'],
+                    'pre_emphasis': cache_params['pre_emphasis'],
+                    'formant_range': (cache_params['start_sample'], cache_params['end_sample'])}
+        return None
+
+    def _apply_task_results(self, task_type, results):
+        """将（来自缓存的）结果交给与后台任务相同的完成处理函数。"""
+        if task_type == 'analyze_spectrogram':
+            self.on_spectrogram_finished(results)
+        elif task_type == 'analyze_acoustics':
+            self.spectrogram_widget.set_analysis_data(
+                f0_data=None, f0_derived_data=None, intensity_data=None, clear_previous_formants=False
+            )
+            self.on_acoustics_finished(results)
+        elif task_type == 'analyze_formants_view':
+            self.on_formant_view_finished(results)
+
+    def _store_task_results_in_cache(self, task, results):
+        """
+        后台任务完成后把结果写入磁盘缓存。被取消的任务（空结果）不会写入。
+        写盘（压缩）在独立的线程中进行，不阻塞界面。
+        """
+        content_hash = task.context.get('content_hash')
+        if not results or not content_hash:
+            return
+        task_type, cache_params = task.context['task_type'], task.context['cache_params']
+
+        arrays = None
+        if task_type == 'analyze_spectrogram' and 'S_db' in results:
+            arrays = {'S_db': quantize_spectrogram(results['S_db']), 'hop_length': results['hop_length']}
+        elif task_type == 'analyze_acoustics':
+            if 'f0_raw' in results:
+                arrays = pack_acoustics(results.get('f0_raw'), results.get('f0_derived'), results.get('intensity'))
+            elif 'hop_length' in results:
+                # 普通模式：数据已经通过 chunk_finished 逐块累积到了语谱图控件中
+                widget = self.spectrogram_widget
+                arrays = pack_acoustics(widget._f0_data, widget._f0_derived_data, widget._intensity_data)
+        elif task_type == 'analyze_formants_view' and 'formant_range' in results:
+            # 各段已并入区间缓存，取出整个分析范围内的点
+            cache = self._formant_cache(results['hop_length'], results['pre_emphasis'])
+            arrays = pack_formants(cache.points_in(*cache.align(*results['formant_range'])))
+
+        if arrays is not None:
+            threading.Thread(target=self.disk_cache.put, daemon=True,
+                             args=(content_hash, task_type, cache_params, arrays)).start()
+
+    def _compute_content_hash_async(self, filepath):
+        """
+        [v2.5] 在后台线程中计算内容哈希（磁盘缓存的键）。
+        大文件的哈希需要读完整个文件，不应推迟波形的首次绘制；哈希就绪前发起的分析任务只是不使用缓存。
+        """
+        if self.disk_cache is None:
+            return
+        def compute():
+            try:
+                content_hash = compute_file_hash(filepath)
+            except OSError:
+                return
+            if self.current_filepath == filepath: # 期间已切换到其他文件时丢弃结果
+                self.current_content_hash = content_hash
+        threading.Thread(target=compute, daemon=True).start()
+
+    def _get_coarse_f0_range(self, method):
+        """
+        [新增] 返回当前文件已知的粗略 F0 估计（先查内存，再查磁盘缓存），未知时返回 None。
+        粗略估计与 F0 范围、预加重和精细度设置无关，调整这些参数后重新分析时可以直接复用。
+        """
+        key = (self.current_filepath, method)
+        if key in self._coarse_f0_ranges:
+            return self._coarse_f0_ranges[key]
+        if self.disk_cache is not None and self.current_content_hash:
+            entry = self.disk_cache.get(self.current_content_hash, COARSE_F0_KIND, {'method': method})
+            if entry is not None:
+                self._coarse_f0_ranges[key] = unpack_coarse_f0_range(entry)
+                return self._coarse_f0_ranges[key]
+        return None
+
+    def _remember_coarse_f0_range(self, method, coarse_range):
+        """[新增] 记住后台任务得到的粗略 F0 估计，并在后台线程中写入磁盘缓存。"""
+        key = (self.current_filepath, method)
+        if key in self._coarse_f0_ranges:
+            return
+        self._coarse_f0_ranges[key] = coarse_range
+        if self.disk_cache is not None and self.current_content_hash:
+            threading.Thread(target=self.disk_cache.put, daemon=True,
+                             args=(self.current_content_hash, COARSE_F0_KIND, {'method': method},
+                                   pack_coarse_f0_range(coarse_range))).start()
 
     def load_audio_file(self, filepath):
         """
@@ -3409,63 +3927,17 @@ class AudioAnalysisPage(QWidget):
         """
         self.clear_all_central_widgets() # [修改] 使用新的清理函数
         self.current_filepath = filepath
+        self.current_content_hash = None
         self.run_task('load', filepath=filepath, progress_text=f"正在加载音频...")
 
     def convert_analysis_to_dataframe(self, analysis_results):
         """
         [v2.0 - 共振峰修复版]
         一个辅助函数，将分析结果字典转换为可保存的Pandas DataFrame。
-        此版本修复了导出CSV时丢失共振峰 (F1, F2...) 数据的bug。
+        [v2.5] 转换逻辑已移至 audio_analysis_engine，供命令行批量分析共用；
+        结果中带有 'sr'（批量结果）时使用该采样率换算共振峰时间戳。
         """
-        if not analysis_results:
-            return None
-        
-        all_data = []
-        
-        # --- 1. 处理 F0 和强度数据 (保持不变) ---
-        if 'f0_data' in analysis_results and 'intensity_data' in analysis_results:
-            times, f0_vals = analysis_results.get('f0_data', ([], []))
-            intensity = analysis_results.get('intensity_data', [])
-            
-            min_len = min(len(times), len(f0_vals), len(intensity))
-            
-            for i in range(min_len):
-                all_data.append({
-                    'timestamp': times[i], 
-                    'f0_hz': f0_vals[i], 
-                    'intensity': intensity[i]
-                })
-
-        # --- 2. [核心修复] 新增处理共振峰数据的逻辑 ---
-        if 'formants_data' in analysis_results and self.sr:
-            formants_list = analysis_results.get('formants_data', [])
-            
-            for sample_pos, formants in formants_list:
-                # 2.1. 创建一个包含时间戳的基础数据点字典
-                formant_dict = {'timestamp': sample_pos / self.sr}
-                
-                # 2.2. 遍历该音框找到的所有共振峰值
-                for i, f_val in enumerate(formants):
-                    # 创建列名，如 f1_hz, f2_hz, ...
-                    col_name = f'f{i+1}_hz'
-                    formant_dict[col_name] = f_val
-                
-                # 2.3. 将这个包含所有共振峰信息的点添加到总列表中
-                all_data.append(formant_dict)
-        # --- 修复结束 ---
-
-        if not all_data:
-            return None
-            
-        # 3. 合并和整理 DataFrame (保持不变)
-        #    groupby().first() 会将具有相同时间戳的数据点合并为一行。
-        #    对于共振峰数据，每个点的时间戳理论上是唯一的，
-        #    对于F0/强度数据，它们本身就是对齐的。
-        #    这个操作能确保最终结果的整洁。
-        df = pd.DataFrame(all_data)
-        df = df.groupby('timestamp').first().reset_index()
-        df = df.sort_values(by='timestamp').round(4)
-        return df
+        return analysis_results_to_dataframe(analysis_results, (analysis_results or {}).get('sr', self.sr))
 
     def open_file_dialog(self):
         """
@@ -3478,52 +3950,49 @@ class AudioAnalysisPage(QWidget):
     def dragEnterEvent(self, event):
         """
         处理拖放进入事件。
-        如果拖入的是本地文件URL，并且是支持的音频或CSV格式，则接受拖放。
+        如果拖入的是本地文件URL，并且是支持的音频或分析数据文件格式，则接受拖放。
         """
         if event.mimeData().hasUrls():
             url = event.mimeData().urls()[0]
             if url.isLocalFile():
                 filepath = url.toLocalFile().lower()
-                # 接受音频文件或CSV文件
-                if filepath.endswith(('.wav', '.mp3', '.flac', 'ogg', '.m4a', '.csv')):
+                # 接受音频文件或分析数据文件 (CSV/Parquet/Feather/NPZ)
+                if filepath.endswith(('.wav', '.mp3', '.flac', 'ogg', '.m4a')) or table_format_of(filepath):
                     event.acceptProposedAction()
 
     def dropEvent(self, event):
         """
         处理拖放事件。
-        根据拖入的文件类型（音频或CSV）分派不同的处理任务。
+        根据拖入的文件类型（音频或分析数据文件）分派不同的处理任务。
         """
         if event.mimeData().hasUrls():
             filepath = event.mimeData().urls()[0].toLocalFile()
-            if filepath.lower().endswith('.csv'):
-                self.load_from_csv(filepath) # 如果是CSV文件，加载CSV数据
+            if table_format_of(filepath):
+                self.load_from_csv(filepath) # 如果是分析数据文件，加载其中的分析数据
             else:
                 self.load_audio_file(filepath) # 如果是音频文件，加载音频
 
-    def on_thread_finished(self):
+    def on_task_done(self, task):
         """
-        [v2.1 - 线程修复版] 后台任务线程结束时的最终清理槽函数。
-        现在由 QThread.finished 信号安全触发。
+        [v2.6] 调度器中的任务结束（完成、出错或被取消）时的清理槽函数。
+        线程与工作器由调度器释放，这里只关闭该任务的进度对话框。
         """
-        if self.progress_dialog:
-            self.progress_dialog.close()
-            self.progress_dialog = None
+        progress_dialog = task.context.pop('progress_dialog', None)
+        if progress_dialog:
+            progress_dialog.canceled.disconnect(task.cancel) # QProgressDialog 关闭时也会发出 canceled
+            progress_dialog.close()
+            progress_dialog.deleteLater()
 
-        # 此时线程已停止，可以安全地安排删除
-        if self.worker:
-            self.worker.deleteLater()
-            self.worker = None
-
-        if self.task_thread:
-            self.task_thread.deleteLater()
-            self.task_thread = None
-    
-        self.is_task_running = False
+        # 语谱图任务被取消或失败：撤销提交时提前启用的 F0 分析按钮
+        if (task.group == 'analyze_spectrogram' and not self.spectrogram_widget.has_spectrogram()
+                and self.task_scheduler.active_task('analyze_spectrogram') is None):
+            self.analyze_acoustics_button.setEnabled(False)
+            self.analyze_acoustics_button.setToolTip("请先运行“分析语谱图”以启用此功能。")
 
     def on_task_error(self, error_msg):
         """
         [v2.1 - 线程修复版] 后台任务发生错误时的槽函数。
-        现在只负责显示错误信息，所有清理工作由 on_thread_finished 统一处理。
+        现在只负责显示错误信息，所有清理工作由 on_task_done 统一处理。
         """
         import traceback
         traceback.print_exc()
@@ -3552,11 +4021,7 @@ class AudioAnalysisPage(QWidget):
         Returns:
             str: 格式化后的时间字符串。
         """
-        if ms <= 0: return "00:00.00"
-        td = timedelta(milliseconds=ms)
-        minutes, seconds = divmod(td.seconds, 60)
-        milliseconds = td.microseconds // 10000 # 取百分之一秒
-        return f"{minutes:02d}:{seconds:02d}.{milliseconds:02d}"
+        return format_duration(ms)
 
     def handle_export_image(self):
         """
@@ -3597,8 +4062,9 @@ class AudioAnalysisPage(QWidget):
         """
         [v2.0 - 健壮性修复版]
         根据给定选项，将当前语谱图控件的视图内容高质量地渲染到一个 QPixmap 上。
-        此版本新增了 'source_filepath' 参数，使其在被外部模块（如批量处理）
-        调用时能够正确显示文件名等上下文信息，从而修复了 'TypeError'。
+        [v2.6] 不再创建并 show() 临时控件，而是把控件的 scene/style 交给
+        audio_analysis_render.render_analysis_image 在 QImage 上离屏绘制（与控件自身的绘制代码相同），
+        批量导出可以在工作线程中直接调用同一个渲染器。
 
         :param options: (dict) 导出选项，包含 'resolution', 'info_label', 'add_time_axis'。
         :param source_filepath: (str, optional) 要在信息标签中显示的源文件路径。
@@ -3606,169 +4072,27 @@ class AudioAnalysisPage(QWidget):
         :return: QPixmap 对象，包含了渲染好的高质量图片。
         """
         source_widget = self.spectrogram_widget
-        resolution = options["resolution"]
-        
-        # --- 1. 定义固定的UI元素尺寸 ---
-        # 无论最终图片分辨率多大，这些UI元素的像素尺寸都保持不变，确保视觉一致性。
-        INFO_FONT_PIXEL_SIZE = 14
-        TIME_AXIS_FONT_PIXEL_SIZE = 12
-        SPECTROGRAM_AXIS_FONT_PIXEL_SIZE = 12
-        TIME_AXIS_HEIGHT = 35 # 时间轴的固定像素高度
-
-        # --- 2. 布局计算 ---
         # 如果分辨率为None（例如，选择了“当前窗口大小”），则使用源控件的当前尺寸。
-        if resolution is None:
-            target_width, target_height = source_widget.width(), source_widget.height()
-        else:
-            target_width, target_height = resolution
-        
-        # 根据是否添加时间轴，计算语谱图本身需要占据的高度。
+        resolution = options["resolution"] or (source_widget.width(), source_widget.height())
+        target_width, target_height = resolution
         axis_height = TIME_AXIS_HEIGHT if options["add_time_axis"] else 0
-        spectrogram_height = target_height - axis_height
-
-        # --- 3. 创建渲染目标 (QPixmap) ---
-        pixmap = QPixmap(target_width, target_height)
-        # 使用源控件的背景色填充，确保主题一致
-        pixmap.fill(source_widget.backgroundColor)
-
-        # --- 4. 渲染语谱图主体部分 ---
-        if spectrogram_height > 0:
-            # 创建一个临时的、不可见的 SpectrogramWidget 用于离屏渲染。
-            # 这样做可以避免干扰主界面的UI。
-            temp_widget = SpectrogramWidget(None, self.icon_manager)
-            temp_widget.setAttribute(Qt.WA_DontShowOnScreen)
-            temp_widget.show() # 必须调用 show() 才能使其内部布局生效以供渲染
-
-            # 设置固定的字体大小，确保轴标签大小在高分辨率下依然清晰可读。
-            fixed_font = QFont()
-            fixed_font.setPixelSize(SPECTROGRAM_AXIS_FONT_PIXEL_SIZE)
-            temp_widget.setFont(fixed_font)
-            
-            # 复制源控件的所有可写属性（如颜色、可见性等）到临时控件。
-            meta_obj = temp_widget.metaObject()
-            for i in range(meta_obj.propertyOffset(), meta_obj.propertyCount()):
-                prop = meta_obj.property(i)
-                if prop.isWritable():
-                    temp_widget.setProperty(prop.name(), source_widget.property(prop.name()))
-            
-            # 复制核心数据和视图状态
-            temp_widget.spectrogram_image = source_widget.spectrogram_image
-            temp_widget.sr = source_widget.sr
-            temp_widget.hop_length = source_widget.hop_length
-            temp_widget.max_display_freq = source_widget.max_display_freq
-            temp_widget.set_view_window(source_widget._view_start_sample, source_widget._view_end_sample)
-            temp_widget.set_analysis_data(
-                f0_data=source_widget._f0_data, f0_derived_data=source_widget._f0_derived_data,
-                intensity_data=source_widget._intensity_data, formants_data=source_widget._formants_data
-            )
 
-            # --- [核心修复] 显式复制叠加层的可见性状态 ---
-            # 因为这些状态是普通的Python属性而非QProperties，它们不会在属性循环中被自动复制。
-            # 我们必须手动调用 set_overlay_visibility 方法来同步这些状态。
-            temp_widget.set_overlay_visibility(
-                show_f0=source_widget._show_f0,
-                show_f0_points=source_widget._show_f0_points,
-                show_f0_derived=source_widget._show_f0_derived,
-                show_intensity=source_widget._show_intensity,
-                smooth_intensity=source_widget._smooth_intensity,
-                show_formants=source_widget._show_formants,
-                highlight_f1=source_widget._highlight_f1,
-                highlight_f2=source_widget._highlight_f2,
-                show_other_formants=source_widget._show_other_formants
-            )
-            # --- 修复结束 ---
+        # 分块金字塔与主控件共享；离屏渲染时同步补齐导出分辨率所需的分块
+        plot_width = plot_rect_for(QRect(0, 0, target_width, target_height - axis_height)).width()
+        scene = source_widget.render_scene(plot_width, synchronous_tiles=True)
+        # 坐标轴标签使用固定的默认字体，不随界面主题的字号变化
+        style = source_widget.render_style(axis_font=QFont().toString())
 
-            # 设置临时控件的尺寸为我们计算出的语谱图目标尺寸。
-            temp_widget.resize(target_width, spectrogram_height)
-            
-            # 将临时控件的内容渲染到 QPixmap 的指定区域 (顶部)。
-            temp_widget.render(pixmap, QPoint(0, 0), QRegion(0, 0, target_width, spectrogram_height))
-
-            # 渲染完毕后，清理临时控件。
-            temp_widget.hide()
-            temp_widget.deleteLater()
-
-        # --- 5. 准备在 QPixmap 上进行后续绘制 ---
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.Antialiasing)
-
-        # --- 6. 渲染时间轴部分 (如果需要) ---
-        if options["add_time_axis"] and axis_height > 0:
-            axis_rect = QRect(0, spectrogram_height, target_width, axis_height)
-            
-            # ... (此部分的时间轴刻度智能计算和绘制逻辑与之前版本完全相同，无需修改) ...
-            view_start_sample = source_widget._view_start_sample
-            view_end_sample = source_widget._view_end_sample
-            sr = source_widget.sr
-            view_duration_s = (view_end_sample - view_start_sample) / sr if sr > 0 else 0
-            start_time_s = view_start_sample / sr if sr > 0 else 0
-
-            target_ticks = max(5, int(target_width / 150))
-            raw_interval = view_duration_s / target_ticks if target_ticks > 0 else 0
-            
-            if raw_interval > 0:
-                power = 10.0 ** math.floor(math.log10(raw_interval))
-                if raw_interval / power < 1.5: interval = 1 * power
-                elif raw_interval / power < 3.5: interval = 2 * power
-                elif raw_interval / power < 7.5: interval = 5 * power
-                else: interval = 10 * power
-                
-                font = QFont(); font.setPixelSize(TIME_AXIS_FONT_PIXEL_SIZE)
-                painter.setFont(font)
-                painter.setPen(source_widget.palette().color(QPalette.Text))
-
-                first_tick_time = math.ceil(start_time_s / interval) * interval
-                
-                for i in range(int(target_ticks * 2)):
-                    tick_time = first_tick_time + i * interval
-                    if tick_time > start_time_s + view_duration_s: break
-
-                    x_pos = (tick_time - start_time_s) / view_duration_s * target_width if view_duration_s > 0 else 0
-                    
-                    painter.drawLine(int(x_pos), axis_rect.top(), int(x_pos), axis_rect.top() + 5)
-                    
-                    if interval >= 1: label = f"{tick_time:.1f}s"
-                    elif interval >= 0.1: label = f"{tick_time:.2f}"
-                    elif interval >= 0.01: label = f"{tick_time:.3f}"
-                    else: label = f"{tick_time * 1000:.1f}ms"
-                    
-                    painter.drawText(QRect(int(x_pos) - 50, axis_rect.top() + 5, 100, axis_rect.height() - 5), Qt.AlignCenter | Qt.TextDontClip, label)
-
-        # --- 7. [核心修复] 渲染信息标签部分 ---
-        if options["info_label"]:
-            font = QFont(); font.setPixelSize(INFO_FONT_PIXEL_SIZE)
-            painter.setFont(font)
-            painter.setPen(QColor(Qt.darkGray))
-            
-            # 7.1. 决定要使用的文件路径
-            #      如果外部调用者（如批量保存）提供了 source_filepath，就优先使用它。
-            #      否则，回退到使用本模块自己加载的 self.current_filepath。
-            path_to_use = source_filepath if source_filepath is not None else self.current_filepath
-            
-            # 7.2. 从有效的路径中提取文件名，并进行安全检查
-            filename_to_display = "N/A" # 默认值
-            # 确保 path_to_use 是一个有效的字符串
-            if path_to_use and isinstance(path_to_use, str):
-                filename_to_display = os.path.basename(path_to_use)
-            
-            # 7.3. 构建并绘制最终的信息文本
-            #      注意：时长(known_duration)和采样率(sr)依赖于调用者（批量保存循环）
-            #      在使用此函数前已经正确设置了 self.main_page 的这些属性。
-            info_text = f"File: {filename_to_display}\n" \
-                        f"Duration: {self.format_time(self.known_duration)}\n" \
-                        f"Sample Rate: {self.sr} Hz"
-            
-            margin = 15
-            text_rect = QRect(0, 0, target_width - margin, target_height - margin)
-            painter.drawText(text_rect, Qt.AlignRight | Qt.AlignTop, info_text)
-        
-        # 8. 结束绘制并返回最终的 QPixmap
-        painter.end()
-        return pixmap
+        path_to_use = source_filepath if source_filepath is not None else self.current_filepath
+        info_text = analysis_info_text(path_to_use, self.known_duration, self.sr)
+        image = render_analysis_image(scene, style, dict(options, resolution=resolution), info_text)
+        return QPixmap.fromImage(image)
 
     def handle_export_csv(self):
         """
-        处理将选区内的分析数据导出为CSV的请求。
+        处理将选区内的分析数据导出为表格的请求。
+        [v2.6] 表格按列直接由 NumPy 数组组装（见 audio_analysis_export），
+        除 CSV 外还可以保存为 Parquet/Feather（需要 pyarrow）或 NPZ，格式由扩展名决定。
         """
         if self.current_selection is None or self.sr is None:
             QMessageBox.warning(self, "无选区", "请先选择一个区域以导出分析数据。")
@@ -3780,54 +4104,31 @@ class AudioAnalysisPage(QWidget):
         base_name = os.path.splitext(os.path.basename(self.current_filepath))[0]
         default_path = os.path.join(os.path.dirname(self.current_filepath), f"{base_name}_analysis_{start_s:.2f}-{end_s:.2f}s.csv")
         
-        save_path, _ = QFileDialog.getSaveFileName(self, "导出分析数据为CSV", default_path, "CSV 文件 (*.csv)")
+        save_path, selected_filter = QFileDialog.getSaveFileName(self, "导出分析数据", default_path, table_file_filter())
 
         if not save_path: return # 用户取消保存
+        if table_format_of(save_path) is None: # 未输入扩展名时使用所选文件类型的扩展名
+            match = re.search(r'\*(\.\w+)', selected_filter)
+            save_path += match.group(1) if match else ".csv"
 
         try:
-            # 准备数据
-            all_data = []
-
-            # F0 数据
-            if self.spectrogram_widget._f0_data:
-                times, f0_vals = self.spectrogram_widget._f0_data
-                for t, f0 in zip(times, f0_vals):
-                    if start_s <= t < end_s: # 筛选选区内的数据
-                        all_data.append({'timestamp': t, 'f0_hz': f0})
-
-            # 强度数据
-            if self.spectrogram_widget._intensity_data is not None:
-                hop_length = self.spectrogram_widget.hop_length
+            widget = self.spectrogram_widget
+            intensity_times = None
+            if widget._intensity_data is not None:
                 # 计算强度数据对应的时间戳
-                intensity_times = librosa.frames_to_time(np.arange(len(self.spectrogram_widget._intensity_data)), sr=self.sr, hop_length=hop_length)
-                for t, intensity in zip(intensity_times, self.spectrogram_widget._intensity_data):
-                     if start_s <= t < end_s: # 筛选选区内的数据
-                        all_data.append({'timestamp': t, 'intensity': intensity})
-            
-            # 共振峰数据
-            if self.spectrogram_widget._formants_data:
-                for sample_pos, formants in self.spectrogram_widget._formants_data:
-                    t = sample_pos / self.sr # 采样点转换为时间
-                    if start_s <= t < end_s: # 筛选选区内的数据
-                        formant_dict = {'timestamp': t}
-                        for i, f in enumerate(formants):
-                            formant_dict[f'f{i+1}_hz'] = f # 格式化共振峰列名
-                        all_data.append(formant_dict)
-            
-            if not all_data:
+                intensity_times = librosa.frames_to_time(np.arange(len(widget._intensity_data)), sr=self.sr, hop_length=widget.hop_length)
+            # 筛选选区内的数据，并按时间戳合并为一行（每列取第一个有效值），排序并四舍五入到4位小数
+            columns = analysis_columns(widget._f0_data, widget._intensity_data, widget._formants_data, self.sr,
+                                       intensity_times=intensity_times, time_range=(start_s, end_s))
+            if columns is None:
                 QMessageBox.warning(self, "无数据", "在选定区域内没有可导出的分析数据。")
                 return
 
-            # 合并数据：按时间戳分组并取第一个值，然后排序
-            df = pd.DataFrame(all_data)
-            df = df.groupby('timestamp').first().reset_index() # 合并同一时间戳的数据
-            df = df.sort_values(by='timestamp').round(4) # 排序并四舍五入到4位小数
-            
-            df.to_csv(save_path, index=False, encoding='utf-8-sig') # 保存为CSV文件，不包含索引，使用UTF-8 BOM编码
-            QMessageBox.information(self, "导出成功", f"分析数据已成功导出到CSV文件:\n{save_path}")
+            save_analysis_table(columns, save_path)
+            QMessageBox.information(self, "导出成功", f"分析数据已成功导出到:\n{save_path}")
 
         except Exception as e:
-            QMessageBox.critical(self, "导出失败", f"导出CSV时发生错误: {e}")
+            QMessageBox.critical(self, "导出失败", f"导出分析数据时发生错误: {e}")
 
     def handle_export_wav(self):
         """
@@ -3857,16 +4158,16 @@ class AudioAnalysisPage(QWidget):
 
     def load_from_csv(self, csv_path):
         """
-        处理拖入的CSV文件，查找关联音频并加载。
+        处理拖入的分析数据文件（CSV，或 Parquet/Feather/NPZ），查找关联音频并加载。
         Args:
-            csv_path (str): 拖入的CSV文件路径。
+            csv_path (str): 拖入的分析数据文件路径。
         """
         try:
-            # 1. 解析文件名以找到原始音频文件的基本名称
+            # 1. 解析文件名以找到原始音频文件的基本名称（选区导出为 _analysis_..., 批量导出为 _analysis）
             filename = os.path.basename(csv_path)
-            match = re.match(r'(.+)_analysis_.*\.csv', filename)
+            match = re.match(r'(.+)_analysis(?:_.*)?\.(?:csv|parquet|feather|npz)$', filename, re.IGNORECASE)
             if not match:
-                QMessageBox.warning(self, "文件名格式不匹配", "无法从此CSV文件名中识别出原始音频文件。\n\n文件名应为 '[原始文件名]_analysis_...' 格式。")
+                QMessageBox.warning(self, "文件名格式不匹配", "无法从此文件名中识别出原始音频文件。\n\n文件名应为 '[原始文件名]_analysis_...' 格式。")
                 return
             
             base_name = match.group(1) # 提取原始文件名部分
@@ -3893,45 +4194,22 @@ class AudioAnalysisPage(QWidget):
 
     def _apply_csv_data(self, csv_path):
         """
-        读取CSV文件并将其中的分析数据应用到语谱图上。
+        读取分析数据文件并将其中的分析数据应用到语谱图上。
+        [v2.6] 支持 CSV/Parquet/Feather/NPZ（Parquet/Feather 以内存映射方式读取），
+        各列以数组运算还原为 F0、强度和共振峰数据，不再逐行遍历。
         Args:
-            csv_path (str): CSV文件路径。
+            csv_path (str): 分析数据文件路径。
         """
         try:
-            df = pd.read_csv(csv_path)
+            df = load_analysis_table(csv_path)
             if 'timestamp' not in df.columns:
-                QMessageBox.warning(self, "CSV格式错误", "CSV文件中缺少必需的 'timestamp' 列。")
+                QMessageBox.warning(self, "文件格式错误", "分析数据文件中缺少必需的 'timestamp' 列。")
                 return
 
             # 清除旧的分析数据，但不清除语谱图背景本身
             self.spectrogram_widget.set_analysis_data(f0_data=None, intensity_data=None, formants_data=None, clear_previous_formants=True)
 
-            # 准备新的数据容器
-            f0_data, intensity_data, formants_data = None, None, []
-            
-            # --- 提取F0数据 ---
-            if 'f0_hz' in df.columns:
-                f0_df = df[['timestamp', 'f0_hz']].dropna() # 提取时间戳和F0，并去除NaN
-                f0_times = f0_df['timestamp'].to_numpy()
-                f0_values = f0_df['f0_hz'].to_numpy()
-                f0_data = (f0_times, f0_values)
-
-            # --- 提取强度数据 ---
-            if 'intensity' in df.columns:
-                intensity_df = df[['timestamp', 'intensity']].dropna()
-                # 注意: 强度数据需要是一个没有时间戳的纯数组，因为它的时间由 hop_length 决定
-                # 这里我们假设CSV中的时间戳与hop_length匹配，直接提取值
-                intensity_data = intensity_df['intensity'].to_numpy()
-
-            # --- 提取共振峰数据 ---
-            formant_cols = [col for col in df.columns if col.startswith('f') and col.endswith('_hz')] # 查找所有共振峰列
-            if formant_cols:
-                formant_df = df[['timestamp'] + formant_cols].dropna(subset=formant_cols, how='all') # 提取共振峰数据，去除全NaN行
-                for _, row in formant_df.iterrows():
-                    sample_pos = int(row['timestamp'] * self.sr) # 时间转换为采样点
-                    formants = [row[col] for col in formant_cols if pd.notna(row[col])] # 提取有效的共振峰值
-                    if formants:
-                        formants_data.append((sample_pos, formants)) # 添加到共振峰数据列表
+            f0_data, intensity_data, formants_data = analysis_data_from_table(df, self.sr)
             
             # 应用提取的数据到语谱图控件
             self.spectrogram_widget.set_analysis_data(
@@ -3940,10 +4218,10 @@ class AudioAnalysisPage(QWidget):
                 formants_data=formants_data,
                 clear_previous_formants=True
             )
-            QMessageBox.information(self, "加载成功", "已从CSV加载分析数据。\n\n请注意，语谱图背景需要手动点击“运行完整分析”来生成。")
+            QMessageBox.information(self, "加载成功", "已从文件加载分析数据。\n\n请注意，语谱图背景需要手动点击“运行完整分析”来生成。")
 
         except Exception as e:
-            QMessageBox.critical(self, "应用CSV数据失败", f"读取并应用CSV数据时发生错误: {e}")
+            QMessageBox.critical(self, "应用分析数据失败", f"读取并应用分析数据时发生错误: {e}")
 
     def _on_persistent_setting_changed(self, key, value):
         """
@@ -4285,9 +4563,100 @@ class AnalysisSettingsDialog(QDialog):
         mode_layout = QVBoxLayout(mode_group)
         self.normal_mode_radio = QRadioButton("普通模式 (推荐)")
         self.compatibility_mode_radio = QRadioButton("兼容模式")
+        # [新增] 快速模式：F0 改用向量化 YIN，比 pYIN 快一个数量级以上，适合长录音的快速浏览
+        self.fast_mode_radio = QRadioButton("快速模式 (快速浏览)")
+        self.fast_mode_radio.setToolTip("使用向量化 YIN 代替 pYIN 计算 F0，速度快数十倍。\n没有 pYIN 的概率平滑，偶尔出现倍频/半频跳点，精确测量请使用普通模式。")
         mode_layout.addWidget(self.normal_mode_radio)
+        mode_layout.addWidget(self.fast_mode_radio)
         mode_layout.addWidget(self.compatibility_mode_radio)
+
+        # [新增] 普通模式在正式分析前粗略估计 F0 范围的方法
+        self.coarse_f0_method_combo = QComboBox()
+        self.coarse_f0_method_combo.addItem("pYIN (精确)", "pyin")
+        self.coarse_f0_method_combo.addItem("自相关 (快速)", "autocorr")
+        self.coarse_f0_method_combo.setToolTip("普通模式会先粗略估计F0分布以缩小正式分析的搜索范围。\n自相关估计只需几毫秒，pYIN 估计更稳健但在长音频上需要数秒。\n同一文件的估计结果会被缓存，调整其他参数后重新分析时不再重复计算。")
+        coarse_f0_layout = QHBoxLayout()
+        coarse_f0_layout.addWidget(QLabel("F0 范围预估:"))
+        coarse_f0_layout.addWidget(self.coarse_f0_method_combo)
+        coarse_f0_layout.addStretch()
+        mode_layout.addLayout(coarse_f0_layout)
+
+        # [新增] 多进程并行分析（F0 普通模式与共振峰分析）
+        self.parallel_f0_check = QCheckBox("多进程并行分析 (F0 普通模式与共振峰)")
+        self.parallel_f0_check.setToolTip("将各分析块分发到多个CPU核心同时计算，长音频的F0与共振峰提取可显著加速。\n首次启用时需要几秒钟启动后台进程。")
+        self.parallel_workers_spinbox = QSpinBox()
+        self.parallel_workers_spinbox.setRange(0, os.cpu_count() or 1)
+        self.parallel_workers_spinbox.setSpecialValueText("自动 (全部核心)")
+        self.parallel_workers_spinbox.setToolTip("参与计算的进程数，0 表示使用全部CPU核心。")
+        self.parallel_f0_check.toggled.connect(self.parallel_workers_spinbox.setEnabled)
+        parallel_layout = QHBoxLayout()
+        parallel_layout.addWidget(self.parallel_f0_check)
+        parallel_layout.addWidget(QLabel("进程数:"))
+        parallel_layout.addWidget(self.parallel_workers_spinbox)
+        parallel_layout.addStretch()
+        mode_layout.addLayout(parallel_layout)
         layout.addWidget(mode_group)
+
+        # [新增] 共振峰组：平移/缩放时自动分析可见区域
+        formant_group = QGroupBox("共振峰")
+        formant_layout = QHBoxLayout(formant_group)
+        self.auto_view_formants_check = QCheckBox("平移/缩放时自动分析可见区域的共振峰")
+        self.auto_view_formants_check.setToolTip("打开“显示共振峰”且已生成语谱图时，自动分析当前视图中尚未分析的部分，并在后台预取两侧相邻区域。\n已分析过的区域会被记住，来回拖动时不会重复计算。")
+        self.auto_view_formants_max_spinbox = QSpinBox()
+        self.auto_view_formants_max_spinbox.setRange(1, 600)
+        self.auto_view_formants_max_spinbox.setSuffix(" 秒")
+        self.auto_view_formants_max_spinbox.setToolTip("视图比这更长时不自动分析，请使用“分析共振峰”按钮。")
+        self.auto_view_formants_check.toggled.connect(self.auto_view_formants_max_spinbox.setEnabled)
+        formant_layout.addWidget(self.auto_view_formants_check)
+        formant_layout.addWidget(QLabel("视图上限:"))
+        formant_layout.addWidget(self.auto_view_formants_max_spinbox)
+        formant_layout.addStretch()
+        layout.addWidget(formant_group)
+
+        # [新增] 批量分析组：多个文件在进程池中同时分析
+        batch_group = QGroupBox("批量分析")
+        batch_layout = QHBoxLayout(batch_group)
+        self.batch_workers_spinbox = QSpinBox()
+        self.batch_workers_spinbox.setRange(0, os.cpu_count() or 1)
+        self.batch_workers_spinbox.setSpecialValueText("自动 (全部核心)")
+        self.batch_workers_spinbox.setToolTip("批量分析时同时分析的文件数（每个文件一个进程），0 表示使用全部CPU核心，1 表示逐个分析。\n逐个分析时进度条会显示每个文件内部的进度。")
+        self.batch_max_in_flight_spinbox = QSpinBox()
+        self.batch_max_in_flight_spinbox.setRange(1, 600)
+        self.batch_max_in_flight_spinbox.setSuffix(" 分钟")
+        self.batch_max_in_flight_spinbox.setToolTip("同时分析的文件的音频总时长上限，用于限制内存占用。\n单个文件超过该时长时仍会单独分析。")
+        batch_layout.addWidget(QLabel("同时分析的文件数:"))
+        batch_layout.addWidget(self.batch_workers_spinbox)
+        batch_layout.addWidget(QLabel("音频总时长上限:"))
+        batch_layout.addWidget(self.batch_max_in_flight_spinbox)
+        batch_layout.addStretch()
+        layout.addWidget(batch_group)
+
+        # [新增] 分析结果缓存组
+        cache_group = QGroupBox("分析结果缓存")
+        cache_layout = QVBoxLayout(cache_group)
+        self.cache_enabled_check = QCheckBox("启用磁盘缓存")
+        self.cache_enabled_check.setToolTip("按音频内容和全部分析参数缓存F0、强度、共振峰和语谱图。\n再次打开同一文件并使用相同参数分析时，结果将立即显示。")
+        self.cache_size_spinbox = QSpinBox()
+        self.cache_size_spinbox.setRange(100, 100000)
+        self.cache_size_spinbox.setSingleStep(256)
+        self.cache_size_spinbox.setSuffix(" MB")
+        self.cache_size_spinbox.setToolTip("缓存总大小上限，超出时自动删除最久未使用的结果。")
+        self.cache_enabled_check.toggled.connect(self.cache_size_spinbox.setEnabled)
+        cache_size_layout = QHBoxLayout()
+        cache_size_layout.addWidget(self.cache_enabled_check)
+        cache_size_layout.addWidget(QLabel("容量上限:"))
+        cache_size_layout.addWidget(self.cache_size_spinbox)
+        cache_size_layout.addStretch()
+        cache_layout.addLayout(cache_size_layout)
+        cache_usage_layout = QHBoxLayout()
+        self.cache_usage_label = QLabel()
+        self.clear_cache_btn = QPushButton("清空缓存")
+        self.clear_cache_btn.clicked.connect(self._clear_analysis_cache)
+        cache_usage_layout.addWidget(self.cache_usage_label)
+        cache_usage_layout.addStretch()
+        cache_usage_layout.addWidget(self.clear_cache_btn)
+        cache_layout.addLayout(cache_usage_layout)
+        layout.addWidget(cache_group)
         
         layout.addStretch()
         
@@ -4362,8 +4731,33 @@ class AnalysisSettingsDialog(QDialog):
         if module_states.get("hover_info_mode", "always") == "ctrl": self.hover_info_ctrl_radio.setChecked(True)
         else: self.hover_info_always_radio.setChecked(True)
             
-        if module_states.get("analysis_mode", "normal") == "compatibility": self.compatibility_mode_radio.setChecked(True)
+        analysis_mode = module_states.get("analysis_mode", "normal")
+        if analysis_mode == "compatibility": self.compatibility_mode_radio.setChecked(True)
+        elif analysis_mode == "fast": self.fast_mode_radio.setChecked(True)
         else: self.normal_mode_radio.setChecked(True)
+        method_index = self.coarse_f0_method_combo.findData(module_states.get("coarse_f0_method", "pyin"))
+        self.coarse_f0_method_combo.setCurrentIndex(max(0, method_index))
+
+        parallel_enabled = module_states.get("parallel_f0_enabled", False)
+        self.parallel_f0_check.setChecked(parallel_enabled)
+        self.parallel_workers_spinbox.setValue(module_states.get("parallel_f0_workers", 0))
+        self.parallel_workers_spinbox.setEnabled(parallel_enabled)
+
+        auto_view_formants = module_states.get("auto_view_formants", True)
+        self.auto_view_formants_check.setChecked(auto_view_formants)
+        self.auto_view_formants_max_spinbox.setValue(
+            module_states.get("auto_view_formants_max_s", AudioAnalysisPage.DEFAULT_AUTO_VIEW_FORMANTS_MAX_S))
+        self.auto_view_formants_max_spinbox.setEnabled(auto_view_formants)
+
+        self.batch_workers_spinbox.setValue(module_states.get("batch_workers", 0))
+        self.batch_max_in_flight_spinbox.setValue(
+            module_states.get("batch_max_in_flight_minutes", BatchAnalysisWorker.DEFAULT_MAX_IN_FLIGHT_S // 60))
+
+        cache_enabled = module_states.get("analysis_cache_enabled", True)
+        self.cache_enabled_check.setChecked(cache_enabled)
+        self.cache_size_spinbox.setValue(module_states.get("analysis_cache_size_mb", DEFAULT_CACHE_SIZE_MB))
+        self.cache_size_spinbox.setEnabled(cache_enabled)
+        self._update_cache_usage_label()
 
         follow_theme = module_states.get("follow_theme_for_points", True)
         self.follow_theme_check.setChecked(follow_theme)
@@ -4383,6 +4777,22 @@ class AnalysisSettingsDialog(QDialog):
         self.outline_width_slider.setValue(int(outline_width * 10))
         self._on_outline_width_changed(self.outline_width_slider.value())
 
+    def _get_analysis_cache(self):
+        """返回可用于查看/清理的缓存实例（即使当前页面关闭了缓存，也允许清理已有文件）。"""
+        if self.parent_page.disk_cache is not None:
+            return self.parent_page.disk_cache
+        return AnalysisCache(os.path.join(self.parent_page.parent_window.BASE_PATH, "cache", "audio_analysis"))
+
+    def _update_cache_usage_label(self):
+        size_mb = self._get_analysis_cache().total_size_bytes() / (1024 * 1024)
+        self.cache_usage_label.setText(f"当前占用: {size_mb:.1f} MB")
+
+    def _clear_analysis_cache(self):
+        reply = QMessageBox.question(self, "清空缓存", "确定要删除所有已缓存的分析结果吗？", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self._get_analysis_cache().clear()
+            self._update_cache_usage_label()
+
     def save_settings(self):
         """
         [已修复] 将UI上的所有设置保存回主配置。
@@ -4397,7 +4807,16 @@ class AnalysisSettingsDialog(QDialog):
         settings_from_dialog = {
             "startup_mode": "batch" if self.batch_mode_radio.isChecked() else "single",
             "hover_info_mode": "ctrl" if self.hover_info_ctrl_radio.isChecked() else "always",
-            "analysis_mode": "compatibility" if self.compatibility_mode_radio.isChecked() else "normal",
+            "analysis_mode": "compatibility" if self.compatibility_mode_radio.isChecked() else ("fast" if self.fast_mode_radio.isChecked() else "normal"),
+            "coarse_f0_method": self.coarse_f0_method_combo.currentData(),
+            "parallel_f0_enabled": self.parallel_f0_check.isChecked(),
+            "parallel_f0_workers": self.parallel_workers_spinbox.value(),
+            "auto_view_formants": self.auto_view_formants_check.isChecked(),
+            "auto_view_formants_max_s": self.auto_view_formants_max_spinbox.value(),
+            "batch_workers": self.batch_workers_spinbox.value(),
+            "batch_max_in_flight_minutes": self.batch_max_in_flight_spinbox.value(),
+            "analysis_cache_enabled": self.cache_enabled_check.isChecked(),
+            "analysis_cache_size_mb": self.cache_size_spinbox.value(),
             "follow_theme_for_points": self.follow_theme_check.isChecked(),
             "f0_point_color": self.f0_color_btn.color().name(),
             "f0_point_outline": self.f0_outline_check.isChecked(),
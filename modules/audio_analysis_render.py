@@ -0,0 +1,505 @@
+# --- START OF FILE modules/audio_analysis_render.py ---
+# --- 模块元数据 ---
+MODULE_NAME = "音频分析渲染器"
+MODULE_DESCRIPTION = "只依赖 QImage/QPainter 的语谱图与声学叠加层渲染器，供界面绘制、单张导出、批量导出和命令行共用，不直接作为独立标签页。"
+# ---
+#
+# 渲染输入分为两部分，均为普通字典：
+#   scene —— 数据与视图：'sr'、'hop_length'、'view' (起始, 结束采样点)、'max_display_freq'、
+#            'spectrogram'（Indexed8 QImage 或量化后的 uint8 数组）或 'spectrogram_tiles'（分块列表）、
+#            'f0_data'、'f0_derived_data'、'intensity_data'、'formants_data'、
+#            'f0_display_range'（(下限, 上限)，None 表示不显示 F0 轴）。
+#   style —— 外观：颜色（QColor.rgba() 整数）、点轮廓、坐标轴字体和各叠加层的可见性（见 DEFAULT_RENDER_STYLE）。
+# 两者只包含数组、数字、字符串和布尔值时可以被 pickle，因此同一份渲染代码既能在 GUI 线程中
+# 为 SpectrogramWidget 绘制背景层，也能在工作线程或子进程中离屏生成导出图片，结果逐像素一致。
+
+import os
+import math
+import threading
+from datetime import timedelta
+
+from PyQt5.QtCore import Qt, QPointF, QRect, QRectF
+from PyQt5.QtGui import QPainter, QColor, QPen, QImage, QFont, QPolygonF, QGuiApplication
+
+try:
+    import numpy as np
+    import pandas as pd
+    DEPENDENCIES_MISSING = False
+except ImportError as e:
+    print(f"CRITICAL: audio_analysis_render.py - Missing dependencies: {e}")
+    DEPENDENCIES_MISSING = True
+    MISSING_ERROR_MESSAGE = str(e)
+
+from audio_analysis_engine import quantize_spectrogram
+
+
+PLOT_PADDING = (45, 10, 45, 10) # 绘图区左、上、右、下边距，左右两侧留给频率轴和 F0 轴
+TIME_AXIS_HEIGHT = 35           # 导出图片中时间轴的固定像素高度
+TIME_AXIS_FONT_PIXEL_SIZE = 12
+INFO_FONT_PIXEL_SIZE = 14
+DEFAULT_F0_DISPLAY_RANGE = (75, 400)
+
+# 与 SpectrogramWidget 的默认外观一致
+DEFAULT_RENDER_STYLE = {
+    'background': QColor(Qt.white).rgba(),
+    'spectrogram_min_color': QColor(Qt.white).rgba(), 'spectrogram_max_color': QColor(Qt.black).rgba(),
+    'axis_color': QColor(150, 150, 150).rgba(),
+    'intensity_color': QColor("#4CAF50").rgba(),
+    'f0_color': QColor("#FFA726").rgba(), 'f0_derived_color': QColor(150, 150, 255, 150).rgba(),
+    'f1_color': QColor("#FF6F00").rgba(), 'f2_color': QColor("#9C27B0").rgba(), 'formant_color': QColor("#29B6F6").rgba(),
+    'point_outline_color': QColor(Qt.black).rgba(), 'point_outline_width': 0.5,
+    'f0_point_outline': False, 'f1_point_outline': True, 'f2_point_outline': True, 'formant_point_outline': False,
+    'text_color': QColor(Qt.black).rgba(),
+    'axis_font': None, # QFont 或 QFont.toString() 字符串；None 表示默认字体
+    'show_f0': True, 'show_f0_points': True, 'show_f0_derived': True,
+    'show_intensity': False, 'smooth_intensity': False,
+    'show_formants': True, 'highlight_f1': True, 'highlight_f2': True, 'show_other_formants': True,
+}
+
+_point_sprites = {} # 预渲染的数据点贴图（QImage），按样式和设备像素比缓存，各线程共享（只读）
+_sprite_lock = threading.Lock()
+_render_app = None # ensure_render_application 创建的 QGuiApplication；必须一直持有引用，否则会立即被回收
+_render_app_lock = threading.Lock()
+
+
+def ensure_render_application():
+    """
+    绘制文字需要 QGuiApplication。子进程（例如命令行批量导出）中没有时，
+    以 offscreen 平台创建一个，不需要显示环境。创建的实例保存在模块变量中，在进程结束前一直有效。
+    """
+    global _render_app
+    with _render_app_lock:
+        app = QGuiApplication.instance()
+        if app is None:
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            _render_app = app = QGuiApplication([])
+        return app
+
+
+def spectrogram_color_table(min_color, max_color):
+    """由最小/最大颜色（QColor.rgba() 整数）线性插值得到的 256 色调色板。"""
+    min_c = np.array(QColor.fromRgba(min_color).getRgb(), dtype=float)
+    max_c = np.array(QColor.fromRgba(max_color).getRgb(), dtype=float)
+    colors = (min_c + (max_c - min_c) * (np.arange(256)[:, None] / 255.0)).astype(int)
+    return [QColor(r, g, b).rgba() for r, g, b, _ in colors]
+
+
+def spectrogram_image(S_db, color_table):
+    """
+    将 dB 语谱图（或 quantize_spectrogram 量化后的 uint8 矩阵）转换为 Indexed8 图像，
+    低频在下；图像拥有自己的内存，与输入数组无关。
+    """
+    S_quantized = quantize_spectrogram(np.asarray(S_db))
+    h, w = S_quantized.shape # 高度为频率 bin 数，宽度为帧数
+    image = QImage(w, h, QImage.Format_Indexed8)
+    image.setColorTable(color_table)
+    bits = image.bits()
+    bits.setsize(image.byteCount())
+    # 垂直翻转数据，因为QImage的0,0点在左上角，而语谱图的0频率在底部；每行按 4 字节对齐
+    np.frombuffer(bits, dtype=np.uint8).reshape(h, image.bytesPerLine())[:, :w] = S_quantized[::-1]
+    return image
+
+
+def auto_f0_display_range(f0_values):
+    """
+    根据 F0 数据计算自动显示范围：上下各留 10%（至少 10 Hz）的余量，且范围不小于 100 Hz。
+    有效值少于两个时返回 None（不显示 F0 轴）。
+    """
+    valid_f0 = f0_values[np.isfinite(f0_values)]
+    if len(valid_f0) <= 1:
+        return None
+    actual_min, actual_max = np.min(valid_f0), np.max(valid_f0)
+    padding = max(10, (actual_max - actual_min) * 0.1)
+    padded_min, padded_max = actual_min - padding, actual_max + padding
+    if padded_max - padded_min < 100:
+        center = (padded_max + padded_min) / 2
+        padded_min, padded_max = center - 50, center + 50
+    return max(0, padded_min), padded_max
+
+
+def plot_rect_for(rect):
+    """绘图安全区：在 rect 内留出左右两侧的频率轴和 F0 轴。"""
+    left, top, right, bottom = PLOT_PADDING
+    return rect.adjusted(left, top, -right, -bottom)
+
+
+def polygon_from_array(xy):
+    """
+    将形状为 (N, 2) 的坐标数组一次性写入 QPolygonF。
+    直接填充 QPolygonF 的底层内存（每个点为两个 double），避免逐点创建 QPointF。
+    """
+    n = len(xy)
+    polygon = QPolygonF(n)
+    if n:
+        buffer = polygon.data()
+        buffer.setsize(n * 16)
+        np.frombuffer(buffer, dtype=np.float64).reshape(n, 2)[:] = xy
+    return polygon
+
+
+def format_duration(ms):
+    """将毫秒数格式化为 "MM:SS.ms" 字符串。"""
+    if ms <= 0: return "00:00.00"
+    td = timedelta(milliseconds=ms)
+    minutes, seconds = divmod(td.seconds, 60)
+    milliseconds = td.microseconds // 10000 # 取百分之一秒
+    return f"{minutes:02d}:{seconds:02d}.{milliseconds:02d}"
+
+
+def analysis_info_text(filepath, duration_ms, sr):
+    """导出图片右上角的信息标签文本。"""
+    filename = os.path.basename(filepath) if filepath and isinstance(filepath, str) else "N/A"
+    return f"File: {filename}\nDuration: {format_duration(duration_ms)}\nSample Rate: {sr} Hz"
+
+
+def scene_from_results(results, max_display_freq=5000, f0_display_range='auto'):
+    """
+    由一份分析结果（analyze_file / BatchAnalysisWorker 的输出）构建覆盖整个文件的 scene。
+    f0_display_range 为 'auto' 时按 F0 数据自动计算，也可以直接给出 (下限, 上限)；
+    有效 F0 少于两个时不显示 F0 轴。
+    """
+    sr = results['sr']
+    f0_data = results.get('f0_data')
+    auto_range = auto_f0_display_range(f0_data[1]) if f0_data is not None else None
+    if auto_range is None:
+        f0_display_range = None
+    elif f0_display_range == 'auto':
+        f0_display_range = auto_range
+    return {
+        'sr': sr, 'hop_length': results['hop_length'], 'max_display_freq': max_display_freq,
+        'view': (0, max(1, int(round(results['duration_ms'] / 1000 * sr)))),
+        'spectrogram': results.get('S_db'), 'spectrogram_tiles': None,
+        'f0_data': f0_data, 'f0_derived_data': results.get('f0_derived_data'),
+        'intensity_data': results.get('intensity_data'), 'formants_data': results.get('formants_data') or [],
+        'f0_display_range': f0_display_range,
+    }
+
+
+# --- 叠加层几何 ---
+def _cached(cache, name, data, params, build):
+    """
+    返回名为 name 的几何对象。缓存同时持有数据对象本身的引用，
+    只有数据对象被替换（`is` 比较）或 params 变化时才调用 build() 重建。
+    """
+    entry = cache.get(name)
+    if entry is not None and entry[0] is data and entry[1] == params:
+        return entry[2]
+    geometry = build()
+    cache[name] = (data, params, geometry)
+    return geometry
+
+
+def _smoothed_intensity(intensity_data):
+    return pd.Series(intensity_data).rolling(window=5, center=True, min_periods=1).mean().to_numpy()
+
+
+def _visible_range(sample_positions, view):
+    """用二分查找返回落在视图内的数据下标范围 [start_idx, end_idx)。"""
+    start_idx = np.searchsorted(sample_positions, view[0], side='left')
+    end_idx = np.searchsorted(sample_positions, view[1], side='right')
+    return start_idx, end_idx
+
+
+def _samples_to_x(sample_positions, view, plot_rect):
+    return plot_rect.left() + (sample_positions - view[0]) * plot_rect.width() / (view[1] - view[0])
+
+
+def _intensity_polygon(data_to_plot, hop_length, view, plot_rect):
+    max_intensity = np.max(data_to_plot) if len(data_to_plot) > 0 else 1.0
+    if max_intensity == 0: max_intensity = 1.0
+    sample_positions = np.arange(len(data_to_plot)) * hop_length
+    start_idx, end_idx = _visible_range(sample_positions, view)
+    points = np.empty((end_idx - start_idx, 2))
+    points[:, 0] = _samples_to_x(sample_positions[start_idx:end_idx], view, plot_rect)
+    points[:, 1] = plot_rect.bottom() - (data_to_plot[start_idx:end_idx] / max_intensity * plot_rect.height() * 0.3)
+    return polygon_from_array(points)
+
+
+def _visible_f0_points(f0_data, sr, view, f0_range, plot_rect):
+    """将视图内的有效 F0 值换算为 (N, 2) 的像素坐标数组。"""
+    times, f0_values = f0_data
+    sample_positions = times * sr
+    start_idx, end_idx = _visible_range(sample_positions, view)
+    positions, values = sample_positions[start_idx:end_idx], f0_values[start_idx:end_idx]
+    finite = np.isfinite(values)
+    f0_min, f0_max = f0_range
+    points = np.empty((int(finite.sum()), 2))
+    points[:, 0] = _samples_to_x(positions[finite], view, plot_rect)
+    points[:, 1] = plot_rect.bottom() - ((values[finite] - f0_min) / (f0_max - f0_min) * plot_rect.height())
+    return points
+
+
+def _to_point_list(points):
+    return [QPointF(x, y) for x, y in points.tolist()]
+
+
+def _formant_groups(formants_data, view, max_display_freq, enabled, plot_rect):
+    """返回 (F1 点列表, F2 点列表, 其他共振峰点列表)，未启用的分组为空列表。"""
+    sample_positions = np.array([item[0] for item in formants_data])
+    start_idx, end_idx = _visible_range(sample_positions, view)
+    xs = _samples_to_x(sample_positions[start_idx:end_idx], view, plot_rect)
+    groups = ([], [], [])
+    for x, (_, formants) in zip(xs.tolist(), formants_data[start_idx:end_idx]):
+        for i, f in enumerate(formants):
+            group = 0 if i == 0 else 1 if i == 1 else 2
+            if not enabled[group]: continue
+            y = plot_rect.bottom() - (f / max_display_freq * plot_rect.height())
+            if plot_rect.top() <= y <= plot_rect.bottom():
+                groups[group].append(QPointF(x, y))
+    return groups
+
+
+def point_sprite(color, outline_color, outline_width, dpr=1.0):
+    """
+    预先渲染的数据点（半径 2.5 的圆及可选轮廓）。大量数据点以贴图方式绘制，
+    比逐个抗锯齿绘制椭圆快一个数量级；按颜色、轮廓和设备像素比缓存。
+    """
+    key = (color, outline_color, outline_width, dpr)
+    sprite = _point_sprites.get(key)
+    if sprite is None:
+        extent = math.ceil(5 + (outline_width if outline_color is not None else 0)) + 2
+        sprite = QImage(math.ceil(extent * dpr), math.ceil(extent * dpr), QImage.Format_ARGB32_Premultiplied)
+        sprite.setDevicePixelRatio(dpr)
+        sprite.fill(Qt.transparent)
+        sprite_painter = QPainter(sprite)
+        sprite_painter.setRenderHint(QPainter.Antialiasing)
+        sprite_painter.setPen(QPen(QColor.fromRgba(outline_color), outline_width) if outline_color is not None else Qt.NoPen)
+        sprite_painter.setBrush(QColor.fromRgba(color))
+        sprite_painter.drawEllipse(QPointF(extent / 2, extent / 2), 2.5, 2.5)
+        sprite_painter.end()
+        with _sprite_lock:
+            sprite = _point_sprites.setdefault(key, sprite)
+    return sprite
+
+
+def _draw_point_sprites(painter, centers, sprite):
+    """以 centers（QPointF 列表）为圆心绘制一组数据点。"""
+    half = sprite.width() / sprite.devicePixelRatio() / 2
+    painter.save()
+    painter.translate(-half, -half)
+    for center in centers:
+        painter.drawImage(center, sprite)
+    painter.restore()
+
+
+def _draw_spectrogram_tiles(painter, tiles, view, plot_rect):
+    """绘制视图内的语谱图分块 [(样本起点, 样本终点, QImage 或 None, 源矩形), ...]。"""
+    scale = plot_rect.width() / (view[1] - view[0])
+    painter.save()
+    painter.setClipRect(plot_rect)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform, False)
+    for tile_start, tile_end, image, source_rect in tiles:
+        if image is None: continue
+        x0 = plot_rect.left() + (tile_start - view[0]) * scale
+        x1 = plot_rect.left() + (tile_end - view[0]) * scale
+        painter.drawImage(QRectF(x0, plot_rect.top(), x1 - x0, plot_rect.height()), image, source_rect)
+    painter.restore()
+
+
+def _style_font(style):
+    value = style.get('axis_font')
+    if isinstance(value, QFont):
+        return QFont(value)
+    font = QFont()
+    if value:
+        font.fromString(value)
+    return font
+
+
+def paint_spectrogram_layer(painter, rect, scene, style, cache=None, dpr=1.0):
+    """
+    在 rect 内绘制语谱图及其所有叠加层（背景、语谱图、网格与坐标轴、强度、F0、共振峰）。
+    叠加层使用 numpy.searchsorted 裁剪到视图内，坐标以数组运算求得；
+    cache 为跨次绘制复用的几何缓存字典（None 表示不复用），dpr 为目标设备像素比。
+    """
+    if cache is None: cache = {}
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.fillRect(rect, QColor.fromRgba(style['background']))
+
+    plot_rect = plot_rect_for(rect)
+    if not plot_rect.isValid(): return
+
+    view = scene['view']
+    sr, hop_length, max_display_freq = scene['sr'], scene['hop_length'], scene['max_display_freq']
+    h = plot_rect.height()
+    if view[1] - view[0] <= 0: return
+
+    # --- 绘制语谱图背景 ---
+    spectrogram = scene.get('spectrogram')
+    if scene.get('spectrogram_tiles') is not None:
+        _draw_spectrogram_tiles(painter, scene['spectrogram_tiles'], view, plot_rect)
+    elif spectrogram is not None:
+        if not isinstance(spectrogram, QImage):
+            color_key = (style['spectrogram_min_color'], style['spectrogram_max_color'])
+            spectrogram = _cached(cache, 'spectrogram', spectrogram, color_key, lambda: spectrogram_image(
+                spectrogram, spectrogram_color_table(*color_key)))
+        start_frame = view[0] // hop_length
+        end_frame = view[1] // hop_length
+        view_width_frames = end_frame - start_frame
+        if view_width_frames > 0:
+            source_rect = QRect(start_frame, 0, view_width_frames, spectrogram.height())
+            painter.drawImage(plot_rect, spectrogram, source_rect)
+
+    # --- 绘制坐标轴和网格线 ---
+    painter.setPen(QPen(QColor.fromRgba(style['axis_color']), 1, Qt.DotLine))
+    font = _style_font(style)
+    font.setPointSize(8)
+    painter.setFont(font)
+
+    for freq in range(0, int(max_display_freq) + 1, 1000):
+        if freq == 0 and max_display_freq > 0: continue
+        y = plot_rect.bottom() - (freq / max_display_freq * h)
+        painter.drawLine(plot_rect.left(), int(y), plot_rect.right(), int(y))
+        painter.drawText(QPointF(plot_rect.left() - 35, int(y) + 4), f"{freq}")
+
+    f0_range = scene.get('f0_display_range')
+    f0_display_range = f0_range[1] - f0_range[0] if f0_range is not None else 0
+    if f0_display_range > 0:
+        f0_min, f0_max = f0_range
+        step = 50 if f0_display_range > 200 else 25 if f0_display_range > 100 else 10
+        text_height = painter.fontMetrics().height()
+        for freq in range(int(f0_min // step * step), int(f0_max) + 1, step):
+            if freq < f0_min: continue
+            y = plot_rect.bottom() - ((freq - f0_min) / f0_display_range * h)
+            painter.drawLine(plot_rect.left(), int(y), plot_rect.right(), int(y))
+            painter.drawText(
+                QRect(plot_rect.right() + 5, int(y) - text_height // 2,
+                      plot_rect.right() - plot_rect.left() - 10, text_height),
+                Qt.AlignLeft | Qt.AlignVCenter, f"{freq}"
+            )
+
+    # --- 叠加层：可见部分以 NumPy 数组计算，几何对象缓存到视图或数据变化为止 ---
+    view_key = (view[0], view[1], plot_rect.getRect(), sr, hop_length)
+    outline_color, outline_width = style['point_outline_color'], style['point_outline_width']
+
+    # --- 强度曲线 ---
+    intensity_data = scene.get('intensity_data')
+    if style['show_intensity'] and intensity_data is not None:
+        painter.setPen(QPen(QColor.fromRgba(style['intensity_color']), 2))
+        data_to_plot = intensity_data
+        if style['smooth_intensity']:
+            data_to_plot = _cached(cache, 'smoothed_intensity', intensity_data, None,
+                                   lambda: _smoothed_intensity(intensity_data))
+        polygon = _cached(cache, 'intensity', data_to_plot, view_key,
+                          lambda: _intensity_polygon(data_to_plot, hop_length, view, plot_rect))
+        if polygon.size() > 1:
+            painter.drawPolyline(polygon)
+
+    # --- 基频曲线 (F0) ---
+    if style['show_f0'] and f0_display_range > 0:
+        f0_key = view_key + tuple(f0_range)
+        f0_derived_data, f0_data = scene.get('f0_derived_data'), scene.get('f0_data')
+        if style['show_f0_derived'] and f0_derived_data:
+            painter.setPen(QPen(QColor.fromRgba(style['f0_derived_color']), 1.5, Qt.DashLine))
+            polygon = _cached(cache, 'f0_derived', f0_derived_data, f0_key,
+                              lambda: polygon_from_array(_visible_f0_points(f0_derived_data, sr, view, f0_range, plot_rect)))
+            if polygon.size() > 1:
+                painter.drawPolyline(polygon)
+
+        if style['show_f0_points'] and f0_data:
+            centers = _cached(cache, 'f0_points', f0_data, f0_key,
+                              lambda: _to_point_list(_visible_f0_points(f0_data, sr, view, f0_range, plot_rect)))
+            sprite = point_sprite(style['f0_color'], outline_color if style['f0_point_outline'] else None, outline_width, dpr)
+            _draw_point_sprites(painter, centers, sprite)
+
+    # --- 共振峰点（按 F1 / F2 / 其他分组） ---
+    formants_data = scene.get('formants_data')
+    if style['show_formants'] and formants_data:
+        enabled = (style['highlight_f1'], style['highlight_f2'], style['show_other_formants'])
+        formant_key = view_key + (len(formants_data), max_display_freq) + enabled
+        groups = _cached(cache, 'formants', formants_data, formant_key,
+                         lambda: _formant_groups(formants_data, view, max_display_freq, enabled, plot_rect))
+        styles = (('f1_color', 'f1_point_outline'), ('f2_color', 'f2_point_outline'), ('formant_color', 'formant_point_outline'))
+        for centers, (color_name, outline_name) in zip(groups, styles):
+            if centers:
+                sprite = point_sprite(style[color_name], outline_color if style[outline_name] else None, outline_width, dpr)
+                _draw_point_sprites(painter, centers, sprite)
+
+
+def _paint_time_axis(painter, axis_rect, scene, style):
+    """在 axis_rect 内绘制视图的时间刻度（刻度间隔取 1/2/5×10^n，约每 150 像素一个）。"""
+    view_start_sample, view_end_sample = scene['view']
+    sr = scene['sr']
+    target_width = axis_rect.width()
+    view_duration_s = (view_end_sample - view_start_sample) / sr if sr > 0 else 0
+    start_time_s = view_start_sample / sr if sr > 0 else 0
+
+    target_ticks = max(5, int(target_width / 150))
+    raw_interval = view_duration_s / target_ticks if target_ticks > 0 else 0
+    if raw_interval <= 0:
+        return
+
+    power = 10.0 ** math.floor(math.log10(raw_interval))
+    if raw_interval / power < 1.5: interval = 1 * power
+    elif raw_interval / power < 3.5: interval = 2 * power
+    elif raw_interval / power < 7.5: interval = 5 * power
+    else: interval = 10 * power
+
+    font = QFont(); font.setPixelSize(TIME_AXIS_FONT_PIXEL_SIZE)
+    painter.setFont(font)
+    painter.setPen(QColor.fromRgba(style['text_color']))
+
+    first_tick_time = math.ceil(start_time_s / interval) * interval
+    for i in range(int(target_ticks * 2)):
+        tick_time = first_tick_time + i * interval
+        if tick_time > start_time_s + view_duration_s: break
+
+        x_pos = (tick_time - start_time_s) / view_duration_s * target_width if view_duration_s > 0 else 0
+        painter.drawLine(int(x_pos), axis_rect.top(), int(x_pos), axis_rect.top() + 5)
+
+        if interval >= 1: label = f"{tick_time:.1f}s"
+        elif interval >= 0.1: label = f"{tick_time:.2f}"
+        elif interval >= 0.01: label = f"{tick_time:.3f}"
+        else: label = f"{tick_time * 1000:.1f}ms"
+
+        painter.drawText(QRect(int(x_pos) - 50, axis_rect.top() + 5, 100, axis_rect.height() - 5), Qt.AlignCenter | Qt.TextDontClip, label)
+
+
+def render_analysis_image(scene, style, options, info_text=None):
+    """
+    离屏渲染一张导出图片并返回 QImage：上方为语谱图及叠加层，下方为可选的时间轴，
+    右上角为可选的信息标签。只使用 QImage/QPainter，可以在任意线程或子进程中调用
+    （绘制文字需要 QGuiApplication，子进程中见 ensure_render_application）。
+
+    :param options: (dict) 'resolution' (宽, 高)、'info_label' 和 'add_time_axis'。
+    :param info_text: (str, optional) 信息标签文本，见 analysis_info_text。
+    """
+    target_width, target_height = options['resolution']
+    axis_height = TIME_AXIS_HEIGHT if options['add_time_axis'] else 0
+    spectrogram_height = target_height - axis_height
+
+    background = QColor.fromRgba(style['background'])
+    image_format = QImage.Format_RGB32 if background.alpha() == 255 else QImage.Format_ARGB32_Premultiplied
+    image = QImage(target_width, target_height, image_format)
+    image.fill(background)
+
+    painter = QPainter(image)
+    if spectrogram_height > 0:
+        # 与控件的背景层一样绘制在 (宽 × 语谱图高度) 的区域内，超出部分被裁掉
+        spectrogram_rect = QRect(0, 0, target_width, spectrogram_height)
+        painter.save()
+        painter.setClipRect(spectrogram_rect)
+        paint_spectrogram_layer(painter, spectrogram_rect, scene, style)
+        painter.restore()
+
+    painter.setRenderHint(QPainter.Antialiasing)
+    if options['add_time_axis'] and axis_height > 0:
+        _paint_time_axis(painter, QRect(0, spectrogram_height, target_width, axis_height), scene, style)
+
+    if options['info_label'] and info_text:
+        font = QFont(); font.setPixelSize(INFO_FONT_PIXEL_SIZE)
+        painter.setFont(font)
+        painter.setPen(QColor(Qt.darkGray))
+        margin = 15
+        painter.drawText(QRect(0, 0, target_width - margin, target_height - margin), Qt.AlignRight | Qt.AlignTop, info_text)
+    painter.end()
+    return image
+
+
+def render_analysis_file(scene, style, options, info_text, path):
+    """
+    渲染一张导出图片并保存到 path（格式由扩展名决定）。
+    参数均可 pickle 时可以直接作为进程池任务提交；返回是否保存成功。
+    """
+    ensure_render_application()
+    return render_analysis_image(scene, style, options, info_text).save(path)
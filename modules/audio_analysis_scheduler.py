@@ -0,0 +1,202 @@
+# --- 模块元数据 ---
+MODULE_NAME = "音频分析任务调度"
+MODULE_DESCRIPTION = "为音频分析模块提供带优先级的后台任务调度：少量工作线程并发执行，同组的新任务取代旧任务，每个任务可单独取消，不直接作为独立标签页。"
+# ---
+#
+# 用法：
+#   task = scheduler.submit(worker, PRIORITY_SPECTROGRAM, group='spectrogram')
+#   task.finished.connect(...); task.done.connect(...)
+# worker 是带有 run() 方法和 finished(dict) / error(str)（可选 chunk_finished(dict)）信号的 QObject，
+# 与 AudioTaskWorker 相同。任务被取消后，它此后发出的所有信号都会被丢弃，只会再收到一次 done。
+
+import heapq
+import itertools
+import threading
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+
+# 优先级：数值越小越先开始
+PRIORITY_LOAD = 0           # 加载音频（其他分析都依赖它）
+PRIORITY_VIEW = 1           # 当前可见区域/选区的共振峰，用户正在看
+PRIORITY_SPECTROGRAM = 2
+PRIORITY_ACOUSTICS = 3
+PRIORITY_BACKGROUND = 9     # 预取等用户暂时看不到的工作
+
+DEFAULT_MAX_CONCURRENT_TASKS = 2
+# 已取消但仍在运行的任务不占用并发名额（否则一个不检查中断的长任务会挡住新任务），
+# 但线程总数不超过并发数的这个倍数
+MAX_THREADS_FACTOR = 2
+
+
+class CancellationToken:
+    """线程安全的取消标记。可以直接作为 cancel_check 回调使用：token() 在已取消时返回 True。"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    __call__ = is_cancelled
+
+
+class AnalysisTask(QObject):
+    """
+    调度器中的一个任务。worker 的信号经由任务转发到界面线程；任务取消后不再转发。
+    done 在任务结束时（完成、出错、被取消或在开始前被取代）恰好发出一次。
+    """
+    chunk_finished = pyqtSignal(dict)
+    finished = pyqtSignal(dict)
+    error = pyqtSignal(str)
+    done = pyqtSignal()
+
+    PENDING, RUNNING, DONE = 'pending', 'running', 'done'
+
+    def __init__(self, worker, priority, group=None):
+        super().__init__()
+        self.worker = worker
+        self.priority = priority
+        self.group = group
+        self.token = CancellationToken()
+        self.state = self.PENDING
+        self.thread = None
+        self.context = {} # 提交者自己的附加数据（如进度对话框、缓存参数）
+
+    def cancel(self):
+        """取消任务：未开始的任务不会再开始，运行中的任务收到线程中断请求，其结果被丢弃。"""
+        self.token.cancel()
+        if self.thread is not None:
+            self.thread.requestInterruption()
+
+    def is_cancelled(self):
+        return self.token.is_cancelled()
+
+    def is_active(self):
+        """任务尚未结束且未被取消。"""
+        return self.state != self.DONE and not self.is_cancelled()
+
+    @pyqtSlot(dict)
+    def _relay_chunk(self, chunk):
+        if not self.is_cancelled():
+            self.chunk_finished.emit(chunk)
+
+    @pyqtSlot(dict)
+    def _relay_finished(self, results):
+        if not self.is_cancelled():
+            self.finished.emit(results)
+
+    @pyqtSlot(str)
+    def _relay_error(self, message):
+        if not self.is_cancelled():
+            self.error.emit(message)
+
+    def _mark_done(self):
+        if self.state != self.DONE:
+            self.state = self.DONE
+            self.done.emit()
+
+
+class AnalysisTaskScheduler(QObject):
+    """
+    带优先级的后台任务调度器。
+    - 最多同时运行 max_concurrent 个任务，其余按 (优先级, 提交顺序) 排队；
+    - 提交带 group 的任务时，同组尚未结束的旧任务会被取消（新请求取代过时的请求）；
+    - 每个任务都有自己的 CancellationToken，可以单独取消。
+    每个任务使用独立的 QThread，线程在任务结束后释放。
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT_TASKS, parent=None):
+        super().__init__(parent)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._pending = [] # 堆：(优先级, 序号, 任务)
+        self._running = {} # QThread -> 任务
+        self._sequence = itertools.count()
+
+    def submit(self, worker, priority, group=None):
+        """提交一个工作器，返回对应的 AnalysisTask；同组的旧任务会被取消。"""
+        if group is not None:
+            self.cancel_group(group)
+        task = AnalysisTask(worker, priority, group)
+        heapq.heappush(self._pending, (priority, next(self._sequence), task))
+        self._schedule()
+        return task
+
+    def cancel_group(self, group):
+        for task in self.tasks():
+            if task.group == group:
+                task.cancel()
+        self._drop_cancelled_pending()
+
+    def cancel_all(self):
+        for task in self.tasks():
+            task.cancel()
+        self._drop_cancelled_pending()
+
+    def active_task(self, group):
+        """返回该组中尚未结束且未被取消的任务，没有时返回 None。"""
+        for task in self.tasks():
+            if task.group == group and task.is_active():
+                return task
+        return None
+
+    def has_active_tasks(self):
+        return any(task.is_active() for task in self.tasks())
+
+    def tasks(self):
+        """所有尚未结束的任务（排队中的和运行中的）。"""
+        return [entry[2] for entry in self._pending] + list(self._running.values())
+
+    def _drop_cancelled_pending(self):
+        """从队列中移除已取消的任务，它们不会再开始。"""
+        dropped = [entry[2] for entry in self._pending if entry[2].is_cancelled()]
+        if not dropped:
+            return
+        self._pending = [entry for entry in self._pending if not entry[2].is_cancelled()]
+        heapq.heapify(self._pending)
+        for task in dropped:
+            task.worker.deleteLater()
+            task._mark_done()
+
+    def _can_start(self):
+        live = sum(1 for task in self._running.values() if not task.is_cancelled())
+        return live < self.max_concurrent and len(self._running) < self.max_concurrent * MAX_THREADS_FACTOR
+
+    def _schedule(self):
+        self._drop_cancelled_pending()
+        while self._pending and self._can_start():
+            _, _, task = heapq.heappop(self._pending)
+            self._start(task)
+
+    def _start(self, task):
+        thread = QThread()
+        worker = task.worker
+        worker.moveToThread(thread)
+        task.thread, task.state = thread, AnalysisTask.RUNNING
+        self._running[thread] = task
+
+        if hasattr(worker, 'chunk_finished'):
+            worker.chunk_finished.connect(task._relay_chunk)
+        worker.finished.connect(task._relay_finished)
+        worker.error.connect(task._relay_error)
+        worker.finished.connect(thread.quit)
+        worker.error.connect(thread.quit)
+        thread.finished.connect(self._on_thread_finished)
+        thread.started.connect(worker.run)
+        thread.start()
+
+    @pyqtSlot()
+    def _on_thread_finished(self):
+        thread = self.sender()
+        task = self._running.pop(thread, None)
+        if task is None:
+            return
+        thread.wait() # finished 在线程真正退出前发出，先等它退出再释放
+        task.worker.deleteLater()
+        thread.deleteLater()
+        task.thread = None
+        task._mark_done()
+        self._schedule()
@@ -0,0 +1,371 @@
+# --- 模块元数据 ---
+MODULE_NAME = "音频流式读取"
+MODULE_DESCRIPTION = "为音频分析模块提供按需读取的音频数据源（PCM WAV 内存映射、压缩格式按需解码）和多级波形包络，不直接作为独立标签页。"
+# ---
+
+import os
+import struct
+import threading
+
+try:
+    import numpy as np
+    import soundfile as sf
+    import librosa
+    DEPENDENCIES_MISSING = False
+except ImportError as e:
+    print(f"CRITICAL: audio_analysis_source.py - Missing dependencies: {e}")
+    DEPENDENCIES_MISSING = True
+    MISSING_ERROR_MESSAGE = str(e)
+
+
+# 可以直接内存映射的 WAV 采样格式：subtype -> (numpy 数据类型, 缩放系数, 偏移量)
+# 缩放与 soundfile 读取为 float32 时的换算保持一致，因此结果与 librosa.load 相同。
+# [修复] PCM_24 没有对应的 numpy 类型，映射为每个采样 3 个字节的 uint8 数组，读取时只转换被访问的范围
+# （见 Pcm24AudioSource，转换为左移 8 位的 32 位整数，因此缩放系数与 PCM_32 相同）。
+_MEMMAP_SUBTYPES = {
+    'PCM_U8': ('u1', 1 / 128, -128.0),
+    'PCM_16': ('<i2', 1 / 32768, 0.0),
+    'PCM_24': ('u1', 1 / 2147483648, 0.0),
+    'PCM_32': ('<i4', 1 / 2147483648, 0.0),
+    'FLOAT': ('<f4', 1.0, 0.0),
+    'DOUBLE': ('<f8', 1.0, 0.0),
+}
+_MEMMAP_FORMATS = ('WAV', 'WAVEX', 'RF64')
+
+DECODE_BLOCK_FRAMES = 1 << 18  # 流式遍历时每块的采样点数
+OVERVIEW_BLOCK_FRAMES = 1 << 20 # 流式构建波形包络时每块的采样点数
+# 有损压缩格式（Vorbis、MP3 等）seek 后最先解码出的采样与顺序解码的结果不一定相同，
+# 随机读取时先 seek 到更早的位置并丢弃这段预解码；无损格式可以精确 seek
+SEEK_PREROLL_FRAMES = 1 << 14
+_EXACT_SEEK_SUBTYPES = ('PCM_S8', 'PCM_U8', 'PCM_16', 'PCM_24', 'PCM_32', 'FLOAT', 'DOUBLE', 'ULAW', 'ALAW')
+
+
+class AudioSource:
+    """
+    按需读取的单声道音频数据源，行为上近似一个一维 float32 数组：
+    支持 len()、切片和整数索引，np.asarray() 会读出完整信号。
+    底层可以是内存映射的 PCM WAV（常驻内存几乎为零，只有被访问的页会被读入），
+    也可以是已解码到内存中的单声道数组。
+    切片返回的始终是普通 ndarray，可以直接交给 librosa 或进程池。
+    子类通过重写 _raw() 提供其他存储方式的原始采样（Pcm24AudioSource、StreamingAudioSource）。
+    """
+    ndim = 1
+
+    def __init__(self, data, sr, scale=1.0, offset=0.0, filepath=None):
+        """
+        Args:
+            data (np.ndarray): 形状为 (采样点,) 或 (采样点, 声道) 的原始数据，可以是 np.memmap。
+            sr (int): 采样率。
+            scale, offset: 原始数据到 [-1, 1) 浮点数的换算：(x + offset) * scale。
+            filepath (str, optional): 来源文件路径，仅用于显示和调试。
+        """
+        self._data = data
+        self.sr = int(sr)
+        self._scale, self._offset = scale, offset
+        self.filepath = filepath
+        self.is_memory_mapped = isinstance(data, np.memmap)
+
+    def __len__(self):
+        return self._data.shape[0]
+
+    @property
+    def shape(self):
+        return (len(self),)
+
+    @property
+    def size(self):
+        return len(self)
+
+    @property
+    def dtype(self):
+        return np.dtype(np.float32)
+
+    def read(self, start, end):
+        """读取 [start, end) 范围的采样点，返回单声道 float32 数组。"""
+        start, end = max(0, int(start)), min(len(self), int(end))
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        raw = self._raw(start, end)
+        if raw.ndim == 2 and raw.shape[1] > 1:
+            # 混为单声道：逐声道累加再取平均，与 librosa.to_mono 的计算顺序一致，且比 mean(axis=1) 快得多
+            block = raw[:, 0].astype(np.float32)
+            for channel in range(1, raw.shape[1]):
+                block += raw[:, channel].astype(np.float32, copy=False)
+            block /= np.float32(raw.shape[1])
+            if self._offset:
+                block += np.float32(self._offset)
+        else:
+            block = raw[:, 0] if raw.ndim == 2 else raw
+            if block.dtype != np.float32 or self._offset:
+                block = block.astype(np.float32) + np.float32(self._offset)
+        if self._scale != 1.0:
+            block = block * np.float32(self._scale)
+        return block
+
+    def bucket_extrema(self, start, end, bucket):
+        """
+        返回 [start, end) 内每 bucket 个采样点的 (最小值, 最大值)，形状为 (桶数, 2)，最后一个桶可以不满。
+        直接在原始采样数据上求极值，最后才换算为浮点数，避免为整段音频做浮点转换；
+        换算是单调的，因此结果与先 read() 再求极值一致（多声道时最多相差 float32 的末位舍入）。
+        """
+        start, end = max(0, int(start)), min(len(self), int(end))
+        raw = self._raw(start, end)
+        channels = raw.shape[1] if raw.ndim == 2 else 1
+        if raw.ndim == 2:
+            if channels == 1:
+                raw = raw[:, 0]
+            else:
+                # 多声道先在更宽的类型中求和（混为单声道前的分子），避免溢出
+                wide = np.float64 if raw.dtype.kind == 'f' else np.int64 if raw.dtype.itemsize >= 4 else np.int32
+                mixed = raw[:, 0].astype(wide)
+                for channel in range(1, channels): # 逐声道累加，比 sum(axis=1) 快得多
+                    mixed += raw[:, channel]
+                raw = mixed
+        full = len(raw) // bucket
+        result = np.empty((-(-len(raw) // bucket), 2), dtype=np.float64)
+        if full:
+            rows = raw[:full * bucket].reshape(full, bucket)
+            result[:full, 0], result[:full, 1] = rows.min(axis=1), rows.max(axis=1)
+        if len(raw) > full * bucket:
+            tail = raw[full * bucket:]
+            result[full] = (tail.min(), tail.max())
+        return ((result / channels + self._offset) * self._scale).astype(np.float32)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.read(start, stop)
+            lo, hi = (start, stop) if step > 0 else (stop + 1, start + 1)
+            return self.read(lo, hi)[::step] if step > 0 else self.read(lo, hi)[::-1][::-step]
+        index = int(key)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("audio sample index out of range")
+        return self.read(index, index + 1)[0]
+
+    def __array__(self, dtype=None, copy=None):
+        y = self.read(0, len(self))
+        return y if dtype is None else y.astype(dtype, copy=False)
+
+    def iter_blocks(self, block_size=DECODE_BLOCK_FRAMES):
+        """依次产出 (起始采样点, 数据块)，用于流式遍历整段音频。"""
+        for start in range(0, len(self), block_size):
+            yield start, self.read(start, start + block_size)
+
+    def _raw(self, start, end):
+        """[start, end) 范围的原始采样，形状为 (采样点,) 或 (采样点, 声道)；调用方已把范围限制在 [0, len)。"""
+        return self._data[start:end]
+
+
+class Pcm24AudioSource(AudioSource):
+    """
+    [新增] 24 位 PCM WAV：data 块映射为形状 (采样点, 声道, 3) 的 uint8 数组，
+    读取时只把被访问的范围转换为 32 位整数（高 24 位为采样值），不会为整个文件做转换。
+    """
+
+    def _raw(self, start, end):
+        raw = self._data[start:end]
+        widened = np.zeros(raw.shape[:2] + (4,), dtype=np.uint8)
+        widened[..., 1:] = raw
+        return widened.view('<i4')[..., 0]
+
+
+class StreamingAudioSource(AudioSource):
+    """
+    [新增] 压缩格式（FLAC/OGG/MP3 等）的数据源：保持 SoundFile 打开，每次读取时 seek 到所需位置并只解码该范围，
+    常驻内存不随文件长度增长。按顺序读取（例如构建波形包络的流式遍历）时不会重复 seek；
+    随机读取有损格式时先解码 preroll 个采样点再丢弃，使结果与顺序解码一致。
+    读取可能来自界面线程和分析线程，对文件的访问由锁保护。
+    """
+
+    def __init__(self, sound_file, filepath=None, preroll=0):
+        super().__init__(None, sound_file.samplerate, filepath=filepath)
+        self._file = sound_file
+        self._frames = max(0, sound_file.frames)
+        self._preroll = int(preroll)
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._frames
+
+    def _raw(self, start, end):
+        if end <= start:
+            return np.zeros((0, self._file.channels), dtype=np.float32)
+        with self._lock:
+            skip = 0
+            if start != self._position:
+                skip = min(start, self._preroll)
+                self._file.seek(start - skip)
+            block = self._file.read(end - start + skip, dtype='float32', always_2d=True)[skip:]
+            self._position = start + len(block)
+            if len(block) < end - start:
+                # 部分压缩格式头部记录的帧数并不精确，以实际能解码的长度为准
+                self._frames = start + len(block)
+        return block
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _find_wav_data_chunk(filepath):
+    """
+    解析 RIFF/RF64 头部，返回 data 块的 (文件内偏移, 字节数)。
+    文件结构不符合预期时返回 None，由调用方改用按需解码（StreamingAudioSource）。
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] not in (b'RIFF', b'RF64') or header[8:12] != b'WAVE':
+            return None
+        data_size_64 = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = chunk_header[:4], struct.unpack('<I', chunk_header[4:])[0]
+            if chunk_id == b'data':
+                if chunk_size == 0xFFFFFFFF and data_size_64 is not None:
+                    chunk_size = data_size_64
+                return f.tell(), chunk_size
+            if chunk_id == b'ds64':
+                body = f.read(chunk_size)
+                if len(body) >= 16:
+                    data_size_64 = struct.unpack('<Q', body[8:16])[0]
+                if chunk_size & 1: f.seek(1, 1)
+            else:
+                f.seek(chunk_size + (chunk_size & 1), 1)
+
+
+def _open_memory_mapped_wav(filepath, info):
+    """尝试将 PCM/浮点 WAV 的 data 块映射为 (采样点, 声道) 数组，失败时返回 None。"""
+    if info.format not in _MEMMAP_FORMATS or info.subtype not in _MEMMAP_SUBTYPES:
+        return None
+    location = _find_wav_data_chunk(filepath)
+    if location is None:
+        return None
+    offset, size = location
+    dtype, scale, value_offset = _MEMMAP_SUBTYPES[info.subtype]
+    is_pcm24 = info.subtype == 'PCM_24'
+    sample_shape = (info.channels, 3) if is_pcm24 else (info.channels,)
+    frame_bytes = np.dtype(dtype).itemsize * int(np.prod(sample_shape))
+    available = max(0, os.path.getsize(filepath) - offset)
+    frames = min(info.frames, size // frame_bytes, available // frame_bytes)
+    if frames <= 0:
+        data = np.zeros((0,) + sample_shape, dtype=dtype)
+    else:
+        data = np.memmap(filepath, dtype=dtype, mode='r', offset=offset, shape=(frames,) + sample_shape)
+    source_class = Pcm24AudioSource if is_pcm24 else AudioSource
+    return source_class(data, info.samplerate, scale, value_offset, filepath)
+
+
+def open_audio_source(filepath):
+    """
+    打开音频文件并返回 AudioSource。
+    PCM（8/16/24/32 位）/浮点 WAV 直接内存映射，几乎不占用常驻内存；
+    [修复] 其他 soundfile 支持的格式不再在打开时整段解码，而是返回按需 seek/解码的 StreamingAudioSource；
+    soundfile 无法打开的格式退回 librosa.load。
+    """
+    try:
+        info = sf.info(filepath)
+    except Exception:
+        y, sr = librosa.load(filepath, sr=None, mono=True)
+        return AudioSource(y, sr, filepath=filepath)
+    source = _open_memory_mapped_wav(filepath, info)
+    if source is None:
+        preroll = 0 if info.format == 'FLAC' or info.subtype in _EXACT_SEEK_SUBTYPES else SEEK_PREROLL_FRAMES
+        source = StreamingAudioSource(sf.SoundFile(filepath), filepath, preroll)
+    return source
+
+
+def load_audio(filepath):
+    """
+    读取完整的单声道 float32 信号，返回 (y, sr)。
+    可直接替代 librosa.load(filepath, sr=None, mono=True)，但对 WAV 文件避免了额外的解码拷贝。
+    """
+    source = open_audio_source(filepath)
+    return np.asarray(source), source.sr
+
+
+def audio_duration_s(filepath):
+    """只读取文件头得到音频时长（秒）；soundfile 无法识别的格式返回 0.0（时长未知）。"""
+    try:
+        info = sf.info(filepath)
+    except Exception:
+        return 0.0
+    return info.frames / info.samplerate if info.samplerate else 0.0
+
+
+class WaveformEnvelope:
+    """
+    波形的多级最小/最大值包络（mipmap）。
+    第 L 层的每个桶覆盖 base_bucket * 2^L 个采样点，保存 (最小值, 最大值)；
+    每一层都由上一层两两合并得到，整个金字塔只在加载文件时计算一次。
+    绘制时按“每像素采样点数”选择不超过它的最粗一层，再对各列做向量化的分段归约，
+    因此重绘的开销只与控件宽度有关，与文件长度和缩放级别无关。
+    """
+    MAX_BASE_BUCKETS = 1 << 20  # 最细一层的桶数上限（约 8 MB），超长文件会相应增大基础桶宽
+    MIN_BASE_BUCKET = 32
+    MIN_LEVEL_BUCKETS = 256     # 桶数少于该值后不再继续向上合并
+
+    def __init__(self, levels, base_bucket, total_samples):
+        self.levels = levels
+        self.base_bucket = base_bucket
+        self.total_samples = total_samples
+
+    def column_extrema(self, source, start, end, n_columns):
+        """
+        返回视图 [start, end) 被均分为 n_columns 列后每列的 (最小值数组, 最大值数组)。
+        每列至少要覆盖一个采样点；每列采样点数小于基础桶宽时，直接从 source 读取该视图的原始采样。
+        """
+        spp = (end - start) / n_columns
+        if spp <= self.base_bucket:
+            view = source[start:end]
+            edges = np.minimum((np.arange(n_columns) * spp).astype(np.int64), len(view) - 1)
+            return np.minimum.reduceat(view, edges), np.maximum.reduceat(view, edges)
+        level = min(int(np.log2(spp / self.base_bucket)), len(self.levels) - 1)
+        bucket = self.base_bucket << level
+        data = self.levels[level]
+        stop = min(len(data), -(-end // bucket))
+        edges = np.minimum(((start + np.arange(n_columns) * spp) // bucket).astype(np.int64), stop - 1)
+        col_min = np.minimum.reduceat(data[:stop, 0], edges)
+        col_max = np.maximum.reduceat(data[:stop, 1], edges)
+        # 跨越列边界的桶同时计入左右两列，保证每列的包络覆盖该列全部采样点，峰值不会丢失
+        np.minimum(col_min[:-1], data[edges[1:], 0], out=col_min[:-1])
+        np.maximum(col_max[:-1], data[edges[1:], 1], out=col_max[:-1])
+        return col_min, col_max
+
+
+def build_waveform_envelope(source, block_size=OVERVIEW_BLOCK_FRAMES, cancel_check=None):
+    """
+    单次流式遍历整段音频，构建 WaveformEnvelope。source 可以是 AudioSource 或普通数组。
+    最细一层直接在原始采样数据上分块求极值（见 AudioSource.bucket_extrema），其余各层逐层两两合并。
+    对 StreamingAudioSource，这次遍历就是唯一一次顺序解码；实际解码出的长度短于文件头记录时按实际长度截断。
+    cancel_check 为可选的无参函数，返回 True 时提前结束并返回 None。
+    """
+    if not isinstance(source, AudioSource):
+        source = AudioSource(np.asarray(source, dtype=np.float32), 1)
+    total = len(source)
+    base = WaveformEnvelope.MIN_BASE_BUCKET
+    while total > base * WaveformEnvelope.MAX_BASE_BUCKETS:
+        base *= 2
+    level0 = np.zeros((max(1, -(-total // base)), 2), dtype=np.float32)
+    block_size = max(base, block_size // base * base)  # 数据块按桶边界对齐
+    for start in range(0, total, block_size):
+        if cancel_check is not None and cancel_check():
+            return None
+        extrema = source.bucket_extrema(start, start + block_size, base)
+        level0[start // base:start // base + len(extrema)] = extrema
+    if len(source) < total:
+        total = len(source)
+        level0 = level0[:max(1, -(-total // base))]
+    levels = [level0]
+    while len(levels[-1]) > WaveformEnvelope.MIN_LEVEL_BUCKETS:
+        prev = levels[-1]
+        if len(prev) % 2: # 奇数个桶时复制最后一个桶，使其可以两两合并
+            prev = np.concatenate([prev, prev[-1:]])
+        pairs = prev.reshape(-1, 2, 2)
+        levels.append(np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1))
+    return WaveformEnvelope(levels, base, total)
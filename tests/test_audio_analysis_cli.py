@@ -0,0 +1,76 @@
+# 命令行批量分析（modules/audio_analysis_cli.py）的冒烟测试。
+# 运行：python -m pytest -q tests
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+sf = pytest.importorskip("soundfile")
+pytest.importorskip("librosa")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modules"))
+import audio_analysis_cli as cli
+
+
+def write_tone(path, sr=16000, duration_s=1.0, f0=150.0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    t = np.arange(int(sr * duration_s)) / sr
+    y = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6)) * 0.2
+    sf.write(path, y.astype(np.float32), sr)
+
+
+def run_cli(argv):
+    return cli.main(argv + ['--mode', 'fast', '--no-formants'])
+
+
+def test_recursive_inputs_mirror_subdirectories(tmp_path):
+    src, out = tmp_path / "in", tmp_path / "out"
+    write_tone(str(src / "a" / "001.wav"))
+    write_tone(str(src / "b" / "001.wav"), f0=220.0)
+
+    names = cli.collect_audio_inputs([str(src)], recursive=True)
+    assert sorted(names.values()) == [os.path.join("a", "001"), os.path.join("b", "001")]
+    assert not cli.find_output_collisions(names)
+
+    assert run_cli([str(src), '-r', '-o', str(out), '-j', '1', '--formats', 'csv']) == 0
+    assert (out / "a" / "001_analysis.csv").is_file()
+    assert (out / "b" / "001_analysis.csv").is_file()
+
+
+def test_colliding_output_names_are_rejected(tmp_path, capsys):
+    write_tone(str(tmp_path / "a" / "001.wav"))
+    write_tone(str(tmp_path / "b" / "001.wav"))
+    out = tmp_path / "out"
+
+    assert run_cli([str(tmp_path / "a"), str(tmp_path / "b"), '-o', str(out), '--formats', 'csv']) == 2
+    assert "001" in capsys.readouterr().err
+    assert not out.exists() or not any(out.iterdir())
+
+
+VIEW_SMOKE_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import audio_analysis_cli as cli
+cli.resolve_worker_count = lambda requested: int(requested) or 1  # 单核机器上同样使用子进程
+sys.exit(cli.main(sys.argv[2:]))
+"""
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_view_export_smoke(tmp_path, workers):
+    # 在独立进程中运行：渲染时 QGuiApplication 提前被回收会直接导致段错误
+    src, out = tmp_path / "in", tmp_path / "out"
+    write_tone(str(src / "001.wav"))
+    write_tone(str(src / "002.wav"), f0=220.0)
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    modules_dir = os.path.dirname(os.path.abspath(cli.__file__))
+    proc = subprocess.run([sys.executable, '-c', VIEW_SMOKE_SCRIPT, modules_dir, str(src), '-o', str(out), '-j', workers,
+                           '--mode', 'fast', '--formats', 'csv,npz,png,view'],
+                          env=env, capture_output=True, text=True, timeout=600)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    for name in ("001", "002"):
+        assert (out / f"{name}_view.png").stat().st_size > 0
+        assert (out / f"{name}_spectrogram.png").is_file()
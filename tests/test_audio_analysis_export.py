@@ -0,0 +1,71 @@
+# 合并导出（audio_analysis_export.MergedTableWriter）的测试。
+# 运行：python -m pytest -q tests
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modules"))
+from audio_analysis_export import MergedTableWriter, load_analysis_table
+
+
+def make_table(n, offset, with_f4=False):
+    table = {'timestamp': np.arange(n) * 0.01, 'f0_hz': np.full(n, 100.0 + offset),
+             'f1_hz': np.full(n, 500.0 + offset)}
+    if with_f4:
+        table['f4_hz'] = np.full(n, 3500.0 + offset)
+    return pd.DataFrame(table)
+
+
+def write_merged(path, tables):
+    with MergedTableWriter(str(path)) as writer:
+        for name, table in tables:
+            writer.append(table, name)
+
+
+TABLES = [('001', make_table(3, 1)), ('010', make_table(2, 2, with_f4=True)), ('a b', make_table(2, 3))]
+
+
+def expected_frame(tables=TABLES):
+    frames = [table.assign(source_file=name) for name, table in tables]
+    df = pd.concat(frames, ignore_index=True)
+    return df[[name for name in df.columns if name != 'source_file'] + ['source_file']]
+
+
+@pytest.mark.parametrize("tables", [TABLES, TABLES[:2]], ids=["mixed_names", "numeric_names"])
+def test_merged_parquet_keeps_source_file_as_string(tmp_path, tables):
+    # 只有数字形式的文件名时，按目录名推断类型会把 '001' 读成 1
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "merged.parquet"
+    write_merged(path, tables)
+    for df in (load_analysis_table(str(path)), pd.read_parquet(str(path))):
+        pd.testing.assert_frame_equal(df.astype({'source_file': object}), expected_frame(tables), check_dtype=False)
+
+
+@pytest.mark.parametrize("ext", [".parquet", ".feather"])
+def test_merged_csv_matches_binary_formats(tmp_path, ext):
+    pytest.importorskip("pyarrow")
+    write_merged(tmp_path / "merged.csv", TABLES)
+    write_merged(tmp_path / f"merged{ext}", TABLES)
+    from_csv = pd.read_csv(tmp_path / "merged.csv", dtype={'source_file': str})
+    from_binary = load_analysis_table(str(tmp_path / f"merged{ext}"))
+    assert list(from_csv.columns) == list(from_binary.columns) == list(expected_frame().columns)
+    pd.testing.assert_frame_equal(from_csv, from_binary.astype({'source_file': object}), check_dtype=False)
+
+
+def test_merged_feather_is_written_per_file(tmp_path):
+    pa_ipc = pytest.importorskip("pyarrow.ipc")
+    path = tmp_path / "merged.feather"
+    write_merged(path, TABLES)
+    with pa_ipc.open_file(str(path)) as reader:
+        assert reader.num_record_batches == len(TABLES)
+        assert reader.schema.field('source_file').type == 'string'
+    assert os.listdir(tmp_path) == ["merged.feather"]  # 补列时使用的临时文件已替换为目标文件
+
+
+def test_merge_rejects_formats_that_cannot_stream(tmp_path):
+    with pytest.raises(ValueError):
+        MergedTableWriter(str(tmp_path / "merged.npz"))
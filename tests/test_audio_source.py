@@ -0,0 +1,81 @@
+# 按需读取的音频数据源（audio_analysis_source）的测试。
+# 运行：python -m pytest -q tests
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sf = pytest.importorskip("soundfile")
+librosa = pytest.importorskip("librosa")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modules"))
+from audio_analysis_source import (Pcm24AudioSource, StreamingAudioSource, build_waveform_envelope,
+                                   open_audio_source)
+
+SR = 22050
+
+
+def write_noise(path, seconds=3.0, channels=2, **kwargs):
+    y = np.random.default_rng(0).uniform(-0.9, 0.9, (int(SR * seconds), channels)).astype(np.float32)
+    sf.write(path, y, SR, **kwargs)
+
+
+@pytest.fixture
+def decoded_frames(monkeypatch):
+    """统计 soundfile 实际解码的采样点数。"""
+    counter = [0]
+    original_read = sf.SoundFile.read
+
+    def counting_read(self, *args, **kwargs):
+        data = original_read(self, *args, **kwargs)
+        counter[0] += len(data)
+        return data
+
+    monkeypatch.setattr(sf.SoundFile, 'read', counting_read)
+    return counter
+
+
+def test_pcm24_wav_is_memory_mapped(tmp_path, decoded_frames):
+    path = str(tmp_path / "field.wav")
+    write_noise(path, subtype='PCM_24')
+    source = open_audio_source(path)
+    assert isinstance(source, Pcm24AudioSource) and source.is_memory_mapped
+    assert source._data.dtype == np.uint8 and source._data.shape[1:] == (2, 3)
+    part, full = source[1000:5000], np.asarray(source)
+    assert decoded_frames[0] == 0
+
+    expected, _ = librosa.load(path, sr=None, mono=True)
+    np.testing.assert_array_equal(part, expected[1000:5000])
+    np.testing.assert_array_equal(full, expected)
+
+
+def test_flac_is_decoded_on_demand(tmp_path, decoded_frames):
+    path = str(tmp_path / "field.flac")
+    write_noise(path, subtype='PCM_24')
+    source = open_audio_source(path)
+    assert isinstance(source, StreamingAudioSource)
+    assert decoded_frames[0] == 0
+
+    part = source[SR:SR + 1000]
+    assert decoded_frames[0] == 1000
+
+    envelope = build_waveform_envelope(source, block_size=1 << 14)
+    assert envelope.total_samples == len(source)
+    assert decoded_frames[0] == 1000 + len(source)  # 构建包络只顺序解码一遍
+
+    expected, _ = librosa.load(path, sr=None, mono=True)
+    np.testing.assert_array_equal(part, expected[SR:SR + 1000])
+    np.testing.assert_array_equal(np.asarray(source), expected)
+
+
+def test_lossy_random_reads_match_sequential_decode(tmp_path):
+    path = str(tmp_path / "field.ogg")
+    write_noise(path)
+    source = open_audio_source(path)
+    assert isinstance(source, StreamingAudioSource)
+    full = np.asarray(source)
+    rng = np.random.default_rng(1)
+    for start in rng.integers(0, len(full) - 4000, 50):
+        np.testing.assert_array_equal(source[int(start):int(start) + 500], full[start:start + 500])
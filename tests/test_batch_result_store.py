@@ -0,0 +1,125 @@
+# 批量分析结果存储（audio_analysis_cache.BatchResultStore）的测试。
+# 运行：python -m pytest -q tests
+
+import os
+import shutil
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modules"))
+import audio_analysis_cache as cache_module
+from audio_analysis_cache import BatchManifest, BatchResultStore, params_fingerprint
+
+
+def make_results(value):
+    return {'S_db': np.full((4, 6), value, dtype=np.float32), 'hop_length': 160, 'sr': 16000, 'duration_ms': 10.0}
+
+
+def failing_rmtree(path, *args, **kwargs):
+    # 模拟 Windows 上文件仍被内存映射时的删除失败
+    raise PermissionError(13, "file is mapped", path)
+
+
+def test_rewrite_keeps_existing_memmap_views_valid(tmp_path):
+    store = BatchResultStore(str(tmp_path), memory_items=0)
+    store['a.wav'] = make_results(1)
+    view = store['a.wav']['S_db']
+    assert isinstance(view, np.memmap)
+    old_dir = os.path.join(store.session_dir, store.entry_location('a.wav'))
+
+    store['a.wav'] = make_results(2)
+    assert store['a.wav']['S_db'][0, 0] == 2
+    assert view[0, 0] == 1
+    assert store.entry_location('a.wav') != os.path.basename(old_dir)
+    assert not os.path.exists(old_dir)
+    store.close()
+
+
+def test_failed_removals_are_reported_and_retried(tmp_path, monkeypatch, capsys):
+    store = BatchResultStore(str(tmp_path), memory_items=0)
+    store['a.wav'] = make_results(1)
+    with monkeypatch.context() as m:
+        m.setattr(cache_module.shutil, 'rmtree', failing_rmtree)
+        store['a.wav'] = make_results(2)
+    assert "删除旧的分析结果失败" in capsys.readouterr().out
+    assert len(os.listdir(store.session_dir)) == 2
+
+    store['a.wav'] = make_results(3)
+    assert os.listdir(store.session_dir) == [store.entry_location('a.wav')]
+    assert store['a.wav']['S_db'][0, 0] == 3
+    store.close()
+
+
+def test_undeletable_session_is_marked_and_cleaned_up_later(tmp_path, monkeypatch, capsys):
+    store = BatchResultStore(str(tmp_path))
+    store['a.wav'] = make_results(1)
+    session_dir = store.session_dir
+    with monkeypatch.context() as m:
+        m.setattr(cache_module.shutil, 'rmtree', failing_rmtree)
+        store.close()
+    assert "删除批量分析会话目录失败" in capsys.readouterr().out
+    assert os.path.exists(os.path.join(session_dir, BatchResultStore.CLOSED_MARKER))
+
+    next_store = BatchResultStore(str(tmp_path))
+    next_store['b.wav'] = make_results(2)
+    assert not os.path.exists(session_dir)
+    next_store.close()
+
+
+def test_adopt_session_skips_unfinished_temporary_entries(tmp_path):
+    old = BatchResultStore(str(tmp_path))
+    old['a.wav'] = make_results(1)
+    old.manifest().start_run(['a.wav', 'b.wav'], {})
+    tmp_entry = os.path.join(old.session_dir, f"b{BatchResultStore.TMP_SUFFIX}")
+    shutil.copytree(os.path.join(old.session_dir, old.entry_location('a.wav')), tmp_entry)
+    old_dir = old.session_dir
+    old._finalizer.detach()
+
+    store = BatchResultStore(str(tmp_path))
+    assert store.adopt_session(old_dir) == 1
+    assert list(store) == ['a.wav']
+    assert store['a.wav']['S_db'][0, 0] == 1
+    assert not os.path.exists(old_dir)
+    store.close()
+
+
+def test_stale_sessions_with_unfinished_runs_are_kept(tmp_path):
+    old_time = os.path.getmtime(str(tmp_path)) - (BatchResultStore.STALE_SESSION_DAYS + 1) * 86400
+    sessions = {}
+    for name, finished in (('unfinished', False), ('finished', True)):
+        old = BatchResultStore(str(tmp_path))
+        old['a.wav'] = make_results(1)
+        manifest = old.manifest()
+        manifest.start_run(['a.wav'], {})
+        if finished:
+            manifest.finish_run()
+        old._finalizer.detach()
+        os.utime(old.session_dir, (old_time, old_time))
+        sessions[name] = old.session_dir
+
+    store = BatchResultStore(str(tmp_path))
+    store['b.wav'] = make_results(2)
+    assert os.path.exists(sessions['unfinished'])
+    assert not os.path.exists(sessions['finished'])
+    assert store.unfinished_sessions() == [sessions['unfinished']]
+    store.close()
+
+
+def test_single_file_records_do_not_disturb_resumable_run(tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF")
+    manifest = BatchManifest(str(tmp_path / BatchManifest.FILE_NAME))
+    manifest.start_run([str(audio), "b.wav"], {'f0_min': 75})
+
+    single = BatchManifest(manifest.path)
+    single.start_single({'f0_min': 75})
+    single.record(str(audio), "hash", 'done')
+    single.finish_run()
+
+    record = manifest.latest_file_records()[str(audio)]
+    assert record['fingerprint'] == params_fingerprint({'f0_min': 75})
+    assert BatchManifest.file_unchanged(record)
+    run = manifest.unfinished_run()
+    assert run is not None and run['run_id'] == manifest.run_id
+    assert list(run['done']) == [str(audio)]
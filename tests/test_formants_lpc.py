@@ -0,0 +1,115 @@
+# 向量化的共振峰分析（audio_analysis_engine.analyze_formants_lpc）与旧版逐帧 LPC 循环的等价性测试。
+# 运行：python -m pytest -q tests
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip("librosa")
+from scipy.signal import lfilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modules"))
+from audio_analysis_engine import analyze_formants_lpc
+
+
+def reference_formants(y_data, sr, hop_length, start_offset=0, pre_emphasis=False):
+    """旧版 _analyze_formants_helper 的逐帧实现（向量化之前），作为比较基准。"""
+    y_proc = librosa.effects.preemphasis(y_data) if pre_emphasis else y_data
+    frame_length = int(sr * 0.025)
+    if frame_length < 16:
+        frame_length = max(16, len(y_proc))
+    order = int(2 + sr // 1000)
+    order = max(6, min(order, max(6, frame_length - 2)))
+
+    rms = librosa.feature.rms(y=y_data, frame_length=frame_length, hop_length=hop_length)[0]
+    energy_threshold = np.max(rms) * 0.05 if np.max(rms) > 0 else 0
+    nyq = sr / 2.0
+    formant_ranges = [(250, min(800, nyq)), (800, min(2200, nyq)), (2200, min(3000, nyq)), (3000, min(4000, nyq))]
+
+    formant_points = []
+    for frame_index, i in enumerate(range(0, len(y_proc) - frame_length, hop_length)):
+        if frame_index < len(rms) and rms[frame_index] < energy_threshold:
+            continue
+        y_frame = y_proc[i: i + frame_length]
+        y_frame = (y_frame - np.mean(y_frame)) * np.hamming(len(y_frame))
+        if np.max(np.abs(y_frame)) < 1e-6 or not np.isfinite(y_frame).all() or len(y_frame) <= order:
+            continue
+        try:
+            a = librosa.lpc(y_frame, order=order)
+        except Exception:
+            continue
+        if not np.isfinite(a).all():
+            continue
+        roots = [r for r in np.roots(a) if np.imag(r) >= 0 and 0.001 < np.abs(r) < 0.9999]
+        candidates = []
+        for r in roots:
+            freq = np.angle(r) * (sr / (2 * np.pi))
+            if freq <= 0 or freq >= nyq:
+                continue
+            bw = -(sr / np.pi) * np.log(np.abs(r))
+            if bw <= 0 or bw > 1000:
+                continue
+            candidates.append((freq, bw))
+        found = []
+        for f_min, f_max in formant_ranges:
+            band = [(f, bw) for f, bw in candidates if f_min <= f <= f_max]
+            if band:
+                found.append(min(band, key=lambda x: x[1])[0])
+        if found:
+            formant_points.append((start_offset + i + frame_length // 2, found))
+    return formant_points
+
+
+def synthetic_vowel(sr, formants=(700, 1200, 2600, 3400), f0=120.0, duration_s=0.6, seed=0):
+    """脉冲串经过串联二阶共振器得到的元音，前后各留一段静音以检验能量门限。"""
+    n = int(sr * duration_s)
+    y = np.zeros(n)
+    y[::int(sr / f0)] = 1.0
+    for freq, bw in zip(formants, (80, 90, 120, 150)):
+        if freq >= sr / 2:
+            continue
+        r = np.exp(-np.pi * bw / sr)
+        y = lfilter([1.0], [1.0, -2 * r * np.cos(2 * np.pi * freq / sr), r * r], y)
+    y += np.random.default_rng(seed).normal(0, 1e-4, n)
+    silence = np.zeros(int(sr * 0.1))
+    y = np.concatenate([silence, y / np.max(np.abs(y)) * 0.5, silence])
+    return y.astype(np.float32)
+
+
+def assert_same_points(actual, expected):
+    assert len(actual) > 0
+    assert [center for center, _ in actual] == [center for center, _ in expected]
+    for (_, got), (_, want) in zip(actual, expected):
+        assert len(got) == len(want)
+        np.testing.assert_allclose(got, want, rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize("sr", [16000, 22050, 44100])
+@pytest.mark.parametrize("pre_emphasis", [False, True])
+def test_matches_per_frame_loop(sr, pre_emphasis):
+    y = synthetic_vowel(sr)
+    hop_length = int(sr * 0.01)
+    expected = reference_formants(y, sr, hop_length, pre_emphasis=pre_emphasis)
+    actual = analyze_formants_lpc(y, sr, hop_length, pre_emphasis=pre_emphasis)
+    assert_same_points(actual, expected)
+
+
+@pytest.mark.parametrize("hop_ms", [5, 12.5, 20])
+def test_matches_per_frame_loop_with_offset_and_hops(hop_ms):
+    sr = 22050
+    y = synthetic_vowel(sr, formants=(300, 2300, 2900, 3600), f0=210.0, seed=1)
+    hop_length = int(sr * hop_ms / 1000)
+    expected = reference_formants(y, sr, hop_length, start_offset=12345)
+    actual = analyze_formants_lpc(y, sr, hop_length, start_offset=12345)
+    assert_same_points(actual, expected)
+
+
+def test_finds_synthetic_formants():
+    sr = 16000
+    points = analyze_formants_lpc(synthetic_vowel(sr), sr, 160)
+    f1 = np.median([freqs[0] for _, freqs in points])
+    f2 = np.median([freqs[1] for _, freqs in points if len(freqs) > 1])
+    assert abs(f1 - 700) < 100
+    assert abs(f2 - 1200) < 150